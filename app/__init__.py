@@ -1 +1,5 @@
 # App package
+import time
+
+# Reference point for the "import" startup phase reported by app.startup
+IMPORT_STARTED = time.perf_counter()
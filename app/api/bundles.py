@@ -0,0 +1,29 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+
+from app.bundles import MEDIA_TYPES, bundle_builder
+from app.service_worker import file_revision
+
+router = APIRouter()
+
+
+@router.get("/bundles/{name}", response_class=FileResponse)
+async def get_bundle(name: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Serve a minified script or stylesheet bundle
+
+    Bundles keep a stable URL, so clients revalidate them on every use; the
+    ETag is a hash of the content and a match gets an empty 304
+    """
+    try:
+        path = await run_in_threadpool(bundle_builder.path, name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+
+    headers = {"ETag": f'"{file_revision(path)}"', "Cache-Control": "no-cache"}
+    if if_none_match and headers["ETag"] in if_none_match:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=MEDIA_TYPES[path.suffix], headers=headers)
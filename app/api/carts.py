@@ -0,0 +1,97 @@
+from typing import Dict, Tuple
+
+from fastapi import APIRouter, HTTPException, Path, Response
+
+from app.carts import (
+    CartConflictError,
+    CartFullError,
+    cart_store,
+    customization_registry,
+    price_lines,
+)
+from app.mock_data import ensure_catalog
+from app.models import CartDelta, CartLineChange, CartState
+from app.wishlists import WISHLIST_ID_PATTERN
+
+router = APIRouter()
+
+# Carts are per user and change often; never serve them from a cache
+NO_STORE = "no-store"
+
+CartId = Path(
+    ...,
+    pattern=WISHLIST_ID_PATTERN,
+    description="Client-generated cart id (8-64 letters, digits, _ or -)",
+)
+
+
+def _cart_state(cart_id: str, version: int, lines: Dict[Tuple[int, str], int]):
+    priced, subtotal, item_count = price_lines(
+        ensure_catalog(), lines, customization_registry
+    )
+    return CartState(
+        id=cart_id,
+        version=version,
+        lines=priced,
+        item_count=item_count,
+        subtotal=subtotal,
+    )
+
+
+def _customization_hash(store, line: CartLineChange) -> str:
+    """Resolve a change's customization, raising a 400 for unknown references"""
+    if line.customizations is not None:
+        try:
+            return customization_registry.register(
+                store, line.product_id, line.customizations
+            )
+        except (LookupError, ValueError) as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    if line.customization_hash:
+        customization = customization_registry.get(line.customization_hash)
+        if customization is None or customization.product_id != line.product_id:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown customization_hash: {line.customization_hash}",
+            )
+    elif line.quantity > 0 and store.row_of(line.product_id) is None:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown product id: {line.product_id}"
+        )
+    return line.customization_hash
+
+
+@router.get("/carts/{cart_id}", response_model=CartState)
+async def get_cart(response: Response, cart_id: str = CartId):
+    """
+    Get a cart with prices and totals from the current catalog
+
+    Unknown ids return an empty cart at version 0.
+    """
+    response.headers["Cache-Control"] = NO_STORE
+    return _cart_state(cart_id, *cart_store.get(cart_id))
+
+
+@router.post("/carts/{cart_id}/changes", response_model=CartState)
+async def apply_cart_changes(
+    delta: CartDelta, response: Response, cart_id: str = CartId
+):
+    """
+    Set the quantities of several cart lines at once
+
+    The delta must be based on the cart's current version; otherwise 409 is
+    returned and the client should re-read the cart and rebase its changes.
+    A new customized line sends its selected options instead of a hash.
+    """
+    response.headers["Cache-Control"] = NO_STORE
+    store = ensure_catalog()
+    changes = [
+        (line.product_id, _customization_hash(store, line), line.quantity)
+        for line in delta.lines
+    ]
+
+    try:
+        version, lines = cart_store.apply(cart_id, delta.base_version, changes)
+    except (CartConflictError, CartFullError) as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return _cart_state(cart_id, version, lines)
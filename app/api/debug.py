@@ -0,0 +1,118 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+
+from app import profiling
+from app.memory import GROUP_BY, memory_diagnostics
+
+router = APIRouter()
+
+
+def _require_profile_token(token: Optional[str]) -> profiling.ProfilingConfig:
+    """Debug endpoints are admin-only: they require the profiling token"""
+    config = profiling.profiling_config
+    if not config.token:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    if not config.is_authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+    return config
+
+
+@router.get("/profiles")
+async def get_profiles(x_profile: Optional[str] = Header(None)):
+    """List captured request profiles, newest first"""
+    config = _require_profile_token(x_profile)
+    return profiling.list_profiles(config)
+
+
+@router.get("/profiles/{name}", response_class=FileResponse)
+async def get_profile(name: str, x_profile: Optional[str] = Header(None)):
+    """Download a captured profile (pstats or speedscope JSON)"""
+    config = _require_profile_token(x_profile)
+    if name not in {p["name"] for p in profiling.list_profiles(config)}:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = (
+        "application/json" if name.endswith(".json") else "application/octet-stream"
+    )
+    return FileResponse(config.profile_dir / name, media_type=media_type, filename=name)
+
+
+def _check_group_by(group_by: str) -> None:
+    if group_by not in GROUP_BY:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid group_by. Must be one of: {', '.join(GROUP_BY)}",
+        )
+
+
+async def _snapshot_stats(method, *args):
+    """Run a snapshot query off the loop; snapshots evicted meanwhile are 404s"""
+    try:
+        return await run_in_threadpool(method, *args)
+    except KeyError as exc:
+        raise HTTPException(
+            status_code=404, detail=f"Snapshot not found: {exc.args[0]}"
+        )
+
+
+@router.get("/memory")
+async def get_memory(x_profile: Optional[str] = Header(None)):
+    """Tracing status, stored snapshots and per-component sizes"""
+    _require_profile_token(x_profile)
+    return await run_in_threadpool(memory_diagnostics.status)
+
+
+@router.post("/memory/tracing")
+async def set_memory_tracing(
+    enabled: bool = Query(..., description="Start (true) or stop (false) tracing"),
+    frames: int = Query(1, ge=1, le=64, description="Frames kept per allocation"),
+    x_profile: Optional[str] = Header(None),
+):
+    """Start or stop tracemalloc allocation tracing"""
+    _require_profile_token(x_profile)
+    if enabled:
+        memory_diagnostics.start(frames)
+    else:
+        memory_diagnostics.stop()
+    return {"tracing": memory_diagnostics.tracing}
+
+
+@router.post("/memory/snapshots")
+async def take_memory_snapshot(x_profile: Optional[str] = Header(None)):
+    """Take a tracemalloc snapshot and return its id"""
+    _require_profile_token(x_profile)
+    try:
+        return await run_in_threadpool(memory_diagnostics.take_snapshot)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.get("/memory/snapshots/{snapshot_id}")
+async def get_memory_snapshot(
+    snapshot_id: int,
+    group_by: str = Query("lineno", description="Group by: lineno, filename"),
+    limit: int = Query(20, ge=1, le=500),
+    x_profile: Optional[str] = Header(None),
+):
+    """Top allocation sites in a snapshot"""
+    _require_profile_token(x_profile)
+    _check_group_by(group_by)
+    return await _snapshot_stats(memory_diagnostics.top, snapshot_id, group_by, limit)
+
+
+@router.get("/memory/diff")
+async def get_memory_diff(
+    base: int = Query(..., description="Earlier snapshot id"),
+    current: int = Query(..., description="Later snapshot id"),
+    group_by: str = Query("lineno", description="Group by: lineno, filename"),
+    limit: int = Query(20, ge=1, le=500),
+    x_profile: Optional[str] = Header(None),
+):
+    """Allocation sites that changed most between two snapshots"""
+    _require_profile_token(x_profile)
+    _check_group_by(group_by)
+    return await _snapshot_stats(
+        memory_diagnostics.diff, base, current, group_by, limit
+    )
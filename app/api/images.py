@@ -0,0 +1,63 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import FileResponse, RedirectResponse
+
+from app.images import FORMATS, WIDTHS, image_service
+from app.mock_data import get_product_by_id
+
+router = APIRouter()
+
+# URLs naming the current source revision never change content; others
+# (no or an outdated ``v``) are cached briefly and revalidated by ETag
+VERSIONED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UNVERSIONED_CACHE_CONTROL = "public, max-age=300"
+
+
+@router.get("/img/{product_id}", response_class=FileResponse)
+async def get_product_image(
+    product_id: int,
+    w: int = Query(WIDTHS[-1], gt=0, description="Target width in pixels"),
+    fmt: Optional[str] = Query(
+        None, description="Output format: avif, webp, jpeg (default: negotiated)"
+    ),
+    v: Optional[int] = Query(None, description="Source image revision (from srcset)"),
+    accept: Optional[str] = Header(None),
+):
+    """
+    Serve a resized, re-encoded variant of a product image
+
+    Variants are generated on first request and cached on disk. Only URLs
+    carrying the current source revision are cached as immutable. Products
+    without a local source image redirect to their original image.
+    """
+    product = get_product_by_id(product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    current = v is not None and v == image_service.source_version(product_id)
+    headers = {
+        "Cache-Control": (
+            VERSIONED_CACHE_CONTROL if current else UNVERSIONED_CACHE_CONTROL
+        )
+    }
+    if fmt is None:
+        fmt = image_service.negotiate_format(accept)
+        headers["Vary"] = "Accept"
+    elif fmt not in image_service.supported_formats():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid fmt. Must be one of: {', '.join(image_service.supported_formats())}",
+        )
+
+    try:
+        path = await image_service.get_variant(product_id, w, fmt)
+    except LookupError:
+        # Not fetched yet (python -m app.images fetch)
+        return RedirectResponse(
+            product.image,
+            status_code=307,
+            headers={"Cache-Control": UNVERSIONED_CACHE_CONTROL},
+        )
+
+    return FileResponse(path, media_type=FORMATS[fmt][2], headers=headers)
@@ -0,0 +1,91 @@
+from fastapi import APIRouter, HTTPException, Response
+
+from app.carts import customization_registry
+from app.inventory import OutOfStockError, Reservation, inventory
+from app.mock_data import ensure_catalog
+from app.models import ReservationRequest, ReservationState, StockLevel
+
+router = APIRouter()
+
+# Stock levels and reservations change with every purchase
+NO_STORE = "no-store"
+
+
+def _reservation_state(reservation: Reservation) -> ReservationState:
+    return ReservationState(
+        id=reservation.id,
+        product_id=reservation.product_id,
+        customization_hash=reservation.customization_hash,
+        quantity=reservation.quantity,
+        expires_in=round(max(reservation.expires_at - inventory.clock(), 0), 3),
+        held=reservation.counted_as is not None,
+    )
+
+
+def _check_product(product_id: int, customization_hash: str = "") -> None:
+    """Raise a 404 for unknown products and a 400 for unknown customizations"""
+    if ensure_catalog().row_of(product_id) is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if customization_hash:
+        customization = customization_registry.get(customization_hash)
+        if customization is None or customization.product_id != product_id:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown customization_hash: {customization_hash}",
+            )
+
+
+@router.get("/products/{product_id}/stock", response_model=StockLevel)
+async def get_stock(product_id: int, response: Response):
+    """Get the items available for a product and its stocked customizations"""
+    response.headers["Cache-Control"] = NO_STORE
+    _check_product(product_id)
+    available = inventory.available(product_id)
+    return StockLevel(
+        product_id=product_id,
+        tracked=available is not None,
+        in_stock=not inventory.is_sold_out(product_id),
+        available=available,
+        variants=inventory.variants(product_id),
+    )
+
+
+@router.post("/reservations", response_model=ReservationState, status_code=201)
+async def create_reservation(request: ReservationRequest, response: Response):
+    """
+    Hold items while the client checks out
+
+    Held items are not sold to anyone else until the reservation is
+    committed, released or expires. 409 if not enough items are available.
+    Products without stock are not tracked: nothing is held and the
+    reservation is not kept (``held`` is false).
+    """
+    response.headers["Cache-Control"] = NO_STORE
+    _check_product(request.product_id, request.customization_hash)
+    try:
+        reservation = inventory.reserve(
+            request.product_id, request.quantity, request.customization_hash
+        )
+    except OutOfStockError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return _reservation_state(reservation)
+
+
+@router.post("/reservations/{reservation_id}/commit", response_model=ReservationState)
+async def commit_reservation(reservation_id: str, response: Response):
+    """Sell the reserved items; 404 once the reservation has expired"""
+    response.headers["Cache-Control"] = NO_STORE
+    try:
+        return _reservation_state(inventory.commit(reservation_id))
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+
+@router.delete("/reservations/{reservation_id}", status_code=204)
+async def release_reservation(reservation_id: str):
+    """Put the reserved items back on sale"""
+    try:
+        inventory.release(reservation_id)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return Response(status_code=204)
@@ -1,32 +1,100 @@
-from typing import List, Optional
+import hashlib
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
 
 from app.customization_config import (
     ProductCustomizationConfig,
     get_customization_config,
 )
-from app.mock_data import get_all_products, get_product_by_id, get_products_by_category
-from app.models import Product
+from app.mock_data import (
+    filter_products_page,
+    get_catalog_changes,
+    get_price_histogram,
+    get_product_by_id,
+    get_products_by_category,
+    get_similar_products,
+)
+from app.models import CatalogChanges, PriceHistogram, Product
+from app.similarity import SIMILAR_K
+from app.singleflight import catalog_flight
+from app.tracing import span
 
 router = APIRouter()
 
+_product_list_adapter = TypeAdapter(List[Product])
 
-@router.get("/products", response_model=List[Product])
-async def get_products(
-    category: Optional[str] = Query(
-        None, description="Filter by category: rings, necklaces, bracelets"
-    ),
-    price_max: Optional[int] = Query(
-        None, description="Filter by max price: 500, 1000, 1500, 2000"
-    ),
-    material: Optional[str] = Query(
-        None, description="Filter by material: Silver, Gold, Rose Gold, White Gold"
-    ),
-):
-    """Get all products with optional filters"""
-    products = get_all_products()
+# Browsers and the service worker may reuse a catalog response for this long,
+# then serve it while revalidating with If-None-Match for a while longer
+API_MAX_AGE = 60
+API_STALE_WHILE_REVALIDATE = 600
+API_CACHE_CONTROL = (
+    f"public, max-age={API_MAX_AGE}, "
+    f"stale-while-revalidate={API_STALE_WHILE_REVALIDATE}"
+)
+
+MAX_PAGE_SIZE = 1000
+MAX_PRICE_BUCKETS = 100
+
+
+def _with_etag(build) -> Tuple[bytes, Dict[str, str]]:
+    """Run ``build`` and tag the body with a strong ETag of its content"""
+    body, headers = build()
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return body, {**headers, "ETag": etag}
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    # Weak comparison, as required for If-None-Match
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def _coalesced_json(
+    key: tuple,
+    build,
+    if_none_match: Optional[str] = None,
+    cache_control: str = API_CACHE_CONTROL,
+) -> Response:
+    """
+    Build and serialize a response once for all concurrent identical requests
+
+    The query and JSON encoding run in the threadpool so that identical
+    requests arriving meanwhile can join the in-flight computation. ``build``
+    returns the body and any extra headers. Responses carry an ETag; a
+    matching ``If-None-Match`` gets an empty 304.
+    """
+    with span("coalesced_build", key=repr(key)):
+        body, headers = await catalog_flight.do(
+            key, lambda: run_in_threadpool(_with_etag, build)
+        )
+    headers = {**headers, "Cache-Control": cache_control}
+    if _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
+
+def _serialize_products(
+    products: List[Product], total: Optional[int] = None
+) -> Tuple[bytes, Dict[str, str]]:
+    """Encode a product list as JSON, with the number of matches as a header"""
+    with span("serialize_json", products=len(products)):
+        body = _product_list_adapter.dump_json(products)
+    count = len(products) if total is None else total
+    return body, {"X-Total-Count": str(count)}
+
+
+def _validate_product_filters(
+    category: Optional[str],
+    price_min: Optional[float],
+    price_max: Optional[float],
+    material: Optional[str],
+) -> None:
+    """Raise a 400 for filter values outside the supported choices"""
     if category:
         valid_categories = ["rings", "necklaces", "bracelets"]
         if category not in valid_categories:
@@ -34,15 +102,12 @@ async def get_products(
                 status_code=400,
                 detail=f"Invalid category. Must be one of: {', '.join(valid_categories)}",
             )
-        products = [p for p in products if p.category == category]
 
-    if price_max:
-        if price_max not in [500, 1000, 1500, 2000]:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid price_max. Must be one of: 500, 1000, 1500, 2000",
-            )
-        products = [p for p in products if p.price <= price_max]
+    if price_min is not None and price_max is not None and price_min > price_max:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid price range. price_min must not exceed price_max",
+        )
 
     if material:
         valid_materials = ["Silver", "Gold", "Rose Gold", "White Gold"]
@@ -51,9 +116,159 @@ async def get_products(
                 status_code=400,
                 detail=f"Invalid material. Must be one of: {', '.join(valid_materials)}",
             )
-        products = [p for p in products if p.material == material]
 
-    return products
+
+@router.get("/products", response_model=List[Product])
+async def get_products(
+    category: Optional[str] = Query(
+        None, description="Filter by category: rings, necklaces, bracelets"
+    ),
+    price_min: Optional[float] = Query(
+        None, ge=0, allow_inf_nan=False, description="Filter by min price (inclusive)"
+    ),
+    price_max: Optional[float] = Query(
+        None, ge=0, allow_inf_nan=False, description="Filter by max price (inclusive)"
+    ),
+    material: Optional[str] = Query(
+        None, description="Filter by material: Silver, Gold, Rose Gold, White Gold"
+    ),
+    offset: int = Query(0, ge=0, description="Number of matching products to skip"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE, description="Page size (all matches if omitted)"
+    ),
+    in_stock: bool = Query(False, description="Leave out sold-out products"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Get all products with optional filters
+
+    ``offset``/``limit`` select one page of the matches; the total number of
+    matches is returned in the ``X-Total-Count`` header. Stock changes
+    faster than the catalog, so ``in_stock`` responses are always
+    revalidated.
+    """
+    with span("validate_params"):
+        _validate_product_filters(category, price_min, price_max, material)
+
+    return await _coalesced_json(
+        (
+            "products",
+            category or None,
+            price_min,
+            price_max,
+            material or None,
+            offset,
+            limit,
+            in_stock,
+        ),
+        lambda: _serialize_products(
+            *filter_products_page(
+                category=category,
+                price_min=price_min,
+                price_max=price_max,
+                material=material,
+                offset=offset,
+                limit=limit,
+                in_stock=in_stock,
+            )
+        ),
+        if_none_match,
+        cache_control="no-cache" if in_stock else API_CACHE_CONTROL,
+    )
+
+
+@router.get("/products/changes", response_model=CatalogChanges)
+async def get_product_changes(
+    since: int = Query(
+        0, ge=0, description="Catalog version the client holds (0 for none)"
+    ),
+    epoch: Optional[str] = Query(
+        None, max_length=32, description="Epoch the client's version belongs to"
+    ),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Get the products added, updated or removed since catalog version ``since``
+
+    A version from another epoch (e.g. before a server restart) gets the whole
+    catalog with ``reset`` set. The response is always revalidated, so an
+    unchanged catalog costs a 304.
+    """
+
+    def build() -> Tuple[bytes, Dict[str, str]]:
+        current, version, products, removed = get_catalog_changes(since, epoch)
+        changes = CatalogChanges(
+            epoch=current,
+            version=version,
+            reset=removed is None,
+            products=products,
+            removed=removed or [],
+        )
+        with span("serialize_json", products=len(products)):
+            return changes.model_dump_json().encode("utf-8"), {}
+
+    return await _coalesced_json(
+        ("changes", since, epoch), build, if_none_match, cache_control="no-cache"
+    )
+
+
+@router.get("/products/price-histogram", response_model=PriceHistogram)
+async def get_products_price_histogram(
+    category: Optional[str] = Query(
+        None, description="Filter by category: rings, necklaces, bracelets"
+    ),
+    material: Optional[str] = Query(
+        None, description="Filter by material: Silver, Gold, Rose Gold, White Gold"
+    ),
+    price_min: Optional[float] = Query(
+        None,
+        ge=0,
+        allow_inf_nan=False,
+        description="Lowest bucket edge (default: lowest price)",
+    ),
+    price_max: Optional[float] = Query(
+        None,
+        ge=0,
+        allow_inf_nan=False,
+        description="Highest bucket edge (default: highest price)",
+    ),
+    buckets: int = Query(
+        10, ge=1, le=MAX_PRICE_BUCKETS, description="Number of price buckets"
+    ),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Count the products matching the filters in equal-width price buckets
+
+    Each bucket includes its lower edge; the last one also its upper edge.
+    Edges are empty when nothing matches an open range.
+    """
+    with span("validate_params"):
+        _validate_product_filters(category, price_min, price_max, material)
+
+    def build() -> Tuple[bytes, Dict[str, str]]:
+        edges, counts = get_price_histogram(
+            category=category,
+            material=material,
+            price_min=price_min,
+            price_max=price_max,
+            buckets=buckets,
+        )
+        histogram = PriceHistogram(edges=edges, counts=counts, total=sum(counts))
+        return histogram.model_dump_json().encode("utf-8"), {}
+
+    return await _coalesced_json(
+        (
+            "price-histogram",
+            category or None,
+            material or None,
+            price_min,
+            price_max,
+            buckets,
+        ),
+        build,
+        if_none_match,
+    )
 
 
 @router.get("/products/{product_id}", response_model=Product)
@@ -65,8 +280,32 @@ async def get_product(product_id: int):
     return product
 
 
+@router.get("/products/{product_id}/similar", response_model=List[Product])
+async def get_similar(
+    product_id: int,
+    limit: int = Query(
+        SIMILAR_K, ge=1, le=SIMILAR_K, description="Number of products to return"
+    ),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Get the products most similar to one product, best first
+
+    Neighbors are precomputed, so this is a lookup rather than a search.
+    """
+    if not get_product_by_id(product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    return await _coalesced_json(
+        ("similar", product_id, limit),
+        lambda: _serialize_products(get_similar_products(product_id, limit) or []),
+        if_none_match,
+    )
+
+
 @router.get("/products/category/{category}", response_model=List[Product])
-async def get_products_in_category(category: str):
+async def get_products_in_category(
+    category: str, if_none_match: Optional[str] = Header(None)
+):
     """Get all products in a specific category"""
     valid_categories = ["rings", "necklaces", "bracelets"]
     if category not in valid_categories:
@@ -74,13 +313,19 @@ async def get_products_in_category(category: str):
             status_code=400,
             detail=f"Invalid category. Must be one of: {', '.join(valid_categories)}",
         )
-    return get_products_by_category(category)
+    return await _coalesced_json(
+        ("category", category),
+        lambda: _serialize_products(get_products_by_category(category)),
+        if_none_match,
+    )
 
 
 @router.get(
     "/customization-config/{category}", response_model=ProductCustomizationConfig
 )
-async def get_customization_configuration(category: str):
+async def get_customization_configuration(
+    category: str, if_none_match: Optional[str] = Header(None)
+):
     """
     Get customization configuration for a product category
 
@@ -100,4 +345,8 @@ async def get_customization_configuration(category: str):
             detail=f"Customization configuration not found for category: {category}",
         )
 
-    return config
+    def serialize() -> Tuple[bytes, Dict[str, str]]:
+        with span("serialize_json"):
+            return config.model_dump_json().encode("utf-8"), {}
+
+    return await _coalesced_json(("customization", category), serialize, if_none_match)
@@ -0,0 +1,80 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Path, Query, Response
+
+from app.mock_data import get_products_by_ids
+from app.models import WishlistDelta, WishlistState
+from app.wishlists import WISHLIST_ID_PATTERN, WishlistFullError, wishlist_store
+
+router = APIRouter()
+
+# Wishlists are per user and change often; never serve them from a cache
+NO_STORE = "no-store"
+
+WishlistId = Path(
+    ...,
+    pattern=WISHLIST_ID_PATTERN,
+    description="Client-generated wishlist id (8-64 letters, digits, _ or -)",
+)
+
+
+def _validate_product_ids(product_ids: List[int]) -> None:
+    """Raise a 400 if any id is not in the catalog"""
+    known = {product.id for product in get_products_by_ids(product_ids)}
+    unknown = sorted(set(product_ids) - known)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown product ids: {', '.join(map(str, unknown))}",
+        )
+
+
+@router.get("/wishlists/{wishlist_id}", response_model=WishlistState)
+async def get_wishlist(
+    response: Response,
+    wishlist_id: str = WishlistId,
+    hydrate: bool = Query(True, description="Include the products themselves"),
+):
+    """
+    Get a wishlist and, by default, just the products on it
+
+    Unknown ids return an empty wishlist at version 0.
+    """
+    response.headers["Cache-Control"] = NO_STORE
+    version, product_ids = wishlist_store.get(wishlist_id)
+    return WishlistState(
+        id=wishlist_id,
+        version=version,
+        product_ids=product_ids,
+        products=get_products_by_ids(product_ids) if hydrate else None,
+    )
+
+
+@router.post("/wishlists/{wishlist_id}/changes", response_model=WishlistState)
+async def apply_wishlist_changes(
+    delta: WishlistDelta, response: Response, wishlist_id: str = WishlistId
+):
+    """
+    Apply a batch of adds and removes to a wishlist
+
+    Deltas are merged in arrival order, whatever their ``base_version``.
+    If the wishlist changed since ``base_version`` (e.g. on another device),
+    the response includes the products so the client can refresh without
+    another request.
+    """
+    response.headers["Cache-Control"] = NO_STORE
+    _validate_product_ids(delta.add)
+    try:
+        previous, version, product_ids = wishlist_store.apply(
+            wishlist_id, delta.add, delta.remove
+        )
+    except WishlistFullError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+    stale = previous != delta.base_version
+    return WishlistState(
+        id=wishlist_id,
+        version=version,
+        product_ids=product_ids,
+        products=get_products_by_ids(product_ids) if stale else None,
+    )
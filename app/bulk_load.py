@@ -0,0 +1,164 @@
+"""
+Bulk Product Loading
+Validate a batch of product rows column by column, then build the models
+without per-row Pydantic validation
+"""
+
+import typing
+from operator import itemgetter
+from typing import Any, Dict, List, NamedTuple, Sequence, Set, Tuple
+
+from pydantic import ValidationError
+
+from app.models import Product
+
+# Allowed values are read from the model so the two can't drift apart
+CATEGORIES = frozenset(typing.get_args(Product.model_fields["category"].annotation))
+MATERIALS = frozenset(typing.get_args(Product.model_fields["material"].annotation))
+
+FIELDS = tuple(Product.model_fields)
+_FIELD_SET = frozenset(FIELDS)
+ALL_FIELDS_SET = set(FIELDS)
+_DEFAULTS = {
+    name: field.default
+    for name, field in Product.model_fields.items()
+    if not field.is_required()
+}
+
+_MISSING = object()
+_row_values = itemgetter(*FIELDS)
+_new_product = Product.__new__
+_set = object.__setattr__
+
+
+class RowError(NamedTuple):
+    """A row rejected by full validation"""
+
+    index: int
+    error: ValidationError
+
+
+class BulkLoadResult(NamedTuple):
+    """Outcome of bulk_load_products"""
+
+    products: List[Product]
+    errors: List[RowError]
+    fast_rows: int
+    validated_rows: int
+
+
+def _columns(rows: Sequence[Any]) -> Dict[str, Sequence[Any]]:
+    """Transpose rows into one sequence per field (missing values -> _MISSING)"""
+    if not rows:
+        return {name: () for name in FIELDS}
+    try:
+        # Fast path: every row is a dict holding every field
+        return dict(zip(FIELDS, zip(*map(_row_values, rows))))
+    except (KeyError, TypeError, IndexError):
+        return {
+            name: [
+                row.get(name, _MISSING) if type(row) is dict else _MISSING
+                for row in rows
+            ]
+            for name in FIELDS
+        }
+
+
+def find_suspect_rows(rows: Sequence[Any]) -> Tuple[Set[int], Set[int]]:
+    """
+    Check a batch column by column
+
+    Only values that full validation would accept unchanged pass: exact
+    types, ``price > 0``, known categories and materials, and non-empty
+    ``name``/``description``. Anything else (including values Pydantic would
+    coerce, such as "12" for an int) is left to full validation.
+
+    Returns:
+        (suspect, irregular): rows that need full validation, and valid rows
+        that cannot be used as-is (missing defaults, extra keys, int prices)
+    """
+    columns = _columns(rows)
+    suspect: Set[int] = set()
+    add = suspect.update
+    add(i for i, t in enumerate(map(type, columns["id"])) if t is not int)
+    add(i for i, v in enumerate(columns["name"]) if not v or type(v) is not str)
+    add(i for i, v in enumerate(columns["description"]) if not v or type(v) is not str)
+    add(i for i, t in enumerate(map(type, columns["image"])) if t is not str)
+    prices = columns["price"]
+    add(
+        i
+        for i, v in enumerate(prices)
+        if not ((type(v) is float or type(v) is int) and v > 0)
+    )
+    # Membership also rejects non-strings: only str values are in these sets
+    add(i for i, v in enumerate(columns["category"]) if v not in CATEGORIES)
+    add(i for i, v in enumerate(columns["material"]) if v not in MATERIALS)
+    add(
+        i
+        for i, v in enumerate(columns["customizable"])
+        if v is not _MISSING and type(v) is not bool
+    )
+
+    width = len(FIELDS)
+    irregular = {i for i, row in enumerate(rows) if len(row) != width}
+    irregular.update(i for i, v in enumerate(prices) if type(v) is int)
+    irregular -= suspect
+    return suspect, irregular
+
+
+def construct_unvalidated(values: Dict[str, Any], fields_set: Set[str]) -> Product:
+    """Build a Product around an already valid field dict
+
+    Equivalent to ``Product.model_construct`` (which in Pydantic 2 is slower
+    than validating) for values that are already known to be valid.
+    """
+    product = _new_product(Product)
+    _set(product, "__dict__", values)
+    _set(product, "__pydantic_fields_set__", fields_set)
+    _set(product, "__pydantic_extra__", None)
+    _set(product, "__pydantic_private__", None)
+    return product
+
+
+def bulk_load_products(rows: Sequence[Any]) -> BulkLoadResult:
+    """
+    Build Product models for a batch of rows
+
+    Rows that pass the columnar checks are constructed without validation;
+    the rest go through full ``Product`` validation. Rows that fail it are
+    reported in ``errors`` and left out of ``products``; input order is
+    otherwise preserved.
+
+    Args:
+        rows: Sequence of dicts with Product fields
+
+    Returns:
+        BulkLoadResult with products, per-row errors and path counts
+    """
+    suspect, irregular = find_suspect_rows(rows)
+    width = len(FIELDS)
+    products: List[Product] = []
+    errors: List[RowError] = []
+    append = products.append
+    for index, row in enumerate(rows):
+        if index in suspect:
+            try:
+                append(Product.model_validate(row))
+            except ValidationError as exc:
+                errors.append(RowError(index, exc))
+        elif index in irregular:
+            values = {**_DEFAULTS, **row}
+            if len(values) != width:
+                values = {name: values[name] for name in FIELDS}
+            values["price"] = float(values["price"])
+            append(construct_unvalidated(values, _FIELD_SET.intersection(row)))
+        else:
+            # Every field is set, so all instances can share one fields set:
+            # Pydantic only ever adds names to it, and they are all present
+            append(construct_unvalidated(row.copy(), ALL_FIELDS_SET))
+    return BulkLoadResult(
+        products=products,
+        errors=errors,
+        fast_rows=len(rows) - len(suspect),
+        validated_rows=len(suspect),
+    )
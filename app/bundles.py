@@ -0,0 +1,318 @@
+"""
+Static Bundles
+Minified, concatenated script and style bundles built from files under
+static/ and rebuilt whenever one of their sources changes
+"""
+
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BUNDLE_DIR = Path(os.environ.get("PANDORA_BUNDLE_DIR", ".cache/bundles"))
+
+# Bundle name -> source files, in load order
+BUNDLES: Dict[str, Tuple[Path, ...]] = {
+    # Everything the catalog page runs before the first interaction
+    "app.js": (
+        Path("static/js/dark-mode.js"),
+        Path("static/js/cart.js"),
+        Path("static/js/virtual-grid.js"),
+        Path("static/js/wishlist.js"),
+        Path("static/js/catalog-replica.js"),
+        Path("static/js/catalog.js"),
+        Path("static/js/app.js"),
+    ),
+    # Loaded on first use of the customization builder
+    "customization.js": (
+        Path("static/js/customization-data.js"),
+        Path("static/js/customization-builder.js"),
+    ),
+    "customization.css": (Path("static/css/customization.css"),),
+}
+
+MEDIA_TYPES = {".js": "application/javascript", ".css": "text/css"}
+
+# Keywords after which a "/" starts a regular expression rather than a division
+_REGEX_KEYWORDS = {
+    "return",
+    "typeof",
+    "instanceof",
+    "in",
+    "of",
+    "new",
+    "delete",
+    "void",
+    "throw",
+    "case",
+    "do",
+    "else",
+    "yield",
+    "await",
+}
+# Characters after which a "/" starts a regular expression
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+# A space next to one of these is never needed
+_PUNCTUATION = set("{}()[];,:=<>?!&|")
+# Newlines are dropped after / before these without changing statement breaks
+_OPENERS = set("{([,;")
+_CLOSERS = set("})]")
+
+
+def _skip_string(source: str, start: int) -> int:
+    """Index just past the quoted string starting at ``start``"""
+    quote = source[start]
+    i = start + 1
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == quote or char == "\n":
+            return i + 1
+        i += 1
+    return i
+
+
+def _skip_regex(source: str, start: int) -> int:
+    """Index just past the regular expression literal (and flags) at ``start``"""
+    i = start + 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "\n":
+            return i
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            i += 1
+            while i < len(source) and (source[i].isalnum() or source[i] == "_"):
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+class _JsMinifier:
+    """Single pass over a script that copies literals and squeezes the rest"""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.out: List[str] = []
+        self.pending = ""  # whitespace seen since the last token: "", " " or "\n"
+
+    def last(self) -> str:
+        return self.out[-1][-1] if self.out else ""
+
+    def last_word(self) -> str:
+        # Identifiers are emitted a character at a time
+        match = re.search(r"[A-Za-z_$][\w$]*$", "".join(self.out[-12:]))
+        return match.group(0) if match else ""
+
+    def emit(self, token: str) -> None:
+        """Append a token, preceded by whatever whitespace it still needs"""
+        previous = self.last()
+        if self.pending == "\n":
+            if previous and previous not in _OPENERS and token[0] not in _CLOSERS:
+                self.out.append("\n")
+        elif self.pending == " ":
+            if (
+                previous
+                and previous not in _PUNCTUATION
+                and token[0] not in _PUNCTUATION
+            ):
+                self.out.append(" ")
+        self.pending = ""
+        self.out.append(token)
+
+    def regex_allowed(self) -> bool:
+        previous = self.last()
+        if not previous or previous in _REGEX_PRECEDERS:
+            return True
+        return self.last_word() in _REGEX_KEYWORDS
+
+    def skip_space(self, i: int) -> int:
+        """Skip whitespace or a comment at ``i``, remembering if it broke a line"""
+        source = self.source
+        char = source[i]
+        if char in " \t\r\n":
+            if char == "\n":
+                self.pending = "\n"
+            elif not self.pending:
+                self.pending = " "
+            return i + 1
+        if source.startswith("//", i):
+            newline = source.find("\n", i)
+            return len(source) if newline < 0 else newline
+        if source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            end = len(source) if end < 0 else end + 2
+            if "\n" in source[i:end]:
+                self.pending = "\n"
+            elif not self.pending:
+                self.pending = " "
+            return end
+        return i
+
+    def code(self, i: int, until_brace: bool = False) -> int:
+        """
+        Minify code from ``i``; inside a template substitution stop after the
+        closing brace. Returns the index where scanning stopped.
+        """
+        source = self.source
+        depth = 0
+        while i < len(source):
+            char = source[i]
+            skipped = self.skip_space(i)
+            if skipped != i:
+                i = skipped
+            elif char == "/" and self.regex_allowed():
+                end = _skip_regex(source, i)
+                self.emit(source[i:end])
+                i = end
+            elif char in "\"'":
+                end = _skip_string(source, i)
+                self.emit(source[i:end])
+                i = end
+            elif char == "`":
+                i = self.template(i)
+            else:
+                if char == "{":
+                    depth += 1
+                elif char == "}":
+                    if until_brace and depth == 0:
+                        self.pending = ""
+                        self.out.append("}")
+                        return i + 1
+                    depth -= 1
+                self.emit(char)
+                i += 1
+        return i
+
+    def template(self, start: int) -> int:
+        """Copy a template literal verbatim, minifying its substitutions"""
+        source = self.source
+        self.emit("`")
+        i = start + 1
+        chunk = i
+        while i < len(source):
+            char = source[i]
+            if char == "\\":
+                i += 2
+            elif char == "`":
+                self.out.append(source[chunk : i + 1])
+                return i + 1
+            elif char == "$" and source[i + 1 : i + 2] == "{":
+                self.out.append(source[chunk : i + 2])
+                self.pending = ""
+                i = self.code(i + 2, until_brace=True)
+                chunk = i
+            else:
+                i += 1
+        self.out.append(source[chunk:])
+        return i
+
+
+def minify_js(source: str) -> str:
+    """
+    Strip comments and redundant whitespace from a script
+
+    Deliberately conservative: statement-ending line breaks are kept so
+    automatic semicolon insertion behaves as before, and string, template
+    and regular expression literals are copied unchanged.
+    """
+    minifier = _JsMinifier(source)
+    minifier.code(0)
+    return "".join(minifier.out).strip() + "\n"
+
+
+def minify_css(source: str) -> str:
+    """Strip comments and redundant whitespace from a stylesheet"""
+    parts = re.split(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')", source)
+    for index in range(0, len(parts), 2):
+        text = re.sub(r"/\*.*?\*/", "", parts[index], flags=re.S)
+        text = re.sub(r"\s+", " ", text)
+        text = re.sub(r" ?([{};,>]) ?", r"\1", text).replace(": ", ":")
+        parts[index] = text.replace(";}", "}")
+    return "".join(parts).strip() + "\n"
+
+
+def minify(name: str, source: str) -> str:
+    """Minify ``source`` according to the bundle's file type"""
+    return minify_css(source) if name.endswith(".css") else minify_js(source)
+
+
+class BundleBuilder:
+    """Build bundles into ``output_dir`` and keep them current with their sources"""
+
+    def __init__(
+        self,
+        bundles: Dict[str, Tuple[Path, ...]] = BUNDLES,
+        output_dir: Path = BUNDLE_DIR,
+    ) -> None:
+        self.bundles = bundles
+        self.output_dir = Path(output_dir)
+        self.builds = 0
+        self._lock = threading.Lock()
+        # name -> source (mtime_ns, size) signatures the bundle was built from
+        self._built: Dict[str, Tuple[Tuple[int, int], ...]] = {}
+        # name -> (source bytes, bundle bytes)
+        self._sizes: Dict[str, Tuple[int, int]] = {}
+
+    def output_path(self, name: str) -> Path:
+        """Where the bundle is written; it may not have been built yet"""
+        return self.output_dir / name
+
+    def _signature(self, name: str) -> Tuple[Tuple[int, int], ...]:
+        stats = [os.stat(path) for path in self.bundles[name]]
+        return tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+
+    def path(self, name: str) -> Path:
+        """
+        Return the built bundle, rebuilding it first if a source changed
+
+        Raises:
+            KeyError: If there is no bundle called ``name``
+        """
+        if name not in self.bundles:
+            raise KeyError(name)
+        with self._lock:
+            signature = self._signature(name)
+            path = self.output_path(name)
+            if self._built.get(name) != signature or not path.exists():
+                self._build(name, path)
+                self._built[name] = signature
+        return path
+
+    def _build(self, name: str, path: Path) -> None:
+        sources = [source.read_text(encoding="utf-8") for source in self.bundles[name]]
+        separator = "\n" if name.endswith(".css") else ";\n"
+        body = separator.join(minify(name, source) for source in sources)
+        data = body.encode("utf-8")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(path.suffix + ".tmp")
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+        self._sizes[name] = (sum(len(s.encode("utf-8")) for s in sources), len(data))
+        self.builds += 1
+
+    def build_all(self) -> None:
+        """Make sure every bundle is built and current"""
+        for name in self.bundles:
+            self.path(name)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Source and bundle size in bytes of every bundle built so far"""
+        return {
+            name: {"source_bytes": source, "bytes": built}
+            for name, (source, built) in self._sizes.items()
+        }
+
+
+bundle_builder = BundleBuilder()
@@ -0,0 +1,313 @@
+"""
+Cart Store
+Server-side carts kept as (product_id, customization_hash) -> quantity,
+versioned for optimistic concurrency and priced against the current
+catalog on every read
+
+Anyone can create carts and customizations, so both stores are bounded:
+carts unused for ``ttl`` seconds are dropped, and past their limits the
+least recently used carts and customizations go first.
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from app.customization_config import customization_cost, get_customization_config
+
+if TYPE_CHECKING:
+    # app.models imports the limits below, and the catalog imports app.models
+    from app.catalog_store import ColumnarCatalog
+
+MAX_CART_LINES = 100
+MAX_LINE_QUANTITY = 99
+MAX_CARTS = 100_000
+# Carts not read or changed for this long are forgotten
+CART_TTL = 30 * 24 * 3600.0
+MAX_CUSTOMIZATIONS = 100_000
+
+LineKey = Tuple[int, str]
+
+
+class CartConflictError(Exception):
+    """Raised when a delta was based on an outdated cart version"""
+
+    def __init__(self, version: int) -> None:
+        super().__init__(f"Version conflict. Current version: {version}")
+        self.version = version
+
+
+class CartFullError(ValueError):
+    """Raised when a delta would grow a cart past MAX_CART_LINES"""
+
+
+class Customization(NamedTuple):
+    """A product's selected options and what they add to its price"""
+
+    product_id: int
+    selections: Dict[str, Any]
+    cost: float
+
+
+class CustomizationRegistry:
+    """
+    Content-addressed customizations, shared by all carts
+
+    Identical selections for the same product get the same hash, so cart
+    lines only store a short key. Past ``max_entries`` the least recently
+    used customizations are dropped; cart lines using them then show as
+    unavailable.
+    """
+
+    def __init__(self, max_entries: int = MAX_CUSTOMIZATIONS) -> None:
+        self.max_entries = max_entries
+        self.evictions = 0
+        # Least recently used first
+        self._entries: "OrderedDict[str, Customization]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash_of(product_id: int, selections: Dict[str, Any]) -> str:
+        canonical = json.dumps(
+            [product_id, selections], sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=8).hexdigest()
+
+    def register(
+        self, store: "ColumnarCatalog", product_id: int, selections: Dict[str, Any]
+    ) -> str:
+        """
+        Validate and price selections for a product and return their hash
+
+        Raises:
+            LookupError: if the product is not in the catalog
+            ValueError: if the product is not customizable, has no
+                customization config or the selections are invalid
+        """
+        key = self.hash_of(product_id, selections)
+        if self.get(key) is not None:
+            return key
+        row = store.row_of(product_id)
+        if row is None:
+            raise LookupError(f"Unknown product id: {product_id}")
+        if not store.customizable[row]:
+            raise ValueError(f"Product {product_id} is not customizable")
+        category = store.categories.values[store.category_codes[row]]
+        config = get_customization_config(category)
+        if config is None:
+            raise ValueError(f"Product {product_id} has no customization options")
+        cost = customization_cost(config, selections)
+        with self._lock:
+            self._entries.setdefault(key, Customization(product_id, selections, cost))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return key
+
+    def entries(self) -> Dict[str, Customization]:
+        """Return the registered customizations, least recently used first"""
+        with self._lock:
+            return dict(self._entries)
+
+    def get(self, key: str) -> Optional[Customization]:
+        with self._lock:
+            customization = self._entries.get(key)
+            if customization is not None:
+                self._entries.move_to_end(key)
+            return customization
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Cart:
+    """One cart: quantities by line and a change counter"""
+
+    __slots__ = ("lines", "version", "used_at")
+
+    def __init__(self) -> None:
+        self.lines: Dict[LineKey, int] = {}
+        self.version = 0
+        self.used_at = 0.0
+
+
+class CartStore:
+    """Thread-safe registry of carts by id, least recently used first"""
+
+    def __init__(
+        self,
+        max_lines: int = MAX_CART_LINES,
+        max_carts: int = MAX_CARTS,
+        ttl: float = CART_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_lines = max_lines
+        self.max_carts = max_carts
+        self.ttl = ttl
+        self.clock = clock
+        self.evictions = 0
+        self._carts: "OrderedDict[str, Cart]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired carts and any over the limit; called under the lock"""
+        carts = self._carts
+        while carts and (
+            len(carts) > self.max_carts
+            or next(iter(carts.values())).used_at + self.ttl <= now
+        ):
+            carts.popitem(last=False)
+            self.evictions += 1
+
+    def _touch(self, cart_id: str, cart: Cart, now: float) -> None:
+        """Store a cart as the most recently used; called under the lock"""
+        cart.used_at = now
+        self._carts[cart_id] = cart
+        self._carts.move_to_end(cart_id)
+        self._evict(now)
+
+    def get(self, cart_id: str) -> Tuple[int, Dict[LineKey, int]]:
+        """
+        Return the current state of a cart (empty at version 0 if unknown)
+
+        Returns:
+            (version, quantities by (product_id, customization_hash))
+        """
+        with self._lock:
+            now = self.clock()
+            self._evict(now)
+            cart = self._carts.get(cart_id)
+            if cart is None:
+                return 0, {}
+            self._touch(cart_id, cart, now)
+            return cart.version, dict(cart.lines)
+
+    def apply(
+        self,
+        cart_id: str,
+        base_version: int,
+        changes: Iterable[Tuple[int, str, int]],
+    ) -> Tuple[int, Dict[LineKey, int]]:
+        """
+        Set line quantities (0 removes a line) if the cart is still at
+        ``base_version``
+
+        All changes in one delta are applied together and bump the version
+        once.
+
+        Raises:
+            CartConflictError: if the cart changed since ``base_version``
+            CartFullError: if the cart would exceed ``max_lines``
+
+        Returns:
+            (new version, quantities by line)
+        """
+        changes = list(changes)
+        with self._lock:
+            now = self.clock()
+            self._evict(now)
+            cart = self._carts.get(cart_id) or Cart()
+            if cart.version != base_version:
+                raise CartConflictError(cart.version)
+            lines = dict(cart.lines)
+            for product_id, customization_hash, quantity in changes:
+                key = (product_id, customization_hash)
+                if quantity > 0:
+                    lines[key] = quantity
+                else:
+                    lines.pop(key, None)
+            if len(lines) > self.max_lines:
+                raise CartFullError(f"Cart full. At most {self.max_lines} lines")
+            if lines != cart.lines:
+                cart.lines = lines
+                cart.version += 1
+            self._touch(cart_id, cart, now)
+            return cart.version, dict(cart.lines)
+
+    def clear(self) -> None:
+        """Forget all carts"""
+        with self._lock:
+            self._carts.clear()
+
+    def __len__(self) -> int:
+        return len(self._carts)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate bytes held by the carts' line tables"""
+        with self._lock:
+            return sum(
+                sys.getsizeof(cart.lines)
+                + sum(sys.getsizeof(key) + sys.getsizeof(key[1]) for key in cart.lines)
+                for cart in self._carts.values()
+            )
+
+
+def price_lines(
+    store: "ColumnarCatalog",
+    lines: Dict[LineKey, int],
+    registry: CustomizationRegistry,
+) -> Tuple[List[Dict[str, Any]], float, int]:
+    """
+    Price cart lines against the current catalog in one pass
+
+    Lines whose product (or customization) no longer exists are returned
+    as unavailable and left out of the totals.
+
+    Returns:
+        (priced lines in product order, subtotal, number of items)
+    """
+    priced = []
+    subtotal = 0.0
+    item_count = 0
+    for (product_id, customization_hash), quantity in sorted(lines.items()):
+        row = store.row_of(product_id)
+        customization = registry.get(customization_hash) if customization_hash else None
+        line = {
+            "product_id": product_id,
+            "customization_hash": customization_hash,
+            "quantity": quantity,
+            "customizations": customization.selections if customization else None,
+            "name": None,
+            "image": None,
+            "unit_price": None,
+            "line_total": None,
+            "available": False,
+        }
+        if row is not None and (customization or not customization_hash):
+            unit_price = store.prices[row] + (
+                customization.cost if customization else 0
+            )
+            line.update(
+                name=store.names[row],
+                image=store.images[row],
+                unit_price=round(unit_price, 2),
+                line_total=round(unit_price * quantity, 2),
+                available=True,
+            )
+            subtotal += unit_price * quantity
+            item_count += quantity
+        priced.append(line)
+    return priced, round(subtotal, 2), item_count
+
+
+customization_registry = CustomizationRegistry()
+cart_store = CartStore()
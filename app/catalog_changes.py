@@ -0,0 +1,68 @@
+"""
+Catalog Change Feed
+A monotonic catalog version and, for any earlier version, the products added,
+updated or removed since
+"""
+
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+
+class CatalogDelta(NamedTuple):
+    """Product ids changed after a given version"""
+
+    upserted: List[int]
+    removed: List[int]
+
+
+class CatalogChangeLog:
+    """Last change of every product changed since the catalog was loaded
+
+    Versions start at 1 for the catalog as loaded and are bumped once per
+    batch of changes. ``epoch`` identifies one loaded catalog: versions from
+    another epoch (e.g. before a restart) cannot be compared with this one.
+    Only each product's latest change is kept, oldest first, so a delta costs
+    time proportional to the number of products it contains.
+    """
+
+    def __init__(self) -> None:
+        self.epoch = secrets.token_hex(8)
+        self.version = 1
+        self._lock = threading.Lock()
+        # product id -> (version of its last change, removed)
+        self._changes: "OrderedDict[int, Tuple[int, bool]]" = OrderedDict()
+
+    def record(self, upserted: Iterable[int], removed: Iterable[int]) -> int:
+        """Record one batch of changes under a new version and return it"""
+        changes = [(i, False) for i in upserted] + [(i, True) for i in removed]
+        with self._lock:
+            if changes:
+                self.version += 1
+            for product_id, is_removed in changes:
+                self._changes[product_id] = (self.version, is_removed)
+                self._changes.move_to_end(product_id)
+            return self.version
+
+    def since(self, version: int) -> Optional[CatalogDelta]:
+        """
+        Return what changed after ``version``
+
+        Returns:
+            The delta, or None if ``version`` is not from this catalog's
+            history and the client needs the full catalog instead
+        """
+        with self._lock:
+            if version < 1 or version > self.version:
+                return None
+            upserted: List[int] = []
+            removed: List[int] = []
+            for product_id, (changed_at, is_removed) in reversed(self._changes.items()):
+                if changed_at <= version:
+                    break
+                (removed if is_removed else upserted).append(product_id)
+            return CatalogDelta(sorted(upserted), sorted(removed))
+
+    def __len__(self) -> int:
+        return len(self._changes)
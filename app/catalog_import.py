@@ -0,0 +1,363 @@
+"""
+Catalog Import
+Stream a CSV or JSON Lines product file into a new catalog store: rows are
+read in chunks, validated across a process pool and appended in file order,
+with duplicate ids and the id index resolved once at the end
+
+    python -m app.catalog_import products.jsonl --map catalog.pcat
+    PANDORA_CATALOG_MAP=catalog.pcat python main.py
+
+Besides the store being built, memory grows by 8 bytes per row (its line
+number, to report duplicate ids) and is otherwise bounded by the chunk
+size: at most two chunks per worker are in flight, and only the first
+``max_errors`` rejected rows are kept for the report. The binary snapshot
+(``--map``, see app/catalog_map.py) is written straight from the store and
+served memory-mapped; the JSON snapshot (``--snapshot``) is parsed and
+materialized in full by every worker that loads it.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from pydantic import ValidationError
+
+from app.bulk_load import bulk_load_products
+from app.catalog_store import ColumnarCatalog
+
+CHUNK_SIZE = 10_000
+# Rejected and duplicate rows kept for the report
+MAX_ERRORS = 100
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# CSV text for the boolean values Product.customizable accepts
+_BOOLEANS = {"true": True, "yes": True, "1": True}
+_BOOLEANS.update({"false": False, "no": False, "0": False})
+
+# (line number, raw record): a list of CSV fields or one JSON Lines line
+Record = Tuple[int, Any]
+
+
+class RejectedRow(NamedTuple):
+    """A row left out of the import, and why"""
+
+    line: int
+    message: str
+
+
+class ChunkResult(NamedTuple):
+    """Outcome of validating one chunk"""
+
+    rows: List[Dict[str, Any]]  # valid product fields, in file order
+    lines: List[int]  # line number of each valid row
+    rejected: List[RejectedRow]
+
+
+class ImportResult(NamedTuple):
+    """Outcome of import_catalog"""
+
+    store: ColumnarCatalog
+    rows_read: int
+    rejected_count: int
+    rejected: List[RejectedRow]  # the first ``max_errors`` rejected rows
+    duplicate_count: int
+    duplicates: List[RejectedRow]  # rows replaced by a later row with their id
+    seconds: float
+
+    @property
+    def rows_imported(self) -> int:
+        return len(self.store)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+
+def _typed_csv_row(header: Sequence[str], fields: List[str]) -> Dict[str, Any]:
+    """
+    Map CSV fields to their columns, converting numbers and booleans
+
+    Values that do not convert are left as text for validation to report.
+    An empty ``customizable`` takes the model default.
+    """
+    row: Dict[str, Any] = dict(zip(header, fields))
+    for name, convert in (("id", int), ("price", float)):
+        try:
+            row[name] = convert(row[name])
+        except (KeyError, ValueError):
+            pass
+    customizable = row.get("customizable")
+    if customizable == "":
+        del row["customizable"]
+    elif customizable is not None:
+        row["customizable"] = _BOOLEANS.get(customizable.lower(), customizable)
+    return row
+
+
+def _decode(fmt: str, header: Sequence[str], record: Any) -> Dict[str, Any]:
+    """
+    One raw record as a field dict
+
+    Raises:
+        ValueError: If the record is not a product object
+    """
+    if fmt == "csv":
+        if len(record) != len(header):
+            raise ValueError(f"{len(record)} fields for {len(header)} columns")
+        return _typed_csv_row(header, record)
+    try:
+        row = json.loads(record)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"invalid JSON: {exc.msg}") from None
+    if type(row) is not dict:
+        raise ValueError("expected a JSON object")
+    return row
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, detail['loc'])) or 'row'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def validate_chunk(
+    fmt: str, header: Sequence[str], records: List[Record]
+) -> ChunkResult:
+    """Decode and validate one chunk of records; runs in a worker process"""
+    rows: List[Dict[str, Any]] = []
+    lines: List[int] = []
+    rejected: List[RejectedRow] = []
+    for line, record in records:
+        try:
+            rows.append(_decode(fmt, header, record))
+            lines.append(line)
+        except ValueError as exc:
+            rejected.append(RejectedRow(line, str(exc)))
+
+    result = bulk_load_products(rows)
+    invalid = {error.index for error in result.errors}
+    rejected.extend(
+        RejectedRow(lines[error.index], _describe(error.error))
+        for error in result.errors
+    )
+    rejected.sort()
+    return ChunkResult(
+        [product.__dict__ for product in result.products],
+        [line for index, line in enumerate(lines) if index not in invalid],
+        rejected,
+    )
+
+
+def read_records(path: Path, fmt: str) -> Tuple[List[str], Iterator[Record]]:
+    """
+    Open ``path`` and return its CSV header (empty for JSON Lines) and records
+
+    Blank JSON Lines lines are skipped. A leading byte order mark (as
+    written by Excel) is dropped. The file is read lazily and closed once the
+    records are exhausted.
+    """
+    f = open(path, newline="", encoding="utf-8-sig")
+    if fmt == "csv":
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+
+        def csv_records() -> Iterator[Record]:
+            with f:
+                for fields in reader:
+                    if fields:
+                        yield reader.line_num, fields
+
+        return header, csv_records()
+
+    def jsonl_records() -> Iterator[Record]:
+        with f:
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    yield line, text
+
+    return [], jsonl_records()
+
+
+def _validated_chunks(
+    fmt: str,
+    header: List[str],
+    records: Iterator[Record],
+    chunk_size: int,
+    workers: int,
+) -> Iterator[ChunkResult]:
+    """Validate chunks in order, keeping at most two per worker in flight"""
+    chunks = iter(lambda: list(islice(records, chunk_size)), [])
+    if workers <= 1:
+        for chunk in chunks:
+            yield validate_chunk(fmt, header, chunk)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending: Deque[Future] = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(validate_chunk, fmt, header, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def import_catalog(
+    path: Path,
+    fmt: Optional[str] = None,
+    chunk_size: int = CHUNK_SIZE,
+    workers: Optional[int] = None,
+    max_errors: int = MAX_ERRORS,
+) -> ImportResult:
+    """
+    Build a catalog store from a CSV or JSON Lines file
+
+    Invalid rows are reported and skipped. When an id appears more than once
+    the last row wins, as with catalog upserts. The id index is built once,
+    after every row has been appended.
+
+    Args:
+        path: File with one product per row (CSV with a header row) or line
+        fmt: "csv" or "jsonl"; by default taken from the file extension
+        chunk_size: Rows validated per task
+        workers: Validation processes (default: one per CPU; 1 validates inline)
+        max_errors: Rejected and duplicate rows kept for the report
+
+    Returns:
+        ImportResult with the new store; publish it with
+        ``app.mock_data.publish_catalog`` or save it with
+        ``app.catalog_map.write_catalog_map``
+
+    Raises:
+        ValueError: For an unknown format
+    """
+    path = Path(path)
+    fmt = fmt or FORMATS.get(path.suffix.lower())
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Unknown catalog format for {path}; use csv or jsonl")
+    workers = workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    store = ColumnarCatalog()
+    lines = array("Q")
+    rows_read = rejected_count = 0
+    rejected: List[RejectedRow] = []
+    header, records = read_records(path, fmt)
+    for chunk in _validated_chunks(fmt, header, records, chunk_size, workers):
+        for row in chunk.rows:
+            store.append(row)
+        lines.extend(chunk.lines)
+        rows_read += len(chunk.rows) + len(chunk.rejected)
+        rejected_count += len(chunk.rejected)
+        rejected.extend(chunk.rejected[: max_errors - len(rejected)])
+
+    superseded = store.superseded_rows()
+    duplicates = [
+        RejectedRow(lines[row], f"id {store.ids[row]} is replaced by a later row")
+        for row in superseded[:max_errors]
+    ]
+    if superseded:
+        store = store.without_rows(superseded)
+    store.build_index()
+    return ImportResult(
+        store,
+        rows_read,
+        rejected_count,
+        rejected,
+        len(superseded),
+        duplicates,
+        time.perf_counter() - started,
+    )
+
+
+def write_snapshot(store: ColumnarCatalog, path: Path) -> None:
+    """
+    Write the store as a JSON catalog snapshot (see PANDORA_CATALOG_SNAPSHOT)
+
+    Loading it materializes every product; prefer the binary snapshot
+    written by ``app.catalog_map.write_catalog_map``.
+    """
+    path = Path(path)
+    partial = path.with_name(path.name + ".tmp")
+    with open(partial, "w", encoding="utf-8") as f:
+        f.write("[")
+        for row in range(len(store)):
+            f.write(",\n" if row else "\n")
+            f.write(json.dumps(store.product(row).__dict__))
+        f.write("\n]\n")
+    os.replace(partial, path)
+
+
+def _print_rows(title: str, rows: Iterable[RejectedRow], total: int) -> None:
+    rows = list(rows)
+    if rows:
+        print(f"{title}:")
+    for row in rows:
+        print(f"  line {row.line}: {row.message}")
+    if total > len(rows):
+        print(f"  ... and {total - len(rows):,} more")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.catalog_import")
+    parser.add_argument("path", type=Path, help="CSV or JSON Lines product file")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())))
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, help="Default: one per CPU")
+    parser.add_argument("--max-errors", type=int, default=MAX_ERRORS)
+    parser.add_argument(
+        "--map", type=Path, help="Write the imported catalog as a binary snapshot"
+    )
+    parser.add_argument(
+        "--snapshot", type=Path, help="Write the imported catalog as JSON"
+    )
+    args = parser.parse_args()
+
+    result = import_catalog(
+        args.path, args.format, args.chunk_size, args.workers, args.max_errors
+    )
+    print(
+        f"read {result.rows_read:,} rows in {result.seconds:.2f}s "
+        f"({result.rows_per_second:,.0f} rows/s)"
+    )
+    print(
+        f"imported {result.rows_imported:,} products, "
+        f"rejected {result.rejected_count:,} rows, "
+        f"replaced {result.duplicate_count:,} duplicate ids"
+    )
+    _print_rows("rejected", result.rejected, result.rejected_count)
+    _print_rows("duplicates", result.duplicates, result.duplicate_count)
+    if args.map:
+        # Imported here: app.catalog_map uses this module for its own CLI
+        from app.catalog_map import write_catalog_map
+
+        size = write_catalog_map(result.store, args.map)
+        print(f"binary snapshot ({size:,} bytes) written to {args.map}")
+    if args.snapshot:
+        write_snapshot(result.store, args.snapshot)
+        print(f"snapshot written to {args.snapshot}")
+    return 1 if result.rejected_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
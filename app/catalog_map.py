@@ -0,0 +1,184 @@
+"""
+Mapped Catalog
+Binary catalog snapshots opened with mmap: fixed-width columns, packed
+string tables, the id and price indexes and per-category/material posting
+lists laid out so a store can wrap them in place
+
+    python -m app.catalog_map products.jsonl catalog.pcat
+    PANDORA_CATALOG_MAP=catalog.pcat python main.py
+
+The file is validated once, when it is built. Opening it only checks the
+header and section bounds, so startup does not grow with the catalog, and
+every worker process shares the same pages through the page cache instead
+of holding a private copy.
+
+Layout: 8-byte magic, little-endian u32 header length, a JSON header
+(version, byte order, row count, intern table values and each section's
+offset, byte length and array typecode), then the sections, each aligned
+to 8 bytes.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from app.catalog_import import import_catalog
+from app.catalog_store import COLUMNS, STRING_COLUMNS, ColumnarCatalog
+
+MAGIC = b"PNDCAT\x00\x01"
+VERSION = 1
+_LENGTH = struct.Struct("<I")
+_ALIGN = 8
+
+
+def _padding(offset: int) -> int:
+    return -offset % _ALIGN
+
+
+def write_catalog_map(store: ColumnarCatalog, path: Path) -> int:
+    """
+    Write ``store`` as a binary snapshot, replacing ``path`` atomically
+
+    Rows must already be valid (e.g. from bulk_load_products).
+
+    Returns:
+        Bytes written
+    """
+    buffers = {name: memoryview(buffer) for name, buffer in store.buffers().items()}
+    layout: Dict[str, Tuple[int, int, str]] = {}
+    offset = 0
+    for name, buffer in buffers.items():
+        layout[name] = (offset, buffer.nbytes, buffer.format)
+        offset += buffer.nbytes + _padding(buffer.nbytes)
+    header = {
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "rows": len(store),
+        "categories": store.categories.values,
+        "materials": store.materials.values,
+        "sections": layout,
+    }
+    # Section offsets are stored relative to the end of the header
+    encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    start = len(MAGIC) + _LENGTH.size + len(encoded)
+    encoded += b" " * _padding(start)
+
+    path = Path(path)
+    partial = path.with_name(path.name + ".tmp")
+    with open(partial, "wb") as f:
+        f.write(MAGIC + _LENGTH.pack(len(encoded)) + encoded)
+        for buffer in buffers.values():
+            f.write(buffer)
+            f.write(b"\0" * _padding(f.tell()))
+        size = f.tell()
+    os.replace(partial, path)
+    return size
+
+
+def _read_header(view: memoryview) -> Tuple[dict, int]:
+    """
+    Decode the header and return it with the offset of the first section
+
+    Raises:
+        ValueError: If the file is not a snapshot this version can read
+    """
+    prefix = len(MAGIC) + _LENGTH.size
+    if bytes(view[: len(MAGIC)]) != MAGIC or len(view) < prefix:
+        raise ValueError("Not a binary catalog snapshot")
+    (length,) = _LENGTH.unpack(view[len(MAGIC) : prefix])
+    try:
+        header = json.loads(str(view[prefix : prefix + length], "utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Corrupt catalog snapshot header") from None
+    if not isinstance(header, dict) or header.get("version") != VERSION:
+        raise ValueError("Unsupported catalog snapshot version")
+    if header.get("byteorder") != sys.byteorder:
+        raise ValueError(f"Catalog snapshot is {header.get('byteorder')}-endian")
+    return header, prefix + length
+
+
+def _sections(
+    view: memoryview, header: dict, start: int
+) -> Iterator[Tuple[str, memoryview]]:
+    """
+    Yield each section as a typed view, checking it lies inside the file
+
+    Raises:
+        ValueError: If a section is out of bounds or misaligned
+    """
+    for name, (offset, nbytes, typecode) in header["sections"].items():
+        begin = start + offset
+        itemsize = array(typecode).itemsize
+        if begin % _ALIGN or nbytes % itemsize or begin + nbytes > len(view):
+            raise ValueError(f"Catalog snapshot section {name} is truncated")
+        yield name, view[begin : begin + nbytes].cast(typecode)
+
+
+def _check_lengths(buffers: Dict[str, memoryview], rows: int) -> None:
+    """
+    Check column lengths agree with the row count
+
+    Raises:
+        ValueError: If a column is missing or has the wrong length
+    """
+    try:
+        lengths = {name: len(buffers[name]) for name in COLUMNS}
+        for name in STRING_COLUMNS:
+            offsets = buffers[f"{name}.offsets"]
+            lengths[name] = len(offsets) - 1
+            if offsets[-1] != len(buffers[f"{name}.data"]):
+                lengths[name] = -1
+    except KeyError as exc:
+        raise ValueError(f"Catalog snapshot has no {exc.args[0]} section") from None
+    wrong = sorted(name for name, length in lengths.items() if length != rows)
+    if wrong:
+        raise ValueError(f"Catalog snapshot columns do not match: {', '.join(wrong)}")
+
+
+def open_catalog_map(path: Path) -> ColumnarCatalog:
+    """
+    Map a binary snapshot read-only and wrap it as a catalog store
+
+    Nothing is copied: products are materialized straight from the mapped
+    pages, which stay mapped for as long as the store is referenced.
+
+    Raises:
+        ValueError: If the file is not a readable snapshot
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    header, start = _read_header(view)
+    buffers = dict(_sections(view, header, start))
+    _check_lengths(buffers, header["rows"])
+    return ColumnarCatalog.from_buffers(
+        buffers, header["categories"], header["materials"]
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.catalog_map")
+    parser.add_argument("source", type=Path, help="CSV or JSON Lines product file")
+    parser.add_argument("output", type=Path, help="Binary snapshot to write")
+    args = parser.parse_args()
+
+    result = import_catalog(args.source)
+    if result.rejected_count:
+        # The snapshot is trusted when opened, so only a clean import is written
+        print(f"rejected {result.rejected_count:,} rows; snapshot not written")
+        for row in result.rejected:
+            print(f"  line {row.line}: {row.message}")
+        return 1
+    size = write_catalog_map(result.store, args.output)
+    print(f"wrote {len(result.store):,} products ({size:,} bytes) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
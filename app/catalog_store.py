@@ -0,0 +1,487 @@
+"""
+Columnar Catalog Store
+Products held as typed arrays, interned codes and packed string buffers,
+materialized as Product models only for the rows being returned
+"""
+
+import math
+import typing
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from app.bulk_load import ALL_FIELDS_SET, construct_unvalidated
+from app.models import Product
+
+CATEGORIES = typing.get_args(Product.model_fields["category"].annotation)
+MATERIALS = typing.get_args(Product.model_fields["material"].annotation)
+
+# Fixed-width columns and string columns, by ColumnarCatalog attribute name
+COLUMNS = ("ids", "prices", "category_codes", "material_codes", "customizable")
+STRING_COLUMNS = ("names", "descriptions", "images")
+# Code columns with a posting list (rows per code) when built with postings
+POSTINGS = ("category", "material")
+
+
+class StringColumn:
+    """Strings packed into one UTF-8 buffer with an offsets array"""
+
+    def __init__(self) -> None:
+        self._data = bytearray()
+        self._offsets = array("Q", [0])
+
+    @classmethod
+    def from_buffers(cls, data: Sequence[int], offsets: Sequence[int]):
+        """Wrap existing buffers (e.g. memoryviews of a mapped file)"""
+        column = cls()
+        column._data, column._offsets = data, offsets
+        return column
+
+    def buffers(self) -> Tuple[Sequence[int], Sequence[int]]:
+        """The UTF-8 data and offsets buffers"""
+        return self._data, self._offsets
+
+    def append(self, value: str) -> None:
+        self._data += value.encode("utf-8")
+        self._offsets.append(len(self._data))
+
+    def extend(self, other: "StringColumn", start: int, stop: int) -> None:
+        """Append rows ``start:stop`` of ``other`` as one buffer copy"""
+        data, offsets = other.buffers()
+        begin = offsets[start]
+        shift = len(self._data) - begin
+        self._data += data[begin : offsets[stop]]
+        self._offsets.extend(offset + shift for offset in offsets[start + 1 : stop + 1])
+
+    def __getitem__(self, row: int) -> str:
+        offsets = self._offsets
+        return str(self._data[offsets[row] : offsets[row + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+
+class InternTable:
+    """Small table mapping repeated strings to integer codes"""
+
+    def __init__(self, values: Iterable[str] = ()) -> None:
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        """Return the code for ``value``, adding it if new"""
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value: str) -> Optional[int]:
+        """Return the code for ``value`` without adding it"""
+        return self._codes.get(value)
+
+
+class ColumnarCatalog:
+    """Append-only, array-backed product catalog
+
+    Rows are expected to be valid already (e.g. from bulk_load_products);
+    materialized products are built without re-validation and report every
+    field as set.
+    """
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.prices = array("d")
+        self.category_codes = array("B")
+        self.material_codes = array("B")
+        self.customizable = array("B")
+        self.names = StringColumn()
+        self.descriptions = StringColumn()
+        self.images = StringColumn()
+        self.categories = InternTable(CATEGORIES)
+        self.materials = InternTable(MATERIALS)
+        # (sorted ids, their rows), rebuilt lazily when ids were appended out
+        # of order. Published as one tuple so readers never see half of it.
+        self._ids_ascending = True
+        self._id_index: Optional[Tuple[Sequence[int], Sequence[int]]] = None
+        # (rows ordered by price, their prices), built lazily and published
+        # as one tuple like the id index
+        self._price_index: Optional[Tuple[Sequence[int], Sequence[float]]] = None
+        # Rows per code as (rows, starts): code c owns rows[starts[c]:starts[c + 1]]
+        self._postings: Dict[str, Tuple[Sequence[int], Sequence[int]]] = {}
+        # Set when the columns are views of a shared buffer, not owned arrays
+        self.shared = False
+
+    @classmethod
+    def from_products(cls, products: Iterable[Product]) -> "ColumnarCatalog":
+        catalog = cls()
+        for product in products:
+            catalog.append(product.__dict__)
+        return catalog
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Mapping]) -> "ColumnarCatalog":
+        """Build from already validated field mappings"""
+        catalog = cls()
+        for row in rows:
+            catalog.append(row)
+        return catalog
+
+    @classmethod
+    def from_buffers(
+        cls,
+        buffers: Mapping[str, Sequence],
+        categories: Sequence[str],
+        materials: Sequence[str],
+    ) -> "ColumnarCatalog":
+        """
+        Wrap buffers laid out as by ``buffers()``, without copying them
+
+        The buffers may be views of a memory-mapped file; the result is
+        read-only.
+        """
+        catalog = cls()
+        for name in COLUMNS:
+            setattr(catalog, name, buffers[name])
+        for name in STRING_COLUMNS:
+            column = StringColumn.from_buffers(
+                buffers[f"{name}.data"], buffers[f"{name}.offsets"]
+            )
+            setattr(catalog, name, column)
+        catalog.categories = InternTable(categories)
+        catalog.materials = InternTable(materials)
+        if "sorted_ids" in buffers:
+            catalog._ids_ascending = False
+            catalog._id_index = (buffers["sorted_ids"], buffers["sorted_rows"])
+        for name in POSTINGS:
+            if f"{name}.rows" in buffers:
+                rows, starts = buffers[f"{name}.rows"], buffers[f"{name}.starts"]
+                catalog._postings[name] = (rows, starts)
+        if "price_rows" in buffers:
+            catalog._price_index = (buffers["price_rows"], buffers["sorted_prices"])
+        catalog.shared = True
+        return catalog
+
+    def buffers(self) -> Dict[str, Sequence]:
+        """
+        Every column, the id and price indexes and the posting lists as flat
+        buffers
+
+        Returns:
+            Buffers by name, as taken by ``from_buffers``. ``sorted_ids`` and
+            ``sorted_rows`` are only present when ids are not ascending.
+        """
+        id_index = self._sorted_by_id()
+        buffers: Dict[str, Sequence] = {name: getattr(self, name) for name in COLUMNS}
+        for name in STRING_COLUMNS:
+            data, offsets = getattr(self, name).buffers()
+            buffers[f"{name}.data"], buffers[f"{name}.offsets"] = data, offsets
+        if not self._ids_ascending:
+            buffers["sorted_ids"], buffers["sorted_rows"] = id_index
+        for name in POSTINGS:
+            rows, starts = self._postings.get(name) or self._build_postings(name)
+            buffers[f"{name}.rows"], buffers[f"{name}.starts"] = rows, starts
+        buffers["price_rows"], buffers["sorted_prices"] = self.price_index()
+        return buffers
+
+    def _coded(self, name: str) -> Tuple[InternTable, Sequence[int]]:
+        """The intern table and code column for category or material"""
+        if name == "category":
+            return self.categories, self.category_codes
+        return self.materials, self.material_codes
+
+    def _build_postings(self, name: str) -> Tuple[array, array]:
+        """Rows grouped by code, in row order, with each code's start"""
+        table, codes = self._coded(name)
+        by_code = [array("Q") for _ in table.values]
+        for row, code in enumerate(codes):
+            by_code[code].append(row)
+        rows, starts = array("Q"), array("Q", [0])
+        for code_rows in by_code:
+            rows.extend(code_rows)
+            starts.append(len(rows))
+        return rows, starts
+
+    def _rows_with(self, name: str, value: str, rows: Sequence[int]) -> Sequence[int]:
+        """Rows from ``rows`` whose category or material is ``value``"""
+        table, codes = self._coded(name)
+        code = table.lookup(value)
+        postings = self._postings.get(name)
+        if postings is not None and isinstance(rows, range):
+            # Unfiltered so far: the posting list is the answer
+            posting_rows, starts = postings
+            if code is None or code + 1 >= len(starts):
+                return []
+            return posting_rows[starts[code] : starts[code + 1]]
+        return [i for i in rows if codes[i] == code]
+
+    def append(self, row: Mapping) -> int:
+        """Append one product's fields and return its row number"""
+        product_id = row["id"]
+        if self.ids and product_id <= self.ids[-1]:
+            self._ids_ascending = False
+        self._id_index = None
+        self._price_index = None
+        self.ids.append(product_id)
+        self.prices.append(row["price"])
+        self.category_codes.append(self.categories.code(row["category"]))
+        self.material_codes.append(self.materials.code(row["material"]))
+        self.customizable.append(1 if row.get("customizable", False) else 0)
+        self.names.append(row["name"])
+        self.descriptions.append(row["description"])
+        self.images.append(row["image"])
+        return len(self.ids) - 1
+
+    def extend(self, other: "ColumnarCatalog", start: int, stop: int) -> None:
+        """Append rows ``start:stop`` of ``other``, column by column"""
+        if start >= stop:
+            return
+        if not other._ids_ascending or (self.ids and other.ids[start] <= self.ids[-1]):
+            self._ids_ascending = False
+        self._id_index = None
+        self._price_index = None
+        for name in COLUMNS:
+            getattr(self, name).extend(getattr(other, name)[start:stop])
+        for name in STRING_COLUMNS:
+            getattr(self, name).extend(getattr(other, name), start, stop)
+
+    def with_changes(
+        self, upserts: Mapping[int, Mapping], removals: Iterable[int]
+    ) -> "ColumnarCatalog":
+        """
+        Return a new catalog with rows replaced, removed and appended
+
+        A row in ``upserts`` replaces the row with its id in place, or is
+        appended if the id is new. The rows in between are copied as runs of
+        the column buffers, so the per-row Python work is proportional to the
+        number of changes; copying the buffers is still a pass over the whole
+        catalog.
+
+        Args:
+            upserts: Field mappings by product id
+            removals: Ids of rows to leave out (unknown ids are ignored)
+        """
+        changed: Dict[int, Optional[Mapping]] = {}
+        for product_id in removals:
+            row = self.row_of(product_id)
+            if row is not None:
+                changed[row] = None
+        appended = []
+        for product_id, fields in upserts.items():
+            row = self.row_of(product_id)
+            if row is None:
+                appended.append(fields)
+            else:
+                changed[row] = fields
+        return self._copy_with(changed, appended)
+
+    def without_rows(self, rows: Iterable[int]) -> "ColumnarCatalog":
+        """Return a new catalog without the given rows, copied as buffer runs"""
+        return self._copy_with(dict.fromkeys(rows), [])
+
+    def _copy_with(
+        self, changed: Mapping[int, Optional[Mapping]], appended: Iterable[Mapping]
+    ) -> "ColumnarCatalog":
+        """Copy with rows replaced (by fields) or left out (None), then appended"""
+        catalog = type(self)()
+        # Copied code columns keep their meaning only with the same tables
+        catalog.categories = InternTable(self.categories.values)
+        catalog.materials = InternTable(self.materials.values)
+        start = 0
+        for row in [*sorted(changed), len(self)]:
+            catalog.extend(self, start, row)
+            fields = changed.get(row)
+            if fields is not None:
+                catalog.append(fields)
+            start = row + 1
+        for fields in appended:
+            catalog.append(fields)
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def build_index(self) -> None:
+        """Build the id index now instead of on the first lookup after appends"""
+        self._sorted_by_id()
+
+    def _sorted_by_id(self) -> Optional[Tuple[Sequence[int], Sequence[int]]]:
+        """(sorted ids, their rows), or None while ids are ascending"""
+        if self._ids_ascending:
+            return None
+        index = self._id_index
+        if index is None:
+            # Stable sort: rows sharing an id stay in row order
+            order = sorted(range(len(self.ids)), key=self.ids.__getitem__)
+            index = (array("q", (self.ids[i] for i in order)), array("Q", order))
+            self._id_index = index
+        return index
+
+    def price_index(self) -> Tuple[Sequence[int], Sequence[float]]:
+        """Rows ordered by price (ties in row order) and their prices"""
+        index = self._price_index
+        if index is None:
+            prices = self.prices
+            order = sorted(range(len(prices)), key=prices.__getitem__)
+            index = (array("Q", order), array("d", (prices[i] for i in order)))
+            self._price_index = index
+        return index
+
+    def _rows_priced(
+        self,
+        rows: Sequence[int],
+        price_min: Optional[float],
+        price_max: Optional[float],
+    ) -> Sequence[int]:
+        """Rows from ``rows`` priced within [price_min, price_max]"""
+        low = -math.inf if price_min is None else price_min
+        high = math.inf if price_max is None else price_max
+        if isinstance(rows, range):
+            # Unfiltered so far: binary search the price index
+            price_rows, sorted_prices = self.price_index()
+            start = bisect_left(sorted_prices, low)
+            end = bisect_right(sorted_prices, high)
+            return sorted(price_rows[start:end])
+        prices = self.prices
+        return [i for i in rows if low <= prices[i] <= high]
+
+    def price_histogram(
+        self,
+        rows: Optional[Sequence[int]],
+        buckets: int,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+    ) -> Tuple[List[float], List[int]]:
+        """
+        Count products per equal-width price bucket
+
+        Only prices within [low, high] are counted. Each bucket includes its
+        lower edge; the last one also its upper edge. Counting is one binary
+        search per edge over sorted prices, taken from the price index when
+        ``rows`` is None.
+
+        Args:
+            rows: Rows to count, or None for every row
+            buckets: Number of buckets
+            low: Lowest edge (default: the lowest price counted)
+            high: Highest edge (default: the highest price counted)
+
+        Returns:
+            (``buckets + 1`` edges, count per bucket); both empty when no price
+            is counted and the range is open
+        """
+        if rows is None:
+            prices = self.price_index()[1]
+        else:
+            column = self.prices
+            prices = sorted(column[row] for row in rows)
+        start = 0 if low is None else bisect_left(prices, low)
+        end = len(prices) if high is None else max(bisect_right(prices, high), start)
+        if start >= end and (low is None or high is None):
+            return [], []
+        low = prices[start] if low is None else low
+        high = prices[end - 1] if high is None else high
+        width = (high - low) / buckets
+        edges = [low + width * i for i in range(buckets)] + [high]
+        positions = [bisect_left(prices, edge, start, end) for edge in edges[:-1]]
+        positions.append(end)
+        counts = [positions[i + 1] - positions[i] for i in range(buckets)]
+        return edges, counts
+
+    def superseded_rows(self) -> List[int]:
+        """Rows whose id appears again on a later row, in row order"""
+        index = self._sorted_by_id()
+        if index is None:
+            return []
+        ids, rows = index
+        return sorted(rows[i] for i in range(len(ids) - 1) if ids[i] == ids[i + 1])
+
+    def row_of(self, product_id: int) -> Optional[int]:
+        """Return the row holding ``product_id`` (binary search over ids)"""
+        ids, rows = self._sorted_by_id() or (self.ids, None)
+        pos = bisect_left(ids, product_id)
+        if pos == len(ids) or ids[pos] != product_id:
+            return None
+        return pos if rows is None else rows[pos]
+
+    def select(
+        self,
+        category: Optional[str] = None,
+        price_max: Optional[float] = None,
+        material: Optional[str] = None,
+        price_min: Optional[float] = None,
+    ) -> List[int]:
+        """Return row numbers matching all given filters, in catalog order
+
+        Prices are inclusive at both ends. A price range on its own is
+        answered from the price index.
+        """
+        rows: Sequence[int] = range(len(self.ids))
+        if category:
+            rows = self._rows_with("category", category, rows)
+        if material:
+            rows = self._rows_with("material", material, rows)
+        if price_min is not None or price_max is not None:
+            rows = self._rows_priced(rows, price_min, price_max)
+        return list(rows)
+
+    def product(self, row: int) -> Product:
+        """Materialize one row as a Product"""
+        values = {
+            "id": self.ids[row],
+            "name": self.names[row],
+            "price": self.prices[row],
+            "category": self.categories.values[self.category_codes[row]],
+            "material": self.materials.values[self.material_codes[row]],
+            "image": self.images[row],
+            "description": self.descriptions[row],
+            "customizable": bool(self.customizable[row]),
+        }
+        return construct_unvalidated(values, ALL_FIELDS_SET)
+
+    def products(self, rows: Optional[Iterable[int]] = None) -> List[Product]:
+        """Materialize the given rows (all rows by default)"""
+        if rows is None:
+            rows = range(len(self.ids))
+        return [self.product(row) for row in rows]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate bytes held by the column buffers"""
+        arrays = (
+            self.ids,
+            self.prices,
+            self.category_codes,
+            self.material_codes,
+            self.customizable,
+        )
+        return (
+            sum(a.itemsize * len(a) for a in arrays)
+            + self.names.nbytes
+            + self.descriptions.nbytes
+            + self.images.nbytes
+        )
+
+    @property
+    def index_nbytes(self) -> int:
+        """Approximate bytes held by the id and price indexes, postings and
+        intern tables"""
+        total = 0
+        indexes = [
+            *(self._id_index or ()),
+            *(self._price_index or ()),
+        ]
+        for postings in self._postings.values():
+            indexes.extend(postings)
+        for index in indexes:
+            if index is not None:
+                total += index.itemsize * len(index)
+        for table in (self.categories, self.materials):
+            total += sum(len(value.encode("utf-8")) for value in table.values)
+        return total
@@ -3,10 +3,13 @@ Customization Configuration
 Centralized configuration for all product customization options and pricing
 """
 
-from typing import Any, Dict, List, Optional
+import re
+from typing import Any, Callable, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
+from app.metrics import CACHE_REQUESTS
+
 
 class CustomizationOptionValue(BaseModel):
     """Individual option value (e.g., 'Gold' or 'Size 7')"""
@@ -43,343 +46,365 @@ class ProductCustomizationConfig(BaseModel):
 # Note: Requirements use £ (GBP) but the app uses $ (USD)
 # For consistency, treating all prices as USD
 
+
 # Rings Customization Configuration
-RINGS_CONFIG = ProductCustomizationConfig(
-    category="rings",
-    options=[
-        CustomizationOption(
-            option_id="metal_type",
-            display_name="Metal Type",
-            option_type="select",
-            required=True,
-            order=1,
-            help_text="Select the metal for your ring",
-            values=[
-                CustomizationOptionValue(
-                    value="sterling_silver",
-                    price_modifier=0.0,
-                    display_name="Sterling Silver",
-                    description="Classic and affordable",
-                ),
-                CustomizationOptionValue(
-                    value="gold",
-                    price_modifier=200.0,
-                    display_name="Gold",
-                    description="Timeless 18k yellow gold",
-                ),
-                CustomizationOptionValue(
-                    value="rose_gold",
-                    price_modifier=250.0,
-                    display_name="Rose Gold",
-                    description="Romantic 14k rose gold",
-                ),
-                CustomizationOptionValue(
-                    value="platinum",
-                    price_modifier=500.0,
-                    display_name="Platinum",
-                    description="Premium and durable",
-                ),
-            ],
-        ),
-        CustomizationOption(
-            option_id="ring_size",
-            display_name="Ring Size",
-            option_type="select",
-            required=True,
-            order=2,
-            help_text="Select your ring size (US sizing)",
-            values=[
-                CustomizationOptionValue(
-                    value=str(size), price_modifier=0.0, display_name=f"Size {size}"
-                )
-                for size in [
-                    4.0,
-                    4.5,
-                    5.0,
-                    5.5,
-                    6.0,
-                    6.5,
-                    7.0,
-                    7.5,
-                    8.0,
-                    8.5,
-                    9.0,
-                    9.5,
-                    10.0,
-                    10.5,
-                    11.0,
-                    11.5,
-                    12.0,
-                ]
-            ],
-        ),
-        CustomizationOption(
-            option_id="gemstone",
-            display_name="Gemstone",
-            option_type="select",
-            required=False,
-            order=3,
-            help_text="Add a gemstone (optional)",
-            values=[
-                CustomizationOptionValue(
-                    value="none",
-                    price_modifier=0.0,
-                    display_name="No Gemstone",
-                    description="Keep it simple",
-                ),
-                CustomizationOptionValue(
-                    value="diamond",
-                    price_modifier=300.0,
-                    display_name="Diamond",
-                    description="Classic brilliance",
-                ),
-                CustomizationOptionValue(
-                    value="sapphire",
-                    price_modifier=150.0,
-                    display_name="Sapphire",
-                    description="Deep blue elegance",
-                ),
-                CustomizationOptionValue(
-                    value="emerald",
-                    price_modifier=200.0,
-                    display_name="Emerald",
-                    description="Vibrant green",
-                ),
-                CustomizationOptionValue(
-                    value="ruby",
-                    price_modifier=180.0,
-                    display_name="Ruby",
-                    description="Passionate red",
-                ),
-            ],
-        ),
-        CustomizationOption(
-            option_id="engraving",
-            display_name="Engraving",
-            option_type="text",
-            required=False,
-            order=4,
-            help_text="Inside band, max 20 characters",
-            validation_rules={
-                "max_length": 20,
-                "pattern": "^[a-zA-Z0-9\\s\\.\\,\\!\\?\\'\\-]*$",
-                "price": 50.0,
-            },
-        ),
-    ],
-)
+def _build_rings_config() -> ProductCustomizationConfig:
+    return ProductCustomizationConfig(
+        category="rings",
+        options=[
+            CustomizationOption(
+                option_id="metal_type",
+                display_name="Metal Type",
+                option_type="select",
+                required=True,
+                order=1,
+                help_text="Select the metal for your ring",
+                values=[
+                    CustomizationOptionValue(
+                        value="sterling_silver",
+                        price_modifier=0.0,
+                        display_name="Sterling Silver",
+                        description="Classic and affordable",
+                    ),
+                    CustomizationOptionValue(
+                        value="gold",
+                        price_modifier=200.0,
+                        display_name="Gold",
+                        description="Timeless 18k yellow gold",
+                    ),
+                    CustomizationOptionValue(
+                        value="rose_gold",
+                        price_modifier=250.0,
+                        display_name="Rose Gold",
+                        description="Romantic 14k rose gold",
+                    ),
+                    CustomizationOptionValue(
+                        value="platinum",
+                        price_modifier=500.0,
+                        display_name="Platinum",
+                        description="Premium and durable",
+                    ),
+                ],
+            ),
+            CustomizationOption(
+                option_id="ring_size",
+                display_name="Ring Size",
+                option_type="select",
+                required=True,
+                order=2,
+                help_text="Select your ring size (US sizing)",
+                values=[
+                    CustomizationOptionValue(
+                        value=str(size), price_modifier=0.0, display_name=f"Size {size}"
+                    )
+                    for size in [
+                        4.0,
+                        4.5,
+                        5.0,
+                        5.5,
+                        6.0,
+                        6.5,
+                        7.0,
+                        7.5,
+                        8.0,
+                        8.5,
+                        9.0,
+                        9.5,
+                        10.0,
+                        10.5,
+                        11.0,
+                        11.5,
+                        12.0,
+                    ]
+                ],
+            ),
+            CustomizationOption(
+                option_id="gemstone",
+                display_name="Gemstone",
+                option_type="select",
+                required=False,
+                order=3,
+                help_text="Add a gemstone (optional)",
+                values=[
+                    CustomizationOptionValue(
+                        value="none",
+                        price_modifier=0.0,
+                        display_name="No Gemstone",
+                        description="Keep it simple",
+                    ),
+                    CustomizationOptionValue(
+                        value="diamond",
+                        price_modifier=300.0,
+                        display_name="Diamond",
+                        description="Classic brilliance",
+                    ),
+                    CustomizationOptionValue(
+                        value="sapphire",
+                        price_modifier=150.0,
+                        display_name="Sapphire",
+                        description="Deep blue elegance",
+                    ),
+                    CustomizationOptionValue(
+                        value="emerald",
+                        price_modifier=200.0,
+                        display_name="Emerald",
+                        description="Vibrant green",
+                    ),
+                    CustomizationOptionValue(
+                        value="ruby",
+                        price_modifier=180.0,
+                        display_name="Ruby",
+                        description="Passionate red",
+                    ),
+                ],
+            ),
+            CustomizationOption(
+                option_id="engraving",
+                display_name="Engraving",
+                option_type="text",
+                required=False,
+                order=4,
+                help_text="Inside band, max 20 characters",
+                validation_rules={
+                    "max_length": 20,
+                    "pattern": "^[a-zA-Z0-9\\s\\.\\,\\!\\?\\'\\-]*$",
+                    "price": 50.0,
+                },
+            ),
+        ],
+    )
+
 
 # Necklaces Customization Configuration
-NECKLACES_CONFIG = ProductCustomizationConfig(
-    category="necklaces",
-    options=[
-        CustomizationOption(
-            option_id="metal_type",
-            display_name="Metal Type",
-            option_type="select",
-            required=True,
-            order=1,
-            help_text="Select the metal for your necklace",
-            values=[
-                CustomizationOptionValue(
-                    value="sterling_silver",
-                    price_modifier=0.0,
-                    display_name="Sterling Silver",
-                ),
-                CustomizationOptionValue(
-                    value="gold", price_modifier=150.0, display_name="Gold"
-                ),
-                CustomizationOptionValue(
-                    value="rose_gold", price_modifier=180.0, display_name="Rose Gold"
-                ),
-                CustomizationOptionValue(
-                    value="white_gold", price_modifier=200.0, display_name="White Gold"
-                ),
-            ],
-        ),
-        CustomizationOption(
-            option_id="chain_length",
-            display_name="Chain Length",
-            option_type="select",
-            required=True,
-            order=2,
-            help_text="Select your preferred chain length",
-            values=[
-                CustomizationOptionValue(
-                    value='16"', price_modifier=0.0, display_name="16 inches"
-                ),
-                CustomizationOptionValue(
-                    value='18"', price_modifier=0.0, display_name="18 inches"
-                ),
-                CustomizationOptionValue(
-                    value='20"', price_modifier=0.0, display_name="20 inches"
-                ),
-                CustomizationOptionValue(
-                    value='22"', price_modifier=0.0, display_name="22 inches"
-                ),
-                CustomizationOptionValue(
-                    value='24"', price_modifier=0.0, display_name="24 inches"
-                ),
-            ],
-        ),
-        CustomizationOption(
-            option_id="pendant_option",
-            display_name="Pendant Option",
-            option_type="select",
-            required=False,
-            order=3,
-            help_text="Add a special pendant (optional)",
-            values=[
-                CustomizationOptionValue(
-                    value="none", price_modifier=0.0, display_name="No Addition"
-                ),
-                CustomizationOptionValue(
-                    value="birthstone",
-                    price_modifier=100.0,
-                    display_name="Add Birthstone",
-                ),
-                CustomizationOptionValue(
-                    value="initials", price_modifier=75.0, display_name="Add Initials"
-                ),
-            ],
-        ),
-        CustomizationOption(
-            option_id="clasp_type",
-            display_name="Clasp Type",
-            option_type="select",
-            required=True,
-            order=4,
-            help_text="Select clasp style",
-            values=[
-                CustomizationOptionValue(
-                    value="lobster", price_modifier=0.0, display_name="Lobster Clasp"
-                ),
-                CustomizationOptionValue(
-                    value="spring_ring", price_modifier=0.0, display_name="Spring Ring"
-                ),
-                CustomizationOptionValue(
-                    value="toggle", price_modifier=0.0, display_name="Toggle Clasp"
-                ),
-            ],
-        ),
-        CustomizationOption(
-            option_id="engraving",
-            display_name="Engraving",
-            option_type="text",
-            required=False,
-            order=5,
-            help_text="Back of pendant, max 15 characters",
-            validation_rules={
-                "max_length": 15,
-                "pattern": "^[a-zA-Z0-9\\s\\.\\,\\!\\?\\'\\-]*$",
-                "price": 40.0,
-            },
-        ),
-    ],
-)
+def _build_necklaces_config() -> ProductCustomizationConfig:
+    return ProductCustomizationConfig(
+        category="necklaces",
+        options=[
+            CustomizationOption(
+                option_id="metal_type",
+                display_name="Metal Type",
+                option_type="select",
+                required=True,
+                order=1,
+                help_text="Select the metal for your necklace",
+                values=[
+                    CustomizationOptionValue(
+                        value="sterling_silver",
+                        price_modifier=0.0,
+                        display_name="Sterling Silver",
+                    ),
+                    CustomizationOptionValue(
+                        value="gold", price_modifier=150.0, display_name="Gold"
+                    ),
+                    CustomizationOptionValue(
+                        value="rose_gold",
+                        price_modifier=180.0,
+                        display_name="Rose Gold",
+                    ),
+                    CustomizationOptionValue(
+                        value="white_gold",
+                        price_modifier=200.0,
+                        display_name="White Gold",
+                    ),
+                ],
+            ),
+            CustomizationOption(
+                option_id="chain_length",
+                display_name="Chain Length",
+                option_type="select",
+                required=True,
+                order=2,
+                help_text="Select your preferred chain length",
+                values=[
+                    CustomizationOptionValue(
+                        value='16"', price_modifier=0.0, display_name="16 inches"
+                    ),
+                    CustomizationOptionValue(
+                        value='18"', price_modifier=0.0, display_name="18 inches"
+                    ),
+                    CustomizationOptionValue(
+                        value='20"', price_modifier=0.0, display_name="20 inches"
+                    ),
+                    CustomizationOptionValue(
+                        value='22"', price_modifier=0.0, display_name="22 inches"
+                    ),
+                    CustomizationOptionValue(
+                        value='24"', price_modifier=0.0, display_name="24 inches"
+                    ),
+                ],
+            ),
+            CustomizationOption(
+                option_id="pendant_option",
+                display_name="Pendant Option",
+                option_type="select",
+                required=False,
+                order=3,
+                help_text="Add a special pendant (optional)",
+                values=[
+                    CustomizationOptionValue(
+                        value="none", price_modifier=0.0, display_name="No Addition"
+                    ),
+                    CustomizationOptionValue(
+                        value="birthstone",
+                        price_modifier=100.0,
+                        display_name="Add Birthstone",
+                    ),
+                    CustomizationOptionValue(
+                        value="initials",
+                        price_modifier=75.0,
+                        display_name="Add Initials",
+                    ),
+                ],
+            ),
+            CustomizationOption(
+                option_id="clasp_type",
+                display_name="Clasp Type",
+                option_type="select",
+                required=True,
+                order=4,
+                help_text="Select clasp style",
+                values=[
+                    CustomizationOptionValue(
+                        value="lobster",
+                        price_modifier=0.0,
+                        display_name="Lobster Clasp",
+                    ),
+                    CustomizationOptionValue(
+                        value="spring_ring",
+                        price_modifier=0.0,
+                        display_name="Spring Ring",
+                    ),
+                    CustomizationOptionValue(
+                        value="toggle", price_modifier=0.0, display_name="Toggle Clasp"
+                    ),
+                ],
+            ),
+            CustomizationOption(
+                option_id="engraving",
+                display_name="Engraving",
+                option_type="text",
+                required=False,
+                order=5,
+                help_text="Back of pendant, max 15 characters",
+                validation_rules={
+                    "max_length": 15,
+                    "pattern": "^[a-zA-Z0-9\\s\\.\\,\\!\\?\\'\\-]*$",
+                    "price": 40.0,
+                },
+            ),
+        ],
+    )
+
 
 # Bracelets Customization Configuration
-BRACELETS_CONFIG = ProductCustomizationConfig(
-    category="bracelets",
-    options=[
-        CustomizationOption(
-            option_id="metal_type",
-            display_name="Metal Type",
-            option_type="select",
-            required=True,
-            order=1,
-            help_text="Select the metal for your bracelet",
-            values=[
-                CustomizationOptionValue(
-                    value="sterling_silver",
-                    price_modifier=0.0,
-                    display_name="Sterling Silver",
-                ),
-                CustomizationOptionValue(
-                    value="gold", price_modifier=120.0, display_name="Gold"
-                ),
-                CustomizationOptionValue(
-                    value="rose_gold", price_modifier=150.0, display_name="Rose Gold"
-                ),
-            ],
-        ),
-        CustomizationOption(
-            option_id="bracelet_size",
-            display_name="Bracelet Size",
-            option_type="select",
-            required=True,
-            order=2,
-            help_text="Select your wrist size",
-            values=[
-                CustomizationOptionValue(
-                    value='6"', price_modifier=0.0, display_name="6 inches"
-                ),
-                CustomizationOptionValue(
-                    value='6.5"', price_modifier=0.0, display_name="6.5 inches"
-                ),
-                CustomizationOptionValue(
-                    value='7"', price_modifier=0.0, display_name="7 inches"
-                ),
-                CustomizationOptionValue(
-                    value='7.5"', price_modifier=0.0, display_name="7.5 inches"
-                ),
-                CustomizationOptionValue(
-                    value='8"', price_modifier=0.0, display_name="8 inches"
-                ),
-            ],
-        ),
-        CustomizationOption(
-            option_id="charms",
-            display_name="Charm Addition",
-            option_type="multi_select",
-            required=False,
-            order=3,
-            help_text="Add up to 3 charms ($50 each)",
-            validation_rules={"max_selections": 3, "price_per_item": 50.0},
-            values=[
-                CustomizationOptionValue(
-                    value="heart", price_modifier=50.0, display_name="Heart Charm"
-                ),
-                CustomizationOptionValue(
-                    value="star", price_modifier=50.0, display_name="Star Charm"
-                ),
-                CustomizationOptionValue(
-                    value="moon", price_modifier=50.0, display_name="Moon Charm"
-                ),
-                CustomizationOptionValue(
-                    value="flower", price_modifier=50.0, display_name="Flower Charm"
-                ),
-                CustomizationOptionValue(
-                    value="key", price_modifier=50.0, display_name="Key Charm"
-                ),
-                CustomizationOptionValue(
-                    value="lock", price_modifier=50.0, display_name="Lock Charm"
-                ),
-            ],
-        ),
-        CustomizationOption(
-            option_id="engraving",
-            display_name="Engraving",
-            option_type="text",
-            required=False,
-            order=4,
-            help_text="Inside bracelet, max 10 characters",
-            validation_rules={
-                "max_length": 10,
-                "pattern": "^[a-zA-Z0-9\\s\\.\\,\\!\\?\\'\\-]*$",
-                "price": 35.0,
-            },
-        ),
-    ],
-)
-
-# Master configuration dictionary
-CUSTOMIZATION_CONFIGS: Dict[str, ProductCustomizationConfig] = {
-    "rings": RINGS_CONFIG,
-    "necklaces": NECKLACES_CONFIG,
-    "bracelets": BRACELETS_CONFIG,
+def _build_bracelets_config() -> ProductCustomizationConfig:
+    return ProductCustomizationConfig(
+        category="bracelets",
+        options=[
+            CustomizationOption(
+                option_id="metal_type",
+                display_name="Metal Type",
+                option_type="select",
+                required=True,
+                order=1,
+                help_text="Select the metal for your bracelet",
+                values=[
+                    CustomizationOptionValue(
+                        value="sterling_silver",
+                        price_modifier=0.0,
+                        display_name="Sterling Silver",
+                    ),
+                    CustomizationOptionValue(
+                        value="gold", price_modifier=120.0, display_name="Gold"
+                    ),
+                    CustomizationOptionValue(
+                        value="rose_gold",
+                        price_modifier=150.0,
+                        display_name="Rose Gold",
+                    ),
+                ],
+            ),
+            CustomizationOption(
+                option_id="bracelet_size",
+                display_name="Bracelet Size",
+                option_type="select",
+                required=True,
+                order=2,
+                help_text="Select your wrist size",
+                values=[
+                    CustomizationOptionValue(
+                        value='6"', price_modifier=0.0, display_name="6 inches"
+                    ),
+                    CustomizationOptionValue(
+                        value='6.5"', price_modifier=0.0, display_name="6.5 inches"
+                    ),
+                    CustomizationOptionValue(
+                        value='7"', price_modifier=0.0, display_name="7 inches"
+                    ),
+                    CustomizationOptionValue(
+                        value='7.5"', price_modifier=0.0, display_name="7.5 inches"
+                    ),
+                    CustomizationOptionValue(
+                        value='8"', price_modifier=0.0, display_name="8 inches"
+                    ),
+                ],
+            ),
+            CustomizationOption(
+                option_id="charms",
+                display_name="Charm Addition",
+                option_type="multi_select",
+                required=False,
+                order=3,
+                help_text="Add up to 3 charms ($50 each)",
+                validation_rules={"max_selections": 3, "price_per_item": 50.0},
+                values=[
+                    CustomizationOptionValue(
+                        value="heart", price_modifier=50.0, display_name="Heart Charm"
+                    ),
+                    CustomizationOptionValue(
+                        value="star", price_modifier=50.0, display_name="Star Charm"
+                    ),
+                    CustomizationOptionValue(
+                        value="moon", price_modifier=50.0, display_name="Moon Charm"
+                    ),
+                    CustomizationOptionValue(
+                        value="flower", price_modifier=50.0, display_name="Flower Charm"
+                    ),
+                    CustomizationOptionValue(
+                        value="key", price_modifier=50.0, display_name="Key Charm"
+                    ),
+                    CustomizationOptionValue(
+                        value="lock", price_modifier=50.0, display_name="Lock Charm"
+                    ),
+                ],
+            ),
+            CustomizationOption(
+                option_id="engraving",
+                display_name="Engraving",
+                option_type="text",
+                required=False,
+                order=4,
+                help_text="Inside bracelet, max 10 characters",
+                validation_rules={
+                    "max_length": 10,
+                    "pattern": "^[a-zA-Z0-9\\s\\.\\,\\!\\?\\'\\-]*$",
+                    "price": 35.0,
+                },
+            ),
+        ],
+    )
+
+
+# Master configuration dictionary: category -> builder
+# Configs are validated on first request (or during startup warm-up) and reused
+CUSTOMIZATION_CONFIG_BUILDERS: Dict[str, Callable[[], ProductCustomizationConfig]] = {
+    "rings": _build_rings_config,
+    "necklaces": _build_necklaces_config,
+    "bracelets": _build_bracelets_config,
 }
 
+_configs: Dict[str, ProductCustomizationConfig] = {}
+
 
 def get_customization_config(category: str) -> Optional[ProductCustomizationConfig]:
     """
@@ -391,4 +416,103 @@ def get_customization_config(category: str) -> Optional[ProductCustomizationConf
     Returns:
         ProductCustomizationConfig or None if category not found
     """
-    return CUSTOMIZATION_CONFIGS.get(category)
+    config = _configs.get(category)
+    if config is None:
+        builder = CUSTOMIZATION_CONFIG_BUILDERS.get(category)
+        if builder is None:
+            return None
+        CACHE_REQUESTS.inc("customization_config", "miss")
+        config = _configs.setdefault(category, builder())
+    else:
+        CACHE_REQUESTS.inc("customization_config", "hit")
+    return config
+
+
+def load_customization_configs() -> Dict[str, ProductCustomizationConfig]:
+    """Build every category's configuration up front"""
+    for category in CUSTOMIZATION_CONFIG_BUILDERS:
+        get_customization_config(category)
+    return dict(_configs)
+
+
+def cached_customization_configs() -> Dict[str, ProductCustomizationConfig]:
+    """Return the configurations built so far, without building the rest"""
+    return dict(_configs)
+
+
+def _option_cost(option: CustomizationOption, value: Any) -> float:
+    """Price one non-empty selected value, raising ValueError if it is invalid"""
+    rules = option.validation_rules or {}
+    if option.option_type == "multi_select":
+        allowed = {choice.value for choice in option.values}
+        if (
+            not isinstance(value, list)
+            or not all(isinstance(item, str) for item in value)
+            or not set(value) <= allowed
+            or len(value) > rules.get("max_selections", len(value))
+        ):
+            raise ValueError(f"Invalid value for {option.option_id}")
+        return len(value) * rules.get("price_per_item", 0.0)
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid value for {option.option_id}")
+    if option.option_type == "text":
+        if len(value) > rules.get("max_length", len(value)) or not re.match(
+            rules.get("pattern", ""), value
+        ):
+            raise ValueError(f"Invalid value for {option.option_id}")
+        return rules.get("price", 0.0)
+    choice = next((c for c in option.values if c.value == value), None)
+    if choice is None:
+        raise ValueError(f"Invalid value for {option.option_id}")
+    return max(choice.price_modifier, 0.0)
+
+
+def customization_cost(
+    config: ProductCustomizationConfig, selections: Dict[str, Any]
+) -> float:
+    """
+    Price selected options the way the customization builder does
+
+    Args:
+        config: Configuration for the product's category
+        selections: option_id -> selected value, a string (a list of strings
+            for multi_select); empty values are skipped
+
+    Raises:
+        ValueError: for unknown options or values, values that are not
+            strings, text breaking its rules or a missing required option
+
+    Returns:
+        Cost added to the base price in USD
+    """
+    options = {option.option_id: option for option in config.options}
+    cost = 0.0
+    for option_id, value in selections.items():
+        option = options.get(option_id)
+        if option is None:
+            raise ValueError(f"Unknown option: {option_id}")
+        if value is None or value == "" or value == []:
+            continue
+        cost += _option_cost(option, value)
+    for option in config.options:
+        if option.required and selections.get(option.option_id) in (None, "", []):
+            raise ValueError(f"Missing required option: {option.option_id}")
+    return cost
+
+
+# Module-level configs from before they were built lazily, by category
+_LEGACY_CONFIGS = {
+    "RINGS_CONFIG": "rings",
+    "NECKLACES_CONFIG": "necklaces",
+    "BRACELETS_CONFIG": "bracelets",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Build the formerly import-time configs when they are first accessed"""
+    category = _LEGACY_CONFIGS.get(name)
+    if category is not None:
+        return get_customization_config(category)
+    if name == "CUSTOMIZATION_CONFIGS":
+        return load_customization_configs()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
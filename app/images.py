@@ -0,0 +1,400 @@
+"""
+Responsive Image Pipeline
+Resized, re-encoded product image variants generated on demand from local
+source images and kept in a size-bounded on-disk LRU cache
+
+Source images are not shipped; ``python -m app.images fetch`` downloads each
+product's original image into the source directory.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, features
+
+from app.metrics import CACHE_REQUESTS, REGISTRY
+from app.singleflight import SingleFlight
+
+SOURCE_DIR = Path("static/images/products")
+CACHE_DIR = Path(".cache/images")
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+# Evicted variants are deleted this many seconds later, so a response that
+# was handed the file just before its eviction can still open it
+EVICTION_GRACE = 60.0
+
+# Widths variants are generated at; requests are snapped up to one of these so
+# the number of cached variants per product stays bounded
+WIDTHS = (160, 320, 480, 640, 960, 1280)
+
+SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+# Media type of a downloaded source image -> file extension
+SOURCE_MEDIA_TYPES = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+# Output format -> (Pillow encoder, file extension, media type, save options)
+FORMATS: Dict[str, Tuple[str, str, str, dict]] = {
+    "avif": ("AVIF", "avif", "image/avif", {"quality": 50}),
+    "webp": ("WEBP", "webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", "image/jpeg", {"quality": 82, "optimize": True}),
+}
+
+
+class ImageService:
+    """Serve product image variants from a local source directory
+
+    Variants are rendered the first time they are requested and stored in
+    ``cache_dir``. Once the cache grows past ``max_cache_bytes`` the least
+    recently served variants are evicted, and their files deleted
+    ``eviction_grace`` seconds later. Concurrent requests for a variant that
+    is still being rendered wait for that single render.
+
+    Source images are scanned once (``refresh_sources``); their widths,
+    revisions and ``srcset`` values are kept until the next scan.
+    """
+
+    def __init__(
+        self,
+        source_dir: Path = SOURCE_DIR,
+        cache_dir: Path = CACHE_DIR,
+        max_cache_bytes: int = MAX_CACHE_BYTES,
+        eviction_grace: float = EVICTION_GRACE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.source_dir = Path(source_dir)
+        self.cache_dir = Path(cache_dir)
+        self.max_cache_bytes = max_cache_bytes
+        self.eviction_grace = eviction_grace
+        self.clock = clock
+        self.renders = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        # product id -> (path, width, revision); replaced as a whole by a scan
+        self._sources: Optional[Dict[int, Tuple[Path, int, int]]] = None
+        self._srcsets: Dict[int, str] = {}
+        self._entries: Optional["OrderedDict[str, int]"] = None
+        self._cache_bytes = 0
+        # Evicted variant -> when to delete its file, soonest first
+        self._doomed: "OrderedDict[str, float]" = OrderedDict()
+
+    # Source images
+
+    def refresh_sources(self) -> Dict[int, str]:
+        """
+        Rescan the source directory for product images
+
+        Returns:
+            ``srcset`` values by product id (see srcset)
+        """
+        sources: Dict[int, Tuple[Path, int, int]] = {}
+        if self.source_dir.is_dir():
+            for path in sorted(self.source_dir.iterdir()):
+                if path.suffix.lower() not in SOURCE_EXTENSIONS:
+                    continue
+                if not path.stem.isdigit():
+                    continue
+                try:
+                    with Image.open(path) as img:
+                        width = img.width
+                    version = path.stat().st_mtime_ns
+                except OSError:
+                    continue
+                sources[int(path.stem)] = (path, width, version)
+        srcsets = {
+            product_id: self._build_srcset(product_id, width, version)
+            for product_id, (_, width, version) in sources.items()
+        }
+        self._sources, self._srcsets = sources, srcsets
+        return srcsets
+
+    def _scanned(self) -> Dict[int, Tuple[Path, int, int]]:
+        sources = self._sources
+        if sources is None:
+            self.refresh_sources()
+            sources = self._sources
+        return sources
+
+    def find_source(self, product_id: int) -> Optional[Tuple[Path, int]]:
+        """Return the source image path and width for a product, if any"""
+        source = self._scanned().get(product_id)
+        return None if source is None else source[:2]
+
+    def source_version(self, product_id: int) -> Optional[int]:
+        """Revision of a product's source image (its mtime in ns when scanned)"""
+        source = self._scanned().get(product_id)
+        return None if source is None else source[2]
+
+    @classmethod
+    def _build_srcset(cls, product_id: int, source_width: int, version: int) -> str:
+        widths = [w for w in WIDTHS if w < source_width]
+        if source_width <= WIDTHS[-1]:
+            widths.append(cls.snap_width(source_width))
+        return ", ".join(
+            f"/img/{product_id}?w={w}&v={version} {min(w, source_width)}w"
+            for w in widths
+        )
+
+    def srcset(self, product_id: int) -> Optional[str]:
+        """
+        The ``srcset`` attribute value for a product image, built at scan time
+
+        Candidates never exceed the source width. The format is left to
+        content negotiation so each browser gets the best one it accepts.
+        URLs carry the source revision (``v``), so a replaced image gets new
+        URLs after the next scan and the old ones can be cached as immutable.
+
+        Returns:
+            srcset string or None if no local source image exists
+        """
+        self._scanned()
+        return self._srcsets.get(product_id)
+
+    # Variant parameters
+
+    @staticmethod
+    def snap_width(width: int) -> int:
+        """Round a requested width up to the nearest generated width"""
+        for candidate in WIDTHS:
+            if width <= candidate:
+                return candidate
+        return WIDTHS[-1]
+
+    @staticmethod
+    def supported_formats() -> Tuple[str, ...]:
+        """Return the output formats this Pillow build can encode"""
+        return tuple(fmt for fmt in FORMATS if fmt == "jpeg" or features.check(fmt))
+
+    def negotiate_format(self, accept: Optional[str]) -> str:
+        """Pick the most compact output format allowed by an Accept header"""
+        accept = accept or ""
+        supported = self.supported_formats()
+        for fmt in ("avif", "webp"):
+            if fmt in supported and f"image/{fmt}" in accept:
+                return fmt
+        return "jpeg"
+
+    # Variant cache
+
+    def _load_entries(self) -> None:
+        """Index existing cache files, oldest access first"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in self.cache_dir.iterdir():
+            if path.is_file() and not path.name.endswith(".tmp"):
+                stat = path.stat()
+                files.append((stat.st_mtime, path.name, stat.st_size))
+        files.sort()
+        self._entries = OrderedDict((name, size) for _, name, size in files)
+        self._cache_bytes = sum(self._entries.values())
+
+    def _variant_name(self, product_id: int, width: int, fmt: str) -> str:
+        version = self.source_version(product_id)
+        return f"{product_id}-{width}-{version}.{FORMATS[fmt][1]}"
+
+    def _touch(self, name: str) -> bool:
+        """
+        Mark a cached variant as recently used; return False if absent
+
+        Recency is kept in memory only. After a restart variants are
+        ordered by when they were rendered.
+        """
+        with self._lock:
+            if self._entries is None:
+                self._load_entries()
+            if name not in self._entries:
+                CACHE_REQUESTS.inc("image_variant", "miss")
+                return False
+            self._entries.move_to_end(name)
+        CACHE_REQUESTS.inc("image_variant", "hit")
+        return True
+
+    def _store(self, name: str, size: int) -> None:
+        """Record a new variant and evict least recently used ones over budget"""
+        with self._lock:
+            if self._entries is None:
+                self._load_entries()
+            now = self.clock()
+            self._doomed.pop(name, None)
+            self._cache_bytes += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            while self._cache_bytes > self.max_cache_bytes and len(self._entries) > 1:
+                victim, victim_size = self._entries.popitem(last=False)
+                self._cache_bytes -= victim_size
+                self.evictions += 1
+                self._doomed.pop(victim, None)
+                self._doomed[victim] = now + self.eviction_grace
+            self._delete_evicted(now)
+
+    def _delete_evicted(self, now: float) -> None:
+        """Delete evicted variants whose grace period is over; called under the lock"""
+        doomed = self._doomed
+        while doomed:
+            victim, deadline = next(iter(doomed.items()))
+            if deadline > now:
+                break
+            del doomed[victim]
+            (self.cache_dir / victim).unlink(missing_ok=True)
+
+    def _render(self, product_id: int, width: int, fmt: str, name: str) -> Path:
+        """Resize and encode one variant into the cache directory"""
+        source_path, _ = self.find_source(product_id)
+        encoder, _, _, options = FORMATS[fmt]
+        target = self.cache_dir / name
+        tmp = target.with_name(f"{name}.{threading.get_ident()}.tmp")
+        with self._lock:
+            # Rendered again after an eviction: keep the new file
+            self._doomed.pop(name, None)
+        with Image.open(source_path) as img:
+            if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA", "L"):
+                img = img.convert("RGBA")
+            if img.width > width:
+                height = round(img.height * width / img.width)
+                img = img.resize((width, height), Image.Resampling.LANCZOS)
+            img.save(tmp, format=encoder, **options)
+        os.replace(tmp, target)
+        self.renders += 1
+        self._store(name, target.stat().st_size)
+        return target
+
+    async def get_variant(self, product_id: int, width: int, fmt: str) -> Path:
+        """
+        Return the path of a cached variant, rendering it on first request
+
+        Args:
+            product_id: Product whose source image to use
+            width: Requested width in pixels (snapped to WIDTHS)
+            fmt: One of the supported output formats
+
+        Raises:
+            LookupError: If the product has no local source image
+        """
+        if self.find_source(product_id) is None:
+            raise LookupError(f"No source image for product {product_id}")
+        width = self.snap_width(width)
+        name = self._variant_name(product_id, width, fmt)
+        if self._touch(name):
+            return self.cache_dir / name
+        return await self._flight.do(
+            name, lambda: run_in_threadpool(self._render, product_id, width, fmt, name)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters"""
+        return {
+            "renders": self.renders,
+            "evictions": self.evictions,
+            "cached_variants": len(self._entries or ()),
+            "cache_bytes": self._cache_bytes,
+            "coalesced": self._flight.coalesced,
+        }
+
+
+image_service = ImageService()
+
+REGISTRY.callback(
+    "image_cache_bytes",
+    "Bytes currently held in the image variant disk cache",
+    "gauge",
+    (),
+    lambda: {(): image_service.stats()["cache_bytes"]},
+)
+REGISTRY.callback(
+    "image_cache_evictions_total",
+    "Image variants evicted from the disk cache",
+    "counter",
+    (),
+    lambda: {(): image_service.evictions},
+)
+
+
+def _sized_url(url: str, width: int) -> str:
+    """Ask an image CDN URL that takes a ``w`` parameter for ``width`` pixels"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if not any(key == "w" for key, _ in query):
+        return url
+    query = [(key, str(width) if key == "w" else value) for key, value in query]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def fetch_sources(
+    images: Dict[int, str],
+    source_dir: Path = SOURCE_DIR,
+    client: Optional[httpx.Client] = None,
+) -> List[int]:
+    """
+    Download product images as local source images
+
+    Products that already have a source image are skipped. URLs with a ``w``
+    parameter are asked for the largest generated width.
+
+    Args:
+        images: Original image URL by product id
+        source_dir: Directory to write ``<product_id>.<ext>`` files to
+        client: HTTP client to use (default: a new one following redirects)
+
+    Returns:
+        Ids of the products whose image was downloaded
+    """
+    source_dir = Path(source_dir)
+    source_dir.mkdir(parents=True, exist_ok=True)
+    existing = {
+        path.stem for path in source_dir.iterdir() if path.suffix in SOURCE_EXTENSIONS
+    }
+    own_client = client is None
+    client = client or httpx.Client(follow_redirects=True, timeout=30)
+    fetched = []
+    try:
+        for product_id, url in images.items():
+            if str(product_id) in existing:
+                continue
+            response = client.get(_sized_url(url, WIDTHS[-1]))
+            media_type = response.headers.get("content-type", "").split(";")[0]
+            extension = SOURCE_MEDIA_TYPES.get(media_type.strip())
+            if response.status_code != 200 or extension is None:
+                print(
+                    f"product {product_id}: skipped ({response.status_code} {media_type})"
+                )
+                continue
+            target = source_dir / f"{product_id}{extension}"
+            tmp = target.with_name(f"{target.name}.tmp")
+            tmp.write_bytes(response.content)
+            os.replace(tmp, target)
+            fetched.append(product_id)
+    finally:
+        if own_client:
+            client.close()
+    return fetched
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.images")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch = commands.add_parser(
+        "fetch", help="Download product images missing from the source directory"
+    )
+    fetch.add_argument("--source-dir", type=Path, default=SOURCE_DIR)
+    args = parser.parse_args()
+
+    from app.mock_data import ensure_catalog
+
+    products = ensure_catalog().products()
+    fetched = fetch_sources(
+        {product.id: product.image for product in products}, args.source_dir
+    )
+    print(f"fetched {len(fetched):,} of {len(products):,} product images")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""
+Inventory
+Stock per product and per customization variant, short-lived reservations
+that expire on a timer wheel, and the set of sold-out products behind the
+``in_stock`` filter
+
+Each product has its own lock, so reservations for unrelated products never
+wait on each other. Products without stock records are not tracked and
+never sell out; reservations for them hold nothing and are not kept, so
+memory is bounded by the stock being held.
+"""
+
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+# How long reserved items are held before going back on sale
+RESERVATION_TTL = 600.0
+# Optional path to a JSON file of stock levels, loaded at warm-up (see
+# Inventory.load_stock)
+STOCK_FILE = os.environ.get("PANDORA_STOCK_FILE")
+
+
+class OutOfStockError(ValueError):
+    """Raised when fewer items are available than a reservation asks for"""
+
+    def __init__(self, available: int) -> None:
+        super().__init__(f"Out of stock. {available} available")
+        self.available = available
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel: deadlines are filed in the slot for their tick and
+    collected as the clock passes them
+
+    Scheduling is O(1) and each advance only visits the slots for the ticks
+    that elapsed, however many timers are pending. Timers are never
+    cancelled; owners ignore keys that no longer apply when they expire.
+    """
+
+    def __init__(
+        self,
+        slots: int = 512,
+        tick: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.tick = tick
+        self.clock = clock
+        self._slots: List[List[Tuple[int, Hashable]]] = [[] for _ in range(slots)]
+        self._current = int(clock() // tick)
+        # Held only to file or collect entries
+        self._lock = threading.Lock()
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Fire ``key`` once the clock reaches ``deadline``"""
+        with self._lock:
+            due = max(math.ceil(deadline / self.tick), self._current + 1)
+            self._slots[due % len(self._slots)].append((due, key))
+
+    def advance(self) -> List[Hashable]:
+        """Return the keys whose deadline has passed, oldest tick first"""
+        now = int(self.clock() // self.tick)
+        if now <= self._current:
+            return []
+        expired: List[Hashable] = []
+        with self._lock:
+            count = len(self._slots)
+            ticks = range(self._current + 1, now + 1)
+            if len(ticks) > count:
+                # Idle for a whole turn: every slot is due once
+                ticks = range(now - count + 1, now + 1)
+            for tick in ticks:
+                slot = self._slots[tick % count]
+                if slot:
+                    expired.extend(key for due, key in slot if due <= now)
+                    self._slots[tick % count] = [e for e in slot if e[0] > now]
+            self._current = max(self._current, now)
+        return expired
+
+    def __len__(self) -> int:
+        return sum(len(slot) for slot in self._slots)
+
+
+class Stock:
+    """Items on hand for one product or variant, and how many are reserved"""
+
+    __slots__ = ("on_hand", "reserved")
+
+    def __init__(self) -> None:
+        self.on_hand = 0
+        self.reserved = 0
+
+    @property
+    def available(self) -> int:
+        return max(self.on_hand - self.reserved, 0)
+
+
+class Reservation(NamedTuple):
+    """Items held for one client until they are bought, released or expire"""
+
+    id: str
+    product_id: int
+    customization_hash: str
+    quantity: int
+    expires_at: float  # on the inventory's clock
+    # Variant the items are counted against ("" for the product's own
+    # stock), or None when the product is not tracked
+    counted_as: Optional[str]
+
+
+class Inventory:
+    """Thread-safe stock levels and reservations"""
+
+    def __init__(
+        self,
+        ttl: float = RESERVATION_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.clock = clock
+        # product id -> customization hash ("" for the product itself) -> stock
+        self._stock: Dict[int, Dict[str, Stock]] = {}
+        self._locks: Dict[int, threading.Lock] = {}
+        self._reservations: Dict[str, Reservation] = {}
+        self._wheel = TimerWheel(clock=clock)
+        # Tracked products with nothing available, updated on every change
+        self._sold_out: Set[int] = set()
+
+    def _lock(self, product_id: int) -> threading.Lock:
+        lock = self._locks.get(product_id)
+        if lock is None:
+            lock = self._locks.setdefault(product_id, threading.Lock())
+        return lock
+
+    def _refresh(self, product_id: int) -> None:
+        """
+        Update the sold-out set for one product; called under its lock
+
+        A product is sold out when its own stock is tracked and neither it
+        nor any tracked variant has items available.
+        """
+        variants = self._stock.get(product_id, {})
+        if "" in variants and not any(s.available for s in variants.values()):
+            self._sold_out.add(product_id)
+        else:
+            self._sold_out.discard(product_id)
+
+    def set_stock(
+        self, product_id: int, on_hand: int, customization_hash: str = ""
+    ) -> None:
+        """
+        Set the items on hand for a product, or for one customization of it
+
+        A customization without its own stock draws on the product's.
+        Reserved items stay reserved.
+        """
+        with self._lock(product_id):
+            variants = self._stock.setdefault(product_id, {})
+            variants.setdefault(customization_hash, Stock()).on_hand = on_hand
+            self._refresh(product_id)
+
+    def load_stock(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Set stock from records like ``{"product_id": 1, "on_hand": 5}``,
+        with an optional ``customization_hash``; returns how many were set
+
+        Every record is checked before any stock is set.
+
+        Raises:
+            ValueError: If a record is malformed
+        """
+        levels = []
+        for number, record in enumerate(records, start=1):
+            if not isinstance(record, dict):
+                raise ValueError(f"Invalid stock record {number}: {record!r}")
+            product_id = record.get("product_id")
+            on_hand = record.get("on_hand")
+            customization_hash = record.get("customization_hash", "")
+            if (
+                type(product_id) is not int
+                or type(on_hand) is not int
+                or on_hand < 0
+                or not isinstance(customization_hash, str)
+            ):
+                raise ValueError(f"Invalid stock record {number}: {record!r}")
+            levels.append((product_id, on_hand, customization_hash))
+        for product_id, on_hand, customization_hash in levels:
+            self.set_stock(product_id, on_hand, customization_hash)
+        return len(levels)
+
+    def load_stock_file(self, path: str) -> int:
+        """Set stock from a JSON list of records (see load_stock)"""
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+        if not isinstance(records, list):
+            raise ValueError(f"{path}: expected a list of stock records")
+        return self.load_stock(records)
+
+    def available(self, product_id: int, customization_hash: str = "") -> Optional[int]:
+        """Items available to reserve, or None if the product is not tracked"""
+        self.expire()
+        variants = self._stock.get(product_id, {})
+        stock = variants.get(customization_hash) or variants.get("")
+        return None if stock is None else stock.available
+
+    def variants(self, product_id: int) -> Dict[str, int]:
+        """Items available per customization with its own stock"""
+        self.expire()
+        with self._lock(product_id):
+            variants = self._stock.get(product_id, {})
+            return {key: s.available for key, s in variants.items() if key}
+
+    def is_sold_out(self, product_id: int) -> bool:
+        self.expire()
+        return product_id in self._sold_out
+
+    def reserve(
+        self, product_id: int, quantity: int, customization_hash: str = ""
+    ) -> Reservation:
+        """
+        Hold ``quantity`` items for ``ttl`` seconds
+
+        For untracked products nothing is held and the reservation is not
+        kept (its ``counted_as`` is None): committing or releasing it raises
+        LookupError.
+
+        Raises:
+            OutOfStockError: If fewer items are available
+        """
+        self.expire()
+        counted_as = None
+        with self._lock(product_id):
+            variants = self._stock.get(product_id, {})
+            key = customization_hash if customization_hash in variants else ""
+            stock = variants.get(key)
+            if stock is not None:
+                if stock.available < quantity:
+                    raise OutOfStockError(stock.available)
+                stock.reserved += quantity
+                counted_as = key
+                self._refresh(product_id)
+        reservation = Reservation(
+            secrets.token_urlsafe(12),
+            product_id,
+            customization_hash,
+            quantity,
+            self.clock() + self.ttl,
+            counted_as,
+        )
+        if counted_as is not None:
+            self._reservations[reservation.id] = reservation
+            self._wheel.schedule(reservation.id, reservation.expires_at)
+        return reservation
+
+    def _settle(self, reservation: Reservation, sold: bool) -> None:
+        """Return reserved items to sale, or take them off hand if sold"""
+        if reservation.counted_as is None:
+            return
+        with self._lock(reservation.product_id):
+            variants = self._stock.get(reservation.product_id, {})
+            stock = variants.get(reservation.counted_as)
+            if stock is not None:
+                stock.reserved -= reservation.quantity
+                if sold:
+                    stock.on_hand -= reservation.quantity
+            self._refresh(reservation.product_id)
+
+    def _take(self, reservation_id: str) -> Reservation:
+        """
+        Remove a live reservation so only one caller can settle it
+
+        Raises:
+            LookupError: If it is unknown, already settled or has expired
+        """
+        reservation = self._reservations.pop(reservation_id, None)
+        if reservation is None:
+            raise LookupError(f"Unknown reservation: {reservation_id}")
+        if reservation.expires_at <= self.clock():
+            self._settle(reservation, sold=False)
+            raise LookupError(f"Reservation expired: {reservation_id}")
+        return reservation
+
+    def commit(self, reservation_id: str) -> Reservation:
+        """
+        Sell the reserved items
+
+        Raises:
+            LookupError: If the reservation is unknown or has expired
+        """
+        reservation = self._take(reservation_id)
+        self._settle(reservation, sold=True)
+        return reservation
+
+    def release(self, reservation_id: str) -> Reservation:
+        """
+        Put the reserved items back on sale
+
+        Raises:
+            LookupError: If the reservation is unknown or has expired
+        """
+        reservation = self._take(reservation_id)
+        self._settle(reservation, sold=False)
+        return reservation
+
+    def expire(self) -> int:
+        """Release reservations whose time is up; returns how many"""
+        released = 0
+        for reservation_id in self._wheel.advance():
+            reservation = self._reservations.pop(reservation_id, None)
+            if reservation is not None:
+                self._settle(reservation, sold=False)
+                released += 1
+        return released
+
+    def in_stock_rows(self, ids: Sequence[int], rows: List[int]) -> List[int]:
+        """Keep the rows whose product id (``ids[row]``) is not sold out"""
+        self.expire()
+        sold_out = self._sold_out
+        if not sold_out:
+            return rows
+        return [row for row in rows if ids[row] not in sold_out]
+
+    def clear(self) -> None:
+        """Forget all stock and reservations"""
+        self._stock.clear()
+        self._reservations.clear()
+        self._sold_out.clear()
+
+    def __len__(self) -> int:
+        return len(self._reservations)
+
+
+inventory = Inventory()
@@ -0,0 +1,153 @@
+"""
+Event Loop Monitor
+Continuous scheduling-lag measurement with stack capture for handlers that
+block the event loop
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+from app.metrics import REGISTRY, LabelValues
+
+logger = logging.getLogger(__name__)
+
+LAG_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class BlockedLoop(NamedTuple):
+    """One stall of the event loop, captured while it was happening"""
+
+    at: float
+    blocked_for: float
+    stack: List[str]
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes a periodic task
+
+    A task on the loop sleeps for ``interval`` and records how much later
+    than requested it woke up. A watchdog thread notices when that wake-up
+    is overdue by more than ``threshold`` and logs the loop thread's stack
+    at that moment, which points at the code holding the loop. A
+    ``threshold`` of zero disables the monitor.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        threshold: float = 0.1,
+        window: int = 1200,
+        max_reports: int = 50,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: Deque[float] = deque(maxlen=window)
+        self.blocked: Deque[BlockedLoop] = deque(maxlen=max_reports)
+        self._expected_wake = 0.0
+        self._reported_wake = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> "LoopLagMonitor":
+        return cls(
+            threshold=float(os.environ.get("PANDORA_LOOP_LAG_THRESHOLD_MS", "100"))
+            / 1000,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def start(self) -> None:
+        """Start measuring on the running loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-lag-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _measure(self) -> None:
+        interval = self.interval
+        while True:
+            self._expected_wake = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - self._expected_wake)
+            self.lags.append(lag)
+            LOOP_LAG.observe(lag)
+
+    def _watch(self) -> None:
+        check_every = max(0.005, self.threshold / 4)
+        while not self._stop.wait(check_every):
+            expected = self._expected_wake
+            if not expected or expected == self._reported_wake:
+                continue
+            overdue = time.perf_counter() - expected
+            if overdue > self.threshold:
+                self._reported_wake = expected
+                self._report(overdue)
+
+    def _report(self, overdue: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        self.blocked.append(BlockedLoop(time.time(), overdue, stack))
+        LOOP_BLOCKED.inc()
+        logger.warning(
+            "event loop blocked for more than %.0f ms; loop thread stack:\n%s",
+            overdue * 1000,
+            "".join(stack),
+        )
+
+    def percentiles(self) -> Dict[float, float]:
+        """Lag quantiles in seconds over the recent window"""
+        lags = sorted(self.lags)
+        if not lags:
+            return {}
+        last = len(lags) - 1
+        return {q: lags[min(last, int(q * len(lags)))] for q in LAG_QUANTILES}
+
+
+loop_monitor = LoopLagMonitor.from_env()
+
+
+def _lag_quantiles() -> Dict[LabelValues, float]:
+    return {(str(q),): lag for q, lag in loop_monitor.percentiles().items()}
+
+
+LOOP_LAG = REGISTRY.histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a periodic timer"
+)
+LOOP_BLOCKED = REGISTRY.counter(
+    "event_loop_blocked_total", "Event loop stalls longer than the lag threshold"
+)
+REGISTRY.callback(
+    "event_loop_lag_quantile_seconds",
+    "Event loop lag quantiles over the recent window",
+    "gauge",
+    ("quantile",),
+    _lag_quantiles,
+)
@@ -1,20 +1,82 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 
+from app.api.bundles import router as bundles_router
+from app.api.carts import router as carts_router
+from app.api.debug import router as debug_router
+from app.api.images import router as images_router
+from app.api.inventory import router as inventory_router
 from app.api.routes import router
+from app.api.wishlists import router as wishlists_router
+from app.loop_monitor import loop_monitor
+from app.metrics import REGISTRY, MetricsMiddleware
+from app.profiling import ProfilingMiddleware
+from app.service_worker import render_service_worker
+from app.startup import record_import_phase, startup_state, warm_up
+from app.tracing import TracingMiddleware, tracer
+
+
+def _warm_up_done(task: asyncio.Task) -> None:
+    """Retrieve the warm-up result so a failure is logged and reported"""
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        startup_state.fail(exc)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving immediately and warm up in the background"""
+    record_import_phase()
+    if loop_monitor.enabled:
+        loop_monitor.start()
+    warm_up_task = asyncio.create_task(run_in_threadpool(warm_up))
+    warm_up_task.add_done_callback(_warm_up_done)
+    yield
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+    await loop_monitor.stop()
+    tracer.flush()
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose names change whenever their content does"""
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
 
 app = FastAPI(
     title="Pandora Jewelry Showcase",
     description="Luxury jewelry e-commerce PWA",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-# Mount static files
+app.add_middleware(TracingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+# Mount static files; fingerprinted build output can be cached forever
+app.mount("/static/dist", ImmutableStaticFiles(directory="static/dist"), name="dist")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Include API routes
 app.include_router(router, prefix="/api", tags=["products"])
+app.include_router(wishlists_router, prefix="/api", tags=["wishlists"])
+app.include_router(carts_router, prefix="/api", tags=["carts"])
+app.include_router(inventory_router, prefix="/api", tags=["inventory"])
+app.include_router(images_router, tags=["images"])
+app.include_router(bundles_router, tags=["bundles"])
+app.include_router(debug_router, prefix="/debug", tags=["debug"])
 
 
 @app.get("/")
@@ -29,6 +91,39 @@ async def read_wishlist():
     return FileResponse("templates/wishlist.html")
 
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving"""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: 200 with startup timings once warm-up has finished"""
+    return JSONResponse(
+        startup_state.snapshot(), status_code=200 if startup_state.ready else 503
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/service-worker.js", include_in_schema=False)
+async def get_service_worker():
+    """Serve the service worker from the root so it controls every page"""
+    return Response(
+        render_service_worker(),
+        media_type="application/javascript",
+        # Browsers must always check for a new worker (and precache manifest)
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 @app.get("/manifest.json")
 async def get_manifest():
     """Serve PWA manifest"""
@@ -0,0 +1,224 @@
+"""
+Memory Diagnostics
+On-demand tracemalloc snapshots, top allocation sites and snapshot diffs,
+plus the sizes of the catalog, its indexes, the caches and the per-client
+stores (wishlists, carts and customizations)
+"""
+
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from types import FunctionType, ModuleType
+from typing import Any, Dict, List, Optional
+
+from app.carts import cart_store, customization_registry
+from app.customization_config import cached_customization_configs
+from app.images import image_service
+from app.mock_data import cached_price_histograms, loaded_catalog
+from app.wishlists import wishlist_store
+
+GROUP_BY = ("lineno", "filename")
+
+# Allocations made by the diagnostics themselves are not interesting
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+# Shared objects that should not be counted as part of a component
+_SKIP_TYPES = (type, ModuleType, FunctionType)
+
+
+def deep_sizeof(obj: Any) -> int:
+    """Bytes held by ``obj`` and everything it references, counted once"""
+    seen = set()
+    total = 0
+    pending = [obj]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, _SKIP_TYPES) or id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        pending.extend(gc.get_referents(current))
+    return total
+
+
+def component_sizes() -> Dict[str, Dict[str, int]]:
+    """Measure the catalog, its indexes, the caches and client stores separately"""
+    store = loaded_catalog()
+    configs = cached_customization_configs()
+    histograms = cached_price_histograms()
+    customizations = customization_registry.entries()
+    images = image_service.stats()
+    return {
+        "catalog": {
+            "bytes": store.nbytes if store is not None else 0,
+            "rows": len(store) if store is not None else 0,
+            # Mapped from a binary snapshot: pages are shared between workers
+            "shared": store is not None and store.shared,
+        },
+        "catalog_indexes": {
+            "bytes": store.index_nbytes if store is not None else 0,
+        },
+        "customization_configs": {
+            "bytes": deep_sizeof(configs),
+            "entries": len(configs),
+        },
+        "image_variant_cache": {
+            "disk_bytes": images["cache_bytes"],
+            "entries": images["cached_variants"],
+        },
+        "price_histograms": {
+            "bytes": deep_sizeof(histograms),
+            "entries": len(histograms),
+        },
+        "wishlists": {
+            "bytes": wishlist_store.nbytes,
+            "entries": len(wishlist_store),
+        },
+        "carts": {
+            "bytes": cart_store.nbytes,
+            "entries": len(cart_store),
+        },
+        "customizations": {
+            "bytes": deep_sizeof(customizations),
+            "entries": len(customizations),
+        },
+    }
+
+
+def _stat_to_dict(stat, group_by: str) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    site = {"file": frame.filename}
+    if group_by == "lineno":
+        site["line"] = frame.lineno
+    site["size_bytes"] = stat.size
+    site["count"] = stat.count
+    if hasattr(stat, "size_diff"):
+        site["size_diff_bytes"] = stat.size_diff
+        site["count_diff"] = stat.count_diff
+    return site
+
+
+class MemoryDiagnostics:
+    """Allocation tracing controls and a small store of snapshots
+
+    Tracing is off unless started here (or with ``PYTHONTRACEMALLOC``):
+    while it is on, every allocation pays for recording its traceback.
+    Snapshots are looked up, stored and evicted under a lock, so a lookup
+    never sees one half-evicted.
+    """
+
+    def __init__(self, max_snapshots: int = 8) -> None:
+        self.max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[int, tracemalloc.Snapshot]" = OrderedDict()
+        self._taken_at: Dict[int, float] = {}
+        self._next_id = 1
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        """Start tracing allocations, keeping ``frames`` frames per traceback"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        """Stop tracing and forget the snapshots taken so far"""
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+            self._taken_at.clear()
+
+    def status(self) -> Dict[str, Any]:
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": self.tracing,
+            "traced_bytes": traced,
+            "peak_traced_bytes": peak,
+            "snapshots": self._describe_all(),
+            "components": component_sizes(),
+        }
+
+    def _describe_all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._describe(sid) for sid in self._snapshots]
+
+    def _describe(self, snapshot_id: int) -> Dict[str, Any]:
+        snapshot = self._snapshots[snapshot_id]
+        return {
+            "id": snapshot_id,
+            "taken_at": self._taken_at[snapshot_id],
+            "traced_bytes": sum(trace.size for trace in snapshot.traces),
+        }
+
+    def take_snapshot(self) -> Dict[str, Any]:
+        """
+        Take a snapshot, dropping the oldest once ``max_snapshots`` are held
+
+        Raises:
+            RuntimeError: If allocation tracing is not running
+        """
+        if not self.tracing:
+            raise RuntimeError("Allocation tracing is not enabled")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = snapshot
+            self._taken_at[snapshot_id] = time.time()
+            while len(self._snapshots) > self.max_snapshots:
+                oldest, _ = self._snapshots.popitem(last=False)
+                del self._taken_at[oldest]
+            return self._describe(snapshot_id)
+
+    def get(self, snapshot_id: int) -> Optional[tracemalloc.Snapshot]:
+        with self._lock:
+            return self._snapshots.get(snapshot_id)
+
+    def _held(self, *snapshot_ids: int) -> List[tracemalloc.Snapshot]:
+        """
+        Look up snapshots together
+
+        Raises:
+            KeyError: With the first id that is not held (e.g. evicted)
+        """
+        with self._lock:
+            return [self._snapshots[snapshot_id] for snapshot_id in snapshot_ids]
+
+    def top(
+        self, snapshot_id: int, group_by: str = "lineno", limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Largest allocation sites in a snapshot, grouped by line or file
+
+        Raises:
+            KeyError: If the snapshot is not held
+        """
+        (snapshot,) = self._held(snapshot_id)
+        stats = snapshot.statistics(group_by)
+        return [_stat_to_dict(stat, group_by) for stat in stats[:limit]]
+
+    def diff(
+        self, base_id: int, current_id: int, group_by: str = "lineno", limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Allocation sites that grew (or shrank) most between two snapshots
+
+        Raises:
+            KeyError: If either snapshot is not held
+        """
+        base, current = self._held(base_id, current_id)
+        stats = current.compare_to(base, group_by)
+        return [_stat_to_dict(stat, group_by) for stat in stats[:limit]]
+
+
+memory_diagnostics = MemoryDiagnostics()
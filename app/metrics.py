@@ -0,0 +1,265 @@
+"""
+Metrics
+In-process counters and histograms exposed in Prometheus text format
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, tuned for an in-memory catalog API
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter keyed by label values
+
+    Increments are plain dict updates with no locking: they happen on the
+    event loop thread (or under the GIL from worker threads), where an
+    occasional lost increment is an acceptable trade for zero contention.
+    """
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Add ``amount`` to the series identified by ``labels``"""
+        values = self._values
+        values[labels] = values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Return the current value of a series"""
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[Tuple[str, LabelValues, Tuple[str, ...], float]]:
+        return [
+            (self.name, self.labelnames, labels, value)
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation"""
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        """Return the number of observations for a series"""
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> List[Tuple[str, LabelValues, Tuple[str, ...], float]]:
+        samples = []
+        bucket_names = self.labelnames + ("le",)
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                samples.append(
+                    (
+                        self.name + "_bucket",
+                        bucket_names,
+                        labels + (_format_value(bound),),
+                        cumulative,
+                    )
+                )
+            samples.append((self.name + "_sum", self.labelnames, labels, series[-1]))
+            samples.append((self.name + "_count", self.labelnames, labels, cumulative))
+        return samples
+
+
+class CallbackMetric:
+    """Metric whose samples are read from another component at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        metric_type: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Dict[LabelValues, float]],
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self) -> List[Tuple[str, LabelValues, Tuple[str, ...], float]]:
+        return [
+            (self.name, self.labelnames, labels, value)
+            for labels, value in sorted(self.callback().items())
+        ]
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together at /metrics"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        help: str,
+        metric_type: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Dict[LabelValues, float]],
+    ) -> CallbackMetric:
+        return self._register(
+            CallbackMetric(name, help, metric_type, labelnames, callback)
+        )
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for name, labelnames, labels, value in metric.samples():
+                lines.append(
+                    f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route, method and status",
+    ("route", "method", "status"),
+)
+REQUEST_SIZE = REGISTRY.counter(
+    "http_request_size_bytes_total",
+    "Total HTTP request body bytes by route",
+    ("route", "method"),
+)
+RESPONSE_SIZE = REGISTRY.counter(
+    "http_response_size_bytes_total",
+    "Total HTTP response body bytes by route",
+    ("route", "method", "status"),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "catalog_cache_requests_total",
+    "Catalog-layer cache lookups by cache and result (hit or miss)",
+    ("cache", "result"),
+)
+
+
+def route_label(scope: dict) -> str:
+    """Return a low-cardinality route label for a finished request scope"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounted apps such as /static set root_path instead of a route
+    return scope.get("root_path") or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and body sizes per route"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_bytes = 0
+        response_bytes = 0
+        status = 500
+
+        async def receive_wrapper():
+            nonlocal request_bytes
+            message = await receive()
+            request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            route = route_label(scope)
+            method = scope["method"]
+            status_label = str(status)
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started, route, method, status_label
+            )
+            REQUEST_SIZE.inc(route, method, amount=request_bytes)
+            RESPONSE_SIZE.inc(route, method, status_label, amount=response_bytes)
@@ -1,8 +1,33 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Tuple
+
+from app.bulk_load import bulk_load_products
+from app.catalog_changes import CatalogChangeLog
+from app.catalog_map import open_catalog_map
+from app.catalog_store import ColumnarCatalog
+from app.inventory import inventory
+from app.metrics import CACHE_REQUESTS
 from app.models import Product
+from app.similarity import SimilarityIndex, load_or_build_similarity_map
+from app.tracing import traced
+
+# Optional path to a JSON snapshot written by write_catalog_snapshot()
+CATALOG_SNAPSHOT = os.environ.get("PANDORA_CATALOG_SNAPSHOT")
+# Optional path to a binary snapshot (see app/catalog_map.py), mapped in
+# place of loading and indexing the catalog
+CATALOG_MAP = os.environ.get("PANDORA_CATALOG_MAP")
+# Optional path to similar-products lists shared by every worker (see
+# app/similarity.py), built by whichever worker first finds it missing
+SIMILAR_MAP = os.environ.get("PANDORA_SIMILAR_MAP")
 
 # Mock product data for luxury jewelry showcase
-PRODUCTS = [
-    Product(
+# Raw rows are validated into Product models on first use (see load_catalog)
+PRODUCT_DATA = [
+    dict(
         id=1,
         name="Eternal Brilliance Diamond Ring",
         price=3299.00,
@@ -12,7 +37,7 @@ PRODUCTS = [
         description="Exquisite 18k white gold ring featuring a stunning 1.5ct round brilliant diamond.",
         customizable=True,
     ),
-    Product(
+    dict(
         id=2,
         name="Rose Gold Engagement Ring",
         price=899.00,
@@ -22,7 +47,7 @@ PRODUCTS = [
         description="Romantic 14k rose gold ring with delicate pavé diamonds and center stone.",
         customizable=True,
     ),
-    Product(
+    dict(
         id=3,
         name="Vintage Emerald Ring",
         price=1299.00,
@@ -31,7 +56,7 @@ PRODUCTS = [
         image="https://images.unsplash.com/photo-1515562141207-7a88fb7ce338?w=500",
         description="Art deco inspired 18k yellow gold ring with natural emerald and diamond accents.",
     ),
-    Product(
+    dict(
         id=4,
         name="Sapphire Eternity Band",
         price=450.00,
@@ -40,7 +65,7 @@ PRODUCTS = [
         image="https://images.unsplash.com/photo-1603561591411-07134e71a2a9?w=500",
         description="Classic platinum eternity band adorned with vibrant blue sapphires.",
     ),
-    Product(
+    dict(
         id=5,
         name="Diamond Tennis Necklace",
         price=8999.00,
@@ -49,7 +74,7 @@ PRODUCTS = [
         image="https://images.unsplash.com/photo-1599643478518-a784e5dc4c8f?w=500",
         description="Timeless 18k white gold tennis necklace with 5 carats of brilliant diamonds.",
     ),
-    Product(
+    dict(
         id=6,
         name="Pearl Cascade Necklace",
         price=750.00,
@@ -59,7 +84,7 @@ PRODUCTS = [
         description="Elegant South Sea pearl necklace with 14k gold clasp and accents.",
         customizable=True,
     ),
-    Product(
+    dict(
         id=7,
         name="Emerald Drop Necklace",
         price=1650.00,
@@ -69,7 +94,7 @@ PRODUCTS = [
         description="Sophisticated 18k yellow gold necklace featuring a stunning emerald pendant.",
         customizable=True,
     ),
-    Product(
+    dict(
         id=8,
         name="Gold Chain Statement Necklace",
         price=350.00,
@@ -78,7 +103,7 @@ PRODUCTS = [
         image="https://images.unsplash.com/photo-1611591437281-460bfbe1220a?w=500",
         description="Bold 14k gold chain necklace with modern geometric design.",
     ),
-    Product(
+    dict(
         id=9,
         name="Diamond Tennis Bracelet",
         price=4299.00,
@@ -87,7 +112,7 @@ PRODUCTS = [
         image="https://images.unsplash.com/photo-1611955167811-4711904bb9f8?w=500",
         description="Classic 18k white gold tennis bracelet with 3 carats of diamonds.",
     ),
-    Product(
+    dict(
         id=10,
         name="Rose Gold Bangle Set",
         price=950.00,
@@ -97,7 +122,7 @@ PRODUCTS = [
         description="Set of three delicate 14k rose gold bangles with diamond accents.",
         customizable=True,
     ),
-    Product(
+    dict(
         id=11,
         name="Sapphire Link Bracelet",
         price=1850.00,
@@ -107,7 +132,7 @@ PRODUCTS = [
         description="Luxurious platinum bracelet featuring alternating sapphires and diamonds.",
         customizable=True,
     ),
-    Product(
+    dict(
         id=12,
         name="Gold Cuff Bracelet",
         price=650.00,
@@ -116,7 +141,7 @@ PRODUCTS = [
         image="https://images.unsplash.com/photo-1611591437281-460bfbe1220a?w=500",
         description="Modern 18k yellow gold cuff with intricate hand-engraved details.",
     ),
-    Product(
+    dict(
         id=13,
         name="Ruby Heart Necklace",
         price=1150.00,
@@ -125,7 +150,7 @@ PRODUCTS = [
         image="https://images.unsplash.com/photo-1515562141207-7a88fb7ce338?w=500",
         description="Romantic 18k white gold necklace with heart-shaped ruby and diamond halo.",
     ),
-    Product(
+    dict(
         id=14,
         name="Champagne Diamond Ring",
         price=550.00,
@@ -134,7 +159,7 @@ PRODUCTS = [
         image="https://images.unsplash.com/photo-1605100804763-247f67b3557e?w=500",
         description="Unique 14k rose gold ring featuring a rare champagne diamond center stone.",
     ),
-    Product(
+    dict(
         id=15,
         name="Pearl Bangle Bracelet",
         price=425.00,
@@ -146,19 +171,352 @@ PRODUCTS = [
 ]
 
 
+_catalog_lock = threading.Lock()
+# Held while the store and its change log are replaced or read together
+_changes_lock = threading.Lock()
+_similar_lock = threading.Lock()
+_store: Optional[ColumnarCatalog] = None
+_changes = CatalogChangeLog()
+# Built from _store on first use and kept current by apply_catalog_changes
+_similar: Optional[SimilarityIndex] = None
+
+# Price histograms by filter context, for one catalog (epoch, version)
+MAX_PRICE_HISTOGRAMS = 256
+_histogram_lock = threading.Lock()
+_histogram_version: Optional[Tuple[str, int]] = None
+_histograms: "OrderedDict[tuple, Tuple[List[float], List[int]]]" = OrderedDict()
+
+
+@traced("catalog.load")
+def load_catalog(snapshot_path: Optional[str] = CATALOG_SNAPSHOT) -> List[Product]:
+    """
+    Build Product models for the whole catalog
+
+    Args:
+        snapshot_path: Prebuilt snapshot to load instead of validating PRODUCT_DATA
+
+    Returns:
+        List of products (the store is not built, see build_indexes)
+
+    Raises:
+        ValidationError: For the first row that fails validation
+    """
+    rows = PRODUCT_DATA
+    if snapshot_path and os.path.exists(snapshot_path):
+        with open(snapshot_path, encoding="utf-8") as f:
+            rows = json.load(f)
+    result = bulk_load_products(rows)
+    if result.errors:
+        raise result.errors[0].error
+    return result.products
+
+
+@traced("catalog.build_indexes")
+def build_indexes(products: List[Product]) -> None:
+    """Pack products into the columnar store and publish it as a new epoch"""
+    publish_catalog(ColumnarCatalog.from_products(products))
+
+
+@traced("catalog.map")
+def map_catalog(path: str) -> None:
+    """Serve the binary snapshot at ``path`` as a new epoch"""
+    publish_catalog(open_catalog_map(path))
+
+
+def publish_catalog(store: ColumnarCatalog) -> None:
+    """Serve an already built store (e.g. from an import) as a new epoch"""
+    global _store, _changes, _similar
+    store.build_index()
+    with _changes_lock:
+        _store = store
+        _changes = CatalogChangeLog()
+        _similar = None
+
+
+def ensure_catalog(
+    phase: Callable[[str], ContextManager] = lambda name: nullcontext(),
+) -> ColumnarCatalog:
+    """
+    Load the catalog into the columnar store on first use
+
+    Only one caller loads it; the others wait for it under the lock.
+
+    Args:
+        phase: Called with the name of each loading step, returning a context
+            that wraps it (e.g. to time startup phases)
+    """
+    if not is_catalog_loaded():
+        with _catalog_lock:
+            if not is_catalog_loaded() and CATALOG_MAP:
+                with phase("catalog_map"):
+                    map_catalog(CATALOG_MAP)
+            elif not is_catalog_loaded():
+                with phase("catalog_load"):
+                    products = load_catalog()
+                with phase("index_build"):
+                    build_indexes(products)
+    return _store
+
+
+def loaded_catalog() -> Optional[ColumnarCatalog]:
+    """Return the columnar store if it has been built, without loading it"""
+    return _store
+
+
+def is_catalog_loaded() -> bool:
+    """Whether the catalog has been loaded and indexed"""
+    return _store is not None
+
+
+@traced("catalog.apply_changes")
+def apply_catalog_changes(
+    upserts: Iterable[Product] = (), removals: Iterable[int] = ()
+) -> int:
+    """
+    Add, replace and remove products as one new catalog version
+
+    Replaced products keep their position; new ones are appended. Readers
+    keep using the previous store until the new one is published.
+
+    The new store is a copy of the previous one with the changes applied
+    (see ColumnarCatalog.with_changes): unchanged products are copied as
+    column buffer runs rather than materialized, but each batch still costs
+    a pass over the whole catalog's buffers. Batch changes rather than
+    applying them one product at a time.
+
+    Args:
+        upserts: Products to add, or to replace the product with the same id
+        removals: Ids of products to remove (unknown ids are ignored)
+
+    Returns:
+        The catalog version after the changes
+
+    Raises:
+        ValueError: If an id is both upserted and removed
+    """
+    ensure_catalog()
+    pending = {product.id: product for product in upserts}
+    removed = set(removals)
+    if removed & pending.keys():
+        raise ValueError("Products cannot be upserted and removed together")
+
+    upserted = list(pending)
+    global _store
+    with _changes_lock:
+        store = _store
+        dropped = [pid for pid in removed if store.row_of(pid) is not None]
+        if upserted or dropped:
+            fields = {pid: product.__dict__ for pid, product in pending.items()}
+            _store = store.with_changes(fields, dropped)
+            if _similar is not None:
+                _similar.update(_store, upserted, dropped)
+        return _changes.record(upserted, dropped)
+
+
+@traced("catalog.changes_since")
+def get_catalog_changes(
+    since: int, epoch: Optional[str] = None
+) -> Tuple[str, int, List[Product], Optional[List[int]]]:
+    """
+    Get the products changed after version ``since`` of catalog ``epoch``
+
+    Returns:
+        (epoch, version, products, removed ids). ``removed`` is None when
+        ``since`` is from another epoch or not a known version; ``products``
+        is then the whole catalog.
+    """
+    ensure_catalog()
+    with _changes_lock:
+        store, changes = _store, _changes
+        delta = changes.since(since) if epoch == changes.epoch else None
+        version = changes.version
+    if delta is None:
+        return changes.epoch, version, store.products(), None
+    rows = (store.row_of(product_id) for product_id in delta.upserted)
+    return (
+        changes.epoch,
+        version,
+        store.products(row for row in rows if row is not None),
+        delta.removed,
+    )
+
+
+@traced("catalog.build_similar")
+def ensure_similar() -> SimilarityIndex:
+    """
+    Build the similar-products index on first use
+
+    The build runs without holding the catalog; changes applied meanwhile
+    are caught up from the change log before the index is published. With
+    PANDORA_SIMILAR_MAP set, the lists are mapped from that file, which is
+    built first if it is missing or was built from another catalog.
+    """
+    global _similar
+    ensure_catalog()
+    if _similar is None:
+        with _similar_lock:
+            while _similar is None:
+                with _changes_lock:
+                    store, changes, version = _store, _changes, _changes.version
+                if SIMILAR_MAP:
+                    index = load_or_build_similarity_map(store, SIMILAR_MAP)
+                else:
+                    index = SimilarityIndex.build(store)
+                with _changes_lock:
+                    # A newly published catalog (new epoch) needs a fresh build
+                    if _changes is changes:
+                        delta = changes.since(version)
+                        index.update(_store, delta.upserted, delta.removed)
+                        _similar = index
+    return _similar
+
+
+@traced("catalog.get_similar_products")
+def get_similar_products(product_id: int, limit: int) -> Optional[List[Product]]:
+    """
+    Get the products most similar to one product, best first
+
+    Returns:
+        Up to ``limit`` products, or None if the product is unknown
+    """
+    index = ensure_similar()
+    with _changes_lock:
+        store = _store
+    if store.row_of(product_id) is None:
+        return None
+    return get_products_by_ids(index.neighbors(product_id)[:limit])
+
+
+def write_catalog_snapshot(path: str) -> None:
+    """Validate PRODUCT_DATA and write it as a snapshot for fast startup"""
+    products = [Product(**row) for row in PRODUCT_DATA]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([p.model_dump(exclude={"srcset"}) for p in products], f)
+
+
+@traced("catalog.get_all_products")
 def get_all_products():
     """Get all products"""
-    return PRODUCTS
+    return ensure_catalog().products()
 
 
+@traced("catalog.get_product_by_id")
 def get_product_by_id(product_id: int):
     """Get a product by its ID"""
-    for product in PRODUCTS:
-        if product.id == product_id:
-            return product
-    return None
+    store = ensure_catalog()
+    row = store.row_of(product_id)
+    return None if row is None else store.product(row)
 
 
+@traced("catalog.get_products_by_ids")
+def get_products_by_ids(product_ids: Iterable[int]) -> List[Product]:
+    """Get the products with the given IDs, in that order, skipping unknown IDs"""
+    store = ensure_catalog()
+    rows = (store.row_of(product_id) for product_id in product_ids)
+    return store.products(row for row in rows if row is not None)
+
+
+@traced("catalog.get_products_by_category")
 def get_products_by_category(category: str):
     """Get all products in a specific category"""
-    return [product for product in PRODUCTS if product.category == category]
+    store = ensure_catalog()
+    return store.products(store.select(category=category))
+
+
+@traced("catalog.filter_products")
+def filter_products(
+    category: Optional[str] = None,
+    price_max: Optional[float] = None,
+    material: Optional[str] = None,
+    in_stock: bool = False,
+    price_min: Optional[float] = None,
+) -> List[Product]:
+    """Get products matching all given filters"""
+    store = ensure_catalog()
+    rows = store.select(
+        category=category, price_min=price_min, price_max=price_max, material=material
+    )
+    if in_stock:
+        rows = inventory.in_stock_rows(store.ids, rows)
+    return store.products(rows)
+
+
+@traced("catalog.filter_products_page")
+def filter_products_page(
+    category: Optional[str] = None,
+    price_max: Optional[float] = None,
+    material: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    in_stock: bool = False,
+    price_min: Optional[float] = None,
+) -> Tuple[List[Product], int]:
+    """
+    Get one page of the products matching all given filters
+
+    Only the rows on the page are materialized. ``in_stock`` leaves out
+    sold-out products. Prices are inclusive at both ends.
+
+    Returns:
+        (products on the page, total number of matches)
+    """
+    store = ensure_catalog()
+    rows = store.select(
+        category=category, price_min=price_min, price_max=price_max, material=material
+    )
+    if in_stock:
+        rows = inventory.in_stock_rows(store.ids, rows)
+    end = None if limit is None else offset + limit
+    return store.products(rows[offset:end]), len(rows)
+
+
+def cached_price_histograms() -> Dict[tuple, Tuple[List[float], List[int]]]:
+    """Return the price histograms cached for the current catalog version"""
+    with _histogram_lock:
+        return dict(_histograms)
+
+
+@traced("catalog.price_histogram")
+def get_price_histogram(
+    category: Optional[str] = None,
+    material: Optional[str] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    buckets: int = 10,
+) -> Tuple[List[float], List[int]]:
+    """
+    Count the matching products per equal-width price bucket
+
+    The buckets span [price_min, price_max], or the matching prices where a
+    bound is not given. Results are cached per filter context until the
+    catalog changes.
+
+    Returns:
+        (``buckets + 1`` bucket edges, count per bucket)
+    """
+    global _histogram_version
+    ensure_catalog()
+    with _changes_lock:
+        store = _store
+        version = (_changes.epoch, _changes.version)
+    key = (category or None, material or None, price_min, price_max, buckets)
+    with _histogram_lock:
+        if _histogram_version != version:
+            _histograms.clear()
+            _histogram_version = version
+        cached = _histograms.get(key)
+        if cached is not None:
+            _histograms.move_to_end(key)
+            CACHE_REQUESTS.inc("price_histogram", "hit")
+            return cached
+    CACHE_REQUESTS.inc("price_histogram", "miss")
+    rows = None
+    if category or material:
+        rows = store.select(category=category, material=material)
+    histogram = store.price_histogram(rows, buckets, price_min, price_max)
+    with _histogram_lock:
+        if _histogram_version == version:
+            _histograms[key] = histogram
+            if len(_histograms) > MAX_PRICE_HISTOGRAMS:
+                _histograms.popitem(last=False)
+    return histogram
@@ -1,6 +1,9 @@
-from typing import Literal
+from typing import Any, ClassVar, Dict, List, Literal, Mapping, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
+
+from app.carts import MAX_CART_LINES, MAX_LINE_QUANTITY
+from app.wishlists import MAX_WISHLIST_ITEMS
 
 
 class Product(BaseModel):
@@ -21,6 +24,17 @@ class Product(BaseModel):
         False, description="Whether product supports customization"
     )
 
+    # srcset values by product id, published at warm-up from the image
+    # service's scan of source images (see ImageService.refresh_sources)
+    image_srcsets: ClassVar[Mapping[int, str]] = {}
+
+    @computed_field(
+        description="Responsive image candidates for srcset (None without a local source)"
+    )
+    @property
+    def srcset(self) -> Optional[str]:
+        return self.image_srcsets.get(self.id)
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -32,3 +46,146 @@ class Product(BaseModel):
                 "description": "Elegant 18k white gold ring with 1ct diamond",
             }
         }
+
+
+class CatalogChanges(BaseModel):
+    """Products added, updated or removed since a client's catalog version"""
+
+    epoch: str = Field(..., description="Identifies the loaded catalog's history")
+    version: int = Field(..., description="Current catalog version")
+    reset: bool = Field(
+        ..., description="True if products is the whole catalog, replacing any copy"
+    )
+    products: List[Product] = Field(..., description="Added or updated products")
+    removed: List[int] = Field(
+        default_factory=list, description="Ids of removed products"
+    )
+
+
+class WishlistDelta(BaseModel):
+    """A batch of wishlist changes made on one device since its last sync"""
+
+    base_version: int = Field(
+        0, ge=0, description="Wishlist version the device last saw"
+    )
+    add: List[int] = Field(
+        default_factory=list,
+        max_length=MAX_WISHLIST_ITEMS,
+        description="Product ids to add",
+    )
+    remove: List[int] = Field(
+        default_factory=list,
+        max_length=MAX_WISHLIST_ITEMS,
+        description="Product ids to remove (applied after add)",
+    )
+
+
+class WishlistState(BaseModel):
+    """Current contents of a server-side wishlist"""
+
+    id: str = Field(..., description="Wishlist identifier")
+    version: int = Field(..., description="Incremented by every change")
+    product_ids: List[int] = Field(..., description="Product ids, ascending")
+    products: Optional[List[Product]] = Field(
+        None, description="Products for product_ids, when requested or needed"
+    )
+
+
+class CartLineChange(BaseModel):
+    """New quantity for one cart line"""
+
+    product_id: int = Field(..., description="Product identifier")
+    customization_hash: str = Field(
+        "", max_length=32, description="Customization of the line ('' for none)"
+    )
+    customizations: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Selected options (option_id -> value) for a new customized "
+        "line; registered and replaced by their hash",
+    )
+    quantity: int = Field(
+        ..., ge=0, le=MAX_LINE_QUANTITY, description="New quantity (0 removes)"
+    )
+
+
+class CartDelta(BaseModel):
+    """Coalesced quantity changes made since the client's last sync"""
+
+    base_version: int = Field(..., ge=0, description="Cart version the client saw")
+    lines: List[CartLineChange] = Field(..., max_length=MAX_CART_LINES)
+
+
+class CartLine(BaseModel):
+    """A cart line priced against the current catalog"""
+
+    product_id: int
+    customization_hash: str
+    quantity: int
+    customizations: Optional[Dict[str, Any]] = None
+    name: Optional[str] = None
+    image: Optional[str] = None
+    unit_price: Optional[float] = Field(None, description="Current price per item")
+    line_total: Optional[float] = None
+    available: bool = Field(..., description="False if the product was removed")
+
+
+class CartState(BaseModel):
+    """Current contents and totals of a server-side cart"""
+
+    id: str = Field(..., description="Cart identifier")
+    version: int = Field(..., description="Incremented by every change")
+    lines: List[CartLine]
+    item_count: int = Field(..., description="Items across available lines")
+    subtotal: float = Field(..., description="Sum of available line totals in USD")
+
+
+class PriceHistogram(BaseModel):
+    """Number of matching products per equal-width price bucket"""
+
+    edges: List[float] = Field(
+        ..., description="Bucket boundaries, one more than there are buckets"
+    )
+    counts: List[int] = Field(
+        ..., description="Products priced from each edge up to the next one"
+    )
+    total: int = Field(..., description="Products counted in all buckets")
+
+
+class StockLevel(BaseModel):
+    """Items available for a product and its separately stocked customizations"""
+
+    product_id: int
+    tracked: bool = Field(..., description="False if the product has no stock limit")
+    in_stock: bool
+    available: Optional[int] = Field(
+        None, description="Items available to reserve (None when not tracked)"
+    )
+    variants: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Items available per customization_hash with its own stock",
+    )
+
+
+class ReservationRequest(BaseModel):
+    """Items to hold while a client checks out"""
+
+    product_id: int = Field(..., description="Product identifier")
+    customization_hash: str = Field(
+        "", max_length=32, description="Customization of the items ('' for none)"
+    )
+    quantity: int = Field(..., ge=1, le=MAX_LINE_QUANTITY)
+
+
+class ReservationState(BaseModel):
+    """A reservation and how long it is held"""
+
+    id: str = Field(..., description="Reservation identifier")
+    product_id: int
+    customization_hash: str
+    quantity: int
+    expires_in: float = Field(..., description="Seconds until the items are released")
+    held: bool = Field(
+        True,
+        description="False for untracked products: nothing is held, and the "
+        "reservation is not kept to be committed or released",
+    )
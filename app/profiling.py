@@ -0,0 +1,268 @@
+"""
+On-demand Request Profiling
+Opt-in per-request profiles written to a local directory as speedscope JSON
+(stack sampling, the default) or pstats (cProfile)
+"""
+
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+PROFILE_DIR = Path(".cache/profiles")
+PROFILE_HEADER = "x-profile"
+PROFILE_MODE_HEADER = "x-profile-mode"
+# The first mode is the default. cProfile only sees the event loop thread, not
+# the query and serialization work offloaded to the threadpool.
+MODES = ("sample", "cprofile")
+
+# Retention: the oldest profiles are deleted once either limit is exceeded
+MAX_PROFILES = 200
+MAX_PROFILE_BYTES = 256 * 1024 * 1024
+
+
+class ProfilingConfig:
+    """Who gets profiled and where profiles go
+
+    Profiling is off unless a token is configured (requests sending it in
+    ``X-Profile`` are profiled) or ``sample_rate`` is above zero. At most
+    ``max_profiles`` files and ``max_bytes`` are kept, newest first.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        profile_dir: Path = PROFILE_DIR,
+        sample_interval: float = 0.001,
+        max_profiles: int = MAX_PROFILES,
+        max_bytes: int = MAX_PROFILE_BYTES,
+    ) -> None:
+        self.token = token
+        self.sample_rate = sample_rate
+        self.profile_dir = Path(profile_dir)
+        self.sample_interval = sample_interval
+        self.max_profiles = max_profiles
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def is_authorized(self, value: Optional[str]) -> bool:
+        """Check a presented token in constant time"""
+        return bool(self.token and value) and hmac.compare_digest(value, self.token)
+
+    @classmethod
+    def from_env(cls) -> "ProfilingConfig":
+        return cls(
+            token=os.environ.get("PANDORA_PROFILE_TOKEN") or None,
+            sample_rate=float(os.environ.get("PANDORA_PROFILE_SAMPLE_RATE", "0")),
+        )
+
+
+profiling_config = ProfilingConfig.from_env()
+
+
+class StackSampler:
+    """Sampling profiler that periodically records every thread's stack
+
+    Unlike cProfile this sees work offloaded to the threadpool, at the cost
+    of also seeing whatever else the process is doing meanwhile.
+    """
+
+    def __init__(self, interval: float = 0.001) -> None:
+        self.interval = interval
+        self._frames: List[Dict[str, object]] = []
+        self._frame_ids: Dict[tuple, int] = {}
+        self._samples: Dict[int, List[List[int]]] = {}
+        self._weights: Dict[int, List[float]] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.duration = 0.0
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self._frames)
+            self._frames.append({"name": key[0], "file": key[1], "line": key[2]})
+        return frame_id
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                self._samples.setdefault(thread_id, []).append(stack)
+                self._weights.setdefault(thread_id, []).append(now - last)
+            last = now
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def to_speedscope(self, name: str) -> Dict[str, object]:
+        """Return the samples as a speedscope file document"""
+        profiles = []
+        for thread_id, samples in self._samples.items():
+            weights = self._weights[thread_id]
+            profiles.append(
+                {
+                    "type": "sampled",
+                    "name": f"{name} (thread {thread_id})",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            )
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "pandora",
+            "shared": {"frames": self._frames},
+            "profiles": profiles,
+        }
+
+
+def _profile_name(method: str, path: str, mode: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    suffix = "pstats" if mode == "cprofile" else "speedscope.json"
+    return f"{stamp}-{random.getrandbits(24):06x}-{method}-{slug[:60]}.{suffix}"
+
+
+def list_profiles(config: ProfilingConfig) -> List[Dict[str, object]]:
+    """Describe captured profiles, newest first"""
+    if not config.profile_dir.is_dir():
+        return []
+    profiles = []
+    for path in config.profile_dir.iterdir():
+        if path.suffix not in (".pstats", ".json"):
+            continue
+        stat = path.stat()
+        profiles.append(
+            {
+                "name": path.name,
+                "format": "pstats" if path.suffix == ".pstats" else "speedscope",
+                "size": stat.st_size,
+                "created": stat.st_mtime,
+            }
+        )
+    profiles.sort(key=lambda p: p["created"], reverse=True)
+    return profiles
+
+
+def prune_profiles(config: ProfilingConfig) -> int:
+    """
+    Delete the oldest profiles beyond the configured limits
+
+    The newest profile is always kept, however large. Returns how many
+    profiles were deleted.
+    """
+    kept_bytes = deleted = 0
+    for index, profile in enumerate(list_profiles(config)):
+        kept_bytes += profile["size"]
+        over = index >= config.max_profiles or kept_bytes > config.max_bytes
+        if index and over:
+            (config.profile_dir / profile["name"]).unlink(missing_ok=True)
+            deleted += 1
+    return deleted
+
+
+def _save_profile(config: ProfilingConfig, write: Callable[[], None]) -> None:
+    """Write a captured profile and prune old ones (blocking file I/O)"""
+    config.profile_dir.mkdir(parents=True, exist_ok=True)
+    write()
+    prune_profiles(config)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles authorized or sampled requests
+
+    When profiling is not configured each request costs one attribute check.
+    Only one request is profiled at a time; others run unprofiled. Profiles
+    are written and pruned in the threadpool, off the event loop.
+    """
+
+    def __init__(self, app, config: Optional[ProfilingConfig] = None) -> None:
+        self.app = app
+        self.config = config
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        config = self.config or profiling_config
+        if scope["type"] != "http" or not config.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        mode = self._requested_mode(scope, config)
+        if mode is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            name = _profile_name(scope["method"], scope["path"], mode)
+            path = config.profile_dir / name
+            if mode == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+                stop = profiler.disable
+
+                def write() -> None:
+                    profiler.dump_stats(path)
+
+            else:
+                sampler = StackSampler(config.sample_interval)
+                sampler.start()
+                stop = sampler.stop
+
+                def write() -> None:
+                    with open(path, "w", encoding="utf-8") as f:
+                        json.dump(sampler.to_speedscope(name), f)
+
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                stop()
+                await run_in_threadpool(_save_profile, config, write)
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def _requested_mode(scope, config: ProfilingConfig) -> Optional[str]:
+        if scope["path"].startswith("/debug/"):
+            # Fetching profiles sends the token too; don't profile that
+            return None
+        headers = dict(scope["headers"])
+        token = headers.get(PROFILE_HEADER.encode())
+        if token is not None and config.is_authorized(token.decode("latin-1")):
+            mode = headers.get(PROFILE_MODE_HEADER.encode(), b"").decode()
+            return mode if mode in MODES else MODES[0]
+        if config.sample_rate > 0 and random.random() < config.sample_rate:
+            return "sample"
+        return None
@@ -0,0 +1,66 @@
+"""
+Service Worker
+Serves the service worker script with a precache manifest whose revisions
+are content hashes, so clients re-download only the assets that changed
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.bundles import bundle_builder
+from app.stylesheet import OUTPUT_URL, built_stylesheets
+
+SCRIPT_PATH = Path("static/js/service-worker.js")
+MANIFEST_PLACEHOLDER = "self.__PRECACHE_MANIFEST"
+
+# URL -> file served at that URL
+PRECACHE: Dict[str, Path] = {
+    "/": Path("templates/index.html"),
+    "/wishlist.html": Path("templates/wishlist.html"),
+    "/manifest.json": Path("static/manifest.json"),
+    # Fingerprinted stylesheet built by `python -m app.stylesheet`
+    **{f"{OUTPUT_URL}/{path.name}": path for path in built_stylesheets()},
+    # The wishlist page loads these individually
+    "/static/js/cart.js": Path("static/js/cart.js"),
+    "/static/js/virtual-grid.js": Path("static/js/virtual-grid.js"),
+    "/static/js/wishlist.js": Path("static/js/wishlist.js"),
+    # Minified bundles for the catalog page
+    **{
+        f"/bundles/{name}": bundle_builder.output_path(name)
+        for name in bundle_builder.bundles
+    },
+}
+
+# path -> ((mtime_ns, size), revision)
+_revisions: Dict[Path, Tuple[Tuple[int, int], str]] = {}
+
+
+def file_revision(path: Path) -> str:
+    """Short content hash of a file, recomputed only when the file changes"""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _revisions.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    revision = hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    _revisions[path] = (signature, revision)
+    return revision
+
+
+def precache_manifest() -> List[Dict[str, str]]:
+    """Return ``[{url, revision}]`` for every precached asset"""
+    bundle_builder.build_all()
+    return [
+        {"url": url, "revision": file_revision(path)} for url, path in PRECACHE.items()
+    ]
+
+
+def render_service_worker() -> str:
+    """Return the service worker script with the manifest filled in"""
+    script = SCRIPT_PATH.read_text(encoding="utf-8")
+    return script.replace(
+        MANIFEST_PLACEHOLDER, json.dumps(precache_manifest(), separators=(",", ":")), 1
+    )
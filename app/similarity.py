@@ -0,0 +1,414 @@
+"""
+Similar Products
+Top-K neighbors for every product, precomputed from description TF-IDF,
+category, material and price, so that a lookup is one dictionary access
+
+Up to EXACT_SCAN_LIMIT products, every pair is scored and the lists are
+exact. Beyond that, candidates for a product's list are the products sharing
+its rarest description terms, up to a fixed budget, plus the nearest prices
+in its category, so building does not compare every pair of products. The
+lists are then approximate: a product sharing only common terms and outside
+the price window is never scored, however similar it is.
+When products change only the affected lists are recomputed; term weights
+(IDF) keep the values from the last full build.
+
+Lists can be written to a binary file and mapped by every worker instead of
+each building its own (see load_or_build_similarity_map):
+
+    python -m app.similarity catalog.pcat similar.psim
+    PANDORA_SIMILAR_MAP=similar.psim python main.py
+"""
+
+import argparse
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from heapq import nlargest
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from app.catalog_store import ColumnarCatalog
+
+SIMILAR_K = 8
+
+# Contribution of each feature's similarity (all in [0, 1]) to a pair's score
+DESCRIPTION_WEIGHT = 0.55
+CATEGORY_WEIGHT = 0.2
+MATERIAL_WEIGHT = 0.15
+PRICE_WEIGHT = 0.1
+
+# Catalogs up to this size score every pair, so their lists are exact
+EXACT_SCAN_LIMIT = 512
+# Products nominated by shared description terms, rarest terms first
+MAX_CANDIDATES = 256
+# Products on either side by price, in the same category, always compared
+PRICE_WINDOW = 16
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset("a an and as at by for from in of on or the to with".split())
+
+Neighbor = Tuple[float, int]  # (score, product id)
+
+# Similarity map: magic, then row count, K and the catalog fingerprint,
+# then neighbor ids and scores (K slots per catalog row) and list lengths
+MAGIC = b"PNDSIM\x00\x01"
+_HEADER = struct.Struct("<II32s")
+
+
+class ProductFeatures(NamedTuple):
+    """What a product is compared on"""
+
+    category: str
+    material: str
+    price: float
+    terms: Dict[str, float]  # L2-normalized TF-IDF weights of the description
+
+
+def description_terms(text: str) -> Counter:
+    """Count the words of a description, without stop words"""
+    return Counter(
+        token for token in _TOKEN.findall(text.lower()) if token not in _STOP_WORDS
+    )
+
+
+def similarity(a: ProductFeatures, b: ProductFeatures) -> float:
+    """Weighted similarity of two products, from 0 to 1"""
+    if len(a.terms) > len(b.terms):
+        a, b = b, a
+    other = b.terms
+    cosine = sum(weight * other.get(term, 0.0) for term, weight in a.terms.items())
+    return (
+        DESCRIPTION_WEIGHT * cosine
+        + CATEGORY_WEIGHT * (a.category == b.category)
+        + MATERIAL_WEIGHT * (a.material == b.material)
+        + PRICE_WEIGHT * min(a.price, b.price) / max(a.price, b.price)
+    )
+
+
+def catalog_fingerprint(store: ColumnarCatalog) -> bytes:
+    """Digest of every buffer of ``store``, to tell whether a map was built from it"""
+    digest = hashlib.blake2b(digest_size=32)
+    for buffer in store.buffers().values():
+        digest.update(memoryview(buffer).cast("B"))
+    return digest.digest()
+
+
+class MappedNeighbors:
+    """Neighbor lists read in place from a similarity map, by catalog row"""
+
+    def __init__(
+        self,
+        store: ColumnarCatalog,
+        k: int,
+        ids: Sequence[int],
+        scores: Sequence[float],
+        lengths: Sequence[int],
+    ) -> None:
+        self.store, self.k = store, k
+        self._ids, self._scores, self._lengths = ids, scores, lengths
+
+    def lists(self, product_id: int) -> List[Neighbor]:
+        row = self.store.row_of(product_id)
+        if row is None:
+            return []
+        start = row * self.k
+        stop = start + self._lengths[row]
+        return list(zip(self._scores[start:stop], self._ids[start:stop]))
+
+
+class SimilarityIndex:
+    """Precomputed nearest neighbors by product id"""
+
+    def __init__(self, k: int = SIMILAR_K) -> None:
+        self.k = k
+        # Lists shared from a similarity map, until the first update
+        self._mapped: Optional[MappedNeighbors] = None
+        self._idf: Dict[str, float] = {}
+        self._unseen_idf = 1.0
+        self._features: Dict[int, ProductFeatures] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        # (price, id) per category, ascending
+        self._by_price: Dict[str, List[Tuple[float, int]]] = {}
+        self._neighbors: Dict[int, List[Neighbor]] = {}
+        # Which lists each product appears in, to refresh them when it changes
+        self._listed_in: Dict[int, Set[int]] = {}
+
+    @classmethod
+    def build(cls, store: ColumnarCatalog, k: int = SIMILAR_K) -> "SimilarityIndex":
+        """Compute features and neighbor lists for every product in ``store``"""
+        index = cls(k)
+        index._index_features(store)
+        for product_id in index._features:
+            index._set_neighbors(product_id, index._top_k(product_id))
+        return index
+
+    @classmethod
+    def from_map(cls, mapped: MappedNeighbors) -> "SimilarityIndex":
+        """
+        Serve lists read in place from a similarity map
+
+        Features are only computed, and the lists copied into this process,
+        when the index is first updated.
+        """
+        index = cls(mapped.k)
+        index._mapped = mapped
+        return index
+
+    def neighbors(self, product_id: int) -> List[int]:
+        """Ids of the most similar products, best first (empty if unknown)"""
+        return [other for _, other in self.ranked(product_id)]
+
+    def ranked(self, product_id: int) -> List[Neighbor]:
+        """(score, id) of the most similar products, best first"""
+        if self._mapped is not None:
+            return self._mapped.lists(product_id)
+        return list(self._neighbors.get(product_id, ()))
+
+    def features(self, product_id: int) -> Optional[ProductFeatures]:
+        """A product's features (None for a mapped index not yet updated)"""
+        return self._features.get(product_id)
+
+    def _index_features(self, store: ColumnarCatalog) -> None:
+        """Compute term weights and every product's features"""
+        counts = [
+            description_terms(store.descriptions[row]) for row in range(len(store))
+        ]
+        df: Counter = Counter()
+        for terms in counts:
+            df.update(terms.keys())
+        # Smoothed IDF, as in scikit-learn
+        self._idf = {
+            term: math.log((1 + len(store)) / (1 + count)) + 1
+            for term, count in df.items()
+        }
+        self._unseen_idf = math.log(1 + len(store)) + 1
+        for row, terms in enumerate(counts):
+            self._add(store, row, terms)
+
+    def _unmap(self) -> None:
+        """Copy mapped lists into this process so that they can change"""
+        mapped, self._mapped = self._mapped, None
+        self._index_features(mapped.store)
+        for product_id in self._features:
+            self._set_neighbors(product_id, mapped.lists(product_id))
+
+    def _add(self, store: ColumnarCatalog, row: int, terms: Counter) -> None:
+        """Index one product's features"""
+        product_id = store.ids[row]
+        weights = {
+            term: (1 + math.log(count)) * self._idf.get(term, self._unseen_idf)
+            for term, count in terms.items()
+        }
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        features = ProductFeatures(
+            store.categories.values[store.category_codes[row]],
+            store.materials.values[store.material_codes[row]],
+            store.prices[row],
+            {term: weight / norm for term, weight in weights.items()},
+        )
+        self._features[product_id] = features
+        for term in features.terms:
+            self._postings.setdefault(term, set()).add(product_id)
+        insort(
+            self._by_price.setdefault(features.category, []),
+            (features.price, product_id),
+        )
+
+    def _remove(self, product_id: int) -> None:
+        """Drop a product's features and its own neighbor list"""
+        features = self._features.pop(product_id, None)
+        if features is None:
+            return
+        for term in features.terms:
+            self._postings[term].discard(product_id)
+        self._by_price[features.category].remove((features.price, product_id))
+        self._set_neighbors(product_id, [])
+
+    def _candidates(self, product_id: int) -> Set[int]:
+        """Products worth scoring against ``product_id``"""
+        if len(self._features) <= EXACT_SCAN_LIMIT:
+            return self._features.keys() - {product_id}
+        features = self._features[product_id]
+        found: Set[int] = set()
+        postings = sorted((self._postings[term] for term in features.terms), key=len)
+        for posting in postings:
+            if len(found) + len(posting) > MAX_CANDIDATES:
+                break
+            found.update(posting)
+        by_price = self._by_price[features.category]
+        pos = bisect_left(by_price, (features.price, product_id))
+        window = by_price[max(pos - PRICE_WINDOW, 0) : pos + PRICE_WINDOW + 1]
+        found.update(other for _, other in window)
+        found.discard(product_id)
+        return found
+
+    def _top_k(self, product_id: int) -> List[Neighbor]:
+        """Score the candidates and keep the best ``k`` (lower id wins ties)"""
+        features, known = self._features[product_id], self._features
+        scored = (
+            (similarity(features, known[other]), -other)
+            for other in self._candidates(product_id)
+        )
+        return [(score, -other) for score, other in nlargest(self.k, scored)]
+
+    def _set_neighbors(self, product_id: int, neighbors: List[Neighbor]) -> None:
+        for _, other in self._neighbors.get(product_id, ()):
+            self._listed_in.get(other, set()).discard(product_id)
+        if neighbors:
+            self._neighbors[product_id] = neighbors
+        else:
+            self._neighbors.pop(product_id, None)
+        for _, other in neighbors:
+            self._listed_in.setdefault(other, set()).add(product_id)
+
+    def _offer(self, product_id: int, other: int) -> None:
+        """Put ``other`` on ``product_id``'s list if it now scores high enough"""
+        neighbors = self._neighbors.get(product_id, [])
+        score = similarity(self._features[product_id], self._features[other])
+        ranked = sorted(neighbors + [(score, other)], key=lambda n: (-n[0], n[1]))[
+            : self.k
+        ]
+        if ranked != neighbors:
+            self._set_neighbors(product_id, ranked)
+
+    def update(
+        self,
+        store: ColumnarCatalog,
+        upserted: Iterable[int] = (),
+        removed: Iterable[int] = (),
+    ) -> None:
+        """
+        Refresh the lists affected by added, changed or removed products
+
+        Args:
+            store: The catalog after the changes
+            upserted: Ids of products added or replaced
+            removed: Ids of products removed
+        """
+        if self._mapped is not None:
+            self._unmap()
+        upserted, removed = set(upserted), set(removed)
+        stale: Set[int] = set()
+        for product_id in upserted | removed:
+            self._remove(product_id)
+            stale |= self._listed_in.pop(product_id, set())
+        for product_id in upserted:
+            row = store.row_of(product_id)
+            if row is not None:
+                self._add(store, row, description_terms(store.descriptions[row]))
+        changed = upserted & self._features.keys()
+        for product_id in (stale - removed) | changed:
+            if product_id in self._features:
+                self._set_neighbors(product_id, self._top_k(product_id))
+        # A new or changed product may now belong on other products' lists
+        for product_id in changed:
+            for other in self._candidates(product_id) - stale - changed:
+                self._offer(other, product_id)
+
+    def __len__(self) -> int:
+        if self._mapped is not None:
+            return len(self._mapped.store)
+        return len(self._features)
+
+
+def write_similarity_map(
+    index: SimilarityIndex, store: ColumnarCatalog, path: Path
+) -> int:
+    """
+    Write the lists of every product in ``store``, replacing ``path`` atomically
+
+    Returns:
+        Bytes written
+    """
+    ids = array("q", bytes(8 * len(store) * index.k))
+    scores = array("d", bytes(8 * len(store) * index.k))
+    lengths = array("B", bytes(len(store)))
+    for row in range(len(store)):
+        ranked = index.ranked(store.ids[row])
+        start = row * index.k
+        for offset, (score, other) in enumerate(ranked):
+            ids[start + offset], scores[start + offset] = other, score
+        lengths[row] = len(ranked)
+
+    path = Path(path)
+    partial = path.with_name(path.name + ".tmp")
+    with open(partial, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER.pack(len(store), index.k, catalog_fingerprint(store)))
+        for buffer in (ids, scores, lengths):
+            f.write(buffer)
+        size = f.tell()
+    os.replace(partial, path)
+    return size
+
+
+def open_similarity_map(path: Path, store: ColumnarCatalog) -> SimilarityIndex:
+    """
+    Map the lists at ``path`` read-only and serve them for ``store``
+
+    Raises:
+        FileNotFoundError: If there is no map at ``path``
+        ValueError: If the file is not a similarity map of ``store``
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    start = len(MAGIC) + _HEADER.size
+    if bytes(view[: len(MAGIC)]) != MAGIC or len(view) < start:
+        raise ValueError("Not a similarity map")
+    rows, k, fingerprint = _HEADER.unpack(view[len(MAGIC) : start])
+    if rows != len(store) or fingerprint != catalog_fingerprint(store):
+        raise ValueError("Similarity map was built from another catalog")
+    slots = 8 * rows * k
+    if len(view) != start + 2 * slots + rows:
+        raise ValueError("Similarity map is truncated")
+    ids = view[start : start + slots].cast("q")
+    scores = view[start + slots : start + 2 * slots].cast("d")
+    lengths = view[start + 2 * slots :]
+    return SimilarityIndex.from_map(MappedNeighbors(store, k, ids, scores, lengths))
+
+
+def load_or_build_similarity_map(
+    store: ColumnarCatalog, path: Path, k: int = SIMILAR_K
+) -> SimilarityIndex:
+    """
+    Map the lists at ``path``, first building and writing them if the file
+    is missing or was built from another catalog
+
+    Processes serialize on a lock file next to ``path``, so when workers
+    start together one builds the map and the others wait and map it.
+    """
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return open_similarity_map(path, store)
+        except (FileNotFoundError, ValueError):
+            write_similarity_map(SimilarityIndex.build(store, k), store, path)
+            return open_similarity_map(path, store)
+
+
+def main() -> int:
+    # Imported here: the catalog modules import this one
+    from app.catalog_map import open_catalog_map
+
+    parser = argparse.ArgumentParser(prog="python -m app.similarity")
+    parser.add_argument("catalog", type=Path, help="Binary catalog snapshot")
+    parser.add_argument("output", type=Path, help="Similarity map to write")
+    args = parser.parse_args()
+
+    store = open_catalog_map(args.catalog)
+    size = write_similarity_map(SimilarityIndex.build(store), store, args.output)
+    print(f"wrote lists for {len(store):,} products ({size:,} bytes) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
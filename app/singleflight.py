@@ -0,0 +1,79 @@
+"""
+Single-flight request coalescing
+Concurrent callers asking for the same key share one in-progress computation
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.metrics import REGISTRY
+
+
+class SingleFlight:
+    """Deduplicate concurrent async calls that share a key
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it is still running await the same task instead of repeating it.
+    The key is forgotten as soon as the task finishes, so results are never
+    cached beyond the lifetime of the in-flight call.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run ``fn`` once for all concurrent callers sharing ``key``
+
+        Args:
+            key: Normalized, hashable description of the work
+            fn: Zero-argument coroutine function producing the result
+
+        Returns:
+            The result of the shared call (exceptions are re-raised to every caller)
+        """
+        self.calls += 1
+        task = self._calls.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        # Shield so a disconnecting caller does not cancel work others await
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters describing how much work was coalesced"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+
+# Shared by the catalog routes in app/api/routes.py
+catalog_flight = SingleFlight()
+
+REGISTRY.callback(
+    "catalog_singleflight_requests_total",
+    "Catalog requests that executed work or joined an in-flight call",
+    "counter",
+    ("result",),
+    lambda: {
+        ("executed",): catalog_flight.executions,
+        ("coalesced",): catalog_flight.coalesced,
+    },
+)
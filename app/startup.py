@@ -0,0 +1,89 @@
+"""
+Application Startup
+Lazy warm-up of the catalog and configuration with per-phase timings
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from app import IMPORT_STARTED
+from app.bundles import bundle_builder
+from app.customization_config import load_customization_configs
+from app.images import image_service
+from app.inventory import STOCK_FILE, inventory
+from app.mock_data import ensure_catalog, ensure_similar
+from app.models import Product
+
+logger = logging.getLogger(__name__)
+
+
+class StartupState:
+    """Readiness flag plus how long each startup phase took"""
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a phase duration"""
+        self.phases[name] = round(seconds * 1000, 3)
+        logger.info("startup phase %s took %.1f ms", name, seconds * 1000)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as a named startup phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def fail(self, exc: BaseException) -> None:
+        """Log a warm-up failure and keep reporting not ready with its cause"""
+        logger.error("startup warm-up failed", exc_info=exc)
+        self.ready = False
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return readiness, any warm-up error and phase timings in milliseconds"""
+        snapshot: Dict[str, object] = {"ready": self.ready}
+        if self.error is not None:
+            snapshot["error"] = self.error
+        snapshot["phases_ms"] = dict(self.phases)
+        return snapshot
+
+
+startup_state = StartupState()
+
+
+def record_import_phase() -> None:
+    """Record time spent importing the application package"""
+    startup_state.record("import", time.perf_counter() - IMPORT_STARTED)
+
+
+def warm_up() -> None:
+    """
+    Load the catalog, build indexes and warm caches, then mark the app ready
+
+    With PANDORA_CATALOG_MAP set, the binary snapshot is mapped instead of
+    loading and indexing the catalog. With PANDORA_STOCK_FILE set, stock
+    levels are loaded from it before the app reports ready.
+
+    Requests arriving before warm-up finishes are still served: the catalog
+    and configs load lazily on first use. Whichever of them comes first
+    loads the catalog; the catalog phases are only timed if warm-up did.
+    """
+    ensure_catalog(phase=startup_state.phase)
+    if STOCK_FILE:
+        with startup_state.phase("stock_load"):
+            inventory.load_stock_file(STOCK_FILE)
+    with startup_state.phase("cache_warm"):
+        load_customization_configs()
+        Product.image_srcsets = image_service.refresh_sources()
+        bundle_builder.build_all()
+    startup_state.ready = True
+    # Grows with the catalog, so it is built after the app reports ready
+    ensure_similar()
@@ -0,0 +1,1118 @@
+"""
+Stylesheet Build
+Builds the site stylesheet ahead of time in place of the in-browser Tailwind
+compiler: the utility classes the templates and scripts use are generated,
+appended to the custom styles and written to one fingerprinted file, and the
+rules each page's own markup needs are inlined into its <head>
+
+    python -m app.stylesheet          # build and report render-blocking bytes
+    python -m app.stylesheet --check  # exit 1 if the built files are stale
+
+Tokens that look like utilities but generate nothing (a typo, or a shade or
+size missing from the theme) are reported by both, and fail --check.
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+)
+
+from app.bundles import minify_css
+
+TEMPLATES = (Path("templates/index.html"), Path("templates/wishlist.html"))
+SCRIPTS_DIR = Path("static/js")
+# Hand-written styles, in cascade order; generated utilities come after them
+SOURCES = (Path("static/css/preflight.css"), Path("static/css/styles.css"))
+OUTPUT_DIR = Path("static/dist")
+OUTPUT_URL = "/static/dist"
+
+BUILD_START = "<!-- build:css -->"
+BUILD_END = "<!-- endbuild -->"
+# The generated block in a template, with its indentation
+BUILD_BLOCK = re.compile(
+    rf"^([ \t]*){re.escape(BUILD_START)}.*?{re.escape(BUILD_END)}", re.S | re.M
+)
+
+# ----------------------------------------------------------------------------
+# Theme (Tailwind's defaults plus the brand colours)
+# ----------------------------------------------------------------------------
+
+SCREENS = {"sm": "640px", "md": "768px", "lg": "1024px", "xl": "1280px"}
+
+# Variant -> pseudo-class, in the order the variants are emitted
+PSEUDO_VARIANTS = {
+    "hover": ":hover",
+    "focus": ":focus",
+    "focus-visible": ":focus-visible",
+    "active": ":active",
+    "disabled": ":disabled",
+}
+GROUP_VARIANTS = {"group-hover": ":hover", "group-focus": ":focus"}
+
+SPACING = [
+    "0", "px", "0.5", "1", "1.5", "2", "2.5", "3", "3.5", "4", "5", "6", "7",
+    "8", "9", "10", "11", "12", "14", "16", "20", "24", "28", "32", "36", "40",
+    "44", "48", "52", "56", "60", "64", "72", "80", "96",
+]  # fmt: skip
+
+FRACTIONS = {"1/2": "50%", "1/3": "33.333333%", "2/3": "66.666667%"}
+FRACTIONS.update({"1/4": "25%", "3/4": "75%"})
+
+_PALETTE = {
+    "gray": "f9fafb f3f4f6 e5e7eb d1d5db 9ca3af 6b7280 4b5563 374151 1f2937 111827",
+    "red": "fef2f2 fee2e2 fecaca fca5a5 f87171 ef4444 dc2626 b91c1c 991b1b 7f1d1d",
+    "yellow": "fefce8 fef9c3 fef08a fde047 facc15 eab308 ca8a04 a16207 854d0e 713f12",
+    "green": "f0fdf4 dcfce7 bbf7d0 86efac 4ade80 22c55e 16a34a 15803d 166534 14532d",
+    "blue": "eff6ff dbeafe bfdbfe 93c5fd 60a5fa 3b82f6 2563eb 1d4ed8 1e40af 1e3a8a",
+}
+_SHADES = ("50", "100", "200", "300", "400", "500", "600", "700", "800", "900")
+COLORS = {
+    "black": "#000000",
+    "white": "#ffffff",
+    **{
+        f"{family}-{shade}": f"#{value}"
+        for family, values in _PALETTE.items()
+        for shade, value in zip(_SHADES, values.split())
+    },
+    "gold": "#D4AF37",
+    "dark-gold": "#B8941E",
+    "luxury": "#1a1a1a",
+}
+# Colours that cannot take an opacity
+KEYWORD_COLORS = {"transparent": "transparent", "current": "currentColor"}
+
+FONT_SIZES = {
+    "xs": ("0.75rem", "1rem"),
+    "sm": ("0.875rem", "1.25rem"),
+    "base": ("1rem", "1.5rem"),
+    "lg": ("1.125rem", "1.75rem"),
+    "xl": ("1.25rem", "1.75rem"),
+    "2xl": ("1.5rem", "2rem"),
+    "3xl": ("1.875rem", "2.25rem"),
+    "4xl": ("2.25rem", "2.5rem"),
+    "5xl": ("3rem", "1"),
+    "6xl": ("3.75rem", "1"),
+    "7xl": ("4.5rem", "1"),
+}
+FONT_WEIGHTS = {
+    "thin": "100",
+    "extralight": "200",
+    "light": "300",
+    "normal": "400",
+    "medium": "500",
+    "semibold": "600",
+    "bold": "700",
+    "extrabold": "800",
+    "black": "900",
+}
+FONT_FAMILIES = {
+    "sans": 'ui-sans-serif, system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI"'
+    ', Roboto, "Helvetica Neue", Arial, sans-serif',
+    "serif": 'ui-serif, Georgia, Cambria, "Times New Roman", Times, serif',
+    "mono": "ui-monospace, SFMono-Regular, Menlo, Monaco, Consolas, monospace",
+}
+RADII = {
+    "none": "0px",
+    "sm": "0.125rem",
+    "": "0.25rem",
+    "md": "0.375rem",
+    "lg": "0.5rem",
+    "xl": "0.75rem",
+    "2xl": "1rem",
+    "3xl": "1.5rem",
+    "full": "9999px",
+}
+SHADOWS = {
+    "sm": "0 1px 2px 0 rgb(0 0 0 / 0.05)",
+    "": "0 1px 3px 0 rgb(0 0 0 / 0.1), 0 1px 2px -1px rgb(0 0 0 / 0.1)",
+    "md": "0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1)",
+    "lg": "0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1)",
+    "xl": "0 20px 25px -5px rgb(0 0 0 / 0.1), 0 8px 10px -6px rgb(0 0 0 / 0.1)",
+    "2xl": "0 25px 50px -12px rgb(0 0 0 / 0.25)",
+    "inner": "inset 0 2px 4px 0 rgb(0 0 0 / 0.05)",
+    "none": "0 0 #0000",
+}
+MAX_WIDTHS = {
+    "xs": "20rem",
+    "sm": "24rem",
+    "md": "28rem",
+    "lg": "32rem",
+    "xl": "36rem",
+    "2xl": "42rem",
+    "3xl": "48rem",
+    "4xl": "56rem",
+    "5xl": "64rem",
+    "6xl": "72rem",
+    "7xl": "80rem",
+    "full": "100%",
+    "none": "none",
+}
+TRACKING = {
+    "tighter": "-0.05em",
+    "tight": "-0.025em",
+    "normal": "0em",
+    "wide": "0.025em",
+    "wider": "0.05em",
+    "widest": "0.1em",
+}
+LEADING = {
+    "none": "1",
+    "tight": "1.25",
+    "snug": "1.375",
+    "normal": "1.5",
+    "relaxed": "1.625",
+    "loose": "2",
+}
+TRANSITIONS = {
+    "": "color, background-color, border-color, text-decoration-color, fill, "
+    "stroke, opacity, box-shadow, transform, filter, backdrop-filter",
+    "all": "all",
+    "colors": "color, background-color, border-color, text-decoration-color, "
+    "fill, stroke",
+    "opacity": "opacity",
+    "shadow": "box-shadow",
+    "transform": "transform",
+}
+DISPLAYS = {
+    "block": "block",
+    "inline-block": "inline-block",
+    "inline": "inline",
+    "flex": "flex",
+    "inline-flex": "inline-flex",
+    "table": "table",
+    "grid": "grid",
+    "inline-grid": "inline-grid",
+    "contents": "contents",
+    "hidden": "none",
+}
+
+TRANSFORM = (
+    "translate(var(--tw-translate-x), var(--tw-translate-y)) "
+    "rotate(var(--tw-rotate)) scaleX(var(--tw-scale-x)) scaleY(var(--tw-scale-y))"
+)
+BOX_SHADOW = "var(--tw-ring-offset-shadow), var(--tw-ring-shadow), var(--tw-shadow)"
+SIDES = {
+    "": ("top", "right", "bottom", "left"),
+    "x": ("left", "right"),
+    "y": ("top", "bottom"),
+    "t": ("top",),
+    "r": ("right",),
+    "b": ("bottom",),
+    "l": ("left",),
+}
+CORNERS = {
+    "": ("top-left", "top-right", "bottom-right", "bottom-left"),
+    "t": ("top-left", "top-right"),
+    "r": ("top-right", "bottom-right"),
+    "b": ("bottom-right", "bottom-left"),
+    "l": ("top-left", "bottom-left"),
+}
+
+# ----------------------------------------------------------------------------
+# Utilities
+# ----------------------------------------------------------------------------
+
+
+class Utility(NamedTuple):
+    """CSS for one utility class, before variants are applied"""
+
+    rank: int  # order within its family; later utilities win conflicts
+    declarations: str
+    selector_suffix: str = ""
+
+
+Handler = Callable[["re.Match[str]"], Optional[Utility]]
+
+# (pattern, handler) per utility family, in the order they are emitted
+_UTILITIES: List[Tuple[Pattern[str], Handler]] = []
+
+
+def _utility(pattern: str) -> Callable[[Handler], Handler]:
+    """Register a handler for class names that fully match ``pattern``"""
+
+    def register(handler: Handler) -> Handler:
+        _UTILITIES.append((re.compile(pattern), handler))
+        return handler
+
+    return register
+
+
+def _length(
+    value: str, extra: Optional[Dict[str, str]] = None
+) -> Optional[Tuple[int, str]]:
+    """(rank, CSS length) for a spacing key, extra keyword or [arbitrary] value"""
+    if value in SPACING:
+        index = SPACING.index(value)
+        if value == "0":
+            return index, "0px"
+        if value == "px":
+            return index, "1px"
+        return index, f"{float(value) / 4:g}rem"
+    extra = extra or {}
+    if value in extra:
+        return len(SPACING) + list(extra).index(value), extra[value]
+    if value.startswith("[") and value.endswith("]") and len(value) > 2:
+        return len(SPACING) + len(extra), value[1:-1].replace("_", " ")
+    return None
+
+
+def _sides(
+    template: str,
+    shorthand: str,
+    side: str,
+    value: str,
+    names: Dict[str, Tuple[str, ...]] = SIDES,
+) -> str:
+    """Declarations setting ``value`` on one side (or corner) group"""
+    if not side:
+        return f"{shorthand}:{value}"
+    return ";".join(f"{template.format(name)}:{value}" for name in names[side])
+
+
+def _negate(length: str, negative: str) -> str:
+    return f"-{length}" if negative and length not in ("0px", "auto") else length
+
+
+def _rgb(color: str) -> str:
+    """'#D4AF37' -> '212 175 55'"""
+    return " ".join(str(int(color[i : i + 2], 16)) for i in (1, 3, 5))
+
+
+def _color(value: str, prop: str, opacity: str) -> Optional[Utility]:
+    """Colour utility setting ``prop``; its alpha comes from --tw-<opacity>-opacity"""
+    if value in KEYWORD_COLORS:
+        return Utility(
+            list(KEYWORD_COLORS).index(value), f"{prop}:{KEYWORD_COLORS[value]}"
+        )
+    if value not in COLORS:
+        return None
+    variable = f"--tw-{opacity}-opacity"
+    return Utility(
+        len(KEYWORD_COLORS) + list(COLORS).index(value),
+        f"{variable}:1;{prop}:rgb({_rgb(COLORS[value])} / var({variable}))",
+    )
+
+
+@_utility(r"container")
+def _container(match: "re.Match[str]") -> Utility:
+    # The max-width per screen is added by generate_utilities
+    return Utility(0, "width:100%")
+
+
+@_utility(r"(visible|invisible)")
+def _visibility(match: "re.Match[str]") -> Utility:
+    return Utility(
+        0, "visibility:" + ("hidden" if match[1] == "invisible" else "visible")
+    )
+
+
+@_utility(r"(static|fixed|absolute|relative|sticky)")
+def _position(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"position:{match[1]}")
+
+
+@_utility(r"(-?)(inset-x|inset-y|inset|top|right|bottom|left)-(.+)")
+def _inset(match: "re.Match[str]") -> Optional[Utility]:
+    names = ["inset", "inset-x", "inset-y", "top", "right", "bottom", "left"]
+    length = _length(match[3], {"auto": "auto", "full": "100%", **FRACTIONS})
+    if length is None:
+        return None
+    side = {"inset": "", "inset-x": "x", "inset-y": "y"}.get(match[2], match[2][0])
+    value = _negate(length[1], match[1])
+    props = _sides("{}", "inset", side, value)
+    return Utility(names.index(match[2]) * 100 + length[0], props)
+
+
+@_utility(r"z-(0|10|20|30|40|50|auto)")
+def _z_index(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"z-index:{match[1]}")
+
+
+def _box_sides(prop: str, match: "re.Match[str]") -> Optional[Utility]:
+    """margin / padding utilities: (-)(m|mx|mt|...)-<length>"""
+    length = _length(match[3], {"auto": "auto"} if prop == "margin" else {})
+    if length is None:
+        return None
+    side = match[2][1:]
+    value = _negate(length[1], match[1])
+    props = _sides(prop + "-{}", prop, side, value)
+    return Utility(list(SIDES).index(side) * 100 + length[0], props)
+
+
+@_utility(r"(-?)(m|mx|my|mt|mr|mb|ml)-(.+)")
+def _margin(match: "re.Match[str]") -> Optional[Utility]:
+    return _box_sides("margin", match)
+
+
+@_utility(r"(" + "|".join(DISPLAYS) + ")")
+def _display(match: "re.Match[str]") -> Utility:
+    return Utility(list(DISPLAYS).index(match[1]), f"display:{DISPLAYS[match[1]]}")
+
+
+@_utility(r"h-(.+)")
+def _height(match: "re.Match[str]") -> Optional[Utility]:
+    length = _length(match[1], {"auto": "auto", "full": "100%", "screen": "100vh"})
+    return length and Utility(length[0], f"height:{length[1]}")
+
+
+@_utility(r"max-h-(.+)")
+def _max_height(match: "re.Match[str]") -> Optional[Utility]:
+    length = _length(match[1], {"full": "100%", "screen": "100vh"})
+    return length and Utility(length[0], f"max-height:{length[1]}")
+
+
+@_utility(r"min-h-(0|full|screen|\[.+\])")
+def _min_height(match: "re.Match[str]") -> Optional[Utility]:
+    length = _length(match[1], {"full": "100%", "screen": "100vh"})
+    return length and Utility(length[0], f"min-height:{length[1]}")
+
+
+@_utility(r"w-(.+)")
+def _width(match: "re.Match[str]") -> Optional[Utility]:
+    extra = {"auto": "auto", **FRACTIONS, "full": "100%", "screen": "100vw"}
+    length = _length(match[1], extra)
+    return length and Utility(length[0], f"width:{length[1]}")
+
+
+@_utility(r"min-w-(0|full|\[.+\])")
+def _min_width(match: "re.Match[str]") -> Optional[Utility]:
+    length = _length(match[1], {"full": "100%"})
+    return length and Utility(length[0], f"min-width:{length[1]}")
+
+
+@_utility(r"max-w-(.+)")
+def _max_width(match: "re.Match[str]") -> Optional[Utility]:
+    if match[1] in MAX_WIDTHS:
+        return Utility(
+            list(MAX_WIDTHS).index(match[1]), f"max-width:{MAX_WIDTHS[match[1]]}"
+        )
+    length = _length(match[1]) if match[1].startswith("[") else None
+    return length and Utility(100, f"max-width:{length[1]}")
+
+
+@_utility(r"flex-(1|auto|initial|none)")
+def _flex(match: "re.Match[str]") -> Utility:
+    values = {"1": "1 1 0%", "auto": "1 1 auto", "initial": "0 1 auto", "none": "none"}
+    return Utility(list(values).index(match[1]), f"flex:{values[match[1]]}")
+
+
+@_utility(r"(?:flex-)?(shrink|grow)(-0)?")
+def _flex_shrink_grow(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"flex-{match[1]}:{0 if match[2] else 1}")
+
+
+@_utility(r"(-?)translate-(x|y)-(.+)")
+def _translate(match: "re.Match[str]") -> Optional[Utility]:
+    length = _length(match[3], {"full": "100%", **FRACTIONS})
+    if length is None:
+        return None
+    value = _negate(length[1], match[1])
+    rank = (0 if match[2] == "x" else 100) + length[0]
+    return Utility(rank, f"--tw-translate-{match[2]}:{value};transform:{TRANSFORM}")
+
+
+@_utility(r"(-?)rotate-(\d+)")
+def _rotate(match: "re.Match[str]") -> Utility:
+    return Utility(200, f"--tw-rotate:{match[1]}{match[2]}deg;transform:{TRANSFORM}")
+
+
+@_utility(r"scale-(\d+)")
+def _scale(match: "re.Match[str]") -> Utility:
+    scale = f"{int(match[1]) / 100:g}"
+    return Utility(
+        300 + int(match[1]),
+        f"--tw-scale-x:{scale};--tw-scale-y:{scale};transform:{TRANSFORM}",
+    )
+
+
+@_utility(r"transform(-none)?")
+def _transform(match: "re.Match[str]") -> Utility:
+    return Utility(500, "transform:" + ("none" if match[1] else TRANSFORM))
+
+
+@_utility(r"cursor-(auto|default|pointer|wait|not-allowed)")
+def _cursor(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"cursor:{match[1]}")
+
+
+@_utility(r"grid-cols-(\d+|none)")
+def _grid_columns(match: "re.Match[str]") -> Utility:
+    if match[1] == "none":
+        return Utility(0, "grid-template-columns:none")
+    columns = int(match[1])
+    return Utility(columns, f"grid-template-columns:repeat({columns}, minmax(0, 1fr))")
+
+
+@_utility(r"flex-(row|row-reverse|col|col-reverse)")
+def _flex_direction(match: "re.Match[str]") -> Utility:
+    return Utility(0, "flex-direction:" + match[1].replace("col", "column"))
+
+
+@_utility(r"flex-(wrap|wrap-reverse|nowrap)")
+def _flex_wrap(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"flex-wrap:{match[1]}")
+
+
+@_utility(r"items-(start|end|center|baseline|stretch)")
+def _align_items(match: "re.Match[str]") -> Utility:
+    value = {"start": "flex-start", "end": "flex-end"}.get(match[1], match[1])
+    return Utility(0, f"align-items:{value}")
+
+
+@_utility(r"justify-(start|end|center|between|around|evenly)")
+def _justify_content(match: "re.Match[str]") -> Utility:
+    values = {"start": "flex-start", "end": "flex-end", "center": "center"}
+    value = values.get(match[1], f"space-{match[1]}")
+    return Utility(0, f"justify-content:{value}")
+
+
+@_utility(r"gap-(?:(x|y)-)?(.+)")
+def _gap(match: "re.Match[str]") -> Optional[Utility]:
+    length = _length(match[2])
+    if length is None:
+        return None
+    prop = {None: "gap", "x": "column-gap", "y": "row-gap"}[match[1]]
+    return Utility(
+        ["gap", "column-gap", "row-gap"].index(prop) * 100 + length[0],
+        f"{prop}:{length[1]}",
+    )
+
+
+@_utility(r"(-?)space-(x|y)-(.+)")
+def _space(match: "re.Match[str]") -> Optional[Utility]:
+    length = _length(match[3])
+    if length is None:
+        return None
+    prop = "margin-left" if match[2] == "x" else "margin-top"
+    return Utility(
+        length[0],
+        f"{prop}:{_negate(length[1], match[1])}",
+        " > :not([hidden]) ~ :not([hidden])",
+    )
+
+
+@_utility(r"overflow(?:-(x|y))?-(auto|hidden|visible|scroll)")
+def _overflow(match: "re.Match[str]") -> Utility:
+    prop = f"overflow-{match[1]}" if match[1] else "overflow"
+    return Utility(1 if match[1] else 0, f"{prop}:{match[2]}")
+
+
+@_utility(r"truncate")
+def _truncate(match: "re.Match[str]") -> Utility:
+    return Utility(0, "overflow:hidden;text-overflow:ellipsis;white-space:nowrap")
+
+
+@_utility(r"whitespace-(normal|nowrap|pre|pre-line|pre-wrap)")
+def _whitespace(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"white-space:{match[1]}")
+
+
+@_utility(r"rounded(?:-(t|r|b|l))?(?:-(none|sm|md|lg|xl|2xl|3xl|full))?")
+def _rounded(match: "re.Match[str]") -> Utility:
+    side, size = match[1] or "", match[2] or ""
+    props = _sides("border-{}-radius", "border-radius", side, RADII[size], CORNERS)
+    return Utility(list(CORNERS).index(side) * 100 + list(RADII).index(size), props)
+
+
+@_utility(r"border(?:-(x|y|t|r|b|l))?(?:-(0|2|4|8))?")
+def _border_width(match: "re.Match[str]") -> Utility:
+    side, width = match[1] or "", match[2] or "1"
+    props = _sides("border-{}-width", "border-width", side, f"{width}px")
+    return Utility(list(SIDES).index(side) * 100 + int(width), props)
+
+
+@_utility(r"border-(solid|dashed|dotted|none)")
+def _border_style(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"border-style:{match[1]}")
+
+
+@_utility(r"border-(.+)")
+def _border_color(match: "re.Match[str]") -> Optional[Utility]:
+    return _color(match[1], "border-color", "border")
+
+
+@_utility(r"bg-(.+)")
+def _background_color(match: "re.Match[str]") -> Optional[Utility]:
+    return _color(match[1], "background-color", "bg")
+
+
+@_utility(r"bg-opacity-(\d+)")
+def _background_opacity(match: "re.Match[str]") -> Utility:
+    return Utility(int(match[1]), f"--tw-bg-opacity:{int(match[1]) / 100:g}")
+
+
+@_utility(r"object-(contain|cover|fill|none)")
+def _object_fit(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"object-fit:{match[1]}")
+
+
+@_utility(r"()(p|px|py|pt|pr|pb|pl)-(.+)")
+def _padding(match: "re.Match[str]") -> Optional[Utility]:
+    return _box_sides("padding", match)
+
+
+@_utility(r"text-(left|center|right|justify)")
+def _text_align(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"text-align:{match[1]}")
+
+
+@_utility(r"font-(" + "|".join(FONT_FAMILIES) + ")")
+def _font_family(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"font-family:{FONT_FAMILIES[match[1]]}")
+
+
+@_utility(r"text-(" + "|".join(FONT_SIZES) + ")")
+def _font_size(match: "re.Match[str]") -> Utility:
+    size, line_height = FONT_SIZES[match[1]]
+    return Utility(
+        list(FONT_SIZES).index(match[1]), f"font-size:{size};line-height:{line_height}"
+    )
+
+
+@_utility(r"font-(" + "|".join(FONT_WEIGHTS) + ")")
+def _font_weight(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"font-weight:{FONT_WEIGHTS[match[1]]}")
+
+
+@_utility(r"(uppercase|lowercase|capitalize|normal-case)")
+def _text_transform(match: "re.Match[str]") -> Utility:
+    return Utility(0, "text-transform:" + match[1].replace("normal-case", "none"))
+
+
+@_utility(r"italic")
+def _italic(match: "re.Match[str]") -> Utility:
+    return Utility(0, "font-style:italic")
+
+
+@_utility(r"leading-(" + "|".join(LEADING) + ")")
+def _leading(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"line-height:{LEADING[match[1]]}")
+
+
+@_utility(r"tracking-(" + "|".join(TRACKING) + ")")
+def _tracking(match: "re.Match[str]") -> Utility:
+    return Utility(0, f"letter-spacing:{TRACKING[match[1]]}")
+
+
+@_utility(r"text-(.+)")
+def _text_color(match: "re.Match[str]") -> Optional[Utility]:
+    return _color(match[1], "color", "text")
+
+
+@_utility(r"(underline|line-through|no-underline)")
+def _text_decoration(match: "re.Match[str]") -> Utility:
+    value = {"no-underline": "none"}.get(match[1], match[1])
+    return Utility(0, f"text-decoration-line:{value}")
+
+
+@_utility(r"opacity-(\d+)")
+def _opacity(match: "re.Match[str]") -> Utility:
+    return Utility(int(match[1]), f"opacity:{int(match[1]) / 100:g}")
+
+
+@_utility(r"shadow(?:-(sm|md|lg|xl|2xl|inner|none))?")
+def _shadow(match: "re.Match[str]") -> Utility:
+    size = match[1] or ""
+    return Utility(
+        list(SHADOWS).index(size),
+        f"--tw-shadow:{SHADOWS[size]};box-shadow:{BOX_SHADOW}",
+    )
+
+
+@_utility(r"outline-none")
+def _outline_none(match: "re.Match[str]") -> Utility:
+    return Utility(0, "outline:2px solid transparent;outline-offset:2px")
+
+
+@_utility(r"ring(?:-(0|1|2|4|8))?")
+def _ring_width(match: "re.Match[str]") -> Utility:
+    width = match[1] or "3"
+    return Utility(
+        int(width),
+        "--tw-ring-offset-shadow:0 0 0 var(--tw-ring-offset-width) "
+        "var(--tw-ring-offset-color);"
+        f"--tw-ring-shadow:0 0 0 calc({width}px + var(--tw-ring-offset-width)) "
+        f"var(--tw-ring-color);box-shadow:{BOX_SHADOW}",
+    )
+
+
+@_utility(r"ring-offset-(0|1|2|4|8)")
+def _ring_offset_width(match: "re.Match[str]") -> Utility:
+    return Utility(int(match[1]), f"--tw-ring-offset-width:{match[1]}px")
+
+
+@_utility(r"ring-offset-(.+)")
+def _ring_offset_color(match: "re.Match[str]") -> Optional[Utility]:
+    color = COLORS.get(match[1], KEYWORD_COLORS.get(match[1]))
+    return color and Utility(0, f"--tw-ring-offset-color:{color}")
+
+
+@_utility(r"ring-(.+)")
+def _ring_color(match: "re.Match[str]") -> Optional[Utility]:
+    return _color(match[1], "--tw-ring-color", "ring")
+
+
+@_utility(r"transition(?:-(all|colors|opacity|shadow|transform|none))?")
+def _transition(match: "re.Match[str]") -> Utility:
+    if match[1] == "none":
+        return Utility(len(TRANSITIONS), "transition-property:none")
+    return Utility(
+        list(TRANSITIONS).index(match[1] or ""),
+        f"transition-property:{TRANSITIONS[match[1] or '']};"
+        "transition-timing-function:cubic-bezier(0.4, 0, 0.2, 1);"
+        "transition-duration:150ms",
+    )
+
+
+@_utility(r"duration-(\d+)")
+def _duration(match: "re.Match[str]") -> Utility:
+    return Utility(int(match[1]), f"transition-duration:{match[1]}ms")
+
+
+@_utility(r"ease-(linear|in|out|in-out)")
+def _ease(match: "re.Match[str]") -> Utility:
+    curves = {
+        "linear": "linear",
+        "in": "cubic-bezier(0.4, 0, 1, 1)",
+        "out": "cubic-bezier(0, 0, 0.2, 1)",
+        "in-out": "cubic-bezier(0.4, 0, 0.2, 1)",
+    }
+    return Utility(0, f"transition-timing-function:{curves[match[1]]}")
+
+
+def resolve_utility(name: str) -> Optional[Tuple[int, Utility]]:
+    """(family index, utility) for a class name without variants, or None"""
+    for family, (pattern, handler) in enumerate(_UTILITIES):
+        match = pattern.fullmatch(name)
+        if match:
+            utility = handler(match)
+            if utility is not None:
+                return family, utility
+    return None
+
+
+def _escape(name: str) -> str:
+    """Escape a class name for use in a selector"""
+    return re.sub(r"([^\w-])", r"\\\1", name)
+
+
+class _Rule(NamedTuple):
+    """One generated rule; sorting rules gives their order in the stylesheet"""
+
+    screen: int  # 0 for no media query, else 1 + index in SCREENS
+    variant: int
+    family: int
+    rank: int
+    name: str
+    selector: str
+    declarations: str
+
+
+def _rules_for(name: str) -> List[_Rule]:
+    """Rules for one class name with its variants, or [] if it is not a utility"""
+    *variants, base = name.split(":")
+    resolved = resolve_utility(base)
+    if resolved is None or len(variants) > 2:
+        return []
+    family, utility = resolved
+    screen, variant, selector = 0, 0, "." + _escape(name)
+    pseudo_names = list(PSEUDO_VARIANTS) + list(GROUP_VARIANTS)
+    for prefix in variants:
+        if prefix in SCREENS and not screen:
+            screen = list(SCREENS).index(prefix) + 1
+        elif prefix in PSEUDO_VARIANTS and not variant:
+            variant = pseudo_names.index(prefix) + 1
+            selector += PSEUDO_VARIANTS[prefix]
+        elif prefix in GROUP_VARIANTS and not variant:
+            variant = pseudo_names.index(prefix) + 1
+            selector = f".group{GROUP_VARIANTS[prefix]} {selector}"
+        else:
+            return []
+    rules = [
+        _Rule(
+            screen,
+            variant,
+            family,
+            utility.rank,
+            name,
+            selector + utility.selector_suffix,
+            utility.declarations,
+        )
+    ]
+    if base == "container" and not variants:
+        for index, width in enumerate(SCREENS.values()):
+            rules.append(
+                _Rule(index + 1, 0, family, 0, name, selector, f"max-width:{width}")
+            )
+    return rules
+
+
+def generate_utilities(classes: Iterable[str]) -> str:
+    """
+    CSS for the utility classes among ``classes``; other names are ignored
+    (see unknown_utilities for those that look like utilities)
+    """
+    rules = sorted(rule for name in set(classes) for rule in _rules_for(name))
+    css: List[str] = []
+    for screen, width in enumerate([""] + list(SCREENS.values())):
+        block = "".join(
+            f"{rule.selector}{{{rule.declarations}}}"
+            for rule in rules
+            if rule.screen == screen
+        )
+        if block and screen:
+            block = f"@media (min-width: {width}){{{block}}}"
+        css.append(block)
+    return minify_css("".join(css))
+
+
+def unknown_utilities(classes: Iterable[str]) -> List[str]:
+    """
+    Names among ``classes`` that look like utilities but generate no CSS
+
+    A name looks like a utility if, without its variants, it fully matches
+    a utility family's pattern (e.g. ``bg-gold-950``, a shade the theme
+    lacks), or if it starts with a known variant (e.g. ``xl:flex-colum``).
+    """
+    variants = {*SCREENS, *PSEUDO_VARIANTS, *GROUP_VARIANTS}
+    unknown = []
+    for name in set(classes):
+        prefix, _, base = name.rpartition(":")
+        looks_like = prefix.split(":")[0] in variants or any(
+            pattern.fullmatch(base) for pattern, _ in _UTILITIES
+        )
+        if looks_like and not _rules_for(name):
+            unknown.append(name)
+    return sorted(unknown)
+
+
+# ----------------------------------------------------------------------------
+# Content scanning and critical CSS
+# ----------------------------------------------------------------------------
+
+# Anything that could be a class name in markup, a string or a template literal
+_CANDIDATE = re.compile(r"[^<>\"'`\s{}()=;,$]+")
+
+
+def scan_classes(paths: Iterable[Path]) -> Set[str]:
+    """Every token in ``paths`` that could be a class name
+
+    Generated build blocks are skipped, so a build does not depend on the
+    output of the previous one
+    """
+    candidates: Set[str] = set()
+    for path in paths:
+        text = BUILD_BLOCK.sub("", path.read_text(encoding="utf-8"))
+        candidates.update(_CANDIDATE.findall(text))
+    return candidates
+
+
+def content_paths() -> List[Path]:
+    """Files scanned for class names: the templates and every script"""
+    return list(TEMPLATES) + sorted(SCRIPTS_DIR.glob("*.js"))
+
+
+class _PageMarkup(HTMLParser):
+    """Classes and ids of the elements a page can show before its scripts run
+
+    The contents of elements that start hidden (``hidden`` at every screen
+    size) or off-screen (``translate-x-full``) are skipped: they cannot be
+    seen until a script reveals them, by which time the full stylesheet has
+    loaded. Scripts and comments are not markup and are skipped too.
+    """
+
+    VOID = {"area", "br", "col", "embed", "hr", "img", "input", "link", "meta"}
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.classes: Set[str] = set()
+        self.ids: Set[str] = set()
+        self._depth = 0
+        self._skip_depth: Optional[int] = None
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if tag not in self.VOID:
+            self._depth += 1
+        if self._skip_depth is not None:
+            return
+        attributes = dict(attrs)
+        names = (attributes.get("class") or "").split()
+        self.classes.update(names)
+        if attributes.get("id"):
+            self.ids.add(attributes["id"])
+        if tag not in self.VOID and _starts_unseen(names):
+            self._skip_depth = self._depth
+
+    def handle_endtag(self, tag: str):
+        if tag in self.VOID:
+            return
+        if self._skip_depth == self._depth:
+            self._skip_depth = None
+        self._depth -= 1
+
+
+def _starts_unseen(names: List[str]) -> bool:
+    """Whether an element with these classes is invisible on first render"""
+    if "translate-x-full" in names:
+        return True
+    shown_at_some_size = any(
+        name.split(":")[-1] in DISPLAYS and name.split(":")[-1] != "hidden"
+        for name in names
+        if ":" in name
+    )
+    return "hidden" in names and not shown_at_some_size
+
+
+def page_selectors(html: str) -> Tuple[Set[str], Set[str]]:
+    """(classes, ids) of the elements a page can show before its scripts run"""
+    parser = _PageMarkup()
+    parser.feed(html)
+    parser.close()
+    return parser.classes, parser.ids
+
+
+def _css_blocks(css: str) -> List[Tuple[str, str]]:
+    """Split a minified stylesheet into top-level (prelude, body) pairs"""
+    blocks = []
+    start = depth = 0
+    brace = -1
+    index = 0
+    while index < len(css):
+        char = css[index]
+        if char in "\"'":
+            index = css.index(char, index + 1)
+        elif char == "{":
+            if depth == 0:
+                brace = index
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:brace].strip(), css[brace + 1 : index]))
+                start = index + 1
+        index += 1
+    return blocks
+
+
+def _unescape(name: str) -> str:
+    return re.sub(r"\\(.)", r"\1", name)
+
+
+def _selector_applies(selector: str, classes: Set[str], ids: Set[str]) -> bool:
+    """Whether every class and id ``selector`` names occurs on the page"""
+    needed_classes = re.findall(r"\.((?:\\.|[\w-])+)", selector)
+    needed_ids = re.findall(r"#((?:\\.|[\w-])+)", selector)
+    return all(_unescape(name) in classes for name in needed_classes) and all(
+        _unescape(name) in ids for name in needed_ids
+    )
+
+
+def critical_css(css: str, classes: Set[str], ids: Set[str]) -> str:
+    """
+    The rules of ``css`` that can match a page using ``classes`` and ``ids``
+
+    Selectors naming a class or id the page does not have are dropped, as are
+    print styles, and keyframes are kept only if a remaining rule uses them
+    """
+    kept: List[Tuple[str, str]] = []
+    keyframes: List[Tuple[int, str, str]] = []
+    for prelude, body in _css_blocks(css):
+        if prelude.startswith("@keyframes"):
+            keyframes.append((len(kept), prelude, body))
+        elif prelude == "@media print":
+            continue
+        elif prelude.startswith("@"):
+            inner = critical_css(body, classes, ids)
+            if inner:
+                kept.append((prelude, inner))
+        else:
+            selectors = [
+                selector
+                for selector in prelude.split(",")
+                if _selector_applies(selector, classes, ids)
+            ]
+            if selectors:
+                kept.append((",".join(selectors), body))
+    used = "".join(body for _, body in kept)
+    for position, prelude, body in reversed(keyframes):
+        if re.search(rf"\b{re.escape(prelude.split()[-1])}\b", used):
+            kept.insert(position, (prelude, body))
+    return "".join(f"{prelude}{{{body}}}" for prelude, body in kept)
+
+
+# ----------------------------------------------------------------------------
+# Render-blocking resources
+# ----------------------------------------------------------------------------
+
+
+class RenderBlocking(NamedTuple):
+    """What a page's <head> makes the browser wait for before first render"""
+
+    requests: List[Tuple[str, Optional[int]]]  # (url, bytes; None if external)
+    inline_bytes: int
+
+    @property
+    def local_bytes(self) -> int:
+        return sum(size for _, size in self.requests if size is not None)
+
+    @property
+    def external(self) -> List[str]:
+        return [url for url, size in self.requests if size is None]
+
+
+def render_blocking(html: str) -> RenderBlocking:
+    """Stylesheets, synchronous scripts and inline code in a page's <head>"""
+    head = html.split("</head>", 1)[0]
+    head = re.sub(r"<noscript>.*?</noscript>", "", head, flags=re.S)
+    head = re.sub(r"<!--.*?-->", "", head, flags=re.S)
+    urls = re.findall(r'<link\b[^>]*rel="stylesheet"[^>]*href="([^"]+)"', head)
+    for attributes, url in re.findall(r'<script\b([^>]*)src="([^"]+)"', head):
+        if not re.search(r"\b(defer|async)\b|type=\"module\"", attributes):
+            urls.append(url)
+    requests: List[Tuple[str, Optional[int]]] = []
+    for url in urls:
+        local = Path(url.lstrip("/"))
+        is_local = url.startswith("/static/") and local.is_file()
+        requests.append((url, local.stat().st_size if is_local else None))
+    inline = re.findall(r"<style>(.*?)</style>", head, flags=re.S)
+    inline += re.findall(r"<script>(.*?)</script>", head, flags=re.S)
+    return RenderBlocking(requests, sum(len(code.encode()) for code in inline))
+
+
+# ----------------------------------------------------------------------------
+# Build
+# ----------------------------------------------------------------------------
+
+
+class StylesheetBuild(NamedTuple):
+    """Result of a build, not yet written"""
+
+    css: str
+    filename: str  # fingerprinted name under OUTPUT_DIR
+    templates: Dict[Path, str]  # template path -> rewritten HTML
+    unknown: Tuple[str, ...] = ()  # utility-like names that generated nothing
+
+    @property
+    def url(self) -> str:
+        return f"{OUTPUT_URL}/{self.filename}"
+
+    def stale_files(self) -> List[Path]:
+        """Files on disk that differ from this build"""
+        expected = {OUTPUT_DIR / self.filename: self.css, **self.templates}
+        return [
+            path
+            for path, text in expected.items()
+            if not path.is_file() or path.read_text(encoding="utf-8") != text
+        ]
+
+
+def _head_styles(critical: str, url: str, indent: str) -> str:
+    """Inlined critical rules plus a non-blocking load of the full stylesheet"""
+    lines = [
+        BUILD_START,
+        f"<style>{critical}</style>",
+        f'<link rel="preload" href="{url}" as="style" '
+        "onload=\"this.onload=null;this.rel='stylesheet'\">",
+        f'<noscript><link rel="stylesheet" href="{url}"></noscript>',
+        BUILD_END,
+    ]
+    return "\n".join(indent + line for line in lines)
+
+
+def build_stylesheet() -> StylesheetBuild:
+    """
+    Build the stylesheet and each template's inlined critical rules
+
+    Raises:
+        ValueError: If a template has no build:css block to fill in
+    """
+    sources = "".join(path.read_text(encoding="utf-8") for path in SOURCES)
+    classes = scan_classes(content_paths())
+    css = minify_css(sources).strip() + generate_utilities(classes)
+    filename = f"styles.{hashlib.sha256(css.encode()).hexdigest()[:10]}.css"
+    url = f"{OUTPUT_URL}/{filename}"
+
+    templates = {}
+    for path in TEMPLATES:
+        html = path.read_text(encoding="utf-8")
+        if not BUILD_BLOCK.search(html):
+            raise ValueError(f"{path} has no {BUILD_START} block")
+        critical = critical_css(css, *page_selectors(html))
+        templates[path] = BUILD_BLOCK.sub(
+            lambda match: _head_styles(critical, url, match[1]), html, count=1
+        )
+    return StylesheetBuild(css, filename, templates, tuple(unknown_utilities(classes)))
+
+
+def write_build(build: StylesheetBuild) -> None:
+    """Write the stylesheet and templates, removing older stylesheets"""
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    for old in built_stylesheets():
+        if old.name != build.filename:
+            old.unlink()
+    (OUTPUT_DIR / build.filename).write_text(build.css, encoding="utf-8")
+    for path, html in build.templates.items():
+        path.write_text(html, encoding="utf-8")
+
+
+def built_stylesheets() -> List[Path]:
+    """Fingerprinted stylesheets in OUTPUT_DIR (one after a build)"""
+    return sorted(OUTPUT_DIR.glob("styles.*.css"))
+
+
+def _describe(blocking: RenderBlocking) -> str:
+    text = f"{len(blocking.requests)} requests"
+    if blocking.external:
+        text += f" ({len(blocking.external)} external, size unknown)"
+    return (
+        f"{text}, {blocking.local_bytes:,} B local + "
+        f"{blocking.inline_bytes:,} B inline"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.stylesheet")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help=(
+            "Exit 1 if the built files are out of date or a utility-like class "
+            "is unknown, instead of writing them"
+        ),
+    )
+    args = parser.parse_args()
+
+    build = build_stylesheet()
+    for name in build.unknown:
+        print(f"unknown utility: {name}")
+    if args.check:
+        stale = build.stale_files()
+        for path in stale:
+            print(f"out of date: {path}")
+        return 1 if stale or build.unknown else 0
+
+    before = {path: render_blocking(path.read_text()) for path in build.templates}
+    write_build(build)
+    print(f"{build.url}: {len(build.css.encode()):,} B")
+    for path, html in build.templates.items():
+        print(f"{path}")
+        print(f"  render-blocking before: {_describe(before[path])}")
+        print(f"  render-blocking after:  {_describe(render_blocking(html))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Request Tracing
+Lightweight spans propagated through a context variable, kept in a ring
+buffer and exported as OTLP/JSON lines to a local file
+"""
+
+import functools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from app.metrics import route_label
+
+TRACE_FILE = Path(".cache/traces/spans.jsonl")
+SERVICE_NAME = "pandora-showcase"
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status_code",
+        "status_message",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: int,
+        parent_id: Optional[int] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Return the span in OTLP/JSON form"""
+        span = {
+            "traceId": f"{self.trace_id:032x}",
+            "spanId": f"{self.span_id:016x}",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status_code},
+        }
+        if self.parent_id is not None:
+            span["parentSpanId"] = f"{self.parent_id:016x}"
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+class _NoopSpan:
+    """Stands in for a span that is not being recorded"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self) -> _NoopSpan:
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+_NOOP_SCOPE = _NoopScope()
+
+# Current span, or NOOP_SPAN inside a trace that was not sampled
+_current_span: ContextVar[Union[Span, _NoopSpan, None]] = ContextVar(
+    "current_span", default=None
+)
+
+
+class _UnsampledScope:
+    """Marks a root as not sampled so its children skip recording too"""
+
+    __slots__ = ("_token",)
+
+    def __enter__(self) -> _NoopSpan:
+        self._token = _current_span.set(NOOP_SPAN)
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_span.reset(self._token)
+        return False
+
+
+class _SpanScope:
+    __slots__ = ("_tracer", "_span", "_token")
+
+    def __init__(self, tracer: "Tracer", span: Span) -> None:
+        self._tracer = tracer
+        self._span = span
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        span = self._span
+        span.end_ns = time.time_ns()
+        if exc is not None:
+            span.status_code = STATUS_ERROR
+            span.status_message = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self._tracer._finish(span)
+        return False
+
+
+class OTLPJsonFileExporter:
+    """Append batches of spans to a file, one OTLP/JSON request per line"""
+
+    def __init__(self, path: Path = TRACE_FILE, service_name: str = SERVICE_NAME):
+        self.path = Path(path)
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Span]) -> None:
+        if not spans:
+            return
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes(
+                            {"service.name": self.service_name}
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        line = json.dumps(request, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class Tracer:
+    """Creates spans and buffers finished ones until they are exported
+
+    Sampling is decided once per trace, when its root span starts; with
+    ``sample_rate`` 0 spans cost little more than a function call. The
+    buffer is bounded: when it is full the oldest unexported spans are
+    dropped and counted in ``dropped``.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        buffer_size: int = 4096,
+        exporter: Optional[OTLPJsonFileExporter] = None,
+        export_batch: int = 512,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.export_batch = export_batch
+        self.buffer: deque = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._flush_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(
+            sample_rate=float(os.environ.get("PANDORA_TRACE_SAMPLE_RATE", "0")),
+            buffer_size=int(os.environ.get("PANDORA_TRACE_BUFFER", "4096")),
+            exporter=OTLPJsonFileExporter(
+                Path(os.environ.get("PANDORA_TRACE_FILE", TRACE_FILE))
+            ),
+        )
+
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any):
+        """
+        Return a context manager timing ``name`` as a child of the current span
+
+        The context manager yields the span (or a no-op stand-in when the
+        trace is not sampled) so callers can add attributes.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            rate = self.sample_rate
+            if rate <= 0:
+                return _NOOP_SCOPE
+            if rate < 1 and random.random() >= rate:
+                return _UnsampledScope()
+            return _SpanScope(
+                self, Span(name, random.getrandbits(128), None, kind, attributes)
+            )
+        if parent is NOOP_SPAN:
+            return _NOOP_SCOPE
+        return _SpanScope(
+            self, Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        )
+
+    def _finish(self, span: Span) -> None:
+        buffer = self.buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped += 1
+        buffer.append(span)
+        if (
+            span.parent_id is None
+            and self.exporter is not None
+            and len(buffer) >= self.export_batch
+        ):
+            self.flush()
+
+    def finished_spans(self) -> List[Span]:
+        """Spans finished and not yet exported, oldest first"""
+        return list(self.buffer)
+
+    def flush(self) -> int:
+        """Export and clear the buffered spans, returning how many were sent"""
+        with self._flush_lock:
+            spans = []
+            buffer = self.buffer
+            while buffer:
+                spans.append(buffer.popleft())
+            if self.exporter is not None:
+                self.exporter.export(spans)
+            return len(spans)
+
+
+tracer = Tracer.from_env()
+
+
+def span(name: str, **attributes: Any):
+    """Start a span on the process tracer (see Tracer.span)"""
+    return tracer.span(name, **attributes)
+
+
+def traced(name: str):
+    """Decorator running the wrapped function inside a span named ``name``"""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each HTTP request"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        with tracer.span(
+            method, SPAN_KIND_SERVER, **{"http.request.method": method}
+        ) as root:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if root is not NOOP_SPAN:
+                    route = route_label(scope)
+                    root.name = f"{method} {route}"
+                    root.set_attribute("http.route", route)
+                    root.set_attribute("url.path", scope["path"])
+                    root.set_attribute("http.response.status_code", status)
+                    if status >= 500:
+                        root.status_code = STATUS_ERROR
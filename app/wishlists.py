@@ -0,0 +1,176 @@
+"""
+Wishlist Store
+Server-side wishlists kept as compact sorted arrays of product ids, updated
+by batched add/remove deltas and versioned so devices can tell when another
+device changed the same wishlist
+
+Anyone can create a wishlist by picking a new id, so the store is bounded:
+wishlists unused for ``ttl`` seconds are dropped, and past ``max_wishlists``
+the least recently used ones go first.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Tuple
+
+# Client-generated wishlist ids (e.g. a UUID kept in localStorage)
+WISHLIST_ID_PATTERN = r"^[A-Za-z0-9_-]{8,64}$"
+
+MAX_WISHLIST_ITEMS = 500
+MAX_WISHLISTS = 100_000
+# Wishlists not read or changed for this long are forgotten
+WISHLIST_TTL = 90 * 24 * 3600.0
+
+
+class WishlistFullError(ValueError):
+    """Raised when a delta would grow a wishlist past MAX_WISHLIST_ITEMS"""
+
+
+class Wishlist:
+    """One wishlist: product ids in ascending order and a change counter"""
+
+    __slots__ = ("product_ids", "version", "used_at")
+
+    def __init__(self) -> None:
+        self.product_ids = array("q")
+        self.version = 0
+        self.used_at = 0.0
+
+    def __contains__(self, product_id: int) -> bool:
+        pos = bisect_left(self.product_ids, product_id)
+        return pos < len(self.product_ids) and self.product_ids[pos] == product_id
+
+    def apply(self, add: Iterable[int], remove: Iterable[int]) -> bool:
+        """
+        Apply one delta: adds first, then removes
+
+        Adding a present id or removing an absent one is a no-op, so deltas
+        from several devices merge without conflicts; for the same id the
+        last delta applied wins. The version is bumped once if anything
+        changed.
+
+        Returns:
+            Whether the wishlist changed
+        """
+        ids = self.product_ids
+        changed = False
+        for product_id in add:
+            pos = bisect_left(ids, product_id)
+            if pos == len(ids) or ids[pos] != product_id:
+                ids.insert(pos, product_id)
+                changed = True
+        for product_id in remove:
+            pos = bisect_left(ids, product_id)
+            if pos < len(ids) and ids[pos] == product_id:
+                del ids[pos]
+                changed = True
+        if changed:
+            self.version += 1
+        return changed
+
+
+class WishlistStore:
+    """Thread-safe registry of wishlists by id, least recently used first"""
+
+    def __init__(
+        self,
+        max_items: int = MAX_WISHLIST_ITEMS,
+        max_wishlists: int = MAX_WISHLISTS,
+        ttl: float = WISHLIST_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_items = max_items
+        self.max_wishlists = max_wishlists
+        self.ttl = ttl
+        self.clock = clock
+        self.evictions = 0
+        # Least recently used first
+        self._wishlists: "OrderedDict[str, Wishlist]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired wishlists and any over the limit; called under the lock"""
+        wishlists = self._wishlists
+        while wishlists and (
+            len(wishlists) > self.max_wishlists
+            or next(iter(wishlists.values())).used_at + self.ttl <= now
+        ):
+            wishlists.popitem(last=False)
+            self.evictions += 1
+
+    def _touch(self, wishlist_id: str, wishlist: Wishlist, now: float) -> None:
+        """Store a wishlist as the most recently used; called under the lock"""
+        wishlist.used_at = now
+        self._wishlists[wishlist_id] = wishlist
+        self._wishlists.move_to_end(wishlist_id)
+        self._evict(now)
+
+    def get(self, wishlist_id: str) -> Tuple[int, List[int]]:
+        """
+        Return the current state of a wishlist (empty at version 0 if unknown)
+
+        Returns:
+            (version, product ids in ascending order)
+        """
+        with self._lock:
+            now = self.clock()
+            self._evict(now)
+            wishlist = self._wishlists.get(wishlist_id)
+            if wishlist is None:
+                return 0, []
+            self._touch(wishlist_id, wishlist, now)
+            return wishlist.version, wishlist.product_ids.tolist()
+
+    def apply(
+        self, wishlist_id: str, add: Iterable[int], remove: Iterable[int]
+    ) -> Tuple[int, int, List[int]]:
+        """
+        Apply a delta to a wishlist, creating it if needed
+
+        Raises:
+            WishlistFullError: if the result would exceed ``max_items``; the
+                wishlist is left unchanged
+
+        Returns:
+            (version before the delta, version after, product ids)
+        """
+        add = list(add)
+        remove = list(remove)
+        with self._lock:
+            now = self.clock()
+            self._evict(now)
+            wishlist = self._wishlists.get(wishlist_id) or Wishlist()
+            previous = wishlist.version
+            removed = set(remove)
+            added = {pid for pid in add if pid not in removed and pid not in wishlist}
+            dropped = {pid for pid in removed if pid in wishlist}
+            if len(wishlist.product_ids) + len(added) - len(dropped) > self.max_items:
+                raise WishlistFullError(
+                    f"Wishlist full. At most {self.max_items} products"
+                )
+            wishlist.apply(add, remove)
+            self._touch(wishlist_id, wishlist, now)
+            return previous, wishlist.version, wishlist.product_ids.tolist()
+
+    def clear(self) -> None:
+        """Forget all wishlists"""
+        with self._lock:
+            self._wishlists.clear()
+
+    def __len__(self) -> int:
+        return len(self._wishlists)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate bytes held by the id arrays"""
+        with self._lock:
+            return sum(
+                w.product_ids.buffer_info()[1] * w.product_ids.itemsize
+                for w in self._wishlists.values()
+            )
+
+
+wishlist_store = WishlistStore()
@@ -0,0 +1 @@
+# Micro-benchmark package
@@ -0,0 +1,85 @@
+"""
+Bytes per product: list of Product models versus the columnar store
+
+    python -m benchmarks.catalog_memory --rows 1000000
+
+Rows get unique names, descriptions and image URLs so that string storage
+is counted as it would be for a real catalog.
+"""
+
+import argparse
+import gc
+import tracemalloc
+from typing import Dict, Iterator
+
+from app.bulk_load import bulk_load_products
+from app.catalog_store import ColumnarCatalog
+from app.mock_data import PRODUCT_DATA
+
+
+def synthetic_rows(count: int) -> Iterator[Dict[str, object]]:
+    """Yield ``count`` valid rows with unique text fields"""
+    for i in range(count):
+        base = PRODUCT_DATA[i % len(PRODUCT_DATA)]
+        yield {
+            "id": i + 1,
+            "name": f"{base['name']} #{i}",
+            "price": float(base["price"]),
+            "category": base["category"],
+            "material": base["material"],
+            "image": f"{base['image']}&v={i}",
+            "description": f"{base['description']} ({i})",
+            "customizable": bool(base.get("customizable", False)),
+        }
+
+
+def _measure(build) -> int:
+    """Bytes still allocated once ``build()`` returns"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        held = build()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del held
+    return after - before
+
+
+def measure(count: int) -> Dict[str, float]:
+    """Return bytes per product for both representations"""
+
+    def build_models():
+        products = []
+        for start in range(0, count, 100_000):
+            chunk = list(synthetic_rows(min(100_000, count - start)))
+            products.extend(bulk_load_products(chunk).products)
+        return products
+
+    models = _measure(build_models)
+    columnar = _measure(lambda: ColumnarCatalog.from_rows(synthetic_rows(count)))
+    return {
+        "rows": count,
+        "models_bytes_per_product": models / count,
+        "columnar_bytes_per_product": columnar / count,
+        "reduction": models / columnar,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.catalog_memory")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    result = measure(args.rows)
+    print(f"rows:                 {result['rows']:,}")
+    print(f"List[Product]:        {result['models_bytes_per_product']:,.1f} B/product")
+    print(
+        f"ColumnarCatalog:      {result['columnar_bytes_per_product']:,.1f} B/product"
+    )
+    print(f"reduction:            {result['reduction']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
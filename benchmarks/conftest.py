@@ -0,0 +1,83 @@
+import pytest
+
+from benchmarks.harness import (
+    BASELINE_PATH,
+    DEFAULT_THRESHOLD,
+    load_baseline,
+    measure,
+    regression,
+    save_baseline,
+)
+
+_results = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-baseline",
+        action="store_true",
+        help="Store this run's timings as the new baseline",
+    )
+    parser.addoption(
+        "--regression-threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown versus baseline, as a fraction (default 0.25)",
+    )
+
+
+@pytest.fixture(scope="session")
+def baseline():
+    return load_baseline()
+
+
+@pytest.fixture
+def bench(request, baseline):
+    """Time a callable and fail if it regressed past the threshold"""
+    config = request.config
+
+    def run(fn, items=None):
+        name = request.node.name
+        result = measure(fn)
+        if items:
+            result["items_per_s"] = items / result["min_s"]
+        _results[name] = result
+        if config.getoption("--update-baseline"):
+            return result
+        message = regression(
+            result, baseline.get(name), config.getoption("--regression-threshold")
+        )
+        if message:
+            pytest.fail(f"{name}: {message}")
+        return result
+
+    return run
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _results:
+        return
+    stored = load_baseline()
+    if session.config.getoption("--update-baseline"):
+        stored.update(_results)
+    else:
+        # Record benchmarks that have no baseline yet, keep existing ones
+        for name, result in _results.items():
+            stored.setdefault(name, result)
+    save_baseline(stored, BASELINE_PATH)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.section("benchmark results (per call)")
+    for name, result in sorted(_results.items()):
+        terminalreporter.write_line(
+            f"{name:<45} min {result['min_s'] * 1e6:>10.2f} us"
+            f"   median {result['median_s'] * 1e6:>10.2f} us"
+            + (
+                f"   {result['items_per_s']:>12,.0f} items/s"
+                if "items_per_s" in result
+                else ""
+            )
+        )
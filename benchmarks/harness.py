@@ -0,0 +1,81 @@
+"""
+Benchmark Harness
+Timing, baseline storage and regression checks for the micro-benchmarks
+"""
+
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+
+def measure(
+    fn: Callable[[], object], rounds: int = 7, min_round_time: float = 0.05
+) -> Dict[str, float]:
+    """
+    Time ``fn`` per call
+
+    The loop count is calibrated so that each round lasts at least
+    ``min_round_time``. Regressions are judged on the fastest round, which is
+    the least affected by scheduler and cache noise; the median is reported
+    alongside it.
+    """
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - started >= min_round_time:
+            break
+        loops *= 2
+
+    per_call = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        per_call.append((time.perf_counter() - started) / loops)
+
+    return {
+        "median_s": statistics.median(per_call),
+        "min_s": min(per_call),
+        "loops": loops,
+        "rounds": rounds,
+    }
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, Dict[str, float]]:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(
+    results: Dict[str, Dict[str, float]], path: Path = BASELINE_PATH
+) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def regression(
+    result: Dict[str, float],
+    baseline: Optional[Dict[str, float]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> Optional[str]:
+    """Return a failure message if ``result`` is slower than allowed"""
+    if baseline is None:
+        return None
+    allowed = baseline["min_s"] * (1 + threshold)
+    if result["min_s"] <= allowed:
+        return None
+    slowdown = result["min_s"] / baseline["min_s"] - 1
+    return (
+        f"{result['min_s'] * 1e6:.2f}us is {slowdown:.0%} slower than "
+        f"baseline {baseline['min_s'] * 1e6:.2f}us (threshold {threshold:.0%})"
+    )
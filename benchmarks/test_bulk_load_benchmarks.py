@@ -0,0 +1,23 @@
+"""
+Benchmarks for bulk product loading (rows per second is reported)
+"""
+
+from app.bulk_load import bulk_load_products
+from app.mock_data import PRODUCT_DATA
+from app.models import Product
+
+ROWS = 10_000
+FULL_ROWS = [
+    {"customizable": False, **PRODUCT_DATA[i % len(PRODUCT_DATA)], "id": i + 1}
+    for i in range(ROWS)
+]
+
+
+class TestBulkLoadBenchmarks:
+    """Columnar bulk load against per-row validation"""
+
+    def test_bulk_load_10k_rows(self, bench):
+        bench(lambda: bulk_load_products(FULL_ROWS), items=ROWS)
+
+    def test_per_row_validation_10k_rows(self, bench):
+        bench(lambda: [Product(**row) for row in FULL_ROWS], items=ROWS)
@@ -0,0 +1,58 @@
+"""
+Micro-benchmarks for the catalog hot paths
+
+Run with ``pytest benchmarks/``; see benchmarks/README.md
+"""
+
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.customization_config import get_customization_config
+from app.mock_data import (
+    PRODUCT_DATA,
+    filter_products,
+    get_all_products,
+    get_product_by_id,
+)
+from app.models import Product
+
+# A larger synthetic catalog so per-row costs dominate fixed overheads
+LARGE_CATALOG = [
+    Product(**{**PRODUCT_DATA[i % len(PRODUCT_DATA)], "id": i + 1}) for i in range(1000)
+]
+
+_product_list_adapter = TypeAdapter(List[Product])
+
+
+class TestCatalogBenchmarks:
+    """Benchmarks of catalog queries"""
+
+    def test_get_products_unfiltered(self, bench):
+        bench(lambda: filter_products())
+
+    def test_get_products_filtered(self, bench):
+        bench(
+            lambda: filter_products(category="rings", price_max=1000, material="Gold")
+        )
+
+    def test_get_product_by_id(self, bench):
+        bench(lambda: get_product_by_id(15))
+
+    def test_get_customization_config(self, bench):
+        bench(lambda: get_customization_config("rings"))
+
+
+class TestModelBenchmarks:
+    """Benchmarks of Product construction and serialization"""
+
+    def test_product_construction(self, bench):
+        row = PRODUCT_DATA[0]
+        bench(lambda: Product(**row))
+
+    def test_product_list_serialization(self, bench):
+        products = get_all_products()
+        bench(lambda: _product_list_adapter.dump_json(products))
+
+    def test_product_list_serialization_1000(self, bench):
+        bench(lambda: _product_list_adapter.dump_json(LARGE_CATALOG))
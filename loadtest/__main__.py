@@ -0,0 +1,130 @@
+"""
+Load test command line
+
+    python -m loadtest run --concurrency 50 --duration 60 --output report.json
+    python -m loadtest run --start-server --sessions 500
+    python -m loadtest compare baseline.json report.json
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import httpx
+
+from loadtest.runner import compare_reports, run_load, write_report
+
+
+@contextmanager
+def local_server(port: int, workers: int) -> Iterator[str]:
+    """Start uvicorn on localhost and wait until it reports live"""
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ]
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                if httpx.get(f"{base_url}/health/live").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        else:
+            raise RuntimeError("Server did not become live within 10 seconds")
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+async def _run(args: argparse.Namespace, base_url: str) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        return await run_load(
+            client,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            sessions=args.sessions,
+            seed=args.seed,
+        )
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    if args.start_server:
+        with local_server(args.port, args.workers) as base_url:
+            report = asyncio.run(_run(args, base_url))
+    else:
+        report = asyncio.run(_run(args, args.base_url))
+
+    write_report(report, args.output)
+    total = report["total"]
+    print(
+        f"{report['meta']['sessions']} sessions, {total['requests']} requests, "
+        f"{total['throughput_rps']} req/s, p95 {total['latency_ms']['p95']}ms, "
+        f"errors {total['error_rate']:.2%} -> {args.output}"
+    )
+    return 1 if total["errors"] and args.fail_on_errors else 0
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    for line in compare_reports(baseline, current):
+        print(line)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m loadtest")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Replay page-load sessions against a server")
+    run.add_argument("--base-url", default="http://127.0.0.1:8000")
+    run.add_argument("--concurrency", type=int, default=10)
+    run.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    run.add_argument("--sessions", type=int, help="Total sessions (overrides duration)")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--timeout", type=float, default=10.0)
+    run.add_argument("--output", default="loadtest-report.json")
+    run.add_argument(
+        "--start-server", action="store_true", help="Start uvicorn locally"
+    )
+    run.add_argument("--port", type=int, default=8765)
+    run.add_argument("--workers", type=int, default=1)
+    run.add_argument("--fail-on-errors", action="store_true")
+    run.set_defaults(func=cmd_run)
+
+    compare = sub.add_parser("compare", help="Compare two JSON reports")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Load Test Runner
+Drives concurrent virtual shoppers and summarizes per-step latency
+"""
+
+import asyncio
+import json
+import math
+import platform
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from loadtest.scenario import STEPS, page_load_session
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class StepStats:
+    """Latencies and errors collected for one scenario step"""
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.error_kinds: Dict[str, int] = {}
+
+    def add(self, seconds: float, error: Optional[str]) -> None:
+        self.latencies.append(seconds)
+        if error is not None:
+            self.errors += 1
+            self.error_kinds[error] = self.error_kinds.get(error, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, object]:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 6) if count else 0.0,
+            "error_kinds": dict(sorted(self.error_kinds.items())),
+            "throughput_rps": round(count / elapsed, 3) if elapsed else 0.0,
+            "latency_ms": {
+                "mean": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+                "p50": round(percentile(latencies, 50) * 1000, 3),
+                "p95": round(percentile(latencies, 95) * 1000, 3),
+                "p99": round(percentile(latencies, 99) * 1000, 3),
+                "max": round(latencies[-1] * 1000, 3) if count else 0.0,
+            },
+        }
+
+
+def _make_recorder(stats: Dict[str, StepStats], total: StepStats):
+    """
+    Return a recorder that times a request and files it under its step
+
+    The recorder returns the response, or None if the request failed.
+    """
+
+    async def record(step: str, request) -> Optional[httpx.Response]:
+        t0 = time.perf_counter()
+        error = None
+        response = None
+        try:
+            response = await request
+            if response.status_code >= 400:
+                error = f"http_{response.status_code}"
+        except httpx.HTTPError as exc:
+            error = type(exc).__name__
+        elapsed = time.perf_counter() - t0
+        stats[step].add(elapsed, error)
+        total.add(elapsed, error)
+        return response
+
+    return record
+
+
+class SessionBudget:
+    """Hands out sessions until a count or a deadline is reached"""
+
+    def __init__(self, sessions: Optional[int], duration: Optional[float]) -> None:
+        self.sessions = sessions
+        self.deadline = None
+        if sessions is None and duration is not None:
+            self.deadline = time.perf_counter() + duration
+        self.started = 0
+
+    def claim(self) -> bool:
+        if self.sessions is not None and self.started >= self.sessions:
+            return False
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return False
+        self.started += 1
+        return True
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    concurrency: int = 10,
+    duration: Optional[float] = 30.0,
+    sessions: Optional[int] = None,
+    seed: int = 0,
+) -> Dict[str, object]:
+    """
+    Run the page-load scenario with ``concurrency`` virtual users
+
+    Args:
+        client: Client whose base_url points at the server under test
+        concurrency: Number of concurrent virtual users
+        duration: Stop starting new sessions after this many seconds
+        sessions: Stop after this many sessions in total (overrides duration)
+        seed: Seed for the filter/category choices so runs are comparable
+
+    Returns:
+        JSON-serializable report with per-step and total statistics
+    """
+    stats = {step: StepStats() for step in STEPS}
+    total = StepStats()
+    record = _make_recorder(stats, total)
+    budget = SessionBudget(sessions, duration)
+    started = time.perf_counter()
+
+    async def virtual_user(user_id: int) -> None:
+        rng = random.Random(seed * 1_000_003 + user_id)
+        while budget.claim():
+            await page_load_session(client, record, rng)
+
+    await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "meta": {
+            "base_url": str(client.base_url),
+            "concurrency": concurrency,
+            "sessions": budget.started,
+            "elapsed_s": round(elapsed, 3),
+            "seed": seed,
+            "python": platform.python_version(),
+        },
+        "steps": {step: stats[step].summary(elapsed) for step in STEPS},
+        "total": total.summary(elapsed),
+    }
+
+
+def write_report(report: Dict[str, object], path: str) -> None:
+    """Write a report as stable, diff-friendly JSON"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare_reports(
+    baseline: Dict[str, object], current: Dict[str, object]
+) -> List[str]:
+    """Describe throughput, p95 and error-rate changes per step"""
+    lines = []
+    for step, now in current["steps"].items():
+        before = baseline["steps"].get(step)
+        if before is None:
+            lines.append(f"{step}: new step")
+            continue
+        lines.append(
+            f"{step}: "
+            f"rps {before['throughput_rps']} -> {now['throughput_rps']}, "
+            f"p95 {before['latency_ms']['p95']}ms -> {now['latency_ms']['p95']}ms, "
+            f"errors {before['error_rate']:.2%} -> {now['error_rate']:.2%}"
+        )
+    return lines
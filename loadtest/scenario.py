@@ -0,0 +1,113 @@
+"""
+Load Test Scenario
+The request sequence a browser makes when a shopper visits the store
+"""
+
+import asyncio
+import random
+from typing import Awaitable, Callable, List, Optional
+
+import httpx
+
+CATEGORIES = ["rings", "necklaces", "bracelets"]
+
+# Page size of the first catalog fetch (CATALOG_PAGE_SIZE in static/js/catalog.js)
+CATALOG_PAGE_SIZE = 60
+
+# Called with (step name, coroutine producing a response); times the request
+# and returns the response, or None if it failed
+Recorder = Callable[
+    [str, Awaitable[httpx.Response]], Awaitable[Optional[httpx.Response]]
+]
+
+
+def client_id(rng: random.Random) -> str:
+    """A wishlist or cart id like the one a browser keeps in localStorage"""
+    return f"load-{rng.getrandbits(64):016x}"
+
+
+def _json(response: Optional[httpx.Response]) -> dict:
+    if response is None or response.status_code != 200:
+        return {}
+    return response.json()
+
+
+async def _load_catalog(
+    client: httpx.AsyncClient, record: Recorder
+) -> Optional[httpx.Response]:
+    """First visit: check the catalog size, then fetch it from the change feed"""
+    await record(
+        "catalog_first_page",
+        client.get("/api/products", params={"limit": CATALOG_PAGE_SIZE}),
+    )
+    return await record(
+        "catalog_changes", client.get("/api/products/changes", params={"since": 0})
+    )
+
+
+async def page_load_session(
+    client: httpx.AsyncClient, record: Recorder, rng: random.Random
+) -> None:
+    """
+    Replay one first visit: index page, catalog replica, wishlist and cart
+    sync, opening the customization modal, adding to the wishlist and cart,
+    the wishlist page and a later catalog revalidation
+
+    Mirrors static/js/app.js: on DOMContentLoaded the catalog replica
+    (ProductCatalog.sync), the wishlist and the cart sync concurrently.
+    Filter changes are answered from the replica, so they send no requests.
+    """
+    wishlist_id, cart_id = client_id(rng), client_id(rng)
+    await record("index", client.get("/"))
+    changes, _, _ = await asyncio.gather(
+        _load_catalog(client, record),
+        record("wishlist_sync", client.get(f"/api/wishlists/{wishlist_id}")),
+        record("cart_sync", client.get(f"/api/carts/{cart_id}")),
+    )
+    catalog = _json(changes)
+    product_ids = [product["id"] for product in catalog.get("products", [])] or [1]
+    await record(
+        "customization_config",
+        client.get(f"/api/customization-config/{rng.choice(CATEGORIES)}"),
+    )
+    await record(
+        "wishlist_add",
+        client.post(
+            f"/api/wishlists/{wishlist_id}/changes",
+            json={"base_version": 0, "add": [rng.choice(product_ids)]},
+        ),
+    )
+    await record(
+        "cart_add",
+        client.post(
+            f"/api/carts/{cart_id}/changes",
+            json={
+                "base_version": 0,
+                "lines": [{"product_id": rng.choice(product_ids), "quantity": 1}],
+            },
+        ),
+    )
+    await record("wishlist_page", client.get("/wishlist.html"))
+    await record("wishlist_products", client.get(f"/api/wishlists/{wishlist_id}"))
+    # Coming back into view: ask only for what changed since the replica's version
+    params = {"since": catalog.get("version", 0)}
+    if catalog.get("epoch"):
+        params["epoch"] = catalog["epoch"]
+    await record(
+        "catalog_revalidate", client.get("/api/products/changes", params=params)
+    )
+
+
+STEPS: List[str] = [
+    "index",
+    "catalog_first_page",
+    "catalog_changes",
+    "wishlist_sync",
+    "cart_sync",
+    "customization_config",
+    "wishlist_add",
+    "cart_add",
+    "wishlist_page",
+    "wishlist_products",
+    "catalog_revalidate",
+]
@@ -4,9 +4,9 @@
 set -e
 
 echo "Running isort..."
-isort app/ tests/ main.py
+isort app/ tests/ loadtest/ benchmarks/ main.py
 
 echo "Running Black..."
-black app/ tests/ main.py
+black app/ tests/ loadtest/ benchmarks/ main.py
 
 echo "✨ Code formatting complete!"
@@ -4,7 +4,7 @@
 set -e
 
 echo "Running Flake8..."
-flake8 app/ tests/ main.py
+flake8 app/ tests/ loadtest/ benchmarks/ main.py
 
 echo "Running mypy..."
 mypy app/ main.py --no-error-summary 2>&1 || true
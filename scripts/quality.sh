@@ -9,12 +9,12 @@ echo "========================================="
 
 echo ""
 echo "1. Checking code formatting..."
-black --check app/ tests/ main.py
-isort --check-only app/ tests/ main.py
+black --check app/ tests/ loadtest/ benchmarks/ main.py
+isort --check-only app/ tests/ loadtest/ benchmarks/ main.py
 
 echo ""
 echo "2. Running linters..."
-flake8 app/ tests/ main.py
+flake8 app/ tests/ loadtest/ benchmarks/ main.py
 
 echo ""
 echo "3. Running type checks..."
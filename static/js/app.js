@@ -19,54 +19,235 @@ function closeMobileMenu() {
     mobileMenu.classList.add('hidden');
 }
 
-// Fetch products from API with filters
+// Current filters in the shape the catalog expects
+function catalogFilters() {
+    return {
+        category: currentFilters.category !== 'all' ? currentFilters.category : null,
+        priceMax: currentFilters.price !== 'all' ? Number(currentFilters.price) : null,
+        material: currentFilters.material !== 'all' ? currentFilters.material : null
+    };
+}
+
+// Show products matching the current filters (answered locally once the catalog is loaded)
 async function fetchProducts() {
+    const queryId = ++productQueryId;
     try {
-        let url = '/api/products';
-        const params = new URLSearchParams();
-        
-        if (currentFilters.category !== 'all') {
-            params.append('category', currentFilters.category);
-        }
-        if (currentFilters.price !== 'all') {
-            params.append('price_max', currentFilters.price);
-        }
-        if (currentFilters.material !== 'all') {
-            params.append('material', currentFilters.material);
-        }
-        
-        if (params.toString()) {
-            url += '?' + params.toString();
+        const { products, total } = await productCatalog.query(catalogFilters(), 0, PRODUCT_PAGE_SIZE);
+        if (queryId !== productQueryId) {
+            return;
         }
-        
-        const response = await fetch(url);
-        if (!response.ok) {
-            throw new Error('Failed to fetch products');
-        }
-        const products = await response.json();
-        displayProducts(products);
-        updateResultCounter(products.length);
+        displayProducts(products, total);
+        updateResultCounter(total);
     } catch (error) {
         console.error('Error fetching products:', error);
         showError('Failed to load products. Please try again later.');
     }
 }
 
+function updateTotalCount() {
+    allProducts = productCatalog.products;
+    document.getElementById('totalCount').textContent = productCatalog.total;
+}
+
+// Fetch the catalog changes since the local version and rebuild the facet indexes
 async function fetchAllProducts() {
     try {
-        const response = await fetch('/api/products');
-        if (!response.ok) {
-            throw new Error('Failed to fetch products');
-        }
-        allProducts = await response.json();
-        document.getElementById('totalCount').textContent = allProducts.length;
+        const changed = await productCatalog.sync();
+        updateTotalCount();
+        return changed;
     } catch (error) {
         console.error('Error fetching all products:', error);
+        throw error;
+    }
+}
+
+// Show the local replica at once (also offline), then catch up with the server
+async function loadCatalog() {
+    const hasLocal = await productCatalog.loadLocal();
+    if (hasLocal) {
+        updateTotalCount();
+        await fetchProducts();
+    }
+    try {
+        if (await fetchAllProducts() || !hasLocal) {
+            await fetchProducts();
+        }
+    } catch (error) {
+        if (!hasLocal) {
+            throw error;
+        }
+    }
+}
+
+// Catch up again when the page comes back online or into view
+function refreshCatalog() {
+    fetchAllProducts().then((changed) => {
+        if (changed) {
+            fetchProducts();
+        }
+    }).catch(() => {});
+}
+
+const PRODUCT_PAGE_SIZE = 60;
+const PRODUCT_IMAGE_SIZES = '(min-width: 1280px) 25vw, (min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw';
+const PLACEHOLDER_IMAGE = 'https://via.placeholder.com/500x500/D4AF37/FFFFFF?text=Jewelry';
+
+let productGridView = null;
+let productQueryId = 0;
+
+// Build an empty product card; updateProductCard fills it in
+function createProductCard() {
+    const card = document.createElement('div');
+    card.className = 'product-card bg-white rounded-lg shadow-md overflow-hidden hover:shadow-xl transition-shadow duration-300';
+    card.innerHTML = `
+        <div class="relative overflow-hidden group">
+            <img data-role="image"
+                 class="w-full h-64 object-cover group-hover:scale-110 transition-transform duration-500"
+                 loading="lazy">
+            <div data-role="badge" class="absolute top-2 right-2 bg-gold text-white text-xs font-bold px-2 py-1 rounded uppercase"></div>
+            <button data-action="wishlist"
+                    class="js-wishlist-btn absolute top-2 left-2 bg-white rounded-full p-2 shadow-md hover:scale-110 transition-all text-gray-400">
+                <svg class="w-5 h-5" fill="currentColor" viewBox="0 0 24 24">
+                    <path d="M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z"/>
+                </svg>
+            </button>
+        </div>
+        <div class="p-5">
+            <div class="mb-3">
+                <h3 data-role="name" class="font-bold text-lg text-luxury mb-1 line-clamp-2"></h3>
+                <p data-role="description" class="text-gray-600 text-sm line-clamp-2"></p>
+            </div>
+            <div class="flex items-center justify-between mb-4">
+                <span data-role="price" class="text-2xl font-bold text-gold"></span>
+                <span data-role="material" class="text-xs text-gray-500 uppercase tracking-wider"></span>
+            </div>
+            <div data-role="actions"></div>
+        </div>
+    `;
+    const image = card.querySelector('[data-role="image"]');
+    image.addEventListener('error', () => {
+        if (image.src !== PLACEHOLDER_IMAGE) {
+            image.removeAttribute('srcset');
+            image.src = PLACEHOLDER_IMAGE;
+        }
+    });
+    return card;
+}
+
+function productActionsHTML(customizable) {
+    if (customizable) {
+        return `
+            <button data-action="customize"
+                    class="w-full bg-gold hover:bg-dark-gold text-white font-semibold py-3 rounded-lg transition-colors duration-300 flex items-center justify-center gap-2 mb-2">
+                <svg class="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
+                    <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M11 5H6a2 2 0 00-2 2v11a2 2 0 002 2h11a2 2 0 002-2v-5m-1.414-9.414a2 2 0 112.828 2.828L11.828 15H9v-2.828l8.586-8.586z"></path>
+                </svg>
+                Customize
+            </button>
+            <button data-action="add-to-cart"
+                    class="w-full bg-luxury hover:bg-gray-800 text-white font-semibold py-2 rounded-lg transition-colors duration-300 flex items-center justify-center gap-2 text-sm">
+                <svg class="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
+                    <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M16 11V7a4 4 0 00-8 0v4M5 9h14l1 12H4L5 9z"></path>
+                </svg>
+                Add Standard
+            </button>
+        `;
+    }
+    return `
+        <button data-action="add-to-cart"
+                class="w-full bg-luxury hover:bg-gold text-white font-semibold py-3 rounded-lg transition-colors duration-300 flex items-center justify-center gap-2">
+            <svg class="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
+                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M16 11V7a4 4 0 00-8 0v4M5 9h14l1 12H4L5 9z"></path>
+            </svg>
+            Add to Cart
+        </button>
+    `;
+}
+
+// Point a (possibly recycled) card at another product
+function updateProductCard(card, product) {
+    card.dataset.productId = product.id;
+
+    const image = card.querySelector('[data-role="image"]');
+    if (product.srcset) {
+        image.srcset = product.srcset;
+        image.sizes = PRODUCT_IMAGE_SIZES;
+    } else {
+        image.removeAttribute('srcset');
+        image.removeAttribute('sizes');
+    }
+    image.src = product.image;
+    image.alt = product.name;
+
+    card.querySelector('[data-role="badge"]').textContent = product.category.replace('s', '');
+    card.querySelector('[data-role="name"]').textContent = product.name;
+    card.querySelector('[data-role="description"]').textContent = product.description;
+    card.querySelector('[data-role="price"]').textContent = `$${product.price.toFixed(2)}`;
+    card.querySelector('[data-role="material"]').textContent = product.material;
+
+    const wishlistBtn = card.querySelector('[data-action="wishlist"]');
+    const isInWishlist = wishlist.isInWishlist(product.id);
+    wishlistBtn.dataset.productId = product.id;
+    wishlistBtn.classList.toggle('text-red-500', isInWishlist);
+    wishlistBtn.classList.toggle('text-gray-400', !isInWishlist);
+
+    const customizable = product.customizable ? 'true' : 'false';
+    if (card.dataset.customizable !== customizable) {
+        card.querySelector('[data-role="actions"]').innerHTML = productActionsHTML(product.customizable);
+        card.dataset.customizable = customizable;
+    }
+}
+
+// Card buttons are handled here rather than per node, so recycled cards need no rebinding
+function handleProductGridClick(event) {
+    const button = event.target.closest('[data-action]');
+    const card = button && button.closest('.product-card');
+    if (!card) {
+        return;
+    }
+    const productId = Number(card.dataset.productId);
+    if (button.dataset.action === 'wishlist') {
+        toggleWishlist(productId);
+    } else if (button.dataset.action === 'customize') {
+        openCustomization(productId);
+    } else if (button.dataset.action === 'add-to-cart') {
+        addToCart(productId);
+    }
+}
+
+function getProductGridView() {
+    if (!productGridView) {
+        const productGrid = document.getElementById('productGrid');
+        productGrid.addEventListener('click', handleProductGridClick);
+        productGrid.addEventListener('mouseover', handleProductGridHover);
+        productGrid.addEventListener('focusin', handleProductGridHover);
+        productGridView = new VirtualGrid(productGrid, {
+            createCard: createProductCard,
+            updateCard: updateProductCard,
+            onNearEnd: loadMoreProducts
+        });
+    }
+    return productGridView;
+}
+
+// Fetch the next page for the current filters as the user nears the end of the grid
+async function loadMoreProducts() {
+    const queryId = productQueryId;
+    const view = getProductGridView();
+    try {
+        const { products, total } = await productCatalog.query(
+            catalogFilters(), view.items.length, PRODUCT_PAGE_SIZE
+        );
+        if (queryId === productQueryId) {
+            view.appendItems(products, view.items.length + products.length < total);
+        }
+    } catch (error) {
+        console.error('Error fetching more products:', error);
     }
 }
 
 // Display products in grid
-function displayProducts(products) {
+function displayProducts(products, total = products.length) {
     const loading = document.getElementById('loading');
     const productGrid = document.getElementById('productGrid');
     const noResults = document.getElementById('noResults');
@@ -81,64 +262,7 @@ function displayProducts(products) {
 
     noResults.classList.add('hidden');
     productGrid.classList.remove('hidden');
-
-    productGrid.innerHTML = products.map(product => {
-        const isInWishlist = wishlist.isInWishlist(product.id);
-        return `
-        <div class="product-card bg-white rounded-lg shadow-md overflow-hidden hover:shadow-xl transition-shadow duration-300">
-            <div class="relative overflow-hidden group">
-                <img src="${product.image}"
-                     alt="${product.name}"
-                     class="w-full h-64 object-cover group-hover:scale-110 transition-transform duration-500"
-                     onerror="this.src='https://via.placeholder.com/500x500/D4AF37/FFFFFF?text=Jewelry'">
-                <div class="absolute top-2 right-2 bg-gold text-white text-xs font-bold px-2 py-1 rounded uppercase">
-                    ${product.category.replace('s', '')}
-                </div>
-                <button onclick="toggleWishlist(${product.id})"
-                        data-product-id="${product.id}"
-                        class="js-wishlist-btn absolute top-2 left-2 bg-white rounded-full p-2 shadow-md hover:scale-110 transition-all ${isInWishlist ? 'text-red-500' : 'text-gray-400'}">
-                    <svg class="w-5 h-5" fill="currentColor" viewBox="0 0 24 24">
-                        <path d="M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z"/>
-                    </svg>
-                </button>
-            </div>
-            <div class="p-5">
-                <div class="mb-3">
-                    <h3 class="font-bold text-lg text-luxury mb-1 line-clamp-2">${product.name}</h3>
-                    <p class="text-gray-600 text-sm line-clamp-2">${product.description}</p>
-                </div>
-                <div class="flex items-center justify-between mb-4">
-                    <span class="text-2xl font-bold text-gold">$${product.price.toFixed(2)}</span>
-                    <span class="text-xs text-gray-500 uppercase tracking-wider">${product.material}</span>
-                </div>
-                ${product.customizable ? `
-                    <button onclick="openCustomization(${product.id})"
-                            class="w-full bg-gold hover:bg-dark-gold text-white font-semibold py-3 rounded-lg transition-colors duration-300 flex items-center justify-center gap-2 mb-2">
-                        <svg class="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                            <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M11 5H6a2 2 0 00-2 2v11a2 2 0 002 2h11a2 2 0 002-2v-5m-1.414-9.414a2 2 0 112.828 2.828L11.828 15H9v-2.828l8.586-8.586z"></path>
-                        </svg>
-                        Customize
-                    </button>
-                    <button onclick="addToCart(${product.id})"
-                            class="w-full bg-luxury hover:bg-gray-800 text-white font-semibold py-2 rounded-lg transition-colors duration-300 flex items-center justify-center gap-2 text-sm">
-                        <svg class="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                            <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M16 11V7a4 4 0 00-8 0v4M5 9h14l1 12H4L5 9z"></path>
-                        </svg>
-                        Add Standard
-                    </button>
-                ` : `
-                    <button onclick="addToCart(${product.id})"
-                            class="w-full bg-luxury hover:bg-gold text-white font-semibold py-3 rounded-lg transition-colors duration-300 flex items-center justify-center gap-2">
-                        <svg class="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                            <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M16 11V7a4 4 0 00-8 0v4M5 9h14l1 12H4L5 9z"></path>
-                        </svg>
-                        Add to Cart
-                    </button>
-                `}
-            </div>
-        </div>
-    `;
-    }).join('');
+    getProductGridView().setItems(products, products.length < total);
 }
 
 // Update result counter
@@ -219,20 +343,80 @@ function filterProducts(category) {
 
 // Add product to cart
 function addToCart(productId) {
-    const product = allProducts.find(p => p.id === productId);
+    const product = productCatalog.get(productId);
     if (product) {
         cart.addItem(product);
     }
 }
 
+// Customization builder, loaded on first use rather than with the page
+const CUSTOMIZATION_SCRIPT = '/bundles/customization.js';
+const CUSTOMIZATION_STYLES = '/bundles/customization.css';
+let customizationModule = null;
+
+function loadCustomizationModule() {
+    if (!customizationModule) {
+        const styles = new Promise((resolve, reject) => {
+            const link = document.createElement('link');
+            link.rel = 'stylesheet';
+            link.href = CUSTOMIZATION_STYLES;
+            link.onload = resolve;
+            link.onerror = reject;
+            document.head.appendChild(link);
+        });
+        const script = new Promise((resolve, reject) => {
+            const element = document.createElement('script');
+            element.src = CUSTOMIZATION_SCRIPT;
+            element.onload = resolve;
+            element.onerror = reject;
+            document.head.appendChild(element);
+        });
+        customizationModule = Promise.all([styles, script]).catch((error) => {
+            // Allow a retry on the next attempt
+            customizationModule = null;
+            throw error;
+        });
+    }
+    return customizationModule;
+}
+
+// Fetch the builder and the product's config before the user clicks Customize
+const prefetchedCustomizations = new Set();
+
+function prefetchCustomization(product) {
+    if (prefetchedCustomizations.has(product.category)) {
+        return;
+    }
+    prefetchedCustomizations.add(product.category);
+    loadCustomizationModule()
+        .then(() => fetchCustomizationConfig(product.category))
+        .catch(() => {});
+}
+
+function handleProductGridHover(event) {
+    const card = event.target.closest('.product-card[data-customizable="true"]');
+    if (card) {
+        const product = productCatalog.get(Number(card.dataset.productId));
+        if (product) {
+            prefetchCustomization(product);
+        }
+    }
+}
+
 // Open customization modal
-function openCustomization(productId) {
-    const product = allProducts.find(p => p.id === productId);
-    if (product && product.customizable) {
-        openCustomizationModal(product);
-    } else {
+async function openCustomization(productId) {
+    const product = productCatalog.get(productId);
+    if (!product || !product.customizable) {
         showError('This product is not available for customization');
+        return;
     }
+    try {
+        await loadCustomizationModule();
+    } catch (error) {
+        showError('Failed to load customization. Please try again.');
+        return;
+    }
+    openCustomizationModal(product);
 }
 
 // Show error message
@@ -250,9 +434,10 @@ function showError(message) {
 
 // Initialize app
 document.addEventListener('DOMContentLoaded', () => {
-    fetchAllProducts();
     loadFiltersFromURL();
-    fetchProducts();
+    loadCatalog().catch(() => showError('Failed to load products. Please try again later.'));
+    wishlist.sync().catch((error) => console.warn('Wishlist sync failed:', error));
+    cart.sync().catch((error) => console.warn('Cart sync failed:', error));
 
     const categoryFilter = document.getElementById('categoryFilter');
     const priceFilter = document.getElementById('priceFilter');
@@ -298,3 +483,20 @@ document.addEventListener('DOMContentLoaded', () => {
         btn.classList.add('text-gold', 'font-bold');
     });
 });
+
+window.addEventListener('online', refreshCatalog);
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'visible') {
+        refreshCatalog();
+    }
+});
+
+// Re-check the catalog version when the service worker saw newer products
+if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.addEventListener('message', (event) => {
+        const data = event.data || {};
+        if (data.type === 'api-updated' && new URL(data.url).pathname.startsWith('/api/products')) {
+            refreshCatalog();
+        }
+    });
+}
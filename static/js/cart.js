@@ -1,73 +1,246 @@
 // Shopping Cart Management
+//
+// Cart lines are (product, customization, quantity); prices and totals come
+// from the server (/api/carts/{id}), which prices every line against the
+// current catalog. Quantity changes show immediately, and rapid clicks are
+// coalesced into one batched write. Writes carry the cart version they were
+// based on; if another tab or device changed the cart first, the changes
+// are rebased on the new version and sent again.
+
+const CART_SYNC_DELAY = 300;
+const CART_MAX_RETRIES = 3;
 
 class ShoppingCart {
-    constructor() {
-        this.items = this.loadCart();
+    constructor(options = {}) {
+        this.endpoint = options.endpoint || '/api/carts';
+        this.fetch = options.fetch || ((...args) => window.fetch(...args));
+        this.syncDelay = options.syncDelay ?? CART_SYNC_DELAY;
+        this.state = this.loadCart();
+        this.items = this.state.lines;
+        this.syncTimer = null;
+        this.syncing = null;
+        this.saveCart();
         this.updateCartUI();
     }
 
     // Load cart from localStorage
     loadCart() {
-        const saved = localStorage.getItem('pandora_cart');
-        return saved ? JSON.parse(saved) : [];
+        let saved = null;
+        try {
+            saved = JSON.parse(localStorage.getItem('pandora_cart'));
+        } catch (error) {
+            saved = null;
+        }
+        if (saved && !Array.isArray(saved) && saved.id) {
+            return saved;
+        }
+        const state = { id: newCartId(), version: 0, lines: [], pending: {} };
+        // Carts saved before server sync held product snapshots: upload them as changes
+        (Array.isArray(saved) ? saved : []).forEach(product => {
+            const line = cartLineFromProduct(product, state.lines);
+            if (!state.lines.includes(line)) {
+                state.lines.push(line);
+            }
+            line.quantity += product.quantity || 1;
+            state.pending[line.key] = pendingChange(line, 0);
+        });
+        return state;
     }
 
     // Save cart to localStorage
     saveCart() {
-        localStorage.setItem('pandora_cart', JSON.stringify(this.items));
+        this.state.lines = this.items;
+        localStorage.setItem('pandora_cart', JSON.stringify(this.state));
     }
 
-    // Add item to cart
+    // Add item to cart (customized items with identical options share a line)
     addItem(product) {
-        // For customized items, treat each as unique (they have unique IDs already)
-        // For regular items, check if already in cart
-        if (product.isCustomized) {
-            this.items.push({
-                ...product,
-                quantity: 1
-            });
-        } else {
-            const existingItem = this.items.find(item => item.id === product.id && !item.isCustomized);
-
-            if (existingItem) {
-                existingItem.quantity += 1;
-            } else {
-                this.items.push({
-                    ...product,
-                    quantity: 1
-                });
-            }
-        }
-
-        this.saveCart();
-        this.updateCartUI();
+        const line = cartLineFromProduct(product, this.items);
+        this.setQuantity(line, line.quantity + 1);
         this.showNotification(`${product.name} added to cart`);
     }
 
     // Remove item from cart
-    removeItem(productId) {
-        this.items = this.items.filter(item => item.id !== productId);
+    removeItem(key) {
+        const line = this.items.find(item => item.key === key);
+        if (line) {
+            this.setQuantity(line, 0);
+        }
+    }
+
+    // Update item quantity
+    updateQuantity(key, quantity) {
+        const line = this.items.find(item => item.key === key);
+        if (line) {
+            this.setQuantity(line, Math.max(0, quantity));
+        }
+    }
+
+    // Change a line locally and queue it for the next batched write
+    setQuantity(line, quantity) {
+        const existing = this.state.pending[line.key];
+        const baseQuantity = existing ? existing.baseQuantity : this.serverQuantity(line.key);
+        line.quantity = quantity;
+        if (!this.items.includes(line)) {
+            this.items.push(line);
+        }
+        if (quantity === 0) {
+            this.items = this.items.filter(item => item !== line);
+        }
+        this.state.pending[line.key] = pendingChange(line, baseQuantity);
         this.saveCart();
         this.updateCartUI();
+        this.scheduleSync();
     }
 
-    // Update item quantity
-    updateQuantity(productId, quantity) {
-        const item = this.items.find(item => item.id === productId);
-        if (item) {
-            if (quantity <= 0) {
-                this.removeItem(productId);
-            } else {
-                item.quantity = quantity;
-                this.saveCart();
-                this.updateCartUI();
+    // Quantity of a line in the last cart state received from the server
+    serverQuantity(key) {
+        const lines = this.state.server ? this.state.server.lines : [];
+        const line = lines.find(item => `${item.product_id}:${item.customization_hash}` === key);
+        return line ? line.quantity : 0;
+    }
+
+    scheduleSync() {
+        if (this.syncTimer) {
+            return;
+        }
+        this.syncTimer = setTimeout(() => {
+            this.syncTimer = null;
+            this.flush().catch(error => console.warn('Cart sync failed:', error));
+        }, this.syncDelay);
+    }
+
+    async request(path, init = {}) {
+        const response = await this.fetch(`${this.endpoint}/${this.state.id}${path}`, init);
+        if (!response.ok) {
+            const error = new Error(`Cart sync failed: ${response.status}`);
+            error.status = response.status;
+            throw error;
+        }
+        return response.json();
+    }
+
+    // Send all queued changes as one write, rebasing them after a version conflict
+    async flush() {
+        while (this.syncing) {
+            await this.syncing.catch(() => {});
+        }
+        for (let attempt = 0; attempt < CART_MAX_RETRIES; attempt++) {
+            const sent = { ...this.state.pending };
+            const changes = Object.values(sent);
+            if (changes.length === 0) {
+                return;
+            }
+            this.syncing = this.request('/changes', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    base_version: this.state.version,
+                    lines: changes.map(change => change.line)
+                }),
+                keepalive: true
+            });
+            try {
+                const state = await this.syncing;
+                // Changes made while the write was in flight stay queued
+                Object.keys(sent).forEach(key => {
+                    if (this.state.pending[key] === sent[key]) {
+                        delete this.state.pending[key];
+                    }
+                });
+                this.applyServerState(state);
+                return;
+            } catch (error) {
+                if (error.status === 409) {
+                    this.syncing = null;
+                    await this.pull();
+                    this.rebasePending();
+                    continue;
+                }
+                if (error.status >= 400 && error.status < 500) {
+                    // The server rejected the changes (e.g. a product was removed): resync
+                    this.state.pending = {};
+                    this.syncing = null;
+                    await this.pull();
+                    return;
+                }
+                throw error;
+            } finally {
+                this.syncing = null;
             }
         }
     }
 
-    // Get cart total
+    // Re-apply each queued change as a difference on top of the server's quantity
+    rebasePending() {
+        Object.values(this.state.pending).forEach(change => {
+            const serverQuantity = this.serverQuantity(change.key);
+            change.line.quantity = Math.max(0, serverQuantity + change.line.quantity - change.baseQuantity);
+            change.baseQuantity = serverQuantity;
+        });
+        this.applyServerState(this.state.server);
+    }
+
+    // Fetch the cart with current prices
+    async pull() {
+        this.applyServerState(await this.request(''));
+    }
+
+    // Bring the cart up to date with the server (and other tabs or devices)
+    async sync() {
+        if (Object.keys(this.state.pending).length > 0) {
+            await this.flush();
+        } else {
+            await this.pull();
+        }
+    }
+
+    // Show the server's lines and prices, with still-queued changes on top
+    applyServerState(server) {
+        const previous = this.items;
+        const serverLines = server.lines.map(line => cartLineFromServer(line, previous));
+        const pending = this.state.pending;
+
+        // A new customized line queued again while its first write was in flight
+        // now has a hash: queue further changes against that line
+        Object.values(pending).forEach(change => {
+            const match = change.key.startsWith('new:') &&
+                serverLines.find(line => line.selectionKey === change.key.slice(4));
+            if (match) {
+                delete pending[change.key];
+                change.key = match.key;
+                change.line.customization_hash = match.customizationHash;
+                delete change.line.customizations;
+                change.baseQuantity = match.quantity;
+                pending[match.key] = change;
+            }
+        });
+
+        const lines = serverLines.map(line => ({ ...line }));
+        Object.values(pending).forEach(change => {
+            let line = lines.find(item => item.key === change.key);
+            if (!line) {
+                line = previous.find(item => item.key === change.key);
+                if (!line) {
+                    return;
+                }
+                line = { ...line };
+                lines.push(line);
+            }
+            line.quantity = change.line.quantity;
+        });
+        this.state.version = server.version;
+        this.state.server = server;
+        this.items = lines.filter(line => line.quantity > 0);
+        this.saveCart();
+        this.updateCartUI();
+    }
+
+    // Get cart total (the server's prices once synced)
     getTotal() {
-        return this.items.reduce((total, item) => total + (item.price * item.quantity), 0);
+        return this.items
+            .filter(item => item.available !== false)
+            .reduce((total, item) => total + (item.price * item.quantity), 0);
     }
 
     // Get total items count
@@ -88,8 +261,8 @@ class ShoppingCart {
         if (this.items.length === 0) {
             cartItems.innerHTML = '<p class="text-gray-500 text-center">Your cart is empty</p>';
         } else {
-            cartItems.innerHTML = this.items.map(item => `
-                <div class="cart-item bg-white rounded-lg shadow p-4 mb-4">
+            cartItems.innerHTML = this.items.map((item, index) => `
+                <div class="cart-item bg-white rounded-lg shadow p-4 mb-4" data-line-index="${index}">
                     ${item.isCustomized ? '<div class="inline-block bg-gold text-white text-xs px-2 py-1 rounded mb-2">Customized</div>' : ''}
                     <div class="flex gap-4">
                         <img src="${item.image}" alt="${item.name}" class="w-20 h-20 object-cover rounded">
@@ -100,22 +273,26 @@ class ShoppingCart {
                                     ${item.customizationSummary.map(c => `${c.label}: ${c.value}`).join(' • ')}
                                 </div>
                             ` : ''}
-                            <p class="text-gold font-bold mb-2">$${item.price.toFixed(2)}</p>
+                            ${item.available === false ? `
+                                <p class="text-red-500 text-sm mb-2">No longer available</p>
+                            ` : `
+                                <p class="text-gold font-bold mb-2">$${item.price.toFixed(2)}</p>
+                            `}
                             <div class="flex items-center gap-2">
                                 ${!item.isCustomized ? `
-                                    <button onclick="cart.updateQuantity('${item.id}', ${item.quantity - 1})"
+                                    <button data-action="decrement"
                                             class="bg-gray-200 hover:bg-gray-300 w-7 h-7 rounded flex items-center justify-center">
                                         <span class="text-lg font-bold">−</span>
                                     </button>
                                     <span class="w-8 text-center font-semibold">${item.quantity}</span>
-                                    <button onclick="cart.updateQuantity('${item.id}', ${item.quantity + 1})"
+                                    <button data-action="increment"
                                             class="bg-gray-200 hover:bg-gray-300 w-7 h-7 rounded flex items-center justify-center">
                                         <span class="text-lg font-bold">+</span>
                                     </button>
                                 ` : `
                                     <span class="text-sm text-gray-600">Qty: ${item.quantity}</span>
                                 `}
-                                <button onclick="cart.removeItem('${item.id}')"
+                                <button data-action="remove"
                                         class="ml-auto text-red-500 hover:text-red-700">
                                     <svg class="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                                         <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16"></path>
@@ -131,6 +308,23 @@ class ShoppingCart {
         cartTotal.textContent = `$${this.getTotal().toFixed(2)}`;
     }
 
+    // Quantity and remove buttons, handled once for the whole list
+    handleCartClick(event) {
+        const button = event.target.closest('[data-action]');
+        const row = button && button.closest('[data-line-index]');
+        if (!row) {
+            return;
+        }
+        const line = this.items[Number(row.dataset.lineIndex)];
+        if (button.dataset.action === 'increment') {
+            this.updateQuantity(line.key, line.quantity + 1);
+        } else if (button.dataset.action === 'decrement') {
+            this.updateQuantity(line.key, line.quantity - 1);
+        } else if (button.dataset.action === 'remove') {
+            this.removeItem(line.key);
+        }
+    }
+
     // Show notification
     showNotification(message) {
         // Create notification element
@@ -147,9 +341,101 @@ class ShoppingCart {
     }
 }
 
+// Stable string for a set of selected options, independent of key order
+function selectionKey(productId, selections) {
+    const sorted = Object.keys(selections).sort().map(key => [key, selections[key]]);
+    return JSON.stringify([productId, sorted]);
+}
+
+// The cart line a product (or customized product) belongs in, existing or new
+function cartLineFromProduct(product, lines) {
+    if (product.isCustomized) {
+        const productId = product.productId;
+        const selections = {};
+        Object.entries(product.customizations || {}).forEach(([optionId, selection]) => {
+            selections[optionId] = selection.value;
+        });
+        const selection = selectionKey(productId, selections);
+        const existing = lines.find(line => line.selectionKey === selection);
+        return existing || {
+            key: `new:${selection}`,
+            productId,
+            customizationHash: '',
+            customizations: selections,
+            selectionKey: selection,
+            isCustomized: true,
+            customizationSummary: product.customizationSummary,
+            name: product.name,
+            image: product.image,
+            price: product.price,
+            quantity: 0
+        };
+    }
+    const key = `${product.id}:`;
+    return lines.find(line => line.key === key) || {
+        key,
+        productId: product.id,
+        customizationHash: '',
+        isCustomized: false,
+        name: product.name,
+        image: product.image,
+        price: product.price,
+        quantity: 0
+    };
+}
+
+// A line from the server, keeping the display summary of the matching local line
+function cartLineFromServer(line, previous) {
+    const selection = line.customizations ? selectionKey(line.product_id, line.customizations) : null;
+    const key = `${line.product_id}:${line.customization_hash}`;
+    const local = previous.find(item => item.key === key || (selection && item.selectionKey === selection));
+    return {
+        key,
+        productId: line.product_id,
+        customizationHash: line.customization_hash,
+        customizations: line.customizations,
+        selectionKey: selection,
+        isCustomized: Boolean(line.customization_hash),
+        customizationSummary: local && local.customizationSummary
+            ? local.customizationSummary
+            : Object.entries(line.customizations || {}).map(([label, value]) => ({ label, value })),
+        name: line.name || (local && local.name) || 'Unavailable product',
+        image: line.image || (local && local.image) || '',
+        price: line.unit_price ?? (local ? local.price : 0),
+        available: line.available,
+        quantity: line.quantity
+    };
+}
+
+// What to send for a line: new customized lines send their options instead of a hash
+function pendingChange(line, baseQuantity) {
+    const change = {
+        product_id: line.productId,
+        customization_hash: line.customizationHash,
+        quantity: line.quantity
+    };
+    if (line.isCustomized && !line.customizationHash) {
+        change.customizations = line.customizations;
+    }
+    return { key: line.key, line: change, baseQuantity };
+}
+
+// Random id for this browser's cart
+function newCartId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Array.from({ length: 4 }, () => Math.random().toString(36).slice(2, 10)).join('');
+}
+
 // Initialize cart
 const cart = new ShoppingCart();
 
+// Send changes still waiting for the batch timer before the page goes away
+window.addEventListener('pagehide', () => {
+    cart.flush().catch(() => {});
+});
+
 // Cart sidebar controls
 const cartBtn = document.getElementById('cartBtn');
 const closeCartBtn = document.getElementById('closeCartBtn');
@@ -169,5 +455,6 @@ function closeCart() {
 }
 
 cartBtn.addEventListener('click', openCart);
+document.getElementById('cartItems').addEventListener('click', (event) => cart.handleCartClick(event));
 closeCartBtn.addEventListener('click', closeCart);
 cartOverlay.addEventListener('click', closeCart);
@@ -0,0 +1,117 @@
+// Local Catalog Replica
+//
+// Keeps a copy of the catalog in IndexedDB: products keyed by id plus the
+// catalog epoch and version they reflect. Deltas from the change feed are
+// written product by product, so a sync writes only what changed. Browsers
+// without IndexedDB, or where opening it fails (e.g. private browsing), fall
+// back to an in-memory replica that lasts for the page.
+
+const CATALOG_DB_NAME = 'pandora-catalog';
+const CATALOG_DB_VERSION = 1;
+
+// Promise for an IDBRequest or the completion of an IDBTransaction
+function idbDone(target) {
+    return new Promise((resolve, reject) => {
+        if ('oncomplete' in target) {
+            target.oncomplete = () => resolve();
+            target.onabort = () => reject(target.error);
+        } else {
+            target.onsuccess = () => resolve(target.result);
+        }
+        target.onerror = () => reject(target.error);
+    });
+}
+
+class IndexedDBCatalogReplica {
+    constructor(name = CATALOG_DB_NAME) {
+        this.name = name;
+        this.db = null;
+    }
+
+    open() {
+        if (!this.db) {
+            try {
+                const request = indexedDB.open(this.name, CATALOG_DB_VERSION);
+                request.onupgradeneeded = () => {
+                    request.result.createObjectStore('products', { keyPath: 'id' });
+                    request.result.createObjectStore('meta');
+                };
+                this.db = idbDone(request);
+            } catch (error) {
+                // Some browsers throw instead of failing the request when storage is blocked
+                this.db = Promise.reject(error);
+            }
+        }
+        return this.db;
+    }
+
+    // {epoch, version, products} as last saved, or null if empty
+    async load() {
+        const db = await this.open();
+        const transaction = db.transaction(['products', 'meta'], 'readonly');
+        const [meta, products] = await Promise.all([
+            idbDone(transaction.objectStore('meta').get('state')),
+            idbDone(transaction.objectStore('products').getAll())
+        ]);
+        return meta ? { epoch: meta.epoch, version: meta.version, products } : null;
+    }
+
+    // Apply a change feed response ({epoch, version, reset, products, removed})
+    async apply(changes) {
+        const db = await this.open();
+        const transaction = db.transaction(['products', 'meta'], 'readwrite');
+        const products = transaction.objectStore('products');
+        if (changes.reset) {
+            products.clear();
+        }
+        changes.products.forEach((product) => products.put(product));
+        changes.removed.forEach((productId) => products.delete(productId));
+        transaction.objectStore('meta').put({ epoch: changes.epoch, version: changes.version }, 'state');
+        await idbDone(transaction);
+    }
+}
+
+class MemoryCatalogReplica {
+    constructor() {
+        this.state = null;
+    }
+
+    async load() {
+        return this.state && {
+            epoch: this.state.epoch,
+            version: this.state.version,
+            products: Array.from(this.state.products.values())
+        };
+    }
+
+    async apply(changes) {
+        const products = changes.reset || !this.state ? new Map() : this.state.products;
+        changes.products.forEach((product) => products.set(product.id, product));
+        changes.removed.forEach((productId) => products.delete(productId));
+        this.state = { epoch: changes.epoch, version: changes.version, products };
+    }
+}
+
+// The IndexedDB replica once it opens, or a memory replica if it cannot be opened
+class FallbackCatalogReplica {
+    constructor(primary = new IndexedDBCatalogReplica()) {
+        this.replica = Promise.resolve()
+            .then(() => primary.open())
+            .then(() => primary, (error) => {
+                console.warn('IndexedDB unavailable, keeping the catalog in memory:', error);
+                return new MemoryCatalogReplica();
+            });
+    }
+
+    async load() {
+        return (await this.replica).load();
+    }
+
+    async apply(changes) {
+        return (await this.replica).apply(changes);
+    }
+}
+
+function createCatalogReplica() {
+    return typeof indexedDB !== 'undefined' ? new FallbackCatalogReplica() : new MemoryCatalogReplica();
+}
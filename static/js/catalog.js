@@ -0,0 +1,226 @@
+// Client-side Product Catalog
+//
+// Keeps a replica of the catalog (see catalog-replica.js), builds per-facet
+// indexes and answers filter changes locally, also while offline. The replica
+// is brought up to date through the server's change feed, which sends only
+// the products added, updated or removed since the version held locally.
+// Catalogs too large to hold in the page are paged on the server instead.
+
+const CLIENT_CATALOG_LIMIT = 5000;
+const CATALOG_PAGE_SIZE = 60;
+
+class ProductCatalog {
+    constructor(options = {}) {
+        this.endpoint = options.endpoint || '/api/products';
+        this.limit = options.limit || CLIENT_CATALOG_LIMIT;
+        this.pageSize = options.pageSize || CATALOG_PAGE_SIZE;
+        this.changesEndpoint = options.changesEndpoint || `${this.endpoint}/changes`;
+        this.fetch = options.fetch || ((...args) => window.fetch(...args));
+        this.replica = options.replica || createCatalogReplica();
+        this.mode = 'local';
+        this.epoch = null;
+        this.version = 0;    // catalog version held locally (0: none)
+        this.total = 0;
+        this.products = [];
+        this.byId = new Map();
+        this.buildIndexes([]);
+    }
+
+    // Build facet -> positions maps and a price-sorted position list
+    buildIndexes(products) {
+        this.products = products;
+        this.byCategory = new Map();
+        this.byMaterial = new Map();
+        products.forEach((product, position) => {
+            this.byId.set(product.id, product);
+            if (!this.byCategory.has(product.category)) {
+                this.byCategory.set(product.category, []);
+            }
+            this.byCategory.get(product.category).push(position);
+            if (!this.byMaterial.has(product.material)) {
+                this.byMaterial.set(product.material, []);
+            }
+            this.byMaterial.get(product.material).push(position);
+        });
+        this.byPrice = Uint32Array.from(products.keys()).sort(
+            (a, b) => products[a].price - products[b].price
+        );
+        this.sortedPrices = Float64Array.from(this.byPrice, (position) => products[position].price);
+    }
+
+    // Positions of products priced at most priceMax (binary search)
+    positionsUpTo(priceMax) {
+        let low = 0;
+        let high = this.sortedPrices.length;
+        while (low < high) {
+            const mid = (low + high) >>> 1;
+            if (this.sortedPrices[mid] <= priceMax) {
+                low = mid + 1;
+            } else {
+                high = mid;
+            }
+        }
+        return this.byPrice.subarray(0, low);
+    }
+
+    // Positions matching all filters, in catalog order
+    matchPositions(filters) {
+        const { category, priceMax, material } = filters;
+        const candidates = [];
+        if (category) {
+            candidates.push(this.byCategory.get(category) || []);
+        }
+        if (material) {
+            candidates.push(this.byMaterial.get(material) || []);
+        }
+        const byPrice = priceMax ? this.positionsUpTo(Number(priceMax)) : null;
+        if (byPrice) {
+            candidates.push(byPrice);
+        }
+        if (candidates.length === 0) {
+            return Array.from(this.products.keys());
+        }
+
+        // Scan the smallest candidate list and check the other filters directly
+        candidates.sort((a, b) => a.length - b.length);
+        const smallest = candidates[0];
+        const products = this.products;
+        const matches = [];
+        for (const position of smallest) {
+            const product = products[position];
+            if ((!category || product.category === category) &&
+                (!material || product.material === material) &&
+                (!priceMax || product.price <= priceMax)) {
+                matches.push(position);
+            }
+        }
+        // Facet lists are in catalog order already; the price list is not
+        return smallest === byPrice ? matches.sort((a, b) => a - b) : matches;
+    }
+
+    queryString(filters, offset, limit) {
+        const params = new URLSearchParams();
+        if (filters.category) {
+            params.append('category', filters.category);
+        }
+        if (filters.priceMax) {
+            params.append('price_max', filters.priceMax);
+        }
+        if (filters.material) {
+            params.append('material', filters.material);
+        }
+        if (offset) {
+            params.append('offset', offset);
+        }
+        if (limit) {
+            params.append('limit', limit);
+        }
+        const query = params.toString();
+        return query ? `${this.endpoint}?${query}` : this.endpoint;
+    }
+
+    async fetchPage(filters, offset, limit) {
+        const response = await this.fetch(this.queryString(filters, offset, limit));
+        if (!response.ok) {
+            throw new Error('Failed to fetch products');
+        }
+        const products = await response.json();
+        products.forEach((product) => this.byId.set(product.id, product));
+        const total = Number(response.headers.get('X-Total-Count'));
+        return { products, total: Number.isNaN(total) ? products.length : total };
+    }
+
+    // Hold products (in id order, like the replica) and index them
+    setProducts(products) {
+        products.sort((a, b) => a.id - b.id);
+        this.byId = new Map();
+        this.buildIndexes(products);
+        this.total = products.length;
+    }
+
+    // Show the replica saved by an earlier visit. Returns true if there was one.
+    async loadLocal() {
+        let state = null;
+        try {
+            state = await this.replica.load();
+        } catch (error) {
+            console.warn('Catalog replica unavailable, keeping it in memory:', error);
+            this.replica = new MemoryCatalogReplica();
+        }
+        if (!state) {
+            return false;
+        }
+        this.epoch = state.epoch;
+        this.version = state.version;
+        this.setProducts(state.products);
+        return true;
+    }
+
+    // Merge a change feed response into the products held in the page
+    applyChanges(changes) {
+        const byId = new Map(changes.reset ? [] : this.products.map((product) => [product.id, product]));
+        changes.products.forEach((product) => byId.set(product.id, product));
+        changes.removed.forEach((productId) => byId.delete(productId));
+        this.epoch = changes.epoch;
+        this.version = changes.version;
+        this.setProducts(Array.from(byId.values()));
+    }
+
+    // Bring the local copy up to date with the server's catalog version.
+    // Returns true when the catalog changed.
+    async sync() {
+        if (this.version === 0) {
+            // Nothing held yet: make sure the catalog is small enough to hold
+            const first = await this.fetchPage({}, 0, this.pageSize);
+            if (first.total > this.limit) {
+                this.mode = 'server';
+                this.total = first.total;
+                this.buildIndexes([]);
+                return true;
+            }
+        }
+
+        this.mode = 'local';
+        const params = new URLSearchParams({ since: this.version });
+        if (this.epoch) {
+            params.append('epoch', this.epoch);
+        }
+        const response = await this.fetch(`${this.changesEndpoint}?${params}`);
+        if (!response.ok) {
+            throw new Error('Failed to fetch catalog changes');
+        }
+        const changes = await response.json();
+        if (!changes.reset && changes.version === this.version) {
+            return false;
+        }
+        this.applyChanges(changes);
+        try {
+            await this.replica.apply(changes);
+        } catch (error) {
+            // Keep the copy in memory from now on, so the stored one never skips a delta
+            console.warn('Failed to save the catalog locally:', error);
+            this.replica = new MemoryCatalogReplica();
+            await this.replica.apply({ ...changes, reset: true, products: this.products, removed: [] });
+        }
+        return true;
+    }
+
+    // Products matching filters ({category, priceMax, material}), one page at a time
+    async query(filters, offset = 0, limit = null) {
+        if (this.mode === 'server') {
+            return this.fetchPage(filters, offset, limit || this.pageSize);
+        }
+        const positions = this.matchPositions(filters);
+        const end = limit ? offset + limit : undefined;
+        return {
+            products: positions.slice(offset, end).map((position) => this.products[position]),
+            total: positions.length,
+        };
+    }
+
+    get(productId) {
+        return this.byId.get(productId);
+    }
+}
+
+const productCatalog = new ProductCatalog();
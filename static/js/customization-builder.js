@@ -622,8 +622,8 @@ function openCustomizationModal(product) {
     activeCustomizationBuilder.init();
 }
 
-// Close button handler
-document.addEventListener('DOMContentLoaded', () => {
+// Modal controls (this script may be loaded after the page has finished loading)
+function bindCustomizationControls() {
     const closeBtn = document.getElementById('closeCustomizationBtn');
     if (closeBtn) {
         closeBtn.addEventListener('click', () => {
@@ -662,4 +662,10 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         });
     }
-});
+}
+
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', bindCustomizationControls);
+} else {
+    bindCustomizationControls();
+}
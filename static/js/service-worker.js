@@ -1,69 +1,225 @@
 // Service Worker for PWA
-const CACHE_NAME = 'pandora-v1';
-const urlsToCache = [
-  '/',
-  '/static/css/styles.css',
-  '/static/js/app.js',
-  '/static/js/cart.js',
-  '/manifest.json'
-];
-
-// Install event - cache resources
+//
+// Served by the app at /service-worker.js, which replaces the placeholder
+// below with the precache manifest: [{url, revision}] where revision is a
+// hash of the file content. Changing any precached file changes this script,
+// so the browser installs the new worker and only re-downloads what changed.
+const PRECACHE_MANIFEST = self.__PRECACHE_MANIFEST || [];
+
+const PRECACHE_NAME = 'pandora-precache';
+const API_CACHE_NAME = 'pandora-api-v1';
+const IMAGE_CACHE_NAME = 'pandora-images-v1';
+const KNOWN_CACHES = [PRECACHE_NAME, API_CACHE_NAME, IMAGE_CACHE_NAME];
+
+// Bounds enforced on activate (and after writes) so caches cannot grow forever
+const MAX_API_ENTRIES = 60;
+const MAX_IMAGE_ENTRIES = 200;
+
+// Used when an API response carries no Cache-Control of its own
+const DEFAULT_MAX_AGE = 60;
+const DEFAULT_STALE_WHILE_REVALIDATE = 600;
+
+// Header recording when a cached API response was last confirmed by the server
+const FETCHED_AT_HEADER = 'x-sw-fetched-at';
+
+// Per-user API data, and the catalog change feed (the page keeps its own
+// replica), must always come from the network
+const NETWORK_ONLY_PREFIXES = ['/api/wishlists/', '/api/carts/', '/api/products/changes'];
+
+function revisionedUrl(entry) {
+  const url = new URL(entry.url, self.location.origin);
+  url.searchParams.set('__rev', entry.revision);
+  return url.href;
+}
+
+const precacheKeys = new Map(
+  PRECACHE_MANIFEST.map((entry) => [new URL(entry.url, self.location.origin).href, revisionedUrl(entry)])
+);
+
+// Install event - download precache entries that are new or changed
 self.addEventListener('install', (event) => {
   event.waitUntil(
-    caches.open(CACHE_NAME)
-      .then((cache) => {
-        console.log('Opened cache');
-        return cache.addAll(urlsToCache);
-      })
-  );
-});
-
-// Fetch event - serve from cache, fallback to network
-self.addEventListener('fetch', (event) => {
-  event.respondWith(
-    caches.match(event.request)
-      .then((response) => {
-        // Cache hit - return response
-        if (response) {
-          return response;
-        }
-
-        return fetch(event.request).then(
-          (response) => {
-            // Check if valid response
-            if (!response || response.status !== 200 || response.type !== 'basic') {
-              return response;
-            }
-
-            // Clone the response
-            const responseToCache = response.clone();
-
-            caches.open(CACHE_NAME)
-              .then((cache) => {
-                cache.put(event.request, responseToCache);
-              });
-
-            return response;
+    caches.open(PRECACHE_NAME).then(async (cache) => {
+      const cachedKeys = new Set((await cache.keys()).map((request) => request.url));
+      await Promise.all(
+        PRECACHE_MANIFEST.map(async (entry) => {
+          const key = revisionedUrl(entry);
+          if (cachedKeys.has(key)) {
+            return;
+          }
+          const response = await fetch(entry.url, { cache: 'no-store' });
+          if (!response.ok) {
+            throw new Error(`Precache failed for ${entry.url}: ${response.status}`);
           }
-        );
-      })
+          await cache.put(key, response);
+        })
+      );
+    }).then(() => self.skipWaiting())
   );
 });
 
-// Activate event - clean up old caches
+// Activate event - bounded cleanup of old caches and entries
 self.addEventListener('activate', (event) => {
-  const cacheWhitelist = [CACHE_NAME];
-
   event.waitUntil(
-    caches.keys().then((cacheNames) => {
-      return Promise.all(
-        cacheNames.map((cacheName) => {
-          if (cacheWhitelist.indexOf(cacheName) === -1) {
-            return caches.delete(cacheName);
-          }
-        })
+    (async () => {
+      const cacheNames = await caches.keys();
+      await Promise.all(
+        cacheNames
+          .filter((cacheName) => !KNOWN_CACHES.includes(cacheName))
+          .map((cacheName) => caches.delete(cacheName))
       );
-    })
+
+      // Drop precached revisions that are no longer in the manifest
+      const wanted = new Set(precacheKeys.values());
+      const precache = await caches.open(PRECACHE_NAME);
+      const stale = (await precache.keys()).filter((request) => !wanted.has(request.url));
+      await Promise.all(stale.map((request) => precache.delete(request)));
+
+      await trimCache(API_CACHE_NAME, MAX_API_ENTRIES);
+      await trimCache(IMAGE_CACHE_NAME, MAX_IMAGE_ENTRIES);
+      await self.clients.claim();
+    })()
   );
 });
+
+// Delete the oldest entries (cache keys are in insertion order) beyond maxEntries
+async function trimCache(cacheName, maxEntries) {
+  const cache = await caches.open(cacheName);
+  const keys = await cache.keys();
+  const excess = keys.slice(0, Math.max(0, keys.length - maxEntries));
+  await Promise.all(excess.map((request) => cache.delete(request)));
+}
+
+// Fetch event - pick a strategy per route
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  if (request.method !== 'GET') {
+    return;
+  }
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  const precacheKey = precacheKeys.get(url.origin + url.pathname);
+  // Pages keep their filters in the query string but are the same document
+  if (precacheKey && (!url.search || request.mode === 'navigate')) {
+    event.respondWith(precacheFirst(request, precacheKey));
+  } else if (NETWORK_ONLY_PREFIXES.some((prefix) => url.pathname.startsWith(prefix))) {
+    return;
+  } else if (url.pathname.startsWith('/api/')) {
+    event.respondWith(staleWhileRevalidate(event));
+  } else if (url.pathname.startsWith('/img/') && url.searchParams.has('v')) {
+    event.respondWith(cacheFirst(request, IMAGE_CACHE_NAME, MAX_IMAGE_ENTRIES));
+  }
+});
+
+// Precached assets are versioned by content, so the cached copy is always current
+async function precacheFirst(request, precacheKey) {
+  const cached = await caches.match(precacheKey, { cacheName: PRECACHE_NAME });
+  return cached || fetch(request);
+}
+
+// Image variants are immutable per URL once it names the source revision (v);
+// other image URLs go to the network and the browser's HTTP cache
+async function cacheFirst(request, cacheName, maxEntries) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(request);
+  if (cached) {
+    return cached;
+  }
+  const response = await fetch(request);
+  if (response.ok) {
+    await cache.put(request, response.clone());
+    trimCache(cacheName, maxEntries);
+  }
+  return response;
+}
+
+function cacheControlSeconds(response, directive, fallback) {
+  const header = response.headers.get('Cache-Control') || '';
+  // no-cache responses (e.g. in_stock product lists) are revalidated on every use
+  if (/no-cache|no-store/.test(header)) {
+    return 0;
+  }
+  const match = header.match(new RegExp(`${directive}=(\\d+)`));
+  return match ? Number(match[1]) : fallback;
+}
+
+// Copy a response with FETCHED_AT_HEADER set to now
+async function stamped(response) {
+  const headers = new Headers(response.headers);
+  headers.set(FETCHED_AT_HEADER, String(Date.now()));
+  return new Response(await response.blob(), {
+    status: 200,
+    statusText: 'OK',
+    headers,
+  });
+}
+
+async function revalidate(request, cache, cached) {
+  const headers = new Headers(request.headers);
+  const etag = cached && cached.headers.get('ETag');
+  if (etag) {
+    headers.set('If-None-Match', etag);
+  }
+  let response;
+  try {
+    response = await fetch(request.url, { headers, cache: 'no-store' });
+  } catch (err) {
+    if (cached) {
+      return cached;
+    }
+    throw err;
+  }
+
+  if (response.status === 304 && cached) {
+    // Unchanged: extend the cached copy's freshness
+    const refreshed = await stamped(cached.clone());
+    await cache.put(request, refreshed.clone());
+    return refreshed;
+  }
+  // Stock levels and other no-store responses are never kept
+  if (!response.ok || /no-store/.test(response.headers.get('Cache-Control') || '')) {
+    return response;
+  }
+  const fresh = await stamped(response);
+  await cache.put(request, fresh.clone());
+  trimCache(API_CACHE_NAME, MAX_API_ENTRIES);
+  if (cached && cached.headers.get('ETag') !== fresh.headers.get('ETag')) {
+    notifyClients(request.url);
+  }
+  return fresh;
+}
+
+// Fresh (within max-age): serve from cache. Stale but within
+// stale-while-revalidate: serve from cache and revalidate in the background.
+// Older than that: wait for the network so stale data is not shown.
+async function staleWhileRevalidate(event) {
+  const request = event.request;
+  const cache = await caches.open(API_CACHE_NAME);
+  const cached = await cache.match(request);
+  if (!cached) {
+    return revalidate(request, cache, null);
+  }
+
+  const ageSeconds = (Date.now() - Number(cached.headers.get(FETCHED_AT_HEADER) || 0)) / 1000;
+  const maxAge = cacheControlSeconds(cached, 'max-age', DEFAULT_MAX_AGE);
+  if (ageSeconds < maxAge) {
+    return cached;
+  }
+  // Clone before handing `cached` to the page, which will consume its body
+  const revalidation = revalidate(request, cache, cached.clone());
+  const staleWindow = cacheControlSeconds(cached, 'stale-while-revalidate', DEFAULT_STALE_WHILE_REVALIDATE);
+  if (ageSeconds < maxAge + staleWindow) {
+    event.waitUntil(revalidation.catch(() => {}));
+    return cached;
+  }
+  return revalidation;
+}
+
+// Tell open pages that data they may be showing has changed on the server
+async function notifyClients(url) {
+  const clients = await self.clients.matchAll({ type: 'window' });
+  clients.forEach((client) => client.postMessage({ type: 'api-updated', url }));
+}
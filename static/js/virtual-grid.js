@@ -0,0 +1,149 @@
+// Virtualized Grid Rendering
+//
+// Keeps only the rows near the viewport (plus a few rows of buffer) in the
+// DOM of a CSS grid container. Rows above and below are replaced by padding
+// so the page keeps its full scroll height. Card nodes leaving the window
+// are recycled for items entering it, and updated in place rather than
+// rebuilt from HTML.
+
+class VirtualGrid {
+    constructor(container, options) {
+        this.container = container;
+        this.createCard = options.createCard;    // () => Element
+        this.updateCard = options.updateCard;    // (node, item) => void
+        this.onNearEnd = options.onNearEnd || null;    // () => Promise, loads more items
+        this.overscanRows = options.overscanRows ?? 2;
+        this.nearEndRows = options.nearEndRows ?? 3;
+        this.rowHeight = options.estimatedRowHeight || 480;
+
+        this.items = [];
+        this.hasMore = false;
+        this.loadingMore = false;
+        this.nodes = new Map();    // item index -> card node
+        this.updateScheduled = false;
+
+        this.scheduleUpdate = this.scheduleUpdate.bind(this);
+        window.addEventListener('scroll', this.scheduleUpdate, { passive: true });
+        window.addEventListener('resize', this.scheduleUpdate);
+    }
+
+    // Replace all items (e.g. after a filter change)
+    setItems(items, hasMore = false) {
+        this.items = items;
+        this.hasMore = hasMore;
+        this.invalidate();
+    }
+
+    // Add the next page of items
+    appendItems(items, hasMore = false) {
+        this.items = this.items.concat(items);
+        this.hasMore = hasMore;
+        this.update();
+    }
+
+    // Re-render every card in the window, e.g. after wishlist state changed
+    invalidate() {
+        this.nodes.forEach((node) => { node.dataset.gridIndex = ''; });
+        this.update();
+    }
+
+    scheduleUpdate() {
+        if (this.updateScheduled) {
+            return;
+        }
+        this.updateScheduled = true;
+        requestAnimationFrame(() => {
+            this.updateScheduled = false;
+            this.update();
+        });
+    }
+
+    columns() {
+        const template = getComputedStyle(this.container).gridTemplateColumns;
+        return template && template !== 'none' ? template.split(' ').length : 1;
+    }
+
+    // Rows [first, last) that intersect the viewport, plus the overscan buffer
+    visibleRows(totalRows) {
+        const top = this.container.getBoundingClientRect().top;
+        const first = Math.floor(-top / this.rowHeight) - this.overscanRows;
+        const last = Math.ceil((window.innerHeight - top) / this.rowHeight) + this.overscanRows;
+        return [
+            Math.min(totalRows, Math.max(0, first)),
+            Math.min(totalRows, Math.max(0, last))
+        ];
+    }
+
+    update() {
+        const columns = this.columns();
+        const totalRows = Math.ceil(this.items.length / columns);
+        const [firstRow, lastRow] = this.visibleRows(totalRows);
+        this.render(firstRow * columns, Math.min(this.items.length, lastRow * columns));
+
+        this.container.style.paddingTop = `${firstRow * this.rowHeight}px`;
+        this.container.style.paddingBottom = `${(totalRows - lastRow) * this.rowHeight}px`;
+
+        if (this.measureRowHeight()) {
+            this.scheduleUpdate();
+        }
+        if (this.hasMore && this.onNearEnd && !this.loadingMore &&
+            lastRow >= totalRows - this.nearEndRows) {
+            this.loadingMore = true;
+            Promise.resolve(this.onNearEnd())
+                .finally(() => {
+                    this.loadingMore = false;
+                });
+        }
+    }
+
+    // Show items [start, end), reusing nodes that are already in the DOM
+    render(start, end) {
+        const free = [];
+        this.nodes.forEach((node, index) => {
+            if (index < start || index >= end) {
+                free.push(node);
+                this.nodes.delete(index);
+            }
+        });
+
+        let position = 0;
+        for (let index = start; index < end; index++, position++) {
+            let node = this.nodes.get(index);
+            if (!node) {
+                node = free.pop() || this.createCard();
+                this.nodes.set(index, node);
+            }
+            if (node.dataset.gridIndex !== String(index)) {
+                this.updateCard(node, this.items[index]);
+                node.dataset.gridIndex = String(index);
+            }
+            const current = this.container.children[position];
+            if (current !== node) {
+                this.container.insertBefore(node, current || null);
+            }
+        }
+        free.forEach((node) => node.remove());
+    }
+
+    // Update the row height from a rendered card; true if it changed
+    measureRowHeight() {
+        const node = this.container.firstElementChild;
+        if (!node || node.offsetHeight === 0) {
+            return false;
+        }
+        const gap = parseFloat(getComputedStyle(this.container).rowGap) || 0;
+        const height = node.offsetHeight + gap;
+        if (Math.abs(height - this.rowHeight) < 1) {
+            return false;
+        }
+        this.rowHeight = height;
+        return true;
+    }
+
+    destroy() {
+        window.removeEventListener('scroll', this.scheduleUpdate);
+        window.removeEventListener('resize', this.scheduleUpdate);
+        this.nodes.forEach((node) => node.remove());
+        this.nodes.clear();
+    }
+}
@@ -1,15 +1,33 @@
 // Wishlist Management
+//
+// The wishlist is kept in localStorage for instant rendering and synced to
+// the server (/api/wishlists/{id}) as batched add/remove deltas. The server
+// stores only product ids and returns the products when another device has
+// changed the wishlist, so no page needs the full catalog to show it.
+
+const WISHLIST_SYNC_KEY = 'pandora_wishlist_sync';
+const WISHLIST_SYNC_DELAY = 500;
 
 class WishlistManager {
-    constructor() {
+    constructor(options = {}) {
+        this.endpoint = options.endpoint || '/api/wishlists';
+        this.fetch = options.fetch || ((...args) => window.fetch(...args));
+        this.syncDelay = options.syncDelay ?? WISHLIST_SYNC_DELAY;
         this.items = this.loadWishlist();
+        this.syncState = this.loadSyncState();
+        this.syncTimer = null;
+        this.syncing = null;
         this.updateWishlistUI();
     }
 
     // Load wishlist from localStorage
     loadWishlist() {
         const saved = localStorage.getItem('pandora_wishlist');
-        return saved ? JSON.parse(saved) : [];
+        try {
+            return saved ? JSON.parse(saved) : [];
+        } catch (error) {
+            return [];
+        }
     }
 
     // Save wishlist to localStorage
@@ -17,6 +35,126 @@ class WishlistManager {
         localStorage.setItem('pandora_wishlist', JSON.stringify(this.items));
     }
 
+    // Load the wishlist id, last seen server version and unsent changes
+    loadSyncState() {
+        let state = null;
+        try {
+            state = JSON.parse(localStorage.getItem(WISHLIST_SYNC_KEY));
+        } catch (error) {
+            state = null;
+        }
+        if (!state || !state.id) {
+            // First sync from this device: upload what is already saved locally
+            state = { id: newWishlistId(), version: 0, pending: {} };
+            this.items.forEach(item => {
+                state.pending[item.id] = 'add';
+            });
+        }
+        return state;
+    }
+
+    saveSyncState() {
+        localStorage.setItem(WISHLIST_SYNC_KEY, JSON.stringify(this.syncState));
+    }
+
+    // Record a change for the next batched sync; later changes to the same product win
+    queueChange(productId, op) {
+        this.syncState.pending[productId] = op;
+        this.saveSyncState();
+        if (!this.syncTimer) {
+            this.syncTimer = setTimeout(() => {
+                this.syncTimer = null;
+                this.flush().catch(error => console.warn('Wishlist sync failed:', error));
+            }, this.syncDelay);
+        }
+    }
+
+    async request(path, init = {}) {
+        const response = await this.fetch(`${this.endpoint}/${this.syncState.id}${path}`, init);
+        if (!response.ok) {
+            const error = new Error(`Wishlist sync failed: ${response.status}`);
+            error.status = response.status;
+            throw error;
+        }
+        return response.json();
+    }
+
+    // Send all unsent changes as one delta
+    async flush() {
+        while (this.syncing) {
+            await this.syncing.catch(() => {});
+        }
+        const pending = this.syncState.pending;
+        const productIds = Object.keys(pending);
+        if (productIds.length === 0) {
+            return;
+        }
+        const delta = { base_version: this.syncState.version, add: [], remove: [] };
+        productIds.forEach(productId => delta[pending[productId]].push(Number(productId)));
+        this.syncState.pending = {};
+        this.saveSyncState();
+
+        this.syncing = this.request('/changes', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(delta),
+            keepalive: true
+        });
+        try {
+            this.applyServerState(await this.syncing);
+        } catch (error) {
+            if (error.status >= 400 && error.status < 500) {
+                // The server rejected the delta (e.g. a product no longer exists): resync
+                this.syncing = null;
+                await this.pull();
+                return;
+            }
+            // Keep the changes for the next attempt; newer local changes win
+            this.syncState.pending = { ...pending, ...this.syncState.pending };
+            this.saveSyncState();
+            throw error;
+        } finally {
+            this.syncing = null;
+        }
+    }
+
+    // Fetch the server's wishlist with its products
+    async pull() {
+        this.applyServerState(await this.request(''));
+    }
+
+    // Bring the wishlist up to date with the server (and other devices)
+    async sync() {
+        if (Object.keys(this.syncState.pending).length > 0) {
+            await this.flush();
+        } else {
+            await this.pull();
+        }
+    }
+
+    // Adopt the server's version, and its products when it sent them
+    applyServerState(state) {
+        this.syncState.version = state.version;
+        this.saveSyncState();
+        if (!state.products) {
+            return;
+        }
+        // Changes made while the request was in flight still apply on top
+        const pending = this.syncState.pending;
+        const items = state.products.filter(product => pending[product.id] !== 'remove');
+        this.items.forEach(item => {
+            if (pending[item.id] === 'add' && !items.some(product => product.id === item.id)) {
+                items.push(item);
+            }
+        });
+        this.items = items;
+        this.saveWishlist();
+        this.updateWishlistUI();
+        if (window.location.pathname.includes('wishlist.html')) {
+            this.displayWishlistItems();
+        }
+    }
+
     // Check if product is in wishlist
     isInWishlist(productId) {
         return this.items.some(item => item.id === productId);
@@ -27,6 +165,7 @@ class WishlistManager {
         if (!this.isInWishlist(product.id)) {
             this.items.push(product);
             this.saveWishlist();
+            this.queueChange(product.id, 'add');
             this.updateWishlistUI();
             this.showNotification(`${product.name} added to wishlist`);
             return true;
@@ -38,6 +177,7 @@ class WishlistManager {
     removeItem(productId) {
         this.items = this.items.filter(item => item.id !== productId);
         this.saveWishlist();
+        this.queueChange(productId, 'remove');
         this.updateWishlistUI();
 
         // Update heart icons on all pages
@@ -117,50 +257,29 @@ class WishlistManager {
         if (emptyState) emptyState.classList.add('hidden');
         wishlistContainer.classList.remove('hidden');
 
-        wishlistContainer.innerHTML = this.items.map(product => `
-            <div class="bg-white rounded-lg shadow-md overflow-hidden hover:shadow-xl transition-shadow duration-300">
-                <div class="relative overflow-hidden group">
-                    <img src="${product.image}"
-                         alt="${product.name}"
-                         class="w-full h-64 object-cover group-hover:scale-110 transition-transform duration-500"
-                         onerror="this.src='https://via.placeholder.com/500x500/D4AF37/FFFFFF?text=Jewelry'">
-                    <div class="absolute top-2 right-2 bg-gold text-white text-xs font-bold px-2 py-1 rounded uppercase">
-                        ${product.category.replace('s', '')}
-                    </div>
-                    <button onclick="wishlist.removeItem(${product.id})"
-                            class="absolute top-2 left-2 bg-white rounded-full p-2 shadow-md hover:bg-red-50 transition-colors">
-                        <svg class="w-5 h-5 text-red-500" fill="currentColor" viewBox="0 0 24 24">
-                            <path d="M6 18L18 6M6 6l12 12" stroke="currentColor" stroke-width="2" stroke-linecap="round"/>
-                        </svg>
-                    </button>
-                </div>
-                <div class="p-5">
-                    <div class="mb-3">
-                        <h3 class="font-bold text-lg text-luxury mb-1 line-clamp-2">${product.name}</h3>
-                        <p class="text-gray-600 text-sm line-clamp-2">${product.description}</p>
-                    </div>
-                    <div class="flex items-center justify-between mb-4">
-                        <span class="text-2xl font-bold text-gold">$${product.price.toFixed(2)}</span>
-                        <span class="text-xs text-gray-500 uppercase tracking-wider">${product.material}</span>
-                    </div>
-                    <div class="flex gap-2">
-                        <button onclick="wishlist.moveToCart(${product.id})"
-                                class="flex-1 bg-gold hover:bg-dark-gold text-white font-semibold py-3 rounded-lg transition-colors duration-300 flex items-center justify-center gap-2">
-                            <svg class="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M16 11V7a4 4 0 00-8 0v4M5 9h14l1 12H4L5 9z"></path>
-                            </svg>
-                            Move to Cart
-                        </button>
-                        <button onclick="wishlist.removeItem(${product.id})"
-                                class="bg-gray-200 hover:bg-gray-300 text-gray-700 font-semibold px-4 py-3 rounded-lg transition-colors duration-300">
-                            <svg class="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16"></path>
-                            </svg>
-                        </button>
-                    </div>
-                </div>
-            </div>
-        `).join('');
+        if (!this.gridView) {
+            wishlistContainer.addEventListener('click', (event) => this.handleGridClick(event));
+            this.gridView = new VirtualGrid(wishlistContainer, {
+                createCard: createWishlistCard,
+                updateCard: updateWishlistCard
+            });
+        }
+        this.gridView.setItems(this.items);
+    }
+
+    // Card buttons on the wishlist page, handled once for all (recycled) cards
+    handleGridClick(event) {
+        const button = event.target.closest('[data-action]');
+        const card = button && button.closest('[data-product-id]');
+        if (!card) {
+            return;
+        }
+        const productId = Number(card.dataset.productId);
+        if (button.dataset.action === 'move-to-cart') {
+            this.moveToCart(productId);
+        } else if (button.dataset.action === 'remove') {
+            this.removeItem(productId);
+        }
     }
 
     // Show notification
@@ -179,28 +298,121 @@ class WishlistManager {
     }
 }
 
+// Build an empty wishlist card; updateWishlistCard fills it in
+function createWishlistCard() {
+    const card = document.createElement('div');
+    card.className = 'bg-white rounded-lg shadow-md overflow-hidden hover:shadow-xl transition-shadow duration-300';
+    card.innerHTML = `
+        <div class="relative overflow-hidden group">
+            <img data-role="image"
+                 class="w-full h-64 object-cover group-hover:scale-110 transition-transform duration-500"
+                 loading="lazy">
+            <div data-role="badge" class="absolute top-2 right-2 bg-gold text-white text-xs font-bold px-2 py-1 rounded uppercase"></div>
+            <button data-action="remove"
+                    class="absolute top-2 left-2 bg-white rounded-full p-2 shadow-md hover:bg-red-50 transition-colors">
+                <svg class="w-5 h-5 text-red-500" fill="currentColor" viewBox="0 0 24 24">
+                    <path d="M6 18L18 6M6 6l12 12" stroke="currentColor" stroke-width="2" stroke-linecap="round"/>
+                </svg>
+            </button>
+        </div>
+        <div class="p-5">
+            <div class="mb-3">
+                <h3 data-role="name" class="font-bold text-lg text-luxury mb-1 line-clamp-2"></h3>
+                <p data-role="description" class="text-gray-600 text-sm line-clamp-2"></p>
+            </div>
+            <div class="flex items-center justify-between mb-4">
+                <span data-role="price" class="text-2xl font-bold text-gold"></span>
+                <span data-role="material" class="text-xs text-gray-500 uppercase tracking-wider"></span>
+            </div>
+            <div class="flex gap-2">
+                <button data-action="move-to-cart"
+                        class="flex-1 bg-gold hover:bg-dark-gold text-white font-semibold py-3 rounded-lg transition-colors duration-300 flex items-center justify-center gap-2">
+                    <svg class="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
+                        <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M16 11V7a4 4 0 00-8 0v4M5 9h14l1 12H4L5 9z"></path>
+                    </svg>
+                    Move to Cart
+                </button>
+                <button data-action="remove"
+                        class="bg-gray-200 hover:bg-gray-300 text-gray-700 font-semibold px-4 py-3 rounded-lg transition-colors duration-300">
+                    <svg class="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
+                        <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16"></path>
+                    </svg>
+                </button>
+            </div>
+        </div>
+    `;
+    const image = card.querySelector('[data-role="image"]');
+    image.addEventListener('error', () => {
+        const placeholder = 'https://via.placeholder.com/500x500/D4AF37/FFFFFF?text=Jewelry';
+        if (image.src !== placeholder) {
+            image.removeAttribute('srcset');
+            image.src = placeholder;
+        }
+    });
+    return card;
+}
+
+// Point a (possibly recycled) wishlist card at another product
+function updateWishlistCard(card, product) {
+    card.dataset.productId = product.id;
+
+    const image = card.querySelector('[data-role="image"]');
+    if (product.srcset) {
+        image.srcset = product.srcset;
+        image.sizes = '(min-width: 1280px) 25vw, (min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw';
+    } else {
+        image.removeAttribute('srcset');
+        image.removeAttribute('sizes');
+    }
+    image.src = product.image;
+    image.alt = product.name;
+
+    card.querySelector('[data-role="badge"]').textContent = product.category.replace('s', '');
+    card.querySelector('[data-role="name"]').textContent = product.name;
+    card.querySelector('[data-role="description"]').textContent = product.description;
+    card.querySelector('[data-role="price"]').textContent = `$${product.price.toFixed(2)}`;
+    card.querySelector('[data-role="material"]').textContent = product.material;
+}
+
+// Random id for this browser's wishlist
+function newWishlistId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Array.from({ length: 4 }, () => Math.random().toString(36).slice(2, 10)).join('');
+}
+
 // Initialize wishlist
 const wishlist = new WishlistManager();
 
+// Send changes still waiting for the batch timer before the page goes away
+window.addEventListener('pagehide', () => {
+    wishlist.flush().catch(() => {});
+});
+
 // Function to toggle wishlist for a product
 function toggleWishlist(productId) {
-    // Find product in allProducts array
-    if (typeof allProducts !== 'undefined') {
-        const product = allProducts.find(p => p.id === productId);
-        if (product) {
-            const isAdded = wishlist.toggleItem(product);
-
-            // Update the button appearance
-            const heartBtns = document.querySelectorAll(`.js-wishlist-btn[data-product-id="${productId}"]`);
-            heartBtns.forEach(btn => {
-                if (isAdded) {
-                    btn.classList.remove('text-gray-400');
-                    btn.classList.add('text-red-500');
-                } else {
-                    btn.classList.remove('text-red-500');
-                    btn.classList.add('text-gray-400');
-                }
-            });
-        }
+    // Find product in the client-side catalog (index page) or allProducts array
+    let product;
+    if (typeof productCatalog !== 'undefined') {
+        product = productCatalog.get(productId);
+    }
+    if (!product && typeof allProducts !== 'undefined') {
+        product = allProducts.find(p => p.id === productId);
+    }
+    if (product) {
+        const isAdded = wishlist.toggleItem(product);
+
+        // Update the button appearance
+        const heartBtns = document.querySelectorAll(`.js-wishlist-btn[data-product-id="${productId}"]`);
+        heartBtns.forEach(btn => {
+            if (isAdded) {
+                btn.classList.remove('text-gray-400');
+                btn.classList.add('text-red-500');
+            } else {
+                btn.classList.remove('text-red-500');
+                btn.classList.add('text-gray-400');
+            }
+        });
     }
 }
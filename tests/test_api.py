@@ -167,10 +167,11 @@ class TestProductAPI:
         assert "Invalid category" in response.json()["detail"]
 
     def test_filter_invalid_price(self):
-        """Test filtering with invalid price returns 400"""
-        response = client.get("/api/products?price_max=999")
+        """Test filtering with an inverted or negative price range is refused"""
+        response = client.get("/api/products?price_min=1000&price_max=999")
         assert response.status_code == 400
-        assert "Invalid price_max" in response.json()["detail"]
+        assert "Invalid price range" in response.json()["detail"]
+        assert client.get("/api/products?price_min=-1").status_code == 422
 
     def test_filter_invalid_material(self):
         """Test filtering with invalid material returns 400"""
@@ -184,3 +185,27 @@ class TestProductAPI:
         assert response.status_code == 200
         products = response.json()
         assert products == []
+
+    def test_total_count_header(self):
+        """Test listings report the number of matches"""
+        response = client.get("/api/products?category=rings")
+        assert response.headers["x-total-count"] == "5"
+
+    def test_paging(self):
+        """Test offset/limit return one page and the total number of matches"""
+        all_ids = [p["id"] for p in client.get("/api/products").json()]
+        response = client.get("/api/products?offset=4&limit=3")
+        assert response.status_code == 200
+        assert [p["id"] for p in response.json()] == all_ids[4:7]
+        assert response.headers["x-total-count"] == str(len(all_ids))
+
+    def test_paging_past_the_end(self):
+        """Test a page past the last match is empty"""
+        response = client.get("/api/products?category=rings&offset=100&limit=10")
+        assert response.json() == []
+        assert response.headers["x-total-count"] == "5"
+
+    def test_paging_invalid_limit(self):
+        """Test out-of-range paging parameters are rejected"""
+        assert client.get("/api/products?limit=0").status_code == 422
+        assert client.get("/api/products?offset=-1").status_code == 422
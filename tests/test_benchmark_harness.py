@@ -0,0 +1,31 @@
+"""
+Tests for the micro-benchmark harness (benchmarks/harness.py)
+"""
+
+from benchmarks.harness import load_baseline, measure, regression, save_baseline
+
+
+class TestBenchmarkHarness:
+    """Test timing, baseline storage and the regression gate"""
+
+    def test_measure_reports_per_call_times(self):
+        """Test measure calibrates loops and reports min and median"""
+        result = measure(lambda: sum(range(10)), rounds=3, min_round_time=0.001)
+        assert result["rounds"] == 3
+        assert result["loops"] >= 1
+        assert 0 < result["min_s"] <= result["median_s"]
+
+    def test_regression_threshold(self):
+        """Test results are judged against the baseline with a threshold"""
+        baseline = {"min_s": 1.0, "median_s": 1.0}
+        assert regression({"min_s": 1.2, "median_s": 1.2}, baseline, 0.25) is None
+        message = regression({"min_s": 1.5, "median_s": 1.5}, baseline, 0.25)
+        assert "50% slower" in message
+        assert regression({"min_s": 9.0, "median_s": 9.0}, None) is None
+
+    def test_baseline_round_trip(self, tmp_path):
+        """Test baselines are saved and loaded as JSON"""
+        path = tmp_path / "baseline.json"
+        assert load_baseline(path) == {}
+        save_baseline({"bench": {"min_s": 1e-6, "median_s": 2e-6}}, path)
+        assert load_baseline(path)["bench"]["min_s"] == 1e-6
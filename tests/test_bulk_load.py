@@ -0,0 +1,82 @@
+"""
+Tests for bulk product loading (app/bulk_load.py)
+"""
+
+from app.bulk_load import bulk_load_products, find_suspect_rows
+from app.mock_data import PRODUCT_DATA
+from app.models import Product
+
+VALID_ROW = {
+    "id": 1,
+    "name": "Diamond Ring",
+    "price": 2999.99,
+    "category": "rings",
+    "material": "White Gold",
+    "image": "https://example.com/ring.jpg",
+    "description": "Beautiful diamond ring",
+    "customizable": True,
+}
+
+
+class TestBulkLoad:
+    """Test the columnar fast path and its fallback"""
+
+    def test_matches_validated_products(self):
+        """Test fast-path products equal fully validated ones"""
+        result = bulk_load_products(PRODUCT_DATA)
+        expected = [Product(**row) for row in PRODUCT_DATA]
+        assert result.products == expected
+        assert [p.model_fields_set for p in result.products] == [
+            p.model_fields_set for p in expected
+        ]
+        assert result.fast_rows == len(PRODUCT_DATA)
+        assert result.validated_rows == 0
+        assert result.errors == []
+
+    def test_int_price_and_missing_default(self):
+        """Test int prices become floats and missing defaults are filled"""
+        row = {k: v for k, v in VALID_ROW.items() if k != "customizable"}
+        row["price"] = 450
+        (product,) = bulk_load_products([row]).products
+        assert product.price == 450.0
+        assert isinstance(product.price, float)
+        assert product.customizable is False
+        assert product.model_fields_set == set(row)
+
+    def test_extra_keys_are_ignored(self):
+        """Test unknown keys are dropped like full validation does"""
+        (product,) = bulk_load_products([{**VALID_ROW, "sku": "X1"}]).products
+        assert product == Product(**VALID_ROW)
+        assert "sku" not in product.model_dump()
+
+    def test_invalid_rows_are_reported_not_raised(self):
+        """Test rows failing validation are reported with their index"""
+        rows = [
+            VALID_ROW,
+            {**VALID_ROW, "id": 2, "price": -1},
+            {**VALID_ROW, "id": 3, "category": "watches"},
+            {**VALID_ROW, "id": 4, "name": ""},
+            "not a row",
+            {**VALID_ROW, "id": 6},
+        ]
+        result = bulk_load_products(rows)
+        assert [p.id for p in result.products] == [1, 6]
+        assert [e.index for e in result.errors] == [1, 2, 3, 4]
+        assert result.fast_rows == 2
+        assert result.validated_rows == 4
+
+    def test_coercible_rows_fall_back_to_validation(self):
+        """Test values Pydantic would coerce go through full validation"""
+        rows = [{**VALID_ROW, "id": "7"}, {**VALID_ROW, "customizable": "yes"}]
+        suspect, _ = find_suspect_rows(rows)
+        assert suspect == {0, 1}
+        result = bulk_load_products(rows)
+        assert result.products[0].id == 7
+        assert result.products[1].customizable is True
+        assert result.errors == []
+
+    def test_empty_batch(self):
+        """Test an empty batch loads nothing"""
+        result = bulk_load_products([])
+        assert result.products == []
+        assert result.fast_rows == 0
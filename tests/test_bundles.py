@@ -0,0 +1,128 @@
+"""
+Tests for the minified script and style bundles
+"""
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.bundles import BundleBuilder, minify_css, minify_js
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def builder(tmp_path):
+    """BundleBuilder over one temporary script"""
+    source = tmp_path / "one.js"
+    source.write_text("// header\nconst one = 1;\n")
+    return BundleBuilder({"one.js": (source,)}, output_dir=tmp_path / "out")
+
+
+class TestMinifier:
+    """Test the conservative script and stylesheet minifiers"""
+
+    def test_strips_comments_and_indentation(self):
+        """Test comments, indentation and blank lines are removed"""
+        source = (
+            "// comment\nfunction f(a, b) {\n    /* block */\n    return a + b;\n}\n\n"
+        )
+        assert minify_js(source) == "function f(a,b){return a + b;}\n"
+
+    def test_literals_are_unchanged(self):
+        """Test strings, template literals and regexes keep their content"""
+        source = (
+            "const s = 'a // b';\n"
+            'const d = "/* c */";\n'
+            "const t = `x  ${ { y: 1 }.y }  // z`;\n"
+            "const r = /[/]\\/+/g;\n"
+        )
+        minified = minify_js(source)
+        assert "'a // b'" in minified
+        assert '"/* c */"' in minified
+        assert "`x  ${{y:1}.y}  // z`" in minified
+        assert "/[/]\\/+/g" in minified
+
+    def test_division_is_not_a_regex(self):
+        """Test a slash after an operand is kept as division"""
+        assert minify_js("x = a / 2 / b;\n") == "x=a / 2 / b;\n"
+
+    def test_statement_line_breaks_are_kept(self):
+        """Test newlines that may end a statement survive"""
+        assert minify_js("let a = 1\nlet b = a\n") == "let a=1\nlet b=a\n"
+
+    def test_css(self):
+        """Test stylesheet comments and whitespace are removed"""
+        source = '/* x */\n#a > .b {\n    content: "  ;  ";\n    color: red;\n}\n'
+        assert minify_css(source) == '#a>.b{content:"  ;  ";color:red}\n'
+
+
+class TestBundleBuilder:
+    """Test bundles are built once and rebuilt when a source changes"""
+
+    def test_builds_once(self, builder):
+        """Test an unchanged bundle is not rebuilt"""
+        path = builder.path("one.js")
+        assert path.read_text() == "const one=1;\n"
+        builder.path("one.js")
+        assert builder.builds == 1
+
+    def test_rebuilds_when_source_changes(self, builder):
+        """Test editing a source rebuilds its bundle"""
+        builder.path("one.js")
+        source = builder.bundles["one.js"][0]
+        source.write_text("const two = 2;\n")
+        os.utime(source, ns=(1, 1))
+        assert builder.path("one.js").read_text() == "const two=2;\n"
+        assert builder.builds == 2
+
+    def test_unknown_bundle(self, builder):
+        """Test an unknown name raises KeyError"""
+        with pytest.raises(KeyError):
+            builder.path("missing.js")
+
+    def test_stats(self, builder):
+        """Test source and bundle sizes are reported"""
+        builder.path("one.js")
+        assert builder.stats() == {"one.js": {"source_bytes": 25, "bytes": 13}}
+
+
+class TestBundleEndpoint:
+    """Test the served bundles"""
+
+    def test_app_bundle(self):
+        """Test the app bundle is served with a validator and no max-age"""
+        response = client.get("/bundles/app.js")
+        assert response.status_code == 200
+        assert "javascript" in response.headers["content-type"]
+        assert response.headers["cache-control"] == "no-cache"
+        assert "class ProductCatalog" in response.text
+        assert "CustomizationBuilder" not in response.text
+
+    def test_if_none_match_returns_304(self):
+        """Test a matching ETag gets an empty 304"""
+        etag = client.get("/bundles/customization.js").headers["etag"]
+        response = client.get(
+            "/bundles/customization.js", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_customization_styles(self):
+        """Test the customization stylesheet bundle is served as CSS"""
+        response = client.get("/bundles/customization.css")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/css")
+
+    def test_unknown_bundle_returns_404(self):
+        """Test unknown bundle names are rejected"""
+        assert client.get("/bundles/missing.js").status_code == 404
+
+    def test_index_loads_bundle_only(self):
+        """Test the catalog page defers the bundle and not the builder"""
+        content = client.get("/").text
+        assert '<script defer src="/bundles/app.js"></script>' in content
+        assert "customization-builder.js" not in content
+        assert "customization.css" not in content
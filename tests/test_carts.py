@@ -0,0 +1,271 @@
+"""
+Tests for server-side carts (app/carts.py) and /api/carts
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.carts import (
+    CartConflictError,
+    CartStore,
+    CustomizationRegistry,
+    cart_store,
+    customization_registry,
+    price_lines,
+)
+from app.catalog_store import ColumnarCatalog
+from app.customization_config import customization_cost, get_customization_config
+from app.main import app
+from app.mock_data import PRODUCT_DATA
+
+client = TestClient(app)
+CART = "/api/carts/device-one"
+
+# Product 1 is a customizable ring at $3299, product 4 a plain ring at $450
+RING_OPTIONS = {"metal_type": "gold", "ring_size": "7.0", "engraving": "Always"}
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    """Each test starts without carts or registered customizations"""
+    cart_store.clear()
+    customization_registry.clear()
+    yield
+    cart_store.clear()
+    customization_registry.clear()
+
+
+def post_changes(base_version, *lines):
+    return client.post(
+        f"{CART}/changes", json={"base_version": base_version, "lines": list(lines)}
+    )
+
+
+class TestCustomizationPricing:
+    """Test server-side customization prices"""
+
+    def test_cost_matches_builder_rules(self):
+        """Test select, text and multi-select options are priced"""
+        rings = get_customization_config("rings")
+        assert customization_cost(rings, RING_OPTIONS) == 250.0
+        bracelets = get_customization_config("bracelets")
+        plain = {"metal_type": "sterling_silver", "bracelet_size": '7"'}
+        assert customization_cost(bracelets, {**plain, "charms": ["heart"]}) == 50.0
+        assert customization_cost(bracelets, {**plain, "charms": []}) == 0.0
+
+    @pytest.mark.parametrize(
+        "selections",
+        [
+            {"metal_type": "unobtainium"},
+            {"no_such_option": "x"},
+            {"engraving": "x" * 50},
+            {"engraving": "<script>"},
+            {"metal_type": ["gold"]},
+            {"ring_size": 7},
+            {"engraving": {"text": "A"}},
+            {"ring_size": None},
+            {"ring_size": ""},
+        ],
+    )
+    def test_invalid_selections(self, selections):
+        """Test unknown options/values, values that are not strings,
+        rule-breaking text and missing required options are rejected"""
+        with pytest.raises(ValueError):
+            customization_cost(
+                get_customization_config("rings"), {**RING_OPTIONS, **selections}
+            )
+
+    def test_multi_select_items_must_be_strings(self):
+        """Test unhashable or non-string list items are rejected, not a crash"""
+        bracelets = get_customization_config("bracelets")
+        plain = {"metal_type": "sterling_silver", "bracelet_size": '7"'}
+        for charms in ([{"a": 1}], [["heart"]], [1], "heart"):
+            with pytest.raises(ValueError):
+                customization_cost(bracelets, {**plain, "charms": charms})
+
+    def test_identical_selections_share_a_hash(self):
+        """Test the registry is content-addressed"""
+        store = ColumnarCatalog.from_rows(PRODUCT_DATA)
+        registry = CustomizationRegistry()
+        first = registry.register(store, 1, RING_OPTIONS)
+        second = registry.register(store, 1, dict(reversed(RING_OPTIONS.items())))
+        assert first == second
+        assert len(registry) == 1
+        assert registry.register(store, 2, RING_OPTIONS) != first
+
+    def test_plain_products_cannot_be_customized(self):
+        """Test registering options for a non-customizable product fails"""
+        store = ColumnarCatalog.from_rows(PRODUCT_DATA)
+        with pytest.raises(ValueError):
+            CustomizationRegistry().register(store, 4, {"metal_type": "gold"})
+
+    def test_least_recently_used_customizations_are_evicted(self):
+        """Test the registry keeps at most max_entries, dropping the least used"""
+        store = ColumnarCatalog.from_rows(PRODUCT_DATA)
+        registry = CustomizationRegistry(max_entries=2)
+        gold = registry.register(store, 1, RING_OPTIONS)
+        silver = registry.register(
+            store, 1, {**RING_OPTIONS, "metal_type": "sterling_silver"}
+        )
+        registry.get(gold)
+        registry.register(store, 1, {**RING_OPTIONS, "metal_type": "platinum"})
+        assert len(registry) == 2 and registry.evictions == 1
+        assert registry.get(silver) is None
+        assert registry.get(gold) is not None
+
+
+class TestCartStore:
+    """Test versions and optimistic concurrency"""
+
+    def test_changes_bump_version_once(self):
+        """Test one delta bumps the version once and no-op deltas not at all"""
+        store = CartStore()
+        assert store.apply("c", 0, [(1, "", 2), (4, "", 1)]) == (
+            1,
+            {(1, ""): 2, (4, ""): 1},
+        )
+        assert store.apply("c", 1, [(1, "", 2)])[0] == 1
+        assert store.apply("c", 1, [(4, "", 0)]) == (2, {(1, ""): 2})
+
+    def test_stale_version_is_rejected(self):
+        """Test a delta based on an old version raises and changes nothing"""
+        store = CartStore()
+        store.apply("c", 0, [(1, "", 1)])
+        with pytest.raises(CartConflictError) as info:
+            store.apply("c", 0, [(1, "", 5)])
+        assert info.value.version == 1
+        assert store.get("c") == (1, {(1, ""): 1})
+
+    def test_least_recently_used_carts_are_evicted(self):
+        """Test the store keeps at most max_carts, dropping the least used"""
+        store = CartStore(max_carts=2)
+        store.apply("a", 0, [(1, "", 1)])
+        store.apply("b", 0, [(2, "", 1)])
+        store.get("a")
+        store.apply("c", 0, [(3, "", 1)])
+        assert len(store) == 2 and store.evictions == 1
+        assert store.get("b") == (0, {})
+        assert store.get("a") == (1, {(1, ""): 1})
+
+    def test_unused_carts_expire(self):
+        """Test carts unused for ttl seconds are forgotten"""
+        now = [0.0]
+        store = CartStore(ttl=10, clock=lambda: now[0])
+        store.apply("a", 0, [(1, "", 1)])
+        now[0] = 9
+        store.apply("b", 0, [(2, "", 1)])
+        now[0] = 15
+        assert store.get("a") == (0, {})
+        assert store.get("b") == (1, {(2, ""): 1})
+
+    def test_prices_come_from_the_catalog(self):
+        """Test lines are priced from the catalog, not from what was stored"""
+        store = ColumnarCatalog.from_rows(PRODUCT_DATA)
+        lines, subtotal, count = price_lines(
+            store, {(4, ""): 2, (99999, ""): 1}, CustomizationRegistry()
+        )
+        assert [line["available"] for line in lines] == [True, False]
+        assert lines[0]["line_total"] == 900.0
+        assert (subtotal, count) == (900.0, 2)
+
+        store.prices[store.row_of(4)] = 500.0
+        assert price_lines(store, {(4, ""): 2}, CustomizationRegistry())[1] == 1000.0
+
+
+class TestCartAPI:
+    """Test /api/carts/{id}"""
+
+    def test_unknown_cart_is_empty(self):
+        """Test an unused id returns an empty cart at version 0"""
+        response = client.get(CART)
+        assert response.status_code == 200
+        assert response.json() == {
+            "id": "device-one",
+            "version": 0,
+            "lines": [],
+            "item_count": 0,
+            "subtotal": 0.0,
+        }
+        assert response.headers["cache-control"] == "no-store"
+
+    def test_batched_changes_with_server_totals(self):
+        """Test several lines are written at once and totalled server-side"""
+        response = post_changes(
+            0,
+            {"product_id": 4, "quantity": 3},
+            {"product_id": 1, "customizations": RING_OPTIONS, "quantity": 1},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["version"] == 1
+        assert data["item_count"] == 4
+        assert data["subtotal"] == 3 * 450.0 + 3299.0 + 250.0
+
+        customized = data["lines"][0]
+        assert customized["product_id"] == 1
+        assert customized["customization_hash"]
+        assert customized["customizations"] == RING_OPTIONS
+        assert customized["unit_price"] == 3549.0
+        assert client.get(CART).json() == data
+
+    def test_existing_customization_by_hash(self):
+        """Test later changes refer to a customized line by its hash"""
+        data = post_changes(
+            0, {"product_id": 1, "customizations": RING_OPTIONS, "quantity": 1}
+        ).json()
+        customization_hash = data["lines"][0]["customization_hash"]
+        data = post_changes(
+            1,
+            {"product_id": 1, "customization_hash": customization_hash, "quantity": 2},
+        ).json()
+        assert data["lines"][0]["quantity"] == 2
+        assert len(data["lines"]) == 1
+
+    def test_version_conflict(self):
+        """Test a write based on an old version returns 409"""
+        post_changes(0, {"product_id": 4, "quantity": 1})
+        response = post_changes(0, {"product_id": 4, "quantity": 5})
+        assert response.status_code == 409
+        assert "Current version: 1" in response.json()["detail"]
+        assert client.get(CART).json()["lines"][0]["quantity"] == 1
+
+    @pytest.mark.parametrize(
+        "line",
+        [
+            {"product_id": 99999, "quantity": 1},
+            {"product_id": 4, "customizations": {"metal_type": "gold"}, "quantity": 1},
+            {"product_id": 1, "customizations": {"metal_type": "tin"}, "quantity": 1},
+            {"product_id": 1, "customizations": {}, "quantity": 1},
+            {
+                "product_id": 1,
+                "customizations": {**RING_OPTIONS, "engraving": {"a": 1}},
+                "quantity": 1,
+            },
+            {
+                "product_id": 10,
+                "customizations": {"charms": [{"a": 1}]},
+                "quantity": 1,
+            },
+            {"product_id": 1, "customization_hash": "feedface", "quantity": 1},
+        ],
+    )
+    def test_invalid_lines(self, line):
+        """Test unknown products, options and hashes, values that are not
+        strings and missing required options return 400"""
+        response = post_changes(0, line)
+        assert response.status_code == 400
+        assert client.get(CART).json()["version"] == 0
+
+    def test_product_without_customization_config(self, monkeypatch):
+        """Test customizing a product whose category has no config returns 400"""
+        monkeypatch.setattr("app.carts.get_customization_config", lambda category: None)
+        response = post_changes(
+            0, {"product_id": 1, "customizations": RING_OPTIONS, "quantity": 1}
+        )
+        assert response.status_code == 400
+        assert "Product 1" in response.json()["detail"]
+
+    def test_quantity_limits(self):
+        """Test negative and oversized quantities are rejected"""
+        assert post_changes(0, {"product_id": 4, "quantity": -1}).status_code == 422
+        assert post_changes(0, {"product_id": 4, "quantity": 100}).status_code == 422
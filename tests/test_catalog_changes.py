@@ -0,0 +1,143 @@
+"""
+Tests for catalog versions and the product change feed
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.catalog_changes import CatalogChangeLog
+from app.main import app
+from app.mock_data import (
+    apply_catalog_changes,
+    build_indexes,
+    get_product_by_id,
+    load_catalog,
+)
+from app.models import Product
+
+client = TestClient(app)
+
+NEW_PRODUCT = Product(
+    id=100,
+    name="Gold Hoop Earrings",
+    price=300.0,
+    category="bracelets",
+    material="Gold",
+    image="https://example.com/hoops.jpg",
+    description="Classic 14k gold hoops.",
+)
+
+
+@pytest.fixture
+def catalog():
+    """Fresh catalog for the test, restored afterwards"""
+    build_indexes(load_catalog())
+    yield
+    build_indexes(load_catalog())
+
+
+def _changes(**params):
+    response = client.get("/api/products/changes", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestCatalogChangeLog:
+    """Test versions and deltas"""
+
+    def test_one_version_per_batch(self):
+        """Test a batch bumps the version once and an empty one not at all"""
+        log = CatalogChangeLog()
+        assert log.version == 1
+        assert log.record([1, 2], [3]) == 2
+        assert log.record([], []) == 2
+
+    def test_since_returns_latest_change_per_product(self):
+        """Test a delta lists each product once, by its latest change"""
+        log = CatalogChangeLog()
+        log.record([1, 2], [])
+        log.record([3], [2])
+        log.record([1], [])
+        assert log.since(1) == ([1, 3], [2])
+        assert log.since(2) == ([1, 3], [2])
+        assert log.since(3) == ([1], [])
+        assert log.since(4) == ([], [])
+
+    def test_unknown_versions_need_full_catalog(self):
+        """Test versions outside the history return None"""
+        log = CatalogChangeLog()
+        assert log.since(0) is None
+        assert log.since(2) is None
+
+
+class TestApplyCatalogChanges:
+    """Test changing the published catalog"""
+
+    def test_upsert_and_remove(self, catalog):
+        """Test replaced products keep their place, new ones are appended"""
+        updated = get_product_by_id(2).model_copy(update={"price": 999.0})
+        apply_catalog_changes([updated, NEW_PRODUCT], [3, 12345])
+
+        ids = [product["id"] for product in client.get("/api/products").json()]
+        assert ids == [1, 2] + list(range(4, 16)) + [100]
+        assert get_product_by_id(2).price == 999.0
+        assert get_product_by_id(3) is None
+
+    def test_upsert_and_remove_same_id(self, catalog):
+        """Test an id cannot be upserted and removed in one batch"""
+        with pytest.raises(ValueError):
+            apply_catalog_changes([NEW_PRODUCT], [NEW_PRODUCT.id])
+
+
+class TestChangesEndpoint:
+    """Test GET /api/products/changes"""
+
+    def test_first_sync_gets_whole_catalog(self, catalog):
+        """Test since=0 returns every product with reset set"""
+        body = _changes(since=0)
+        assert body["reset"] is True
+        assert body["version"] == 1
+        assert len(body["products"]) == 15
+
+    def test_delta_has_only_changes(self, catalog):
+        """Test a known version gets only the changed products"""
+        epoch = _changes()["epoch"]
+        apply_catalog_changes([NEW_PRODUCT], [3])
+
+        body = _changes(since=1, epoch=epoch)
+        assert body["reset"] is False
+        assert body["version"] == 2
+        assert [product["id"] for product in body["products"]] == [100]
+        assert body["removed"] == [3]
+        assert _changes(since=2, epoch=epoch)["products"] == []
+
+    def test_other_epoch_resets(self, catalog):
+        """Test versions from another epoch get the whole catalog"""
+        apply_catalog_changes([NEW_PRODUCT])
+        body = _changes(since=1, epoch="0123456789abcdef")
+        assert body["reset"] is True
+        assert len(body["products"]) == 16
+
+    def test_future_version_resets(self, catalog):
+        """Test a version newer than the catalog gets the whole catalog"""
+        epoch = _changes()["epoch"]
+        assert _changes(since=7, epoch=epoch)["reset"] is True
+
+    def test_always_revalidated(self, catalog):
+        """Test responses must be revalidated and unchanged ones cost a 304"""
+        epoch = _changes()["epoch"]
+        response = client.get(
+            "/api/products/changes", params={"since": 1, "epoch": epoch}
+        )
+        assert response.headers["cache-control"] == "no-cache"
+        response = client.get(
+            "/api/products/changes",
+            params={"since": 1, "epoch": epoch},
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+        assert response.status_code == 304
+
+    def test_negative_version_rejected(self):
+        """Test since must not be negative"""
+        response = client.get("/api/products/changes", params={"since": -1})
+        assert response.status_code == 422
@@ -0,0 +1,156 @@
+"""
+Tests for the streaming catalog import (app/catalog_import.py)
+"""
+
+import json
+import sys
+
+import pytest
+
+from app.catalog_import import import_catalog, main, validate_chunk, write_snapshot
+from app.catalog_map import open_catalog_map
+from app.mock_data import (
+    PRODUCT_DATA,
+    build_indexes,
+    get_product_by_id,
+    load_catalog,
+    publish_catalog,
+)
+
+CSV_HEADER = "id,name,price,category,material,image,description,customizable\n"
+
+
+def _jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return path
+
+
+@pytest.fixture
+def catalog():
+    """Restore the catalog after the test"""
+    yield
+    build_indexes(load_catalog())
+
+
+class TestValidateChunk:
+    """Test decoding and validating one chunk"""
+
+    def test_csv_values_are_typed(self):
+        """Test CSV text becomes ints, floats and booleans, blanks use defaults"""
+        header = CSV_HEADER.strip().split(",")
+        record = ["7", "Ring", "12.5", "rings", "Gold", "x.jpg", "Nice", "true"]
+        blank = ["8", "Band", "10", "rings", "Gold", "y.jpg", "Plain", ""]
+        result = validate_chunk("csv", header, [(2, record), (3, blank)])
+        assert result.rejected == []
+        assert result.lines == [2, 3]
+        assert result.rows[0]["id"] == 7
+        assert result.rows[0]["price"] == 12.5
+        assert result.rows[0]["customizable"] is True
+        assert result.rows[1]["customizable"] is False
+
+    def test_rejected_rows_name_line_and_field(self):
+        """Test bad rows are reported by line without stopping the chunk"""
+        good = json.dumps(PRODUCT_DATA[0])
+        bad_price = json.dumps({**PRODUCT_DATA[1], "price": -1})
+        records = [(1, good), (2, "{not json"), (3, "[1]"), (4, bad_price)]
+        result = validate_chunk("jsonl", [], records)
+        assert result.lines == [1]
+        assert [row.line for row in result.rejected] == [2, 3, 4]
+        assert result.rejected[0].message.startswith("invalid JSON")
+        assert result.rejected[1].message == "expected a JSON object"
+        assert result.rejected[2].message.startswith("price: Input should be greater")
+
+
+class TestImportCatalog:
+    """Test importing whole files"""
+
+    def test_jsonl_across_chunks_and_workers(self, tmp_path):
+        """Test chunked, parallel validation keeps file order"""
+        path = _jsonl(tmp_path / "products.jsonl", PRODUCT_DATA)
+        result = import_catalog(path, chunk_size=4, workers=2)
+        assert result.rows_read == 15
+        assert list(result.store.ids) == [row["id"] for row in PRODUCT_DATA]
+        assert result.rejected_count == 0
+
+    def test_csv(self, tmp_path):
+        """Test a CSV file with a header row, quoting and a short row"""
+        path = tmp_path / "products.csv"
+        path.write_text(
+            CSV_HEADER
+            + '1,"Ring, gold",99.5,rings,Gold,a.jpg,"Two\nlines",\n'
+            + "2,Chain,10,necklaces,Silver\n"
+        )
+        result = import_catalog(path, workers=1)
+        assert list(result.store.ids) == [1]
+        assert result.store.product(0).name == "Ring, gold"
+        assert result.rejected[0].line == 4
+        assert result.rejected[0].message == "5 fields for 8 columns"
+
+    def test_byte_order_mark(self, tmp_path):
+        """Test files saved with a UTF-8 byte order mark are read"""
+        row = "1,Ring,99.5,rings,Gold,a.jpg,Plain,\n"
+        (tmp_path / "products.csv").write_text(CSV_HEADER + row, encoding="utf-8-sig")
+        _jsonl(tmp_path / "products.jsonl", PRODUCT_DATA[:1])
+        text = (tmp_path / "products.jsonl").read_text()
+        (tmp_path / "products.jsonl").write_text(text, encoding="utf-8-sig")
+        for name in ("products.csv", "products.jsonl"):
+            result = import_catalog(tmp_path / name, workers=1)
+            assert result.rejected == []
+            assert list(result.store.ids) == [1]
+
+    def test_last_duplicate_wins(self, tmp_path):
+        """Test earlier rows for an id are replaced and reported"""
+        rows = [PRODUCT_DATA[0], PRODUCT_DATA[1], {**PRODUCT_DATA[0], "price": 1.0}]
+        path = _jsonl(tmp_path / "products.jsonl", rows)
+        result = import_catalog(path, workers=1)
+        assert list(result.store.ids) == [2, 1]
+        assert result.store.product(1).price == 1.0
+        assert result.duplicate_count == 1
+        assert result.duplicates[0].line == 1
+
+    def test_errors_are_capped(self, tmp_path):
+        """Test only max_errors rejected rows are kept, all are counted"""
+        path = tmp_path / "products.jsonl"
+        path.write_text("{}\n" * 10)
+        result = import_catalog(path, workers=1, max_errors=3)
+        assert result.rejected_count == 10
+        assert len(result.rejected) == 3
+        assert result.rows_imported == 0
+
+    def test_unknown_format(self, tmp_path):
+        """Test files that are neither CSV nor JSON Lines are refused"""
+        with pytest.raises(ValueError):
+            import_catalog(tmp_path / "products.xml")
+
+
+class TestPublishing:
+    """Test using an imported store"""
+
+    def test_snapshot_round_trip(self, tmp_path):
+        """Test a written snapshot loads as the same products"""
+        path = _jsonl(tmp_path / "products.jsonl", PRODUCT_DATA)
+        store = import_catalog(path, workers=1).store
+        write_snapshot(store, tmp_path / "catalog.json")
+        assert load_catalog(str(tmp_path / "catalog.json")) == store.products()
+
+    def test_cli_writes_binary_snapshot(self, tmp_path, monkeypatch, capsys):
+        """Test --map writes a binary snapshot of the imported rows, without
+        the rows replaced by a later duplicate"""
+        rows = [*PRODUCT_DATA, {**PRODUCT_DATA[0], "price": 1.0}]
+        path = _jsonl(tmp_path / "products.jsonl", rows)
+        output = tmp_path / "catalog.pcat"
+        argv = ["catalog_import", str(path), "--workers", "1", "--map", str(output)]
+        monkeypatch.setattr(sys, "argv", argv)
+        assert main() == 0
+        mapped = open_catalog_map(str(output))
+        assert list(mapped.ids) == [row["id"] for row in PRODUCT_DATA[1:]] + [1]
+        assert mapped.product(mapped.row_of(1)).price == 1.0
+        assert "binary snapshot" in capsys.readouterr().out
+
+    def test_publish_catalog(self, tmp_path, catalog):
+        """Test an imported store can be served directly"""
+        row = {**PRODUCT_DATA[0], "id": 500}
+        path = _jsonl(tmp_path / "products.jsonl", [row])
+        publish_catalog(import_catalog(path, workers=1).store)
+        assert get_product_by_id(500).name == PRODUCT_DATA[0]["name"]
+        assert get_product_by_id(1) is None
@@ -0,0 +1,100 @@
+"""
+Tests for memory-mapped binary catalog snapshots (app/catalog_map.py)
+"""
+
+import pytest
+
+from app.catalog_map import open_catalog_map, write_catalog_map
+from app.catalog_store import ColumnarCatalog
+from app.mock_data import (
+    PRODUCT_DATA,
+    build_indexes,
+    filter_products,
+    get_all_products,
+    get_product_by_id,
+    load_catalog,
+    map_catalog,
+)
+from app.startup import StartupState, warm_up
+
+
+@pytest.fixture
+def catalog():
+    """Restore the catalog after the test"""
+    yield
+    build_indexes(load_catalog())
+
+
+def _mapped(tmp_path, rows):
+    path = tmp_path / "catalog.pcat"
+    write_catalog_map(ColumnarCatalog.from_rows(rows), path)
+    return path
+
+
+class TestCatalogMap:
+    """Test writing and mapping binary snapshots"""
+
+    def test_round_trip(self, tmp_path):
+        """Test a mapped store materializes the same products"""
+        store = open_catalog_map(_mapped(tmp_path, PRODUCT_DATA))
+        assert store.shared is True
+        assert store.products() == ColumnarCatalog.from_rows(PRODUCT_DATA).products()
+        assert store.product(store.row_of(7)).name == PRODUCT_DATA[6]["name"]
+        assert store.row_of(99) is None
+
+    def test_posting_lists_match_scans(self, tmp_path):
+        """Test filters answered from posting lists agree with column scans"""
+        rows = list(reversed(PRODUCT_DATA))
+        mapped = open_catalog_map(_mapped(tmp_path, rows))
+        scanned = ColumnarCatalog.from_rows(rows)
+        cases = [
+            {"category": "rings"},
+            {"material": "Gold"},
+            {"category": "necklaces", "price_max": 1500, "material": "Gold"},
+            {"category": "watches"},
+            {"material": "Platinum"},
+        ]
+        for filters in cases:
+            assert mapped.select(**filters) == scanned.select(**filters)
+        assert mapped.row_of(1) == len(rows) - 1
+
+    def test_empty_catalog(self, tmp_path):
+        """Test a catalog without products maps to an empty store"""
+        store = open_catalog_map(_mapped(tmp_path, []))
+        assert len(store) == 0
+        assert store.select(category="rings") == []
+
+    def test_rejects_other_and_truncated_files(self, tmp_path):
+        """Test files that are not complete snapshots are refused"""
+        other = tmp_path / "catalog.json"
+        other.write_text("[]")
+        with pytest.raises(ValueError):
+            open_catalog_map(other)
+        path = _mapped(tmp_path, PRODUCT_DATA)
+        path.write_bytes(path.read_bytes()[:-64])
+        with pytest.raises(ValueError, match="truncated"):
+            open_catalog_map(path)
+
+
+class TestServingMappedCatalog:
+    """Test the catalog served from a mapped snapshot"""
+
+    def test_map_catalog(self, tmp_path, catalog):
+        """Test lookups and filters read from the mapped store"""
+        row = {**PRODUCT_DATA[0], "id": 500}
+        map_catalog(str(_mapped(tmp_path, [row])))
+        assert [product.id for product in get_all_products()] == [500]
+        assert get_product_by_id(500).name == PRODUCT_DATA[0]["name"]
+        assert filter_products(category=row["category"])[0].id == 500
+
+    def test_warm_up_maps_snapshot(self, tmp_path, monkeypatch, catalog):
+        """Test warm-up maps the snapshot instead of loading the catalog"""
+        state = StartupState()
+        monkeypatch.setattr("app.startup.startup_state", state)
+        monkeypatch.setattr("app.mock_data.is_catalog_loaded", lambda: False)
+        monkeypatch.setattr(
+            "app.mock_data.CATALOG_MAP", str(_mapped(tmp_path, PRODUCT_DATA))
+        )
+        warm_up()
+        assert set(state.phases) == {"catalog_map", "cache_warm"}
+        assert len(get_all_products()) == len(PRODUCT_DATA)
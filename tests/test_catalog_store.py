@@ -0,0 +1,141 @@
+"""
+Tests for the columnar catalog store (app/catalog_store.py)
+"""
+
+import sys
+import threading
+
+from app.catalog_map import open_catalog_map, write_catalog_map
+from app.catalog_store import ColumnarCatalog, InternTable, StringColumn
+from app.mock_data import PRODUCT_DATA
+from app.models import Product
+
+
+class TestColumns:
+    """Test the packed string column and intern table"""
+
+    def test_string_column_round_trip(self):
+        """Test strings, including non-ASCII and empty ones, round-trip"""
+        column = StringColumn()
+        values = ["Pavé ring", "", "Émeraude — 18k", "plain"]
+        for value in values:
+            column.append(value)
+        assert len(column) == len(values)
+        assert [column[i] for i in range(len(values))] == values
+
+    def test_intern_table(self):
+        """Test codes are stable and lookup does not add values"""
+        table = InternTable(["Gold", "Silver"])
+        assert table.code("Gold") == 0
+        assert table.code("Rose Gold") == 2
+        assert table.lookup("Platinum") is None
+        assert table.values == ["Gold", "Silver", "Rose Gold"]
+
+
+class TestColumnarCatalog:
+    """Test lookups, filtering and materialization"""
+
+    def setup_method(self):
+        self.catalog = ColumnarCatalog.from_rows(PRODUCT_DATA)
+        self.expected = [Product(**row) for row in PRODUCT_DATA]
+
+    def test_products_equal_validated_models(self):
+        """Test materialized rows equal validated Product models"""
+        assert self.catalog.products() == self.expected
+        assert self.catalog.product(0).model_dump() == self.expected[0].model_dump()
+
+    def test_select_matches_list_filtering(self):
+        """Test select agrees with filtering a list of products"""
+        cases = [
+            {},
+            {"category": "rings"},
+            {"price_max": 1000},
+            {"material": "Gold"},
+            {"category": "necklaces", "price_max": 1500, "material": "Gold"},
+            {"category": "watches"},
+        ]
+        for filters in cases:
+            expected = [
+                p
+                for p in self.expected
+                if p.category == filters.get("category", p.category)
+                and p.price <= filters.get("price_max", p.price)
+                and p.material == filters.get("material", p.material)
+            ]
+            assert self.catalog.products(self.catalog.select(**filters)) == expected
+
+    def test_row_of(self):
+        """Test id lookup for present and missing ids"""
+        assert self.catalog.row_of(1) == 0
+        assert self.catalog.row_of(15) == 14
+        assert self.catalog.row_of(0) is None
+        assert self.catalog.row_of(999) is None
+
+    def test_row_of_unordered_ids(self):
+        """Test id lookup still works when ids are appended out of order"""
+        catalog = ColumnarCatalog.from_rows(reversed(PRODUCT_DATA))
+        assert catalog.row_of(15) == 0
+        assert catalog.row_of(1) == 14
+        assert catalog.row_of(16) is None
+        row = catalog.append({**PRODUCT_DATA[0], "id": 7_000})
+        assert catalog.row_of(7_000) == row
+        assert catalog.product(row).id == 7_000
+
+    def test_concurrent_lookups_after_appends(self):
+        """Test threads racing to rebuild the id index all find every row"""
+        catalog = ColumnarCatalog.from_rows(reversed(PRODUCT_DATA))
+        errors = []
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for step in range(50):
+                catalog.append({**PRODUCT_DATA[0], "id": 1_000 - step})
+                start = threading.Barrier(8)
+
+                def look_up():
+                    start.wait()
+                    try:
+                        for row in PRODUCT_DATA:
+                            assert catalog.row_of(row["id"]) is not None
+                    except Exception as exc:
+                        errors.append(exc)
+
+                threads = [threading.Thread(target=look_up) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        assert errors == []
+
+    def test_with_changes(self, tmp_path):
+        """Test replaced rows keep their place, new rows are appended and the
+        source, owned or mapped, is left unchanged"""
+        path = str(tmp_path / "catalog.pcat")
+        write_catalog_map(self.catalog, path)
+        updated = {**PRODUCT_DATA[4], "name": "Pavé band", "price": 99.0}
+        added = {**PRODUCT_DATA[0], "id": 100, "category": "bracelets"}
+        removed = {PRODUCT_DATA[0]["id"], PRODUCT_DATA[9]["id"], 999}
+        expected = [
+            Product(**row)
+            for row in [*PRODUCT_DATA[:4], updated, *PRODUCT_DATA[5:], added]
+            if row["id"] not in removed
+        ]
+        for source in (self.catalog, open_catalog_map(path)):
+            changed = source.with_changes({5: updated, 100: added}, removed)
+            assert changed.products() == expected
+            assert changed.row_of(100) == len(expected) - 1
+            assert changed.select(category="bracelets", price_max=5000) == [
+                i for i, p in enumerate(expected) if p.category == "bracelets"
+            ]
+            assert source.products() == self.expected
+
+    def test_nbytes_counts_buffers(self):
+        """Test nbytes grows with the stored text"""
+        text = sum(
+            len(row[field].encode("utf-8"))
+            for row in PRODUCT_DATA
+            for field in ("name", "description", "image")
+        )
+        assert self.catalog.nbytes > text
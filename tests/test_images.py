@@ -0,0 +1,215 @@
+"""
+Tests for the responsive image pipeline
+"""
+
+import asyncio
+import io
+import os
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.images import EVICTION_GRACE, ImageService, fetch_sources
+from app.main import app
+from app.models import Product
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def service(tmp_path):
+    """ImageService over a temporary source directory with one 1000px image"""
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    Image.new("RGB", (1000, 800), (212, 175, 55)).save(source_dir / "1.jpg")
+    return ImageService(source_dir=source_dir, cache_dir=tmp_path / "cache")
+
+
+class TestImageService:
+    """Test variant rendering and the on-disk cache"""
+
+    def test_variant_is_resized_and_cached(self, service):
+        """Test the first request renders, the second is served from cache"""
+        path = asyncio.run(service.get_variant(1, 320, "webp"))
+        with Image.open(path) as img:
+            assert img.format == "WEBP"
+            assert img.size == (320, 256)
+
+        mtime = path.stat().st_mtime_ns
+        assert asyncio.run(service.get_variant(1, 320, "webp")) == path
+        assert service.renders == 1
+        assert path.stat().st_mtime_ns == mtime  # hits write nothing
+
+    def test_width_is_snapped_and_never_upscaled(self, service):
+        """Test odd widths snap to a generated width and sources are not enlarged"""
+        path = asyncio.run(service.get_variant(1, 300, "jpeg"))
+        with Image.open(path) as img:
+            assert img.width == 320
+
+        path = asyncio.run(service.get_variant(1, 5000, "jpeg"))
+        with Image.open(path) as img:
+            assert img.width == 1000
+
+    def test_missing_source_raises(self, service):
+        """Test that products without a source image raise LookupError"""
+        with pytest.raises(LookupError):
+            asyncio.run(service.get_variant(2, 320, "webp"))
+
+    def test_concurrent_requests_render_once(self, service):
+        """Test that concurrent requests for one variant share a single render"""
+
+        async def main():
+            return await asyncio.gather(
+                *(service.get_variant(1, 640, "webp") for _ in range(5))
+            )
+
+        paths = asyncio.run(main())
+        assert len(set(paths)) == 1
+        assert service.renders == 1
+        assert service.stats()["coalesced"] == 4
+
+    def test_lru_eviction_keeps_cache_bounded(self, service):
+        """Test least recently used variants are evicted over the byte budget
+        and their files deleted once the grace period is over"""
+        now = [0.0]
+        service.clock = lambda: now[0]
+        first = asyncio.run(service.get_variant(1, 160, "jpeg"))
+        service.max_cache_bytes = first.stat().st_size + 1
+        second = asyncio.run(service.get_variant(1, 320, "jpeg"))
+
+        assert first.exists()  # a response may still be about to send it
+        assert second.exists()
+        assert service.evictions == 1
+        assert (
+            service.stats()["cache_bytes"]
+            <= service.max_cache_bytes + second.stat().st_size
+        )
+        now[0] += EVICTION_GRACE
+        asyncio.run(service.get_variant(1, 480, "jpeg"))
+        assert not first.exists()
+        assert second.exists()
+
+    def test_rendered_again_after_eviction_is_kept(self, service):
+        """Test a variant rendered again during its grace period is not deleted"""
+        now = [0.0]
+        service.clock = lambda: now[0]
+        first = asyncio.run(service.get_variant(1, 160, "jpeg"))
+        service.max_cache_bytes = first.stat().st_size + 1
+        asyncio.run(service.get_variant(1, 320, "jpeg"))
+        service.max_cache_bytes = 10**9
+        assert asyncio.run(service.get_variant(1, 160, "jpeg")) == first
+        now[0] += EVICTION_GRACE
+        asyncio.run(service.get_variant(1, 480, "jpeg"))
+        assert first.exists()
+        assert service.renders == 4
+
+    def test_srcset_candidates(self, service):
+        """Test srcset lists widths up to the source width"""
+        srcset = service.srcset(1)
+        version = service.source_version(1)
+        assert srcset.startswith(f"/img/1?w=160&v={version} 160w")
+        assert srcset.endswith(f"/img/1?w=1280&v={version} 1000w")
+        assert service.srcset(2) is None
+
+    def test_replaced_source_gets_new_urls(self, service, tmp_path):
+        """Test replacing a source image changes its revision and variants"""
+        first = asyncio.run(service.get_variant(1, 160, "jpeg"))
+        version = service.source_version(1)
+        source = tmp_path / "src" / "1.jpg"
+        Image.new("RGB", (1000, 800), (0, 0, 0)).save(source)
+        os.utime(source, ns=(version + 10**9, version + 10**9))
+        assert service.source_version(1) == version  # until the next scan
+        service.refresh_sources()
+        assert service.source_version(1) == version + 10**9
+        assert f"v={version}" not in service.srcset(1)
+        assert asyncio.run(service.get_variant(1, 160, "jpeg")) != first
+
+    def test_fetch_sources(self, tmp_path):
+        """Test missing source images are downloaded at the largest width"""
+        requested = []
+
+        def handler(request):
+            requested.append(str(request.url))
+            if "missing" in request.url.path:
+                return httpx.Response(404)
+            body = io.BytesIO()
+            Image.new("RGB", (40, 30)).save(body, format="PNG")
+            return httpx.Response(
+                200, content=body.getvalue(), headers={"content-type": "image/png"}
+            )
+
+        source_dir = tmp_path / "src"
+        source_dir.mkdir()
+        (source_dir / "3.jpg").write_bytes(b"")
+        images = {
+            1: "https://cdn.example/photo-1?w=500&q=80",
+            2: "https://cdn.example/missing.jpg",
+            3: "https://cdn.example/photo-3",
+        }
+        with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+            assert fetch_sources(images, source_dir, client) == [1]
+        assert requested[0] == "https://cdn.example/photo-1?w=1280&q=80"
+        assert len(requested) == 2
+        assert ImageService(source_dir=source_dir).find_source(1)[1] == 40
+
+    def test_negotiate_format(self, service):
+        """Test Accept header negotiation prefers compact formats"""
+        assert service.negotiate_format("image/webp,*/*") == "webp"
+        assert service.negotiate_format("*/*") == "jpeg"
+        assert service.negotiate_format(None) == "jpeg"
+
+
+class TestImageEndpoint:
+    """Test the /img/{product_id} endpoint"""
+
+    def test_serves_requested_format(self, service, monkeypatch):
+        """Test explicit fmt returns that media type with long-lived caching"""
+        monkeypatch.setattr("app.api.images.image_service", service)
+        version = service.source_version(1)
+        response = client.get(f"/img/1?w=160&fmt=webp&v={version}")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert "immutable" in response.headers["cache-control"]
+
+    def test_unversioned_urls_are_not_immutable(self, service, monkeypatch):
+        """Test URLs without the current revision are cached briefly"""
+        monkeypatch.setattr("app.api.images.image_service", service)
+        for url in ("/img/1?w=160", "/img/1?w=160&v=1"):
+            response = client.get(url)
+            assert response.status_code == 200
+            assert "immutable" not in response.headers["cache-control"]
+            assert "etag" in response.headers
+
+    def test_negotiates_format_from_accept(self, service, monkeypatch):
+        """Test omitted fmt is negotiated and varies on Accept"""
+        monkeypatch.setattr("app.api.images.image_service", service)
+        response = client.get("/img/1?w=160", headers={"Accept": "image/webp"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["vary"] == "Accept"
+
+    def test_invalid_format(self, service, monkeypatch):
+        """Test unknown formats return 400"""
+        monkeypatch.setattr("app.api.images.image_service", service)
+        response = client.get("/img/1?fmt=gif")
+        assert response.status_code == 400
+        assert "Invalid fmt" in response.json()["detail"]
+
+    def test_unknown_product_and_missing_image(self, service, monkeypatch):
+        """Test unknown products return 404 and products without a source
+        redirect to their original image"""
+        monkeypatch.setattr("app.api.images.image_service", service)
+        assert client.get("/img/999").status_code == 404
+        response = client.get("/img/2", follow_redirects=False)
+        assert response.status_code == 307
+        original = client.get("/api/products/2").json()["image"]
+        assert response.headers["location"] == original
+        assert "immutable" not in response.headers["cache-control"]
+
+    def test_srcset_published_at_warm_up(self, monkeypatch):
+        """Test products carry the srcset published from the last scan"""
+        monkeypatch.setattr(Product, "image_srcsets", {1: "/img/1?w=160&v=7 160w"})
+        assert client.get("/api/products/1").json()["srcset"] == "/img/1?w=160&v=7 160w"
+        assert client.get("/api/products/2").json()["srcset"] is None
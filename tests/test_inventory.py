@@ -0,0 +1,263 @@
+"""
+Tests for inventory and reservations (app/inventory.py) and their API
+"""
+
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.carts import CustomizationRegistry
+from app.inventory import Inventory, OutOfStockError, TimerWheel, inventory
+from app.main import app
+from app.mock_data import PRODUCT_DATA, filter_products
+from app.startup import StartupState, warm_up
+
+client = TestClient(app)
+
+RINGS = [row["id"] for row in PRODUCT_DATA if row["category"] == "rings"]
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def empty_inventory():
+    """Each test starts with every product untracked"""
+    inventory.clear()
+    yield
+    inventory.clear()
+
+
+class TestTimerWheel:
+    """Test deadlines collected by the timer wheel"""
+
+    def test_fires_once_deadline_passes(self):
+        """Test keys fire after their deadline, not before, and only once"""
+        clock = FakeClock()
+        wheel = TimerWheel(slots=8, clock=clock)
+        wheel.schedule("a", clock.now + 2.5)
+        wheel.schedule("b", clock.now + 20)  # more than one turn away
+        clock.now += 2
+        assert wheel.advance() == []
+        clock.now += 1
+        assert wheel.advance() == ["a"]
+        assert wheel.advance() == []
+        clock.now += 100  # idle for several turns
+        assert wheel.advance() == ["b"]
+        assert len(wheel) == 0
+
+
+class TestInventory:
+    """Test stock levels, reservations and the sold-out index"""
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.inventory = Inventory(ttl=60, clock=self.clock)
+
+    def test_untracked_products_never_sell_out(self):
+        """Test products without stock can be reserved without limit"""
+        reservation = self.inventory.reserve(1, 50)
+        assert reservation.counted_as is None
+        assert self.inventory.available(1) is None
+        assert not self.inventory.is_sold_out(1)
+
+    def test_untracked_reservations_are_not_kept(self):
+        """Test reservations holding nothing do not accumulate"""
+        for _ in range(100):
+            reservation = self.inventory.reserve(1, 1)
+        assert len(self.inventory) == 0
+        with pytest.raises(LookupError):
+            self.inventory.commit(reservation.id)
+
+    def test_reserve_commit_and_release(self):
+        """Test reserved items are held, then sold or put back"""
+        self.inventory.set_stock(1, 3)
+        first = self.inventory.reserve(1, 2)
+        assert self.inventory.available(1) == 1
+        with pytest.raises(OutOfStockError) as exc:
+            self.inventory.reserve(1, 2)
+        assert exc.value.available == 1
+        self.inventory.commit(first.id)
+        assert self.inventory.available(1) == 1
+        second = self.inventory.reserve(1, 1)
+        assert self.inventory.is_sold_out(1)
+        self.inventory.release(second.id)
+        assert not self.inventory.is_sold_out(1)
+        with pytest.raises(LookupError):
+            self.inventory.commit(first.id)
+
+    def test_reservations_expire(self):
+        """Test expired reservations go back on sale and cannot be bought"""
+        self.inventory.set_stock(1, 1)
+        reservation = self.inventory.reserve(1, 1)
+        assert self.inventory.is_sold_out(1)
+        self.clock.now += 61
+        assert not self.inventory.is_sold_out(1)
+        assert len(self.inventory) == 0
+        with pytest.raises(LookupError):
+            self.inventory.commit(reservation.id)
+
+    def test_load_stock(self, tmp_path):
+        """Test stock records are loaded, and none if any record is malformed"""
+        path = tmp_path / "stock.json"
+        path.write_text(
+            json.dumps(
+                [
+                    {"product_id": 1, "on_hand": 3},
+                    {"product_id": 1, "customization_hash": "abc", "on_hand": 0},
+                    {"product_id": 2, "on_hand": 0},
+                ]
+            )
+        )
+        assert self.inventory.load_stock_file(str(path)) == 3
+        assert self.inventory.available(1) == 3
+        assert self.inventory.variants(1) == {"abc": 0}
+        assert self.inventory.is_sold_out(2)
+        for record in (
+            {"product_id": "5", "on_hand": 1},
+            {"product_id": 5, "on_hand": -1},
+            {"product_id": 5},
+            [5, 1],
+        ):
+            with pytest.raises(ValueError):
+                self.inventory.load_stock([{"product_id": 6, "on_hand": 1}, record])
+            assert self.inventory.available(6) is None
+
+    def test_variants(self):
+        """Test customizations with their own stock, others share the product's"""
+        self.inventory.set_stock(1, 0)
+        self.inventory.set_stock(1, 1, "engraved")
+        assert not self.inventory.is_sold_out(1)
+        with pytest.raises(OutOfStockError):
+            self.inventory.reserve(1, 1, "plain")
+        self.inventory.reserve(1, 1, "engraved")
+        assert self.inventory.variants(1) == {"engraved": 0}
+        assert self.inventory.is_sold_out(1)
+
+    def test_concurrent_reservations_never_oversell(self):
+        """Test many threads reserving the last items sell exactly the stock"""
+        self.inventory.set_stock(1, 100)
+        self.inventory.set_stock(2, 100)
+        reserved = []
+
+        def buy(product_id):
+            for _ in range(60):
+                try:
+                    reserved.append(self.inventory.reserve(product_id, 1))
+                except OutOfStockError:
+                    pass
+
+        threads = [threading.Thread(target=buy, args=(1 + i % 2,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(reserved) == 200
+        assert self.inventory.is_sold_out(1) and self.inventory.is_sold_out(2)
+
+
+class TestInventoryApi:
+    """Test /api/products/{id}/stock, /api/reservations and in_stock"""
+
+    def test_stock_level(self):
+        """Test tracked and untracked stock levels"""
+        inventory.set_stock(1, 5)
+        inventory.set_stock(1, 2, CustomizationRegistry.hash_of(1, {"size": "6"}))
+        body = client.get("/api/products/1/stock").json()
+        assert body["tracked"] is True
+        assert body["available"] == 5
+        assert list(body["variants"].values()) == [2]
+        assert client.get("/api/products/2/stock").json()["tracked"] is False
+        assert client.get("/api/products/999/stock").status_code == 404
+
+    def test_reservation_flow(self):
+        """Test reserving, running out, committing and releasing"""
+        inventory.set_stock(4, 1)
+        response = client.post(
+            "/api/reservations", json={"product_id": 4, "quantity": 1}
+        )
+        assert response.status_code == 201
+        reservation = response.json()
+        assert reservation["held"] is True
+        assert 0 < reservation["expires_in"] <= inventory.ttl
+        again = client.post("/api/reservations", json={"product_id": 4, "quantity": 1})
+        assert again.status_code == 409
+        commit = client.post(f"/api/reservations/{reservation['id']}/commit")
+        assert commit.status_code == 200
+        assert (
+            client.delete(f"/api/reservations/{reservation['id']}").status_code == 404
+        )
+        assert client.get("/api/products/4/stock").json()["in_stock"] is False
+
+    def test_untracked_reservation(self):
+        """Test untracked products are reserved without holding anything"""
+        response = client.post(
+            "/api/reservations", json={"product_id": 4, "quantity": 1}
+        )
+        assert response.status_code == 201
+        assert response.json()["held"] is False
+        assert len(inventory) == 0
+
+    def test_unknown_customization(self):
+        """Test reservations for unregistered customizations are refused"""
+        response = client.post(
+            "/api/reservations",
+            json={"product_id": 1, "customization_hash": "nope", "quantity": 1},
+        )
+        assert response.status_code == 400
+
+    def test_in_stock_filter(self):
+        """Test sold-out products are left out and responses revalidated"""
+        inventory.set_stock(RINGS[0], 0)
+        assert RINGS[0] not in [p.id for p in filter_products("rings", in_stock=True)]
+        response = client.get("/api/products?category=rings&in_stock=true")
+        assert [p["id"] for p in response.json()] == RINGS[1:]
+        assert response.headers["X-Total-Count"] == str(len(RINGS) - 1)
+        assert response.headers["Cache-Control"] == "no-cache"
+        inventory.set_stock(RINGS[0], 1)
+        response = client.get("/api/products?category=rings&in_stock=true")
+        assert [p["id"] for p in response.json()] == RINGS
+
+    def test_stock_file_loaded_at_warm_up(self, tmp_path, monkeypatch):
+        """Test stock from PANDORA_STOCK_FILE drives reservations, expiry and
+        the in_stock filter over HTTP"""
+        path = tmp_path / "stock.json"
+        path.write_text(
+            json.dumps(
+                [
+                    {"product_id": 4, "on_hand": 1},
+                    {"product_id": RINGS[0], "on_hand": 0},
+                ]
+            )
+        )
+        monkeypatch.setattr("app.startup.STOCK_FILE", str(path))
+        monkeypatch.setattr("app.startup.startup_state", StartupState())
+        warm_up()
+        response = client.get("/api/products?category=rings&in_stock=true")
+        assert [p["id"] for p in response.json()] == [
+            ring for ring in RINGS if ring != RINGS[0]
+        ]
+
+        reserve = {"product_id": 4, "quantity": 1}
+        reservation = client.post("/api/reservations", json=reserve).json()
+        assert reservation["held"] is True
+        assert client.post("/api/reservations", json=reserve).status_code == 409
+        assert client.get("/api/products/4/stock").json()["in_stock"] is False
+        assert (
+            client.delete(f"/api/reservations/{reservation['id']}").status_code == 204
+        )
+        assert client.get("/api/products/4/stock").json()["available"] == 1
+
+        monkeypatch.setattr(inventory, "ttl", 0.0)
+        expired = client.post("/api/reservations", json=reserve).json()
+        assert (
+            client.post(f"/api/reservations/{expired['id']}/commit").status_code == 404
+        )
+        assert client.get("/api/products/4/stock").json()["available"] == 1
@@ -0,0 +1,55 @@
+"""
+Tests for the load-test harness (run in-process against the ASGI app)
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from app.main import app
+from loadtest.runner import compare_reports, percentile, run_load, write_report
+from loadtest.scenario import STEPS
+
+
+def _run(**kwargs):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            return await run_load(client, **kwargs)
+
+    return asyncio.run(main())
+
+
+class TestLoadRunner:
+    """Test the load runner and its report"""
+
+    def test_percentile_nearest_rank(self):
+        """Test nearest-rank percentiles"""
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 95) == 0.0
+
+    def test_report_covers_every_step(self):
+        """Test a short run records every page-load step without errors"""
+        report = _run(concurrency=2, sessions=4)
+        assert report["meta"]["sessions"] == 4
+        assert set(report["steps"]) == set(STEPS)
+        for step in report["steps"].values():
+            assert step["requests"] == 4
+            assert step["errors"] == 0
+            assert step["latency_ms"]["p50"] <= step["latency_ms"]["p99"]
+        assert report["total"]["requests"] == 4 * len(STEPS)
+
+    def test_report_round_trip_and_compare(self, tmp_path):
+        """Test reports are written as JSON and can be compared"""
+        report = _run(concurrency=1, sessions=1)
+        path = tmp_path / "report.json"
+        write_report(report, str(path))
+        loaded = json.loads(path.read_text())
+        lines = compare_reports(loaded, report)
+        assert len(lines) == len(STEPS)
+        assert lines[0].startswith("index: rps")
@@ -0,0 +1,80 @@
+"""
+Tests for the event loop lag monitor (app/loop_monitor.py)
+"""
+
+import asyncio
+import logging
+import time
+
+from fastapi.testclient import TestClient
+
+from app.loop_monitor import LoopLagMonitor
+from app.main import app
+
+client = TestClient(app)
+
+
+def _hold_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+def _run_with_monitor(monitor: LoopLagMonitor, body) -> None:
+    async def main():
+        monitor.start()
+        try:
+            await body()
+        finally:
+            await monitor.stop()
+
+    asyncio.run(main())
+
+
+class TestLoopLagMonitor:
+    """Test lag measurement and blocked-loop capture"""
+
+    def test_records_lag_without_reports_when_idle(self):
+        """Test an idle loop produces lag samples but no blocked reports"""
+        monitor = LoopLagMonitor(interval=0.005, threshold=0.2)
+
+        async def idle():
+            await asyncio.sleep(0.1)
+
+        _run_with_monitor(monitor, idle)
+        assert len(monitor.lags) >= 5
+        assert set(monitor.percentiles()) == {0.5, 0.9, 0.99}
+        assert not monitor.blocked
+
+    def test_blocking_call_stack_is_captured(self, caplog):
+        """Test a handler holding the loop is reported with its stack"""
+        monitor = LoopLagMonitor(interval=0.005, threshold=0.05)
+
+        async def blocking_handler():
+            await asyncio.sleep(0.02)
+            _hold_the_loop(0.3)
+            await asyncio.sleep(0.02)
+
+        with caplog.at_level(logging.WARNING, logger="app.loop_monitor"):
+            _run_with_monitor(monitor, blocking_handler)
+
+        assert len(monitor.blocked) == 1
+        report = monitor.blocked[0]
+        assert report.blocked_for > 0.05
+        assert any("_hold_the_loop" in line for line in report.stack)
+        assert "_hold_the_loop" in caplog.text
+        assert max(monitor.lags) >= 0.25
+
+    def test_zero_threshold_disables(self):
+        """Test a zero threshold turns the monitor off"""
+        assert not LoopLagMonitor(threshold=0).enabled
+        assert LoopLagMonitor().enabled
+
+
+class TestLoopMetrics:
+    """Test lag metrics exposure"""
+
+    def test_metrics_endpoint_lists_loop_metrics(self):
+        """Test /metrics exposes the lag histogram, quantiles and stall count"""
+        text = client.get("/metrics").text
+        assert "# TYPE event_loop_lag_seconds histogram" in text
+        assert "# TYPE event_loop_lag_quantile_seconds gauge" in text
+        assert "# TYPE event_loop_blocked_total counter" in text
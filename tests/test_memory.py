@@ -0,0 +1,195 @@
+"""
+Tests for memory diagnostics (app/memory.py) and the /debug/memory endpoints
+"""
+
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.carts import cart_store, customization_registry
+from app.catalog_store import ColumnarCatalog
+from app.main import app
+from app.memory import MemoryDiagnostics, component_sizes, deep_sizeof
+from app.mock_data import PRODUCT_DATA, ensure_catalog, get_price_histogram
+from app.profiling import ProfilingConfig
+
+client = TestClient(app)
+HEADERS = {"X-Profile": "secret"}
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    """Debug endpoints enabled with a known token; tracing stopped afterwards"""
+    monkeypatch.setattr(
+        "app.profiling.profiling_config", ProfilingConfig(token="secret")
+    )
+    yield
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+class TestSizes:
+    """Test component size accounting"""
+
+    def test_deep_sizeof_counts_shared_objects_once(self):
+        """Test referenced objects are included and counted once"""
+        payload = "x" * 10_000
+        assert deep_sizeof([payload, payload]) < 2 * len(payload)
+        assert deep_sizeof([payload]) > len(payload)
+
+    def test_component_sizes_are_separate(self):
+        """Test catalog, index and cache sizes are reported separately"""
+        ensure_catalog()
+        sizes = component_sizes()
+        assert set(sizes) == {
+            "catalog",
+            "catalog_indexes",
+            "customization_configs",
+            "image_variant_cache",
+            "price_histograms",
+            "wishlists",
+            "carts",
+            "customizations",
+        }
+        assert sizes["catalog"]["rows"] == len(PRODUCT_DATA)
+        assert sizes["catalog"]["bytes"] > 0
+
+    def test_client_stores_are_measured(self):
+        """Test carts, customizations and histograms count towards their sizes"""
+        store = ensure_catalog()
+        before = component_sizes()
+        cart_store.apply("memory-test", 0, [(1, "", 1)])
+        customization_registry.register(
+            store, 1, {"metal_type": "gold", "ring_size": "7.0"}
+        )
+        get_price_histogram(price_min=1, price_max=2, buckets=3)
+        after = component_sizes()
+        cart_store.clear()
+        customization_registry.clear()
+        for name in ("carts", "customizations", "price_histograms"):
+            assert after[name]["bytes"] > before[name]["bytes"]
+
+    def test_index_bytes_include_id_permutation(self):
+        """Test the lazily built id permutation counts towards index size"""
+        catalog = ColumnarCatalog.from_rows(reversed(PRODUCT_DATA))
+        before = catalog.index_nbytes
+        catalog.row_of(1)
+        assert catalog.index_nbytes > before
+
+
+class TestMemoryDiagnostics:
+    """Test snapshots, top sites and diffs"""
+
+    def test_snapshot_requires_tracing(self):
+        """Test snapshots are refused while tracing is off"""
+        assert not tracemalloc.is_tracing()
+        with pytest.raises(RuntimeError):
+            MemoryDiagnostics().take_snapshot()
+
+    def test_diff_finds_new_allocations(self):
+        """Test a diff attributes new allocations to this file"""
+        diagnostics = MemoryDiagnostics(max_snapshots=2)
+        diagnostics.start()
+        try:
+            base = diagnostics.take_snapshot()["id"]
+            held = [bytearray(1000) for _ in range(1000)]
+            current = diagnostics.take_snapshot()["id"]
+            diff = diagnostics.diff(base, current, limit=5)
+            top = diagnostics.top(current, group_by="filename", limit=50)
+        finally:
+            diagnostics.stop()
+        assert diff[0]["file"] == __file__
+        assert diff[0]["size_diff_bytes"] >= 1_000_000
+        assert "line" not in top[0]
+        assert any(site["file"] == __file__ for site in top)
+        del held
+
+    def test_oldest_snapshot_is_dropped(self):
+        """Test only max_snapshots snapshots are kept"""
+        diagnostics = MemoryDiagnostics(max_snapshots=2)
+        diagnostics.start()
+        try:
+            ids = [diagnostics.take_snapshot()["id"] for _ in range(3)]
+            assert diagnostics.get(ids[0]) is None
+            assert [s["id"] for s in diagnostics.status()["snapshots"]] == ids[1:]
+            with pytest.raises(KeyError, match=str(ids[0])):
+                diagnostics.diff(ids[0], ids[2])
+        finally:
+            diagnostics.stop()
+
+
+class TestMemoryEndpoints:
+    """Test the admin-only /debug/memory endpoints"""
+
+    def test_requires_token(self, admin):
+        """Test the endpoints reject missing or wrong tokens"""
+        assert client.get("/debug/memory").status_code == 403
+        response = client.post("/debug/memory/snapshots", headers={"X-Profile": "no"})
+        assert response.status_code == 403
+
+    def test_tracing_off_by_default(self, admin):
+        """Test tracing is off and snapshots conflict until it is started"""
+        status = client.get("/debug/memory", headers=HEADERS).json()
+        assert status["tracing"] is False
+        assert "catalog" in status["components"]
+        assert (
+            client.post("/debug/memory/snapshots", headers=HEADERS).status_code == 409
+        )
+
+    def test_snapshot_and_diff_flow(self, admin):
+        """Test starting tracing, taking two snapshots and diffing them"""
+        response = client.post(
+            "/debug/memory/tracing", params={"enabled": True}, headers=HEADERS
+        )
+        assert response.json() == {"tracing": True}
+        base = client.post("/debug/memory/snapshots", headers=HEADERS).json()["id"]
+        client.get("/api/products")
+        current = client.post("/debug/memory/snapshots", headers=HEADERS).json()["id"]
+
+        top = client.get(f"/debug/memory/snapshots/{current}", headers=HEADERS)
+        assert top.status_code == 200
+        assert {"file", "line", "size_bytes", "count"} <= set(top.json()[0])
+
+        diff = client.get(
+            "/debug/memory/diff",
+            params={"base": base, "current": current, "group_by": "filename"},
+            headers=HEADERS,
+        )
+        assert diff.status_code == 200
+        assert "size_diff_bytes" in diff.json()[0]
+
+        bad = client.get(
+            f"/debug/memory/snapshots/{current}",
+            params={"group_by": "module"},
+            headers=HEADERS,
+        )
+        assert bad.status_code == 400
+        assert (
+            client.get("/debug/memory/snapshots/999", headers=HEADERS).status_code
+            == 404
+        )
+
+        response = client.post(
+            "/debug/memory/tracing", params={"enabled": False}, headers=HEADERS
+        )
+        assert response.json() == {"tracing": False}
+
+    def test_evicted_snapshot_is_404(self, admin, monkeypatch):
+        """Test queries on an evicted snapshot are 404s naming it, not errors"""
+        monkeypatch.setattr(
+            "app.api.debug.memory_diagnostics", MemoryDiagnostics(max_snapshots=1)
+        )
+        client.post("/debug/memory/tracing", params={"enabled": True}, headers=HEADERS)
+        base = client.post("/debug/memory/snapshots", headers=HEADERS).json()["id"]
+        current = client.post("/debug/memory/snapshots", headers=HEADERS).json()["id"]
+
+        response = client.get(
+            "/debug/memory/diff",
+            params={"base": base, "current": current},
+            headers=HEADERS,
+        )
+        assert response.status_code == 404
+        assert response.json()["detail"] == f"Snapshot not found: {base}"
+        response = client.get(f"/debug/memory/snapshots/{base}", headers=HEADERS)
+        assert response.status_code == 404
@@ -0,0 +1,71 @@
+"""
+Tests for the metrics subsystem and /metrics endpoint
+"""
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import REQUEST_LATENCY, MetricsRegistry
+
+client = TestClient(app)
+
+
+class TestMetricTypes:
+    """Test counters, histograms and text rendering"""
+
+    def test_counter_render(self):
+        """Test counters render one labelled sample per series"""
+        registry = MetricsRegistry()
+        counter = registry.counter("hits_total", "Hits", ("cache",))
+        counter.inc("a")
+        counter.inc("a", amount=2)
+        text = registry.render()
+        assert "# TYPE hits_total counter" in text
+        assert 'hits_total{cache="a"} 3' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets, sum and count"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency", "Latency", ("route",), (0.1, 1.0))
+        histogram.observe(0.05, "/a")
+        histogram.observe(0.5, "/a")
+        histogram.observe(5.0, "/a")
+        text = registry.render()
+        assert 'latency_bucket{route="/a",le="0.1"} 1' in text
+        assert 'latency_bucket{route="/a",le="1.0"} 2' in text
+        assert 'latency_bucket{route="/a",le="+Inf"} 3' in text
+        assert 'latency_count{route="/a"} 3' in text
+        assert histogram.count("/a") == 3
+
+    def test_label_values_are_escaped(self):
+        """Test quotes in label values are escaped"""
+        registry = MetricsRegistry()
+        registry.counter("c_total", "C", ("name",)).inc('say "hi"')
+        assert 'c_total{name="say \\"hi\\""} 1' in registry.render()
+
+
+class TestMetricsEndpoint:
+    """Test request instrumentation and exposition"""
+
+    def test_route_template_is_used_as_label(self):
+        """Test requests are recorded under their route template and status"""
+        labels = ("/api/products/{product_id}", "GET", "404")
+        before = REQUEST_LATENCY.count(*labels)
+        client.get("/api/products/999")
+        assert REQUEST_LATENCY.count(*labels) == before + 1
+
+    def test_metrics_exposition(self):
+        """Test /metrics serves Prometheus text with request and cache metrics"""
+        client.get("/api/products?category=rings")
+        client.get("/api/customization-config/rings")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert (
+            'http_request_duration_seconds_count{route="/api/products",method="GET",status="200"}'
+            in text
+        )
+        assert 'http_response_size_bytes_total{route="/api/products"' in text
+        assert 'catalog_cache_requests_total{cache="customization_config"' in text
+        assert 'catalog_singleflight_requests_total{result="executed"}' in text
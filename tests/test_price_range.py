@@ -0,0 +1,184 @@
+"""
+Tests for price-range filtering and price histograms (app/catalog_store.py)
+and their API
+"""
+
+import sys
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.catalog_map import open_catalog_map, write_catalog_map
+from app.catalog_store import ColumnarCatalog
+from app.main import app
+from app.mock_data import (
+    PRODUCT_DATA,
+    apply_catalog_changes,
+    build_indexes,
+    get_price_histogram,
+    load_catalog,
+)
+from app.models import Product
+
+client = TestClient(app)
+
+PRICES = sorted(row["price"] for row in PRODUCT_DATA)
+
+
+@pytest.fixture
+def catalog():
+    """Fresh catalog for the test, restored afterwards"""
+    build_indexes(load_catalog())
+    yield
+    build_indexes(load_catalog())
+
+
+class TestPriceRange:
+    """Test range selection and bucketing in the columnar store"""
+
+    def setup_method(self):
+        self.catalog = ColumnarCatalog.from_rows(PRODUCT_DATA)
+
+    def test_select_price_range(self):
+        """Test ranges are inclusive and rows stay in catalog order"""
+        cases = [
+            {"price_min": 450, "price_max": 950},
+            {"price_min": 1000},
+            {"price_max": 350},
+            {"price_min": 9000},
+            {"category": "rings", "price_min": 500, "price_max": 1500},
+            {"material": "Gold", "price_min": 650.0},
+        ]
+        for filters in cases:
+            low = filters.get("price_min", 0)
+            high = filters.get("price_max", float("inf"))
+            expected = [
+                i
+                for i, row in enumerate(PRODUCT_DATA)
+                if low <= row["price"] <= high
+                and row["category"] == filters.get("category", row["category"])
+                and row["material"] == filters.get("material", row["material"])
+            ]
+            assert self.catalog.select(**filters) == expected, filters
+
+    def test_price_index_follows_appends(self):
+        """Test rows added after a range query are found by the next one"""
+        assert self.catalog.select(price_min=5000) == [4]
+        self.catalog.append({**PRODUCT_DATA[0], "id": 100, "price": 6000.0})
+        assert self.catalog.select(price_min=5000) == [4, 15]
+
+    def test_histogram(self):
+        """Test buckets cover every price once and the last edge is inclusive"""
+        edges, counts = self.catalog.price_histogram(None, 4)
+        assert edges[0] == PRICES[0] and edges[-1] == PRICES[-1]
+        assert len(edges) == 5 and sum(counts) == len(PRICES)
+        edges, counts = self.catalog.price_histogram(None, 2, 350, 1150)
+        assert edges == [350, 750, 1150]
+        assert counts == [5, 4]
+        rings = self.catalog.select("rings")
+        assert sum(self.catalog.price_histogram(rings, 3)[1]) == len(rings)
+        assert self.catalog.price_histogram([], 3) == ([], [])
+        assert self.catalog.price_histogram(None, 2, 10, 20) == ([10, 15, 20], [0, 0])
+
+    def test_concurrent_range_queries(self):
+        """Test threads racing to build the price index all get the same rows"""
+        rows = [{**PRODUCT_DATA[i % 15], "id": i + 1} for i in range(3_000)]
+        catalog = ColumnarCatalog.from_rows(rows)
+        expected = catalog.select(price_min=500, price_max=2000)
+        errors = []
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for step in range(20):
+                catalog.append({**PRODUCT_DATA[0], "id": 5_000 + step})
+                start = threading.Barrier(8)
+
+                def query():
+                    start.wait()
+                    try:
+                        assert catalog.select(price_min=500, price_max=2000) == expected
+                        assert catalog.price_histogram(None, 3)[1]
+                    except Exception as exc:
+                        errors.append(exc)
+
+                threads = [threading.Thread(target=query) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        assert errors == []
+
+    def test_price_index_in_snapshot(self, tmp_path):
+        """Test a mapped snapshot answers range queries like the original"""
+        path = tmp_path / "catalog.pcat"
+        write_catalog_map(self.catalog, str(path))
+        mapped = open_catalog_map(str(path))
+        assert mapped.select(price_min=899, price_max=1850) == self.catalog.select(
+            price_min=899, price_max=1850
+        )
+        assert mapped.price_histogram(None, 5) == self.catalog.price_histogram(None, 5)
+
+
+class TestPriceRangeApi:
+    """Test price_min/price_max on /api/products and /api/products/price-histogram"""
+
+    def test_products_in_range(self):
+        """Test any range can be requested"""
+        response = client.get("/api/products?price_min=425&price_max=899")
+        assert response.status_code == 200
+        prices = sorted(p["price"] for p in response.json())
+        assert prices == [p for p in PRICES if 425 <= p <= 899]
+
+    def test_histogram(self):
+        """Test the histogram counts the filtered products"""
+        response = client.get("/api/products/price-histogram?category=rings&buckets=3")
+        assert response.status_code == 200
+        body = response.json()
+        rings = [row["price"] for row in PRODUCT_DATA if row["category"] == "rings"]
+        assert len(body["counts"]) == 3 and len(body["edges"]) == 4
+        assert body["total"] == len(rings)
+        assert body["edges"][0] == min(rings) and body["edges"][-1] == max(rings)
+
+    def test_histogram_validation(self):
+        """Test inverted ranges and bucket counts out of bounds are refused"""
+        url = "/api/products/price-histogram"
+        assert client.get(f"{url}?price_min=10&price_max=5").status_code == 400
+        assert client.get(f"{url}?buckets=0").status_code == 422
+        assert client.get(f"{url}?buckets=101").status_code == 422
+
+    def test_non_finite_prices_rejected(self):
+        """Test inf and nan price bounds are refused on both endpoints"""
+        for url in ("/api/products", "/api/products/price-histogram"):
+            for query in ("price_max=inf", "price_min=nan", "price_max=Infinity"):
+                assert client.get(f"{url}?{query}").status_code == 422, query
+
+    def test_histogram_follows_catalog_changes(self, catalog):
+        """Test cached histograms are replaced once the catalog changes"""
+        before = get_price_histogram(price_min=0, price_max=10000, buckets=2)
+        assert before[1] == [14, 1]
+        cheap = Product(**{**PRODUCT_DATA[0], "id": 100, "price": 100.0})
+        apply_catalog_changes(upserts=[cheap])
+        after = get_price_histogram(price_min=0, price_max=10000, buckets=2)
+        assert after[1] == [15, 1]
+
+    def test_histogram_cache_metrics(self, catalog):
+        """Test histogram cache hits and misses are counted on /metrics"""
+
+        def counts():
+            text = client.get("/metrics").text
+            return [
+                line
+                for line in text.splitlines()
+                if line.startswith(
+                    'catalog_cache_requests_total{cache="price_histogram"'
+                )
+            ]
+
+        get_price_histogram(price_min=1, price_max=3, buckets=7)
+        get_price_histogram(price_min=1, price_max=3, buckets=7)
+        lines = counts()
+        assert any('result="miss"' in line for line in lines)
+        assert any('result="hit"' in line for line in lines)
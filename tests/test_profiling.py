@@ -0,0 +1,135 @@
+"""
+Tests for on-demand request profiling
+"""
+
+import asyncio
+import json
+import os
+import pstats
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.profiling import ProfilingConfig, ProfilingMiddleware
+
+client = TestClient(app)
+
+CPROFILE = {"X-Profile": "secret", "X-Profile-Mode": "cprofile"}
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """Profiling enabled with a known token and a temporary profile directory"""
+    config = ProfilingConfig(token="secret", profile_dir=tmp_path)
+    monkeypatch.setattr("app.profiling.profiling_config", config)
+    return config
+
+
+class TestProfilingMiddleware:
+    """Test which requests are profiled and what is written"""
+
+    def test_disabled_by_default(self):
+        """Test profiling is off without a token or sample rate"""
+        assert ProfilingConfig().enabled is False
+
+    def test_unauthorized_requests_are_not_profiled(self, config):
+        """Test requests without a valid token leave no profile"""
+        client.get("/api/products")
+        client.get("/api/products", headers={"X-Profile": "wrong"})
+        assert list(config.profile_dir.iterdir()) == []
+
+    def test_cprofile_profile_is_written(self, config):
+        """Test an authorized request writes a loadable pstats file"""
+        response = client.get("/api/products", headers=CPROFILE)
+        assert response.status_code == 200
+        (path,) = config.profile_dir.glob("*.pstats")
+        assert "api_products" in path.name
+        assert pstats.Stats(str(path)).total_calls > 0
+
+    def test_sampler_is_the_default(self, config):
+        """Test authorized requests are sampled into a speedscope document"""
+        config.sample_interval = 0.0005
+        client.get("/api/products", headers={"X-Profile": "secret"})
+        (path,) = config.profile_dir.glob("*.speedscope.json")
+        document = json.loads(path.read_text())
+        assert document["$schema"].startswith("https://www.speedscope.app")
+        assert "frames" in document["shared"]
+
+    def test_sample_rate_profiles_without_token(self, tmp_path, monkeypatch):
+        """Test a sample rate of 1 profiles every request"""
+        config = ProfilingConfig(sample_rate=1.0, profile_dir=tmp_path)
+        monkeypatch.setattr("app.profiling.profiling_config", config)
+        client.get("/api/products/1")
+        assert len(list(tmp_path.glob("*.speedscope.json"))) == 1
+
+    def test_old_profiles_are_pruned(self, config):
+        """Test only the newest max_profiles files are kept"""
+        config.max_profiles = 2
+        for _ in range(4):
+            client.get("/api/products/1", headers=CPROFILE)
+        assert len(list(config.profile_dir.glob("*.pstats"))) == 2
+
+    def test_profiles_are_pruned_by_size(self, config):
+        """Test the oldest profiles go once max_bytes is exceeded"""
+        old = config.profile_dir / "old.pstats"
+        old.write_bytes(b"x" * 1000)
+        os.utime(old, (0, 0))
+        config.max_bytes = 999
+        client.get("/api/products/1", headers=CPROFILE)
+        assert not old.exists()
+        assert len(list(config.profile_dir.glob("*.pstats"))) == 1
+
+    def test_profiles_are_written_off_the_event_loop(self, config, monkeypatch):
+        """Test saving and pruning run in the threadpool, not the loop thread"""
+        threads = {}
+
+        def prune(config):
+            threads["prune"] = threading.get_ident()
+            return 0
+
+        async def endpoint(scope, receive, send):
+            threads["loop"] = threading.get_ident()
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def ignore(message):
+            pass
+
+        monkeypatch.setattr("app.profiling.prune_profiles", prune)
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/products",
+            "headers": [(b"x-profile", b"secret")],
+        }
+        asyncio.run(ProfilingMiddleware(endpoint, config)(scope, None, ignore))
+        assert threads["prune"] != threads["loop"]
+        assert len(list(config.profile_dir.glob("*.speedscope.json"))) == 1
+
+
+class TestProfileIndex:
+    """Test the profile index and download endpoints"""
+
+    def test_index_requires_token(self, config):
+        """Test the index rejects missing or invalid tokens"""
+        assert client.get("/debug/profiles").status_code == 403
+        response = client.get("/debug/profiles", headers={"X-Profile": "nope"})
+        assert response.status_code == 403
+
+    def test_index_disabled_without_token(self):
+        """Test the index is hidden when profiling is not configured"""
+        assert client.get("/debug/profiles").status_code == 404
+
+    def test_index_lists_and_serves_profiles(self, config):
+        """Test captured profiles are listed and downloadable"""
+        headers = {"X-Profile": "secret"}
+        client.get("/api/products/1", headers=CPROFILE)
+        profiles = client.get("/debug/profiles", headers=headers).json()
+        assert len(profiles) == 1
+        assert profiles[0]["format"] == "pstats"
+
+        response = client.get(f"/debug/profiles/{profiles[0]['name']}", headers=headers)
+        assert response.status_code == 200
+        assert client.get("/debug/profiles/missing", headers=headers).status_code == 404
@@ -0,0 +1,102 @@
+"""
+Tests for the service worker script and API cache validators
+"""
+
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+from app.api.routes import API_MAX_AGE
+from app.main import app
+from app.service_worker import MANIFEST_PLACEHOLDER, PRECACHE, file_revision
+
+client = TestClient(app)
+
+
+def _manifest(script: str):
+    start = script.index("const PRECACHE_MANIFEST = ") + len(
+        "const PRECACHE_MANIFEST = "
+    )
+    end = script.index(" || []", start)
+    return json.loads(script[start:end])
+
+
+class TestServiceWorkerScript:
+    """Test the served script and its precache manifest"""
+
+    def test_served_from_root_without_caching(self):
+        """Test the worker is served at the root and always revalidated"""
+        response = client.get("/service-worker.js")
+        assert response.status_code == 200
+        assert "javascript" in response.headers["content-type"]
+        assert response.headers["cache-control"] == "no-cache"
+        assert MANIFEST_PLACEHOLDER not in response.text
+
+    def test_manifest_lists_hashed_assets(self):
+        """Test every precached URL is listed with a content revision"""
+        manifest = _manifest(client.get("/service-worker.js").text)
+        assert [entry["url"] for entry in manifest] == list(PRECACHE)
+        for entry in manifest:
+            assert entry["revision"] == file_revision(PRECACHE[entry["url"]])
+
+    def test_precached_urls_are_served(self):
+        """Test the manifest only references URLs the app serves"""
+        for url in PRECACHE:
+            assert client.get(url).status_code == 200, url
+
+    def test_revision_follows_content(self, tmp_path):
+        """Test a file's revision changes with its content, not its mtime"""
+        path = tmp_path / "asset.js"
+        path.write_text("one")
+        first = file_revision(path)
+        os.utime(path, ns=(1, 1))
+        assert file_revision(path) == first
+        path.write_text("two")
+        assert file_revision(path) != first
+
+    def test_pages_register_root_worker(self):
+        """Test both pages register the root-scoped worker"""
+        for url in ("/", "/wishlist.html"):
+            assert "register('/service-worker.js')" in client.get(url).text
+
+
+class TestApiValidators:
+    """Test ETag and Cache-Control on catalog API responses"""
+
+    def test_etag_and_max_age(self):
+        """Test listings carry a strong ETag and a max-age"""
+        response = client.get("/api/products")
+        assert response.headers["etag"].startswith('"')
+        assert f"max-age={API_MAX_AGE}" in response.headers["cache-control"]
+        assert "stale-while-revalidate=" in response.headers["cache-control"]
+
+    def test_if_none_match_returns_304(self):
+        """Test a matching validator gets an empty 304"""
+        etag = client.get("/api/products", params={"category": "rings"}).headers["etag"]
+        response = client.get(
+            "/api/products",
+            params={"category": "rings"},
+            headers={"If-None-Match": f'"stale", W/{etag}'},
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    def test_etag_differs_per_payload(self):
+        """Test different payloads get different validators"""
+        all_products = client.get("/api/products").headers["etag"]
+        rings = client.get("/api/products/category/rings")
+        assert rings.headers["etag"] != all_products
+        stale = client.get(
+            "/api/products", headers={"If-None-Match": rings.headers["etag"]}
+        )
+        assert stale.status_code == 200
+
+    def test_customization_config_etag(self):
+        """Test customization configs are revalidatable too"""
+        etag = client.get("/api/customization-config/rings").headers["etag"]
+        response = client.get(
+            "/api/customization-config/rings", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
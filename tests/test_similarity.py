@@ -0,0 +1,220 @@
+"""
+Tests for precomputed similar products (app/similarity.py) and their API
+"""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.catalog_store import ColumnarCatalog
+from app.main import app
+from app.mock_data import (
+    PRODUCT_DATA,
+    apply_catalog_changes,
+    build_indexes,
+    get_similar_products,
+    load_catalog,
+)
+from app.models import Product
+from app.similarity import (
+    EXACT_SCAN_LIMIT,
+    SIMILAR_K,
+    SimilarityIndex,
+    description_terms,
+    load_or_build_similarity_map,
+    open_similarity_map,
+    similarity,
+    write_similarity_map,
+)
+
+client = TestClient(app)
+
+# Same text, category, material and price as product 1
+TWIN = {**PRODUCT_DATA[0], "id": 100, "name": "Eternal Brilliance II"}
+
+WORDS = "gold silver pearl diamond ring chain charm band drop heart star moon".split()
+
+
+def _synthetic_rows(count):
+    """Products whose descriptions share common words, to defeat candidate pruning"""
+    rng = random.Random(7)
+    return [
+        {
+            **PRODUCT_DATA[i % len(PRODUCT_DATA)],
+            "id": i + 1,
+            "price": round(rng.uniform(50, 2000), 2),
+            "description": " ".join(rng.choices(WORDS, k=rng.randint(3, 6))),
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def catalog():
+    """Fresh catalog for the test, restored afterwards"""
+    build_indexes(load_catalog())
+    yield
+    build_indexes(load_catalog())
+
+
+def _assert_consistent(index, product_ids):
+    """Every list excludes its product, is ranked and references known products"""
+    for product_id in product_ids:
+        neighbors = index.neighbors(product_id)
+        assert product_id not in neighbors
+        assert len(neighbors) <= index.k
+        assert all(index.features(other) for other in neighbors)
+        own = index.features(product_id)
+        scores = [similarity(own, index.features(other)) for other in neighbors]
+        assert scores == sorted(scores, reverse=True)
+
+
+class TestSimilarityIndex:
+    """Test building and updating neighbor lists"""
+
+    def setup_method(self):
+        self.store = ColumnarCatalog.from_rows(PRODUCT_DATA)
+        self.index = SimilarityIndex.build(self.store, k=4)
+
+    def test_description_terms(self):
+        """Test words are lowercased and stop words dropped"""
+        assert description_terms("Gold ring with a Gold clasp") == {
+            "gold": 2,
+            "ring": 1,
+            "clasp": 1,
+        }
+
+    def test_built_lists(self):
+        """Test every product gets a ranked list of other products"""
+        ids = [row["id"] for row in PRODUCT_DATA]
+        _assert_consistent(self.index, ids)
+        assert all(len(self.index.neighbors(i)) == 4 for i in ids)
+        assert self.index.neighbors(999) == []
+
+    def test_added_twin_ranks_first(self):
+        """Test a new, identical product lands at the top of both lists"""
+        store = ColumnarCatalog.from_rows(PRODUCT_DATA + [TWIN])
+        self.index.update(store, upserted=[100])
+        assert self.index.neighbors(1)[0] == 100
+        assert self.index.neighbors(100)[0] == 1
+        _assert_consistent(self.index, [row["id"] for row in PRODUCT_DATA] + [100])
+
+    def test_removed_products_leave_every_list(self):
+        """Test removed products are dropped and the lists refilled"""
+        removed = self.index.neighbors(1)[0]
+        rows = [row for row in PRODUCT_DATA if row["id"] != removed]
+        self.index.update(ColumnarCatalog.from_rows(rows), removed=[removed])
+        ids = [row["id"] for row in rows]
+        assert all(removed not in self.index.neighbors(i) for i in ids)
+        assert self.index.neighbors(removed) == []
+        assert len(self.index.neighbors(1)) == 4
+        _assert_consistent(self.index, ids)
+
+    def test_matches_brute_force_cosine(self):
+        """Test lists equal an exact scan of every pair on catalogs up to the limit"""
+        store = ColumnarCatalog.from_rows(_synthetic_rows(EXACT_SCAN_LIMIT))
+        index = SimilarityIndex.build(store)
+        ids = list(store.ids)
+        for product_id in ids:
+            own = index.features(product_id)
+            exact = sorted(
+                (other for other in ids if other != product_id),
+                key=lambda other: (-similarity(own, index.features(other)), other),
+            )
+            assert index.neighbors(product_id) == exact[:SIMILAR_K]
+
+
+class TestSimilarityMap:
+    """Test neighbor lists shared through a mapped file"""
+
+    def setup_method(self):
+        self.store = ColumnarCatalog.from_rows(PRODUCT_DATA)
+        self.index = SimilarityIndex.build(self.store, k=4)
+
+    def test_round_trip(self, tmp_path):
+        """Test a mapped index serves the same lists as the built one"""
+        path = tmp_path / "similar.psim"
+        write_similarity_map(self.index, self.store, path)
+        mapped = open_similarity_map(path, self.store)
+        assert len(mapped) == len(self.index)
+        for row in PRODUCT_DATA:
+            assert mapped.ranked(row["id"]) == self.index.ranked(row["id"])
+        assert mapped.neighbors(999) == []
+
+    def test_update_copies_mapped_lists(self, tmp_path):
+        """Test an update on a mapped index refreshes lists like a built one"""
+        path = tmp_path / "similar.psim"
+        write_similarity_map(self.index, self.store, path)
+        mapped = open_similarity_map(path, self.store)
+        store = ColumnarCatalog.from_rows(PRODUCT_DATA + [TWIN])
+        mapped.update(store, upserted=[100])
+        self.index.update(store, upserted=[100])
+        for product_id in [row["id"] for row in PRODUCT_DATA] + [100]:
+            assert mapped.ranked(product_id) == self.index.ranked(product_id)
+
+    def test_rejects_other_catalog(self, tmp_path):
+        """Test a map built from another catalog is refused"""
+        path = tmp_path / "similar.psim"
+        write_similarity_map(self.index, self.store, path)
+        changed = [{**PRODUCT_DATA[0], "price": 1.0}] + PRODUCT_DATA[1:]
+        with pytest.raises(ValueError):
+            open_similarity_map(path, ColumnarCatalog.from_rows(changed))
+        path.write_bytes(b"not a map")
+        with pytest.raises(ValueError):
+            open_similarity_map(path, self.store)
+
+    def test_load_or_build(self, tmp_path, monkeypatch):
+        """Test the first caller builds and writes the map and later ones map it"""
+        path = tmp_path / "similar.psim"
+        first = load_or_build_similarity_map(self.store, path, k=4)
+        assert path.exists()
+        assert first.ranked(1) == self.index.ranked(1)
+
+        def no_build(*args, **kwargs):
+            raise AssertionError("map should be reused")
+
+        monkeypatch.setattr(SimilarityIndex, "build", no_build)
+        assert load_or_build_similarity_map(self.store, path).neighbors(1) == (
+            self.index.neighbors(1)
+        )
+
+    def test_catalog_uses_shared_map(self, catalog, tmp_path, monkeypatch):
+        """Test the catalog serves similar products from PANDORA_SIMILAR_MAP"""
+        path = tmp_path / "similar.psim"
+        monkeypatch.setattr("app.mock_data.SIMILAR_MAP", str(path))
+        build_indexes(load_catalog())
+        neighbors = [p.id for p in get_similar_products(1, SIMILAR_K)]
+        assert path.exists()
+        assert len(neighbors) == SIMILAR_K
+        apply_catalog_changes(upserts=[Product(**TWIN)])
+        assert [p.id for p in get_similar_products(1, 1)] == [100]
+
+
+class TestSimilarApi:
+    """Test /api/products/{id}/similar"""
+
+    def test_similar_products(self):
+        """Test neighbors are returned best first, up to the limit"""
+        response = client.get("/api/products/1/similar")
+        assert response.status_code == 200
+        ids = [product["id"] for product in response.json()]
+        assert len(ids) == SIMILAR_K
+        assert 1 not in ids
+        limited = client.get("/api/products/1/similar?limit=2").json()
+        assert [product["id"] for product in limited] == ids[:2]
+
+    def test_unknown_product_and_limit(self):
+        """Test unknown products are 404 and limits above K are refused"""
+        assert client.get("/api/products/999/similar").status_code == 404
+        limit = SIMILAR_K + 1
+        assert client.get(f"/api/products/1/similar?limit={limit}").status_code == 422
+
+    def test_catalog_changes_update_neighbors(self, catalog):
+        """Test catalog changes refresh neighbors without a rebuild"""
+        assert get_similar_products(1, 1)[0].id != 100
+        apply_catalog_changes(upserts=[Product(**TWIN)])
+        assert [p.id for p in get_similar_products(1, 1)] == [100]
+        apply_catalog_changes(removals=[100])
+        assert 100 not in [p.id for p in get_similar_products(1, SIMILAR_K)]
+        assert get_similar_products(100, SIMILAR_K) is None
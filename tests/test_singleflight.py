@@ -0,0 +1,123 @@
+"""
+Tests for single-flight request coalescing
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.singleflight import SingleFlight
+
+client = TestClient(app)
+
+
+class TestSingleFlight:
+    """Test the SingleFlight coalescing primitive"""
+
+    def test_concurrent_identical_calls_share_one_execution(self):
+        """Test that concurrent callers with the same key run the work once"""
+        flight = SingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        async def main():
+            return await asyncio.gather(*(flight.do("k", work) for _ in range(10)))
+
+        results = asyncio.run(main())
+        assert results == ["result"] * 10
+        assert len(runs) == 1
+        assert flight.stats() == {
+            "calls": 10,
+            "executions": 1,
+            "coalesced": 9,
+            "in_flight": 0,
+        }
+
+    def test_different_keys_are_not_coalesced(self):
+        """Test that distinct keys each execute their own work"""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return "result"
+
+        async def main():
+            await asyncio.gather(flight.do("a", work), flight.do("b", work))
+
+        asyncio.run(main())
+        assert flight.executions == 2
+        assert flight.coalesced == 0
+
+    def test_sequential_calls_are_not_cached(self):
+        """Test that a finished call is not reused by later callers"""
+        flight = SingleFlight()
+
+        async def work():
+            return "result"
+
+        async def main():
+            await flight.do("k", work)
+            await flight.do("k", work)
+
+        asyncio.run(main())
+        assert flight.executions == 2
+
+    def test_exception_propagates_to_all_callers(self):
+        """Test that a failure in the shared call reaches every waiter"""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def main():
+            return await asyncio.gather(
+                flight.do("k", work), flight.do("k", work), return_exceptions=True
+            )
+
+        results = asyncio.run(main())
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flight.stats()["in_flight"] == 0
+
+    def test_cancelled_caller_does_not_cancel_shared_work(self):
+        """Test that one caller going away leaves the others unaffected"""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "result"
+
+        async def main():
+            first = asyncio.ensure_future(flight.do("k", work))
+            second = asyncio.ensure_future(flight.do("k", work))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(main()) == "result"
+
+
+class TestCoalescedRoutes:
+    """Test that the coalesced routes still serve the same payloads"""
+
+    def test_filtered_products_payload(self):
+        """Test filtered products are serialized like the response model"""
+        response = client.get("/api/products?category=rings&price_max=1000")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        products = response.json()
+        assert len(products) > 0
+        assert all(p["category"] == "rings" and p["price"] <= 1000 for p in products)
+
+    @pytest.mark.parametrize("category", ["rings", "necklaces", "bracelets"])
+    def test_customization_config_payload(self, category):
+        """Test customization config is still returned as JSON"""
+        response = client.get(f"/api/customization-config/{category}")
+        assert response.status_code == 200
+        assert response.json()["category"] == category
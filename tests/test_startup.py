@@ -0,0 +1,110 @@
+"""
+Tests for lazy, instrumented application startup
+"""
+
+import logging
+import time
+
+from fastapi.testclient import TestClient
+
+from app import customization_config
+from app.customization_config import get_customization_config
+from app.main import app
+from app.mock_data import (
+    PRODUCT_DATA,
+    get_catalog_changes,
+    load_catalog,
+    write_catalog_snapshot,
+)
+from app.startup import StartupState, warm_up
+
+
+class TestStartup:
+    """Test the lifespan warm-up and health probes"""
+
+    def test_ready_after_warm_up(self):
+        """Test readiness reports every startup phase once warm-up finishes"""
+        with TestClient(app) as client:
+            assert client.get("/health/live").json() == {"status": "ok"}
+            for _ in range(100):
+                response = client.get("/health/ready")
+                if response.status_code == 200:
+                    break
+                time.sleep(0.01)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["ready"] is True
+        assert {"import", "cache_warm"} <= set(body["phases_ms"])
+
+    def test_not_ready_reports_503(self, monkeypatch):
+        """Test readiness is 503 before warm-up completes"""
+        monkeypatch.setattr("app.main.startup_state", StartupState())
+        response = TestClient(app).get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
+
+    def test_failed_warm_up_is_logged_and_reported(self, monkeypatch, caplog):
+        """Test a warm-up exception is logged and readiness reports it"""
+        state = StartupState()
+        monkeypatch.setattr("app.main.startup_state", state)
+
+        def broken_warm_up():
+            raise OSError("catalog unavailable")
+
+        monkeypatch.setattr("app.main.warm_up", broken_warm_up)
+        with caplog.at_level(logging.ERROR, logger="app.startup"):
+            with TestClient(app) as client:
+                for _ in range(100):
+                    if state.error is not None:
+                        break
+                    time.sleep(0.01)
+                response = client.get("/health/ready")
+
+        assert response.status_code == 503
+        assert response.json()["error"] == "OSError: catalog unavailable"
+        assert "startup warm-up failed" in caplog.text
+
+    def test_warm_up_records_phases(self, monkeypatch):
+        """Test warm-up times catalog load and index build when still cold"""
+        state = StartupState()
+        monkeypatch.setattr("app.startup.startup_state", state)
+        monkeypatch.setattr("app.mock_data.is_catalog_loaded", lambda: False)
+        warm_up()
+        assert state.ready is True
+        assert set(state.phases) == {"catalog_load", "index_build", "cache_warm"}
+
+    def test_warm_up_keeps_loaded_catalog(self, monkeypatch):
+        """Test warm-up does not reload a catalog a request already loaded"""
+        state = StartupState()
+        monkeypatch.setattr("app.startup.startup_state", state)
+        epoch = get_catalog_changes(0)[0]
+        warm_up()
+        assert get_catalog_changes(0)[0] == epoch
+        assert set(state.phases) == {"cache_warm"}
+
+
+class TestLazyLoading:
+    """Test lazily built catalog and configuration"""
+
+    def test_catalog_snapshot_round_trip(self, tmp_path):
+        """Test a written snapshot loads back to the same products"""
+        path = str(tmp_path / "catalog.json")
+        write_catalog_snapshot(path)
+        products = load_catalog(path)
+        assert len(products) == len(PRODUCT_DATA)
+        assert products == load_catalog(None)
+
+    def test_customization_config_is_built_once(self):
+        """Test configs are memoized after first use"""
+        assert get_customization_config("rings") is get_customization_config("rings")
+        assert get_customization_config("invalid") is None
+
+    def test_legacy_config_names(self):
+        """Test the former module-level config names still resolve lazily"""
+        assert customization_config.RINGS_CONFIG is get_customization_config("rings")
+        assert customization_config.BRACELETS_CONFIG is get_customization_config(
+            "bracelets"
+        )
+        configs = customization_config.CUSTOMIZATION_CONFIGS
+        assert configs["necklaces"] is customization_config.NECKLACES_CONFIG
@@ -0,0 +1,152 @@
+"""
+Tests for the ahead-of-time stylesheet build
+"""
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.stylesheet import (
+    build_stylesheet,
+    content_paths,
+    critical_css,
+    generate_utilities,
+    main,
+    page_selectors,
+    render_blocking,
+    unknown_utilities,
+)
+
+client = TestClient(app)
+
+
+class TestUtilities:
+    """Test CSS generated for utility classes"""
+
+    def test_spacing_and_colours(self):
+        """Test spacing, brand colours and arbitrary values"""
+        css = generate_utilities(["px-1.5", "bg-gold", "min-w-[20px]", "-top-2"])
+        assert ".px-1\\.5{padding-left:0.375rem;padding-right:0.375rem}" in css
+        assert "background-color:rgb(212 175 55 / var(--tw-bg-opacity))" in css
+        assert ".min-w-\\[20px\\]{min-width:20px}" in css
+        assert ".-top-2{top:-0.5rem}" in css
+
+    def test_unknown_names_are_ignored(self):
+        """Test words that are not utilities generate nothing"""
+        assert generate_utilities(["product-card", "fetch", "text-banana"]) == "\n"
+
+    def test_unknown_utilities(self):
+        """Test utility-like names that generate nothing are reported"""
+        names = ["bg-gold-950", "mt-13", "xl:flex-colum", "lg:p-4", "product-card"]
+        assert unknown_utilities(names + ["fetch", "key:value", "text-gold"]) == [
+            "bg-gold-950",
+            "mt-13",
+            "xl:flex-colum",
+        ]
+
+    def test_variants(self):
+        """Test state, group and responsive variants"""
+        css = generate_utilities(
+            ["hover:text-gold", "group-hover:scale-110", "md:flex"]
+        )
+        assert ".hover\\:text-gold:hover{" in css
+        assert ".group:hover .group-hover\\:scale-110{" in css
+        assert "@media (min-width:768px){.md\\:flex{display:flex}}" in css
+
+    def test_later_utilities_win(self):
+        """Test conflicting utilities are ordered as Tailwind orders them"""
+        css = generate_utilities(["hidden", "flex", "md:hidden", "p-4", "px-2"])
+        assert css.index(".flex{") < css.index(".hidden{")
+        assert css.index(".p-4{") < css.index(".px-2{")
+        assert css.index(".hidden{") < css.index(".md\\:hidden{")
+
+
+class TestCriticalCss:
+    """Test the rules inlined for a page"""
+
+    def test_hidden_contents_are_skipped(self):
+        """Test elements inside hidden or off-screen elements are not critical"""
+        html = (
+            '<div id="menu" class="hidden md:flex"><a class="px-4"></a></div>'
+            '<div class="hidden"><p class="mb-2"></p></div>'
+            '<aside id="cart" class="translate-x-full"><p class="p-6"></p></aside>'
+            '<img class="w-6"><span class="text-xs"></span>'
+        )
+        classes, ids = page_selectors(html)
+        assert {"px-4", "hidden", "translate-x-full", "w-6", "text-xs"} <= classes
+        assert "mb-2" not in classes
+        assert "p-6" not in classes
+        assert ids == {"menu", "cart"}
+
+    def test_unused_rules_are_dropped(self):
+        """Test selectors, media rules and keyframes the page cannot use go"""
+        css = (
+            "a,.x,#y{color:red}.z{color:blue}@media print{a{color:black}}"
+            "@media (min-width:768px){.md\\:x{color:red}.z{color:blue}}"
+            "@keyframes spin{to{transform:rotate(360deg)}}.x{animation:spin 1s}"
+            "@keyframes fade{to{opacity:0}}"
+        )
+        assert critical_css(css, {"x", "md:x"}, set()) == (
+            "a,.x{color:red}@media (min-width:768px){.md\\:x{color:red}}"
+            "@keyframes spin{to{transform:rotate(360deg)}}.x{animation:spin 1s}"
+        )
+
+
+class TestRenderBlocking:
+    """Test what a page waits for before its first render"""
+
+    def test_counts_blocking_resources(self):
+        """Test stylesheets and synchronous scripts block, deferred ones do not"""
+        html = (
+            '<head><script src="https://cdn.example.com/x.js"></script>'
+            '<link rel="stylesheet" href="/static/css/styles.css">'
+            '<script defer src="/bundles/app.js"></script>'
+            '<link rel="preload" href="/static/x.css" as="style">'
+            "<style>a{}</style><script>var a;</script></head>"
+        )
+        blocking = render_blocking(html)
+        assert [url for url, _ in blocking.requests] == [
+            "/static/css/styles.css",
+            "https://cdn.example.com/x.js",
+        ]
+        assert blocking.external == ["https://cdn.example.com/x.js"]
+        assert blocking.local_bytes > 0
+        assert blocking.inline_bytes == len("a{}var a;")
+
+
+class TestBuiltStylesheet:
+    """Test the committed build output and how it is served"""
+
+    def test_build_is_current(self):
+        """Test the stylesheet and templates match a fresh build"""
+        build = build_stylesheet()
+        assert build.stale_files() == []
+        assert build.unknown == ()
+
+    def test_check_fails_on_unknown_utilities(self, tmp_path, monkeypatch, capsys):
+        """Test --check reports unknown utility-like classes and exits 1"""
+        script = tmp_path / "typo.js"
+        script.write_text('el.className = "p-4 bg-gold-950";', encoding="utf-8")
+        paths = content_paths() + [script]
+        monkeypatch.setattr("app.stylesheet.content_paths", lambda: paths)
+        monkeypatch.setattr("sys.argv", ["app.stylesheet", "--check"])
+        assert main() == 1
+        out = capsys.readouterr().out
+        assert "unknown utility: bg-gold-950" in out
+        assert "out of date" not in out
+
+    def test_pages_do_not_block_on_styles(self):
+        """Test pages inline their critical rules and nothing blocks render"""
+        for path in ("/", "/wishlist.html"):
+            html = client.get(path).text
+            assert "cdn.tailwindcss.com" not in html
+            blocking = render_blocking(html)
+            assert blocking.requests == []
+            assert ".bg-luxury{" in html
+
+    def test_stylesheet_is_immutable(self):
+        """Test the fingerprinted stylesheet may be cached forever"""
+        response = client.get(build_stylesheet().url)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/css")
+        assert "immutable" in response.headers["cache-control"]
+        assert ".product-card" in response.text
@@ -0,0 +1,148 @@
+"""
+Tests for request tracing (app/tracing.py)
+"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.tracing import NOOP_SPAN, STATUS_ERROR, OTLPJsonFileExporter, Tracer, tracer
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def recording():
+    """Sample every request on the app tracer for the duration of a test"""
+    previous = tracer.sample_rate
+    tracer.sample_rate = 1.0
+    tracer.buffer.clear()
+    yield tracer
+    tracer.sample_rate = previous
+    tracer.buffer.clear()
+
+
+class TestSpans:
+    """Test span nesting, sampling and buffering"""
+
+    def test_children_share_trace_and_parent(self):
+        """Test nested spans are linked through the context variable"""
+        t = Tracer(sample_rate=1.0)
+        with t.span("root") as root:
+            with t.span("child", rows=3) as child:
+                pass
+        assert [s.name for s in t.finished_spans()] == ["child", "root"]
+        assert child.trace_id == root.trace_id
+        assert child.parent_id == root.span_id
+        assert root.parent_id is None
+        assert child.attributes == {"rows": 3}
+        assert root.end_ns >= child.end_ns >= child.start_ns
+
+    def test_disabled_records_nothing(self):
+        """Test a zero sample rate hands out no-op spans"""
+        t = Tracer(sample_rate=0.0)
+        with t.span("root") as root:
+            root.set_attribute("ignored", True)
+        assert root is NOOP_SPAN
+        assert t.finished_spans() == []
+
+    def test_unsampled_trace_skips_children(self):
+        """Test children of an unsampled root are not recorded as new roots"""
+        t = Tracer(sample_rate=1e-12)
+        with t.span("root"):
+            t.sample_rate = 1.0
+            with t.span("child") as child:
+                pass
+        assert child is NOOP_SPAN
+        assert t.finished_spans() == []
+
+    def test_exception_sets_error_status(self):
+        """Test a span records the exception and lets it propagate"""
+        t = Tracer(sample_rate=1.0)
+        with pytest.raises(ValueError):
+            with t.span("failing"):
+                raise ValueError("boom")
+        (span,) = t.finished_spans()
+        assert span.status_code == STATUS_ERROR
+        assert span.status_message == "ValueError: boom"
+
+    def test_ring_buffer_drops_oldest(self):
+        """Test the buffer keeps the newest spans and counts drops"""
+        t = Tracer(sample_rate=1.0, buffer_size=2)
+        for name in ("a", "b", "c"):
+            with t.span(name):
+                pass
+        assert [s.name for s in t.finished_spans()] == ["b", "c"]
+        assert t.dropped == 1
+
+
+class TestExporter:
+    """Test OTLP/JSON file export"""
+
+    def test_flush_writes_otlp_json(self, tmp_path):
+        """Test flushed spans are written as one OTLP request per line"""
+        path = tmp_path / "spans.jsonl"
+        t = Tracer(sample_rate=1.0, exporter=OTLPJsonFileExporter(path))
+        with t.span("root"):
+            with t.span("child", products=5, cached=False):
+                pass
+        assert t.flush() == 2
+        assert t.finished_spans() == []
+
+        (line,) = path.read_text().splitlines()
+        request = json.loads(line)
+        (resource_spans,) = request["resourceSpans"]
+        assert resource_spans["resource"]["attributes"][0]["key"] == "service.name"
+        spans = resource_spans["scopeSpans"][0]["spans"]
+        child, root = spans
+        assert len(root["traceId"]) == 32 and len(root["spanId"]) == 16
+        assert "parentSpanId" not in root
+        assert child["parentSpanId"] == root["spanId"]
+        assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
+        assert child["attributes"] == [
+            {"key": "products", "value": {"intValue": "5"}},
+            {"key": "cached", "value": {"boolValue": False}},
+        ]
+
+    def test_exports_when_batch_is_full(self, tmp_path):
+        """Test finishing a root span exports once the batch size is reached"""
+        path = tmp_path / "spans.jsonl"
+        t = Tracer(sample_rate=1.0, exporter=OTLPJsonFileExporter(path), export_batch=2)
+        with t.span("first"):
+            pass
+        assert not path.exists()
+        with t.span("second"):
+            pass
+        assert len(path.read_text().splitlines()) == 1
+
+
+class TestRequestTracing:
+    """Test spans recorded for API requests"""
+
+    def test_product_listing_phases(self, recording):
+        """Test a listing request records its phases under one root"""
+        response = client.get("/api/products", params={"category": "rings"})
+        assert response.status_code == 200
+        spans = {s.name: s for s in recording.finished_spans()}
+        root = spans["GET /api/products"]
+        assert root.parent_id is None
+        assert root.attributes["http.response.status_code"] == 200
+        for name in (
+            "validate_params",
+            "coalesced_build",
+            "catalog.filter_products_page",
+            "serialize_json",
+        ):
+            assert spans[name].trace_id == root.trace_id
+        # Work done in the threadpool is still parented to the request
+        assert spans["serialize_json"].parent_id == spans["coalesced_build"].span_id
+
+    def test_invalid_params_marked_as_error(self, recording):
+        """Test a rejected filter shows up as a failed validation span"""
+        response = client.get("/api/products", params={"material": "Tin"})
+        assert response.status_code == 400
+        spans = {s.name: s for s in recording.finished_spans()}
+        assert spans["validate_params"].status_code == STATUS_ERROR
+        assert spans["GET /api/products"].attributes["http.route"] == "/api/products"
@@ -28,11 +28,15 @@ class TestWishlistIntegration:
         assert response.status_code == 200
         assert b"cart.js" in response.content
 
-    def test_wishlist_uses_products_api(self):
-        """Test that wishlist page references the products API endpoint"""
+    def test_wishlist_uses_wishlist_api(self):
+        """Test that wishlist page syncs with the wishlist API instead of the catalog"""
         response = client.get("/wishlist.html")
         assert response.status_code == 200
-        assert b"/api/products" in response.content
+        assert b"wishlist.sync()" in response.content
+        assert b"/api/products" not in response.content
+
+        wishlist_js_response = client.get("/static/js/wishlist.js")
+        assert b"/api/wishlists" in wishlist_js_response.content
 
     def test_products_api_available_for_wishlist(self):
         """Test that products API is available for wishlist to fetch product data"""
@@ -0,0 +1,156 @@
+"""
+Tests for server-side wishlists (app/wishlists.py) and /api/wishlists
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.wishlists import Wishlist, WishlistFullError, WishlistStore, wishlist_store
+
+client = TestClient(app)
+WISHLIST = "/api/wishlists/device-one"
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    """Each test starts without wishlists"""
+    wishlist_store.clear()
+    yield
+    wishlist_store.clear()
+
+
+def post_changes(base_version=0, add=(), remove=()):
+    return client.post(
+        f"{WISHLIST}/changes",
+        json={"base_version": base_version, "add": list(add), "remove": list(remove)},
+    )
+
+
+class TestWishlistStore:
+    """Test the id sets and versioning"""
+
+    def test_ids_stay_sorted_and_unique(self):
+        """Test adds keep ascending order and ignore duplicates"""
+        wishlist = Wishlist()
+        assert wishlist.apply([5, 1, 3, 1], [])
+        assert wishlist.product_ids.tolist() == [1, 3, 5]
+        assert 3 in wishlist and 2 not in wishlist
+
+    def test_version_bumps_once_per_changing_delta(self):
+        """Test a delta bumps the version once, and no-op deltas not at all"""
+        wishlist = Wishlist()
+        wishlist.apply([1, 2], [3])
+        assert wishlist.version == 1
+        assert not wishlist.apply([1], [3])
+        assert wishlist.version == 1
+
+    def test_remove_applies_after_add(self):
+        """Test an id in both lists of one delta ends up removed"""
+        wishlist = Wishlist()
+        wishlist.apply([1, 2], [2])
+        assert wishlist.product_ids.tolist() == [1]
+
+    def test_full_wishlist_is_left_unchanged(self):
+        """Test a delta exceeding the size limit is rejected as a whole"""
+        store = WishlistStore(max_items=2)
+        store.apply("w", [1, 2], [])
+        with pytest.raises(WishlistFullError):
+            store.apply("w", [3], [])
+        assert store.get("w") == (1, [1, 2])
+        # Swapping one product for another stays within the limit
+        assert store.apply("w", [3], [1]) == (1, 2, [2, 3])
+
+    def test_least_recently_used_wishlists_are_evicted(self):
+        """Test the store keeps at most max_wishlists, dropping the least used"""
+        store = WishlistStore(max_wishlists=2)
+        store.apply("a", [1], [])
+        store.apply("b", [2], [])
+        store.get("a")
+        store.apply("c", [3], [])
+        assert len(store) == 2 and store.evictions == 1
+        assert store.get("b") == (0, [])
+        assert store.get("a") == (1, [1])
+
+    def test_unused_wishlists_expire(self):
+        """Test wishlists unused for ttl seconds are forgotten"""
+        now = [0.0]
+        store = WishlistStore(ttl=10, clock=lambda: now[0])
+        store.apply("a", [1], [])
+        now[0] = 9
+        store.apply("b", [2], [])
+        now[0] = 15
+        assert store.get("a") == (0, [])
+        assert store.get("b") == (1, [2])
+
+    def test_rejected_delta_creates_nothing(self):
+        """Test a new wishlist is not kept when its first delta is too big"""
+        store = WishlistStore(max_items=1)
+        with pytest.raises(WishlistFullError):
+            store.apply("w", [1, 2], [])
+        assert len(store) == 0
+
+
+class TestWishlistAPI:
+    """Test /api/wishlists/{id}"""
+
+    def test_unknown_wishlist_is_empty(self):
+        """Test an unused id returns an empty wishlist at version 0"""
+        response = client.get(WISHLIST)
+        assert response.status_code == 200
+        assert response.json() == {
+            "id": "device-one",
+            "version": 0,
+            "product_ids": [],
+            "products": [],
+        }
+        assert response.headers["cache-control"] == "no-store"
+
+    def test_changes_then_hydrated_get(self):
+        """Test a batch of changes is stored and returned with its products"""
+        response = post_changes(add=[3, 1, 2], remove=[2])
+        assert response.status_code == 200
+        assert response.json()["version"] == 1
+        assert response.json()["product_ids"] == [1, 3]
+        assert response.json()["products"] is None
+
+        data = client.get(WISHLIST).json()
+        assert data["product_ids"] == [1, 3]
+        assert [p["id"] for p in data["products"]] == [1, 3]
+        assert data["products"][0]["name"]
+
+    def test_get_without_products(self):
+        """Test hydrate=false returns only the ids"""
+        post_changes(add=[4])
+        data = client.get(f"{WISHLIST}?hydrate=false").json()
+        assert data["product_ids"] == [4]
+        assert data["products"] is None
+
+    def test_deltas_from_two_devices_merge(self):
+        """Test a delta based on an old version merges and returns products"""
+        post_changes(base_version=0, add=[1])
+        response = post_changes(base_version=0, add=[2])
+        data = response.json()
+        assert data["version"] == 2
+        assert data["product_ids"] == [1, 2]
+        assert [p["id"] for p in data["products"]] == [1, 2]
+
+    def test_unknown_product_is_rejected(self):
+        """Test adding a product that is not in the catalog returns 400"""
+        response = post_changes(add=[1, 99999])
+        assert response.status_code == 400
+        assert "99999" in response.json()["detail"]
+        assert client.get(WISHLIST).json()["version"] == 0
+
+    def test_invalid_wishlist_id(self):
+        """Test ids outside the allowed pattern are rejected"""
+        assert client.get("/api/wishlists/short").status_code == 422
+        assert client.get("/api/wishlists/has%20space").status_code == 422
+
+    def test_full_wishlist_conflict(self, monkeypatch):
+        """Test growing a wishlist past the limit returns 409"""
+        monkeypatch.setattr(wishlist_store, "max_items", 1)
+        post_changes(add=[1])
+        response = post_changes(base_version=1, add=[2])
+        assert response.status_code == 409
+        assert "Wishlist full" in response.json()["detail"]